@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Construit config/data/arrondissements.geojson (polygones des 20 arrondissements)
+
+Sources acceptées :
+- export GeoJSON officiel "arrondissements" d'opendata.paris.fr (fichier local ou
+  téléchargement, propriétés c_ar / c_arinsee / l_ar conservées)
+- communes.csv(.lzma) du paquet data-france (géométries WKB hexadécimales des
+  arrondissements municipaux "ARM" 75101-75120 issues d'ADMIN EXPRESS, IGN / INSEE)
+
+Le fichier écrit contient exactement une feature par arrondissement ; le script
+échoue si l'un des 20 manque.
+
+Usage:
+    python build_arrondissements_geojson.py --paris [export.geojson]
+    python build_arrondissements_geojson.py --admin-express communes.csv.lzma
+"""
+
+import argparse
+import csv
+import io
+import json
+import lzma
+import struct
+import sys
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Ajouter le projet au path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from config import ARRONDISSEMENTS_GEOJSON, ARRONDISSEMENTS_PARIS
+from processors.utils.arrondissements import code_from_properties
+
+OPENDATA_PARIS_URL = (
+    "https://opendata.paris.fr/api/explore/v2.1/catalog/datasets/arrondissements/exports/geojson"
+)
+
+
+def _parse_wkb(data: bytes) -> Dict[str, Any]:
+    """Géométrie GeoJSON (Polygon / MultiPolygon) d'un WKB / EWKB"""
+    offset = 0
+
+    def read(fmt: str) -> Tuple:
+        nonlocal offset
+        values = struct.unpack_from(fmt, data, offset)
+        offset += struct.calcsize(fmt)
+        return values
+
+    def geometry() -> Tuple[str, List]:
+        order = "<" if read("B")[0] == 1 else ">"
+        geo_type = read(order + "I")[0]
+        if geo_type & 0x20000000:  # EWKB : SRID présent
+            read(order + "I")
+            geo_type &= 0xFFFF
+        if geo_type == 3:
+            rings = []
+            for _ in range(read(order + "I")[0]):
+                n_points = read(order + "I")[0]
+                values = read(order + f"{2 * n_points}d")
+                rings.append([[values[2 * i], values[2 * i + 1]] for i in range(n_points)])
+            return "Polygon", rings
+        if geo_type == 6:
+            return "MultiPolygon", [geometry()[1] for _ in range(read(order + "I")[0])]
+        raise ValueError(f"Type WKB non géré: {geo_type}")
+
+    geo_type, coordinates = geometry()
+    return {"type": geo_type, "coordinates": coordinates}
+
+
+def features_from_admin_express(path: Path) -> List[Dict[str, Any]]:
+    """Arrondissements municipaux de Paris du fichier communes de data-france"""
+    raw = path.read_bytes()
+    text = (lzma.decompress(raw) if path.suffix == ".lzma" else raw).decode("utf-8")
+    csv.field_size_limit(sys.maxsize)
+    features = []
+    for row in csv.DictReader(io.StringIO(text)):
+        code = row.get("code", "")
+        if row.get("type") != "ARM" or not code.startswith("751"):
+            continue
+        features.append({
+            "type": "Feature",
+            "properties": {"c_ar": int(code) - 75100, "c_arinsee": int(code), "l_ar": row.get("nom", "")},
+            "geometry": _parse_wkb(bytes.fromhex(row["geometry"]))
+        })
+    return features
+
+
+def features_from_paris_export(source: str) -> List[Dict[str, Any]]:
+    """Features de l'export opendata.paris.fr (fichier local ou URL)"""
+    if source.startswith("http"):
+        with urllib.request.urlopen(source, timeout=60) as response:
+            collection = json.load(response)
+    else:
+        with open(source, "r", encoding="utf-8") as f:
+            collection = json.load(f)
+    features = []
+    for feature in collection.get("features", []):
+        properties = feature.get("properties") or {}
+        features.append({
+            "type": "Feature",
+            "properties": {key: properties[key] for key in ("c_ar", "c_arinsee", "l_ar") if key in properties},
+            "geometry": feature.get("geometry")
+        })
+    return features
+
+
+def write_geojson(features: List[Dict[str, Any]], output: Path) -> None:
+    """Vérifie la couverture des 20 arrondissements puis écrit le GeoJSON"""
+    by_code = {}
+    for feature in features:
+        code = code_from_properties(feature["properties"])
+        if code and (feature.get("geometry") or {}).get("type") in ("Polygon", "MultiPolygon"):
+            by_code[code] = feature
+    missing = sorted(set(ARRONDISSEMENTS_PARIS) - set(by_code))
+    if missing:
+        raise ValueError(f"Arrondissements absents de la source: {', '.join(missing)}")
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"type": "FeatureCollection",
+                   "features": [by_code[code] for code in ARRONDISSEMENTS_PARIS]},
+                  f, ensure_ascii=False, separators=(",", ":"))
+    print(f"✓ {len(by_code)} arrondissements écrits dans {output}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--paris", nargs="?", const=OPENDATA_PARIS_URL,
+                        help="Export opendata.paris.fr (fichier ou URL, défaut: téléchargement)")
+    source.add_argument("--admin-express", type=Path,
+                        help="communes.csv(.lzma) du paquet data-france")
+    parser.add_argument("--output", type=Path, default=ARRONDISSEMENTS_GEOJSON)
+    args = parser.parse_args()
+
+    try:
+        features = (features_from_paris_export(args.paris) if args.paris
+                    else features_from_admin_express(args.admin_express))
+        write_geojson(features, args.output)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -81,24 +81,56 @@ OUTPUT_DIR = Path(os.getenv("OUTPUT_DIR", str(BASE_DIR / "output")))
 METRICS_DIR = OUTPUT_DIR / "metrics"
 REPORTS_DIR = OUTPUT_DIR / "reports"
 PROCESSED_DIR = OUTPUT_DIR / "processed"
+CACHE_DIR = Path(os.getenv("CACHE_DIR", str(OUTPUT_DIR / "cache")))
+REFERENTIEL_STORE_DIR = CACHE_DIR / "referentiel"  # Référentiel compilé (mmap, versionné)
+# États persistants d'un jour à l'autre (non reconstructibles depuis les sources du jour)
+ETAT_DIR = Path(os.getenv("ETAT_DIR", str(OUTPUT_DIR / "etat")))
+REGISTRE_COMPTEURS_PATH = ETAT_DIR / "registre_compteurs.npz"  # Registre des compteurs vélos
+SANTE_CAPTEURS_VELOS_PATH = ETAT_DIR / "sante_capteurs_velos.npz"  # État de santé des compteurs vélos
+REFERENCES_VELOS_PATH = ETAT_DIR / "references_velos.npz"  # Statistiques historiques des compteurs vélos
+REFERENCES_TRONCONS_PATH = ETAT_DIR / "references_troncons.npz"  # Statistiques historiques des tronçons
+PERTURBATIONS_RATP_DIR = ETAT_DIR / "perturbations_ratp"  # Perturbations RATP suivies, un état par jour
+METEO_HORAIRE_PATH = ETAT_DIR / "meteo_horaire.npz"  # Météo horaire observée et prévue
 
 # Création des répertoires output si nécessaire (uniquement en local)
 if not os.getenv("AWS_EXECUTION_ENV"):  # Pas dans Lambda
-    for directory in [OUTPUT_DIR, METRICS_DIR, REPORTS_DIR, PROCESSED_DIR]:
+    for directory in [OUTPUT_DIR, METRICS_DIR, REPORTS_DIR, PROCESSED_DIR, CACHE_DIR, ETAT_DIR]:
         directory.mkdir(parents=True, exist_ok=True)
 
 # Paramètres traitement
 CHUNK_SIZE = 10000  # Lignes par chunk pour traitement Lambda
 EC2_CHUNK_SIZE = 100000  # Lignes pour traitement EC2
 MAX_FILE_SIZE_MB = 500  # Taille max pour traitement Lambda (au-delà → EC2)
+# Workers parallèles pour les chunks EC2 (1 = séquentiel) ; les tables de référence
+# (référentiel, arrondissements, géométries) leur sont partagées en mémoire sans copie
+WORKERS_PARALLELES = int(os.getenv("WORKERS_PARALLELES", "1"))
+
+# Conservation des étapes intermédiaires (cleaned_data / aggregated_data) dans les résultats
+# Désactivé par défaut (mode "lean") : seuls les indicateurs sont conservés, les étapes
+# intermédiaires sont libérées dès que l'étape suivante les a consommées (activer pour debug)
+RETAIN_INTERMEDIATE_DATA = os.getenv("RETAIN_INTERMEDIATE_DATA", "false").lower() == "true"
+
+# Référentiel compilé : le mapping complet n'est exporté que lorsque la source change
+# (activer pour l'exporter à chaque exécution)
+REFERENTIEL_EXPORT_MAPPING_QUOTIDIEN = os.getenv("REFERENTIEL_EXPORT_MAPPING_QUOTIDIEN", "false").lower() == "true"
 
 # Seuils validation
 TAUX_OCCUPATION_SEUIL_CONGESTION = 80  # % pour alerte congestion
 TAUX_OCCUPATION_SEUIL_CRITIQUE = 90  # % pour alerte critique
 DUREE_ALERTE_CONGESTION_MINUTES = 120  # Durée minimale pour alerte
 CAPTEUR_DEFAILLANT_HEURES = 6  # Heures sans données pour considérer défaillant
+CAPTEUR_VALEUR_CONSTANTE_RELEVES = 12  # Relevés non nuls identiques consécutifs tolérés (valeur bloquée au-delà)
 VARIATION_ANOMALIE_POURCENT = 300  # Variation > 300% pour détecter anomalie
 
+# Références historiques par (entité, type de jour, heure) : moyenne / variance (Welford), EWMA
+REFERENCE_EWMA_ALPHA = float(os.getenv("REFERENCE_EWMA_ALPHA", "0.2"))  # Poids de la dernière observation
+REFERENCE_ZSCORE_SEUIL = float(os.getenv("REFERENCE_ZSCORE_SEUIL", "3.0"))  # |z| au-delà : anomalie
+REFERENCE_OBSERVATIONS_MIN = int(os.getenv("REFERENCE_OBSERVATIONS_MIN", "3"))  # Jours de même type avant z-score
+
+# Sketches statistiques (percentiles t-digest, cardinalités HyperLogLog)
+SKETCH_COMPRESSION = 100  # Compression t-digest (précision vs taille ; sketches ville seulement)
+HLL_PRECISION = 12  # 2^12 registres (~1.6 % d'erreur relative)
+
 # Paramètres calcul temps perdu
 VITESSE_REFERENCE_NORMALE = 50  # km/h pour routes normales
 VITESSE_REFERENCE_URBAINE = 30  # km/h pour zones urbaines
@@ -112,6 +144,26 @@ TAUX_OCCUPATION_VITESSE = {
 # Arrondissements Paris
 ARRONDISSEMENTS_PARIS = [f"750{i:02d}" for i in range(1, 21)]
 
+# Polygones des arrondissements (GeoJSON, propriétés c_ar / c_arinsee), générés par
+# build_arrondissements_geojson.py : le fichier fourni provient des arrondissements
+# municipaux d'ADMIN EXPRESS (IGN / INSEE) ; --paris le régénère depuis l'export
+# "arrondissements" d'opendata.paris.fr. Fichier absent ou incomplet : erreur au chargement
+ARRONDISSEMENTS_GEOJSON = Path(os.getenv(
+    "ARRONDISSEMENTS_GEOJSON", str(BASE_DIR / "config" / "data" / "arrondissements.geojson")
+))
+
+# Dimension calendrier (type de jour, fériés, vacances scolaires) précalculée pour ces années
+CALENDRIER_ANNEE_DEBUT = int(os.getenv("CALENDRIER_ANNEE_DEBUT", "2020"))
+CALENDRIER_ANNEE_FIN = int(os.getenv("CALENDRIER_ANNEE_FIN", "2030"))
+# Périodes de vacances scolaires de Paris (zone C, "start_date;end_date", fin = reprise des
+# cours) : le fichier fourni couvre d'octobre 2023 à janvier 2027 (hors de cette période, le
+# statut de vacances est inconnu), le compléter avec l'export officiel
+# "fr-en-calendrier-scolaire" de data.education.gouv.fr pour les années suivantes
+VACANCES_SCOLAIRES_CSV = Path(os.getenv(
+    "VACANCES_SCOLAIRES_CSV", str(BASE_DIR / "config" / "data" / "vacances_scolaires_zone_c.csv")
+))
+CALENDRIER_CACHE_PATH = CACHE_DIR / "calendrier.npz"
+
 # Catégories impacts chantiers
 IMPACT_CHANTIERS = {
     "BARRAGE_TOTAL": 100,
@@ -120,6 +172,39 @@ IMPACT_CHANTIERS = {
     "SENS_UNIQUE": 30
 }
 
+# Charge chantiers publiée sur les N derniers jours (jusqu'à la date de traitement incluse)
+CHANTIERS_PERIODE_CHARGE_JOURS = int(os.getenv("CHANTIERS_PERIODE_CHARGE_JOURS", "7"))
+
+# Jointure chantiers ↔ tronçons : distance max (m) pour les chantiers ponctuels / linéaires
+JOINTURE_CHANTIERS_TOLERANCE_METRES = float(os.getenv("JOINTURE_CHANTIERS_TOLERANCE_METRES", "15"))
+
+# Appariement compteurs vélos ↔ tronçons : distance max (m) au tronçon le plus proche
+APPARIEMENT_COMPTEURS_DISTANCE_METRES = float(os.getenv("APPARIEMENT_COMPTEURS_DISTANCE_METRES", "30"))
+
+# Pyramide spatiale : précisions geohash des niveaux (5 ≈ 4,9 km, 6 ≈ 1,2 km, 7 ≈ 150 m)
+PYRAMIDE_GEOHASH_PRECISIONS = [
+    int(p) for p in os.getenv("PYRAMIDE_GEOHASH_PRECISIONS", "5,6,7").split(",") if p.strip()
+]
+
+# Géométries servies : tolérance Douglas-Peucker (m) par niveau de zoom ("zoom:tolérance,...")
+GEOMETRIE_TOLERANCES_METRES = {
+    zoom.strip(): float(tolerance)
+    for zoom, tolerance in (
+        item.split(":") for item in os.getenv("GEOMETRIE_TOLERANCES_METRES", "12:20,14:5,16:1").split(",")
+        if item.strip()
+    )
+}
+
+# Suivi des perturbations RATP : jours de conservation d'une perturbation fermée
+PERTURBATIONS_RETENTION_JOURS = int(os.getenv("PERTURBATIONS_RETENTION_JOURS", "7"))
+
+# Suivi des perturbations RATP : jours d'états quotidiens conservés (rejeu possible sur cette fenêtre)
+PERTURBATIONS_ETATS_JOURS = int(os.getenv("PERTURBATIONS_ETATS_JOURS", "31"))
+
+# Reconstruction de l'état du jour depuis l'état de la veille et les instantanés fournis
+# (rejeu d'une plage de dates : traiter les jours dans l'ordre chronologique)
+PERTURBATIONS_RECONSTRUCTION = os.getenv("PERTURBATIONS_RECONSTRUCTION", "false").lower() == "true"
+
 # Niveaux sévérité disruptions RATP
 SEVERITE_RATP = {
     "CRITIQUE": 50,  # priority >= 50
@@ -128,6 +213,10 @@ SEVERITE_RATP = {
     "FAIBLE": 0      # priority < 15
 }
 
+# Disponibilité des lignes : niveau de SEVERITE_RATP minimal d'une perturbation active
+# pour que ses périodes comptent comme minutes perturbées
+DISPONIBILITE_SEVERITE_MIN = os.getenv("DISPONIBILITE_SEVERITE_MIN", "MOYENNE")
+
 # Configuration météo
 CONDITIONS_METEO = {
     "PLUVIEUX": {"precip": 5},  # mm
@@ -136,6 +225,11 @@ CONDITIONS_METEO = {
     "CHAUD": {"temp": 25}   # °C
 }
 
+# Météo horaire : précipitations (mm/h) à partir desquelles une heure est pluvieuse,
+# jours d'historique conservés (les prévisions à venir sont toujours conservées)
+METEO_PLUIE_HORAIRE_MM = float(os.getenv("METEO_PLUIE_HORAIRE_MM", "0.1"))
+METEO_RETENTION_JOURS = int(os.getenv("METEO_RETENTION_JOURS", "14"))
+
 # Configuration logs
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -376,6 +376,25 @@ elif page == "🚗 Trafic Routier":
             df_display["Débit"] = df_display["Débit"].apply(lambda x: f"{x:,.0f}")
             df_display["Taux occ. (%)"] = df_display["Taux occ. (%)"].round(1)
             st.dataframe(df_display, use_container_width=True, hide_index=True)
+            
+            # Profil horaire d'un tronçon du top 10 (matrices stockées avec les métriques)
+            from dashboard.utils.data_loader import get_arc_hourly_profile
+            
+            troncons = {f"{t.get('libelle', 'N/A')} ({t.get('identifiant_arc')})": t.get("identifiant_arc") for t in top}
+            choix = st.selectbox("📈 Profil horaire du tronçon", list(troncons))
+            profil = get_arc_hourly_profile(comptages, troncons[choix])
+            if profil:
+                heures = list(range(24))
+                fig = make_subplots(specs=[[{"secondary_y": True}]])
+                fig.add_trace(go.Scatter(x=heures, y=profil.get("debit"), name="Débit horaire"), secondary_y=False)
+                fig.add_trace(go.Scatter(x=heures, y=profil.get("taux_occupation"), name="Taux occupation (%)",
+                                         line=dict(dash="dot")), secondary_y=True)
+                fig.update_layout(height=350, xaxis_title="Heure")
+                fig.update_yaxes(title_text="Véhicules / heure", secondary_y=False)
+                fig.update_yaxes(title_text="Taux occupation (%)", secondary_y=True)
+                st.plotly_chart(fig, width="stretch")
+            else:
+                st.info("Profil horaire indisponible pour ce tronçon")
         
         st.markdown("---")
         
@@ -184,3 +184,36 @@ def load_report_from_api(date: str) -> Optional[Dict[str, Any]]:
         print(f"Erreur API pour le rapport: {e}")
         return load_report_from_json(date)
 
+
+
+def get_arc_hourly_profile(comptages_metrics: Dict[str, Any], arc_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Extrait les courbes horaires d'un tronçon depuis les matrices stockées
+    (aucun retraitement des données brutes)
+    
+    Args:
+        comptages_metrics: Métriques comptages (avec "profils_horaires" : tous les tronçons
+            en fichier local, tronçons du top 10 et des alertes dans le summary stocké en base)
+        arc_id: Identifiant du tronçon
+    
+    Returns:
+        Dict {couche: 24 valeurs} ou None si indisponible
+    """
+    profils = (comptages_metrics or {}).get("profils_horaires")
+    if not profils:
+        return None
+    
+    try:
+        from processors.utils.hourly_matrix import EntityHourMatrix
+        
+        matrices = EntityHourMatrix.from_dict(profils)
+        if arc_id not in matrices.index:
+            return None
+        
+        return {
+            name: [None if value != value else float(value) for value in matrices.row(name, arc_id)]
+            for name in matrices.layers
+        }
+    except Exception as e:
+        print(f"Erreur lecture profils horaires: {e}")
+        return None
@@ -16,12 +16,15 @@ class BikeMetrics:
     moyenne_horaire: float = 0.0
     pic_horaire: Optional[int] = None
     arrondissement: Optional[str] = None
-    coordinates: Optional[Dict] = None
+    coordinates: Optional[Dict] = None  # Omis si le compteur est référencé par code_compteur
+    code_compteur: Optional[int] = None  # Code du compteur dans le registre des compteurs
     anomalie_detectee: bool = False
+    identifiant_arc: Optional[str] = None  # Tronçon le plus proche (appariement)
+    distance_troncon_metres: Optional[float] = None
     
     def to_dict(self) -> Dict:
         """Convertit en dictionnaire pour DynamoDB"""
-        return {
+        result = {
             "date": self.date,
             "id_compteur": self.id_compteur,
             "nom_compteur": self.nom_compteur,
@@ -29,7 +32,13 @@ class BikeMetrics:
             "moyenne_horaire": self.moyenne_horaire,
             "pic_horaire": self.pic_horaire,
             "arrondissement": self.arrondissement,
-            "coordinates": self.coordinates,
-            "anomalie_detectee": self.anomalie_detectee
+            "anomalie_detectee": self.anomalie_detectee,
+            "identifiant_arc": self.identifiant_arc,
+            "distance_troncon_metres": self.distance_troncon_metres
         }
+        if self.code_compteur is not None:
+            result["code_compteur"] = self.code_compteur
+        else:
+            result["coordinates"] = self.coordinates
+        return result
 
@@ -125,5 +125,21 @@ class DailyReport:
         else:
             rows.append(["Aucun chantier actif", ""])
         
+        # Ligne vide pour séparation
+        rows.append(["", ""])
+        
+        # Évolution vs semaine précédente
+        rows.append(["=== ÉVOLUTION VS SEMAINE PRÉCÉDENTE ===", ""])
+        comparables = {
+            source: evolution for source, evolution in self.evolution_vs_semaine_precedente.items()
+            if isinstance(evolution, dict) and evolution.get("entites_comparees")
+        }
+        if comparables:
+            rows.append(["Source", "Variation (%)"])
+            for source, evolution in comparables.items():
+                rows.append([source, str(evolution.get("variation_pourcent", "N/A"))])
+        else:
+            rows.append(["Aucune comparaison disponible", ""])
+        
         return rows
 
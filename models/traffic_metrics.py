@@ -23,6 +23,16 @@ class TrafficMetrics:
     congestion_alerte: bool = False
     arrondissement: Optional[str] = None
     geo_point_2d: Optional[str] = None
+    debit_p50: Optional[float] = None
+    debit_p90: Optional[float] = None
+    debit_p95: Optional[float] = None
+    taux_occupation_p50: Optional[float] = None
+    taux_occupation_p90: Optional[float] = None
+    taux_occupation_p95: Optional[float] = None
+    heure_pic_index: Optional[int] = None
+    duree_congestion_minutes: int = 0
+    debut_congestion_heure: Optional[int] = None
+    impact_chantiers: float = 0.0
     
     def to_dict(self) -> Dict:
         """Convertit en dictionnaire pour DynamoDB"""
@@ -40,7 +50,17 @@ class TrafficMetrics:
             "temps_perdu_total_minutes": self.temps_perdu_total_minutes,
             "congestion_alerte": self.congestion_alerte,
             "arrondissement": self.arrondissement,
-            "geo_point_2d": self.geo_point_2d
+            "geo_point_2d": self.geo_point_2d,
+            "debit_p50": self.debit_p50,
+            "debit_p90": self.debit_p90,
+            "debit_p95": self.debit_p95,
+            "taux_occupation_p50": self.taux_occupation_p50,
+            "taux_occupation_p90": self.taux_occupation_p90,
+            "taux_occupation_p95": self.taux_occupation_p95,
+            "heure_pic_index": self.heure_pic_index,
+            "duree_congestion_minutes": self.duree_congestion_minutes,
+            "debut_congestion_heure": self.debut_congestion_heure,
+            "impact_chantiers": self.impact_chantiers
         }
 
 
@@ -65,3 +85,32 @@ class TrafficGlobal:
             "temps_perdu_total_paris": self.temps_perdu_total_paris
         }
 
+
+
+@dataclass
+class CongestionCorridor:
+    """Corridor congestionné : tronçons saturés consécutifs (partageant un nœud)"""
+    date: str
+    corridor_id: str
+    troncons: List[str] = field(default_factory=list)
+    longueur_metres: float = 0.0
+    debit_journalier_total: float = 0.0
+    temps_perdu_total_minutes: float = 0.0
+    taux_occupation_moyen: float = 0.0
+    libelles: List[str] = field(default_factory=list)
+    arrondissements: List[str] = field(default_factory=list)
+    
+    def to_dict(self) -> Dict:
+        """Convertit en dictionnaire pour DynamoDB"""
+        return {
+            "date": self.date,
+            "corridor_id": self.corridor_id,
+            "troncons": self.troncons,
+            "nombre_troncons": len(self.troncons),
+            "longueur_metres": self.longueur_metres,
+            "debit_journalier_total": self.debit_journalier_total,
+            "temps_perdu_total_minutes": self.temps_perdu_total_minutes,
+            "taux_occupation_moyen": self.taux_occupation_moyen,
+            "libelles": self.libelles,
+            "arrondissements": self.arrondissements
+        }
@@ -5,6 +5,7 @@ Classe abstraite de base pour tous les processeurs de données
 from abc import ABC, abstractmethod
 from typing import List, Dict, Any, Optional
 from config import settings
+from processors.utils.geometry_batch import save_geometry_cache
 
 
 class BaseProcessor(ABC):
@@ -61,25 +62,42 @@ class BaseProcessor(ABC):
         """
         raise NotImplementedError("Chaque processeur doit implémenter calculate_indicators")
     
-    def process(self, raw_data: Any) -> Dict[str, Any]:
+    def process(self, raw_data: Any, retain_intermediates: Optional[bool] = None) -> Dict[str, Any]:
         """
         Pipeline complet de traitement : validate → aggregate → calculate
         
+        En mode "lean" (défaut en production), chaque étape intermédiaire est libérée
+        dès que l'étape suivante l'a consommée : seuls les indicateurs sont retournés
+        et cleaned_data / aggregated_data valent None. Utiliser rebuild_intermediates()
+        pour les reconstruire à la demande.
+        
         Args:
             raw_data: Données brutes
+            retain_intermediates: Conserver cleaned_data / aggregated_data
+                (défaut: config RETAIN_INTERMEDIATE_DATA)
         
         Returns:
             Dict avec les résultats de chaque étape et les indicateurs finaux
         """
+        if retain_intermediates is None:
+            retain_intermediates = getattr(self.config, "RETAIN_INTERMEDIATE_DATA", False)
+        
         try:
             # Étape 1 : Validation et nettoyage
             cleaned_data = self.validate_and_clean(raw_data)
             
             # Étape 2 : Agrégations quotidiennes
             aggregated_data = self.aggregate_daily(cleaned_data)
+            if not retain_intermediates:
+                cleaned_data = None  # Libérer les données nettoyées (consommées)
             
             # Étape 3 : Calculs d'indicateurs
             indicators = self.calculate_indicators(aggregated_data)
+            if not retain_intermediates:
+                aggregated_data = None  # Libérer les agrégations (consommées)
+            
+            # Cache des géométries : écrit une fois par exécution (s'il a changé)
+            save_geometry_cache()
             
             return {
                 "cleaned_data": cleaned_data,
@@ -97,4 +115,21 @@ class BaseProcessor(ABC):
                 "success": False,
                 "errors": [str(e)]
             }
-
+    
+    def rebuild_intermediates(self, raw_data: Any) -> Dict[str, Any]:
+        """
+        Reconstruit à la demande les étapes intermédiaires (debug, mode lean)
+        
+        Args:
+            raw_data: Données brutes (ou chemin du fichier source)
+        
+        Returns:
+            Dict avec cleaned_data et aggregated_data
+        """
+        cleaned_data = self.validate_and_clean(raw_data)
+        aggregated_data = self.aggregate_daily(cleaned_data)
+        
+        return {
+            "cleaned_data": cleaned_data,
+            "aggregated_data": aggregated_data
+        }
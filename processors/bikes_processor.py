@@ -2,22 +2,32 @@
 Processeur pour les données API Bikes (compteurs vélos)
 """
 
-from typing import List, Dict, Any
+import copy
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
 from processors.base_processor import BaseProcessor
-from processors.utils.validators import (
-    validate_coordinates, detect_failing_sensors, detect_anomalies
-)
-from processors.utils.aggregators import (
-    aggregate_by_hour, calculate_daily_total, find_peak_hour,
-    aggregate_by_arrondissement, calculate_hourly_average
+from processors.utils.validators import validate_coordinates
+from processors.utils.aggregators import select_top_n
+from processors.utils.baseline_store import (
+    CRENEAU_JOUR, comparison_entry, get_baseline_store, reference_profile, week_over_week
 )
-from processors.utils.geo_utils import get_arrondissement_from_coordinates
+from processors.utils.counter_matrix import CounterHourMatrix
+from processors.utils.counter_registry import get_counter_registry
+from processors.utils.geo_utils import get_arrondissements_from_coordinates
+from processors.utils.hourly_matrix import epoch_hours_from_iso, matrix_epoch_hours
+from processors.utils.sensor_health import get_sensor_health
+from processors.utils.sketches import TDigest, HyperLogLog, summarize_sketch
+from processors.utils.spatial_pyramid import build_spatial_pyramid
 from models.bike_metrics import BikeMetrics
 
 
 class BikesProcessor(BaseProcessor):
     """Processeur pour les données de compteurs vélos"""
     
+    _etat_en_attente: Optional[Dict[str, Any]] = None
+    
     def validate_and_clean(self, data: Dict) -> List[Dict]:
         """
         Validation et nettoyage des données bikes
@@ -74,70 +84,163 @@ class BikesProcessor(BaseProcessor):
         if not cleaned_data:
             return {"by_counter": {}, "global": {}}
         
-        # Agrégation par compteur
-        by_counter = {}
+        # Factorisation compteurs × heures en une passe (matrice dense n × 24)
+        engine = CounterHourMatrix.from_records(cleaned_data, "id_compteur", "date", "sum_counts")
+        totals = engine.totals().tolist()
+        moyennes = engine.hourly_means().tolist()
+        peaks = engine.peaks().tolist()
         
-        for record in cleaned_data:
-            counter_id = record.get("id_compteur")
-            if not counter_id:
-                continue
-            
-            if counter_id not in by_counter:
-                by_counter[counter_id] = {
-                    "id_compteur": counter_id,
-                    "nom_compteur": record.get("nom_compteur", ""),
-                    "records": [],
-                    "coordinates": record.get("coordinates")
-                }
-            
-            by_counter[counter_id]["records"].append(record)
+        # Santé des capteurs : évaluée sur une copie de l'état persistant (seules les heures
+        # non encore vues sont traitées) ; l'état n'est modifié qu'en fin d'exécution réussie
+        sante = copy.deepcopy(get_sensor_health(self.config.SANTE_CAPTEURS_VELOS_PATH))
+        dates = [record.get("date") for record in cleaned_data]
+        heures = epoch_hours_from_iso(dates)
+        releves = (
+            [record.get("id_compteur") for record in cleaned_data],
+            heures,
+            [record.get("sum_counts") or 0 for record in cleaned_data]
+        )
+        evenements = sante.consume(*releves)
+        failing = sante.failing_mask(engine.counter_ids)
         
-        # Calculer totaux par compteur
-        for counter_id, counter_data in by_counter.items():
-            records = counter_data["records"]
-            counter_data["total_jour"] = calculate_daily_total(records, "sum_counts")
-            counter_data["moyenne_horaire"] = calculate_hourly_average(records, "sum_counts")
+        # Sketches ville (percentiles horaires, compteurs actifs distincts)
+        compression = self.config.SKETCH_COMPRESSION
+        ville_digest = TDigest(compression)
+        compteurs_actifs = HyperLogLog(self.config.HLL_PRECISION)
+        
+        by_counter = {}
+        for row, counts in engine.iter_counts():
+            counter_id = engine.counter_ids[row]
+            first = cleaned_data[int(engine.first_record[row])]
             
-            # Pic horaire
-            hourly = aggregate_by_hour(records, "date", "sum_counts")
-            if hourly:
-                peak = find_peak_hour(records, "date", "sum_counts")
-                counter_data["pic_horaire"] = peak
-            else:
-                counter_data["pic_horaire"] = None
+            # Distribution horaire : sketch ville seulement (les 24 valeurs du compteur
+            # sont déjà dans la matrice compteur × heure)
+            ville_digest.update(counts.tolist())
+            if totals[row] > 0:
+                compteurs_actifs.add(counter_id)
             
-            # Arrondissement
-            coords = counter_data.get("coordinates", {})
-            lon = coords.get("lon")
-            lat = coords.get("lat")
-            if lon and lat:
-                arrondissement = get_arrondissement_from_coordinates(lon, lat)
-                counter_data["arrondissement"] = arrondissement
-        
-        # Agrégation globale
-        global_total = calculate_daily_total(cleaned_data, "sum_counts")
-        
-        # Par arrondissement
-        arrondissement_totals = {}
-        for record in cleaned_data:
-            lon = record.get("lon")
-            lat = record.get("lat")
-            if lon and lat:
-                arr = get_arrondissement_from_coordinates(lon, lat)
-                if arr:
-                    if arr not in arrondissement_totals:
-                        arrondissement_totals[arr] = 0.0
-                    arrondissement_totals[arr] += record.get("sum_counts", 0)
+            by_counter[counter_id] = {
+                "id_compteur": counter_id,
+                "nom_compteur": first.get("nom_compteur", ""),
+                "date": first.get("date", ""),
+                "total_jour": totals[row],
+                "moyenne_horaire": moyennes[row],
+                "pic_horaire": peaks[row] if peaks[row] >= 0 else None,
+                "defaillant": bool(failing[row])
+            }
+        
+        # Registre des compteurs : mise à jour incrémentale sur une copie (seuls les compteurs
+        # nouveaux ou déplacés sont localisés), métadonnées jointes par position / code entier
+        firsts = [cleaned_data[i] for i in engine.first_record.tolist()]
+        jour = max(str(record.get("date", ""))[:10] for record in firsts)
+        registre_args = (
+            engine.counter_ids,
+            [record.get("nom_compteur", "") for record in firsts],
+            [record.get("lon") for record in firsts],
+            [record.get("lat") for record in firsts]
+        )
+        registry = copy.deepcopy(get_counter_registry())
+        registre = registry.update(*registre_args, date=jour, locate=get_arrondissements_from_coordinates)
+        registre["nombre_compteurs"] = len(registry)
+        # Export complet seulement si les métadonnées ont changé
+        if registre["nouveaux"] or registre["deplaces"] or registre["renommes"]:
+            registre["compteurs"] = registry.to_dict()
+        
+        positions = registry.lookup_many(engine.counter_ids).tolist()
+        for counter_data, position in zip(by_counter.values(), positions):
+            entry = registry.entry(position)
+            counter_data["code_compteur"] = entry["code_compteur"]
+            counter_data["coordinates"] = entry["coordinates"]
+            counter_data["arrondissement"] = entry["arrondissement"]
+        
+        # Références historiques (compteur, type de jour, heure) : comparaison de la journée
+        # (lecture seule, les compteurs non défaillants sont intégrés en fin d'exécution)
+        hourly = np.where(engine.present > 0, engine.matrix, np.nan)
+        references = get_baseline_store(self.config.REFERENCES_VELOS_PATH)
+        comparaison = references.compare(engine.counter_ids, jour, hourly, totals)
+        for row, counter_data in enumerate(by_counter.values()):
+            counter_data["reference"] = comparison_entry(comparaison, row)
+            counter_data["anomalie"] = bool(comparaison["anomalie"][row]) and not counter_data["defaillant"]
+        valides = np.flatnonzero(~failing)
+        
+        # États persistants à intégrer après une exécution réussie (cf. process)
+        self._etat_en_attente = {
+            "releves": releves,
+            "registre": (registre_args, jour),
+            "references": ([engine.counter_ids[row] for row in valides.tolist()], jour,
+                           hourly[valides], np.asarray(totals)[valides])
+        }
+        
+        # Agrégation globale et par arrondissement (réductions sur la matrice)
+        arrondissement_totals = engine.group_totals(
+            [counter_data.get("arrondissement") for counter_data in by_counter.values()]
+        )
         
         return {
             "by_counter": by_counter,
             "global": {
-                "total_jour": global_total,
+                "total_jour": float(sum(totals)),
                 "arrondissement_totals": arrondissement_totals,
                 "nombre_compteurs": len(by_counter)
-            }
+            },
+            "sketches": {
+                "comptage_horaire": ville_digest.to_dict(),
+                "compteurs_actifs": compteurs_actifs.to_dict()
+            },
+            "registre": registre,
+            "evolution_semaine_precedente": week_over_week(
+                totals, comparaison["semaine_precedente"][:, CRENEAU_JOUR]
+            ),
+            "sante_capteurs": dict(sante.summary(), evenements=evenements),
+            # Horodatages UTC : colonnes rattachées à leurs heures absolues (jointure météo)
+            "profil_reference_horaire": reference_profile(
+                jour, hourly, comparaison, matrix_epoch_hours(jour, dates, heures)
+            )
         }
     
+    def process(self, raw_data: Any, retain_intermediates: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Pipeline complet (cf. BaseProcessor.process), puis intégration de la journée aux
+        états persistants (santé des capteurs, registre, références)
+        """
+        self._etat_en_attente = None
+        results = super().process(raw_data, retain_intermediates)
+        if results.get("success") and self._etat_en_attente is not None:
+            self.apply_state(self._etat_en_attente)
+        self._etat_en_attente = None
+        return results
+    
+    def apply_state(self, etat: Dict[str, Any]) -> None:
+        """
+        Intègre la journée aux états persistants et les enregistre (fin d'exécution) :
+        relevés consommés par la santé des capteurs, registre des compteurs mis à jour,
+        compteurs non défaillants intégrés aux références
+        
+        Args:
+            etat: États en attente préparés par aggregate_daily (relevés, registre, références)
+        """
+        sante = get_sensor_health(self.config.SANTE_CAPTEURS_VELOS_PATH)
+        sante.consume(*etat["releves"])
+        try:
+            sante.save(self.config.SANTE_CAPTEURS_VELOS_PATH)
+        except OSError as e:
+            print(f"  ⚠ Écriture état santé capteurs impossible: {e}")
+        
+        registre_args, jour = etat["registre"]
+        registry = get_counter_registry()
+        registry.update(*registre_args, date=jour, locate=get_arrondissements_from_coordinates)
+        try:
+            registry.save()
+        except OSError as e:
+            print(f"  ⚠ Écriture registre compteurs impossible: {e}")
+        
+        references = get_baseline_store(self.config.REFERENCES_VELOS_PATH)
+        references.update(*etat["references"])
+        try:
+            references.save(self.config.REFERENCES_VELOS_PATH)
+        except OSError as e:
+            print(f"  ⚠ Écriture références compteurs impossible: {e}")
+    
     def calculate_indicators(self, aggregated_data: Dict) -> Dict[str, Any]:
         """
         Calculs d'indicateurs bikes
@@ -156,39 +259,48 @@ class BikesProcessor(BaseProcessor):
             "top_counters": []
         }
         
-        # Détecter capteurs défaillants
-        all_records = []
-        for counter_data in by_counter.values():
-            all_records.extend(counter_data.get("records", []))
-        
-        failing = detect_failing_sensors(all_records)
+        # Capteurs défaillants (état de santé à la dernière heure consommée)
+        failing = [
+            counter_id for counter_id, counter_data in by_counter.items()
+            if counter_data.get("defaillant")
+        ]
         indicators["failing_sensors"] = failing
+        if aggregated_data.get("sante_capteurs") is not None:
+            indicators["sante_capteurs"] = aggregated_data["sante_capteurs"]
         
         # Créer métriques par compteur
         for counter_id, counter_data in by_counter.items():
-            if counter_id in failing:
+            if counter_data.get("defaillant"):
                 continue  # Exclure défaillants
             
             metrics = BikeMetrics(
-                date=counter_data.get("records", [{}])[0].get("date", ""),
+                date=counter_data.get("date", ""),
                 id_compteur=counter_id,
                 nom_compteur=counter_data.get("nom_compteur", ""),
                 total_jour=counter_data.get("total_jour", 0.0),
                 moyenne_horaire=counter_data.get("moyenne_horaire", 0.0),
                 pic_horaire=counter_data.get("pic_horaire"),
                 arrondissement=counter_data.get("arrondissement"),
-                coordinates=counter_data.get("coordinates")
+                anomalie_detectee=counter_data.get("anomalie", False),
+                code_compteur=counter_data.get("code_compteur")  # Coordonnées : registre
             )
             
             indicators["metrics"].append(metrics.to_dict())
+            
+            # Anomalies : écart aux références du même type de jour (z-score, variation)
+            if metrics.anomalie_detectee:
+                indicators["anomalies"].append(dict(
+                    id_compteur=counter_id,
+                    nom_compteur=metrics.nom_compteur,
+                    total_jour=metrics.total_jour,
+                    **counter_data.get("reference", {})
+                ))
         
         # Top compteurs (par total_jour)
-        sorted_counters = sorted(
-            indicators["metrics"],
-            key=lambda x: x.get("total_jour", 0),
-            reverse=True
+        indicators["top_counters"] = select_top_n(
+            indicators["metrics"], 10,
+            key=lambda x: x.get("total_jour", 0)
         )
-        indicators["top_counters"] = sorted_counters[:10]
         
         # Calculer indice de fréquentation cyclable (0-100)
         global_total = aggregated_data.get("global", {}).get("total_jour", 0)
@@ -197,6 +309,34 @@ class BikesProcessor(BaseProcessor):
         frequentation_index = min(100.0, (global_total / max_expected) * 100.0)
         
         indicators["frequentation_index"] = frequentation_index
+        if aggregated_data.get("evolution_semaine_precedente") is not None:
+            indicators["evolution_semaine_precedente"] = aggregated_data["evolution_semaine_precedente"]
+        if aggregated_data.get("profil_reference_horaire") is not None:
+            indicators["profil_reference_horaire"] = aggregated_data["profil_reference_horaire"]
+        
+        # Registre des compteurs (export complet seulement si les métadonnées ont changé)
+        if aggregated_data.get("registre") is not None:
+            indicators["registre_compteurs"] = aggregated_data["registre"]
+        
+        # Pyramide spatiale des compteurs (passages par cellule geohash, multi-résolution)
+        coordinates = [by_counter[m["id_compteur"]].get("coordinates") or {} for m in indicators["metrics"]]
+        indicators["pyramide_spatiale"] = build_spatial_pyramid(
+            [c.get("lon", float("nan")) for c in coordinates],
+            [c.get("lat", float("nan")) for c in coordinates],
+            sums={"total_jour": [m.get("total_jour", 0.0) for m in indicators["metrics"]]},
+            means={"moyenne_horaire": [m.get("moyenne_horaire", 0.0) for m in indicators["metrics"]]},
+            count_key="nombre_compteurs"
+        )
+        
+        # Sketches ville sérialisés (stockés avec les métriques du jour, fusionnables)
+        city_sketches = aggregated_data.get("sketches", {})
+        indicators["sketches"] = {"ville": city_sketches}
+        indicators["statistiques_horaires"] = {
+            "comptage_horaire_percentiles": summarize_sketch(city_sketches.get("comptage_horaire")),
+            "compteurs_actifs_distincts": summarize_sketch(
+                city_sketches.get("compteurs_actifs")
+            ).get("distincts", 0)
+        }
         
         return indicators
 
@@ -2,18 +2,32 @@
 Processeur pour les données Batch Chantiers Perturbants
 """
 
-from typing import List, Dict, Any
-from datetime import datetime
+from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta
 from processors.base_processor import BaseProcessor
 from processors.utils.file_utils import load_csv
 from processors.utils.validators import validate_geojson, validate_date_iso
-from processors.utils.geo_utils import calculate_polygon_area, extract_center_point, get_arrondissement_from_coordinates
+from processors.utils.geo_utils import extract_center_point, get_arrondissement_from_coordinates
+from processors.utils.geometry_batch import compute_geometry_metrics
 from processors.utils.aggregators import group_by_field
-from config import IMPACT_CHANTIERS
+from processors.utils.polyline import encode_geometries
+from processors.utils.interval_index import IntervalIndex, DailyActivityMatrix
+from processors.utils.calendar_dimension import epoch_day
+from config import IMPACT_CHANTIERS, CHANTIERS_PERIODE_CHARGE_JOURS
 
 
 class ChantiersProcessor(BaseProcessor):
-    """Processeur pour les chantiers perturbants"""
+    """
+    Processeur pour les chantiers perturbants
+    
+    Attributes:
+        index: Index d'intervalles des chantiers de la dernière agrégation (requêtes sur
+            d'autres dates, rejeu d'historique)
+        charge: Matrice jour × arrondissement de la dernière agrégation
+    """
+    
+    index: Optional[IntervalIndex] = None
+    charge: Optional[DailyActivityMatrix] = None
     
     def validate_and_clean(self, data: Any) -> List[Dict]:
         """
@@ -85,18 +99,27 @@ class ChantiersProcessor(BaseProcessor):
             cleaned_data: Chantiers nettoyés
         
         Returns:
-            Dict avec agrégations
+            Dict avec agrégations (l'index d'intervalles et la matrice jour × arrondissement,
+            réutilisables pour d'autres dates, restent dans self.index / self.charge)
         """
-        now = datetime.now()
-        
-        # Détecter chantiers actifs
-        actifs = []
-        for chantier in cleaned_data:
-            date_debut = chantier.get("Date de début")
-            date_fin = chantier.get("Date de fin")
-            
-            if date_debut and date_fin and date_debut <= now <= date_fin:
-                actifs.append(chantier)
+        jour = self._processing_date()
+        
+        # Index d'intervalles [début, fin] (bornes incluses) construit une fois :
+        # chantiers actifs à la date de traitement, quelle qu'elle soit (rejeu d'historique)
+        debuts = [epoch_day(c["Date de début"]) for c in cleaned_data]
+        fins = [epoch_day(c["Date de fin"]) for c in cleaned_data]
+        index = IntervalIndex(debuts, fins)
+        actifs = [cleaned_data[i] for i in index.active_on(jour).tolist()]
+        
+        # Matrice jour × arrondissement (chantiers actifs, impact cumulé)
+        charge = DailyActivityMatrix.from_intervals(
+            debuts, fins,
+            [c.get("arrondissement") or "Unknown" for c in cleaned_data],
+            weights=[IMPACT_CHANTIERS.get(c.get("Impact sur la circulation", ""), 0) for c in cleaned_data]
+        )
+        periode = getattr(self.config, "CHANTIERS_PERIODE_CHARGE_JOURS", CHANTIERS_PERIODE_CHARGE_JOURS)
+        debut_periode = jour - timedelta(days=periode - 1)
+        self.index, self.charge = index, charge
         
         # Par arrondissement
         by_arrondissement = group_by_field(actifs, "arrondissement")
@@ -108,9 +131,23 @@ class ChantiersProcessor(BaseProcessor):
             "actifs": actifs,
             "by_arrondissement": by_arrondissement,
             "by_impact": by_impact,
-            "total_actifs": len(actifs)
+            "total_actifs": len(actifs),
+            "date_reference": jour.strftime("%Y-%m-%d"),
+            "charge_periode": {
+                "debut": debut_periode.strftime("%Y-%m-%d"),
+                "fin": jour.strftime("%Y-%m-%d"),
+                "chantiers": len(index.active_between(debut_periode, jour)),
+                "par_arrondissement": charge.period(debut_periode, jour)
+            }
         }
     
+    def _processing_date(self) -> datetime:
+        """Date de traitement : partition API_DATE (défaut: aujourd'hui)"""
+        try:
+            return datetime.strptime(str(getattr(self.config, "API_DATE", "")), "%Y-%m-%d")
+        except ValueError:
+            return datetime.now()
+    
     def calculate_indicators(self, aggregated_data: Dict) -> Dict[str, Any]:
         """
         Calculs d'indicateurs chantiers
@@ -145,12 +182,12 @@ class ChantiersProcessor(BaseProcessor):
             if len(chantiers) > 3
         ]
         
-        # Calculer surface totale impactée
-        surface_totale = 0.0
-        for chantier in actifs:
-            geo_shape = chantier.get("geo_shape")
-            if geo_shape:
-                surface_totale += calculate_polygon_area(geo_shape)
+        # Calculer surface totale impactée (surfaces calculées en lot)
+        surfaces = compute_geometry_metrics([c.get("geo_shape") for c in actifs])["surface_m2"]
+        surface_totale = float(surfaces.sum())
+        
+        # Géométries compactes (simplifiées par niveau de zoom, polylignes encodées)
+        geometries = encode_geometries([c.get("geo_shape") for c in actifs])
         
         return {
             "chantiers_actifs": [
@@ -158,13 +195,16 @@ class ChantiersProcessor(BaseProcessor):
                     "identifiant": c.get("Identifiant", ""),
                     "typologie": c.get("Typologie", ""),
                     "impact": c.get("Impact sur la circulation", ""),
-                    "arrondissement": c.get("arrondissement")
+                    "arrondissement": c.get("arrondissement"),
+                    "geometrie": geometrie
                 }
-                for c in actifs
+                for c, geometrie in zip(actifs, geometries)
             ],
             "impact_by_arrondissement": impact_by_arrondissement,
             "zones_critiques": zones_critiques,
             "surface_totale_impactee_m2": surface_totale,
-            "total_chantiers_actifs": len(actifs)
+            "total_chantiers_actifs": len(actifs),
+            "date_reference": aggregated_data.get("date_reference"),
+            "charge_periode": aggregated_data.get("charge_periode", {})
         }
 
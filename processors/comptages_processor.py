@@ -3,30 +3,52 @@ Processeur CRITIQUE pour les données Batch Comptages Routiers (6.2 GB)
 Gère la découpe en chunks et traitement EC2 si nécessaire
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
 from processors.base_processor import BaseProcessor
-from processors.utils.file_utils import load_csv, get_file_size_mb, chunk_file
+from processors.utils.file_utils import iter_csv, get_file_size_mb, chunk_file
 from processors.utils.validators import (
     validate_date_iso, validate_geojson, normalize_traffic_status
 )
 from processors.utils.aggregators import (
     group_by_field, calculate_mean_value, get_mode_value,
-    calculate_top_n, calculate_max_value
-)
-from processors.utils.geo_utils import (
-    calculate_line_length, get_arrondissement_from_coordinates,
-    extract_center_point
+    calculate_max_value, TopK
 )
 from processors.utils.zone_analysis import (
-    get_zone_from_coordinates, extract_zone_from_libelle,
-    get_quadrant_from_coordinates,
     group_by_zone, calculate_zone_metrics, identify_high_traffic_zones
 )
 from processors.utils.traffic_calculations import (
-    calculate_lost_time, detect_congestion_alerts
+    calculate_lost_time_profiles, detect_congestion_runs
+)
+from processors.utils.hourly_matrix import (
+    EntityHourMatrix, encode_etat_trafic, format_hour_timestamp, peak_hours
+)
+from processors.utils.geometry_batch import compute_geometry_metrics, save_geometry_cache
+from processors.utils.baseline_store import (
+    CRENEAU_JOUR, comparison_entry, get_baseline_store, reference_profile, week_over_week
+)
+from processors.utils.referentiel_store import get_compiled_referentiel
+from processors.utils.zone_assignment import (
+    assign_zones, zone_groups, fill_zone_fallback, parse_geo_points
 )
-from models.traffic_metrics import TrafficMetrics, TrafficGlobal
-from config import MAX_FILE_SIZE_MB, EC2_CHUNK_SIZE
+from processors.utils.shared_tables import get_worker_config, shared_worker_pool
+from processors.utils.sketches import (
+    TDigest, HyperLogLog, SketchAccumulator, summarize_sketch
+)
+from processors.utils.road_graph import get_road_graph
+from processors.utils.spatial_pyramid import build_spatial_pyramid
+from models.traffic_metrics import TrafficMetrics, TrafficGlobal, CongestionCorridor
+from config import MAX_FILE_SIZE_MB, EC2_CHUNK_SIZE, WORKERS_PARALLELES
+
+
+def _chunk_indicators_worker(chunk_path: str) -> Dict[str, Any]:
+    """
+    Traitement d'un chunk dans un worker (tables de référence en mémoire partagée,
+    configuration du processeur parent transmise à l'initialisation du pool)
+    """
+    return ComptagesProcessor(get_worker_config(), use_ec2=True).chunk_indicators(chunk_path)
 
 
 class ComptagesProcessor(BaseProcessor):
@@ -51,9 +73,9 @@ class ComptagesProcessor(BaseProcessor):
         Returns:
             Liste des enregistrements nettoyés
         """
-        # Si c'est un chemin, charger
+        # Si c'est un chemin, lire en flux (les lignes brutes ne sont jamais toutes en mémoire)
         if isinstance(data, str):
-            records = load_csv(data)
+            records = iter_csv(data)
         else:
             records = data
         
@@ -119,73 +141,67 @@ class ComptagesProcessor(BaseProcessor):
         # Grouper par Identifiant arc
         by_arc = group_by_field(cleaned_data, "Identifiant arc")
         
+        # Matrices denses tronçon × heure (débit, taux d'occupation, état codé)
+        matrices = EntityHourMatrix.from_records(
+            cleaned_data,
+            id_field="Identifiant arc",
+            date_field="Date et heure de comptage",
+            value_fields={"debit": "Débit horaire", "taux_occupation": "Taux d'occupation"},
+            code_fields={"etat": ("Etat trafic", encode_etat_trafic)}
+        )
+        heures_pic, _ = peak_hours(matrices.layer("debit"))
+        
         aggregated_by_arc = {}
         
+        # Sketches ville (percentiles horaires, tronçons actifs distincts)
+        compression = self.config.SKETCH_COMPRESSION
+        ville_debit = TDigest(compression)
+        ville_taux = TDigest(compression)
+        troncons_actifs = HyperLogLog(self.config.HLL_PRECISION)
+        
+        # Longueurs des tronçons : référentiel compilé (mmap), sinon géométrie du premier
+        # enregistrement (calcul en lot, cache par forme)
+        arc_ids = list(by_arc)
+        referentiel = get_compiled_referentiel()
+        longueurs = referentiel.lengths(arc_ids) if referentiel is not None else np.full(len(arc_ids), np.nan)
+        sans_longueur = np.nonzero(np.isnan(longueurs))[0]
+        if sans_longueur.size:
+            longueurs[sans_longueur] = compute_geometry_metrics([
+                by_arc[arc_ids[i]][0].get("geo_shape") if by_arc[arc_ids[i]] else None
+                for i in sans_longueur.tolist()
+            ])["longueur_metres"]
+        arc_longueurs = dict(zip(arc_ids, longueurs.tolist()))
+        
+        # Zones des tronçons : table calculée une fois par version du référentiel
+        premiers = [by_arc[arc_id][0] if by_arc[arc_id] else {} for arc_id in arc_ids]
+        arc_zones = assign_zones(
+            arc_ids,
+            [record.get("geo_point_2d", "") for record in premiers],
+            [record.get("Libelle", "") for record in premiers]
+        )
+        
         for arc_id, records in by_arc.items():
             if not records:
                 continue
             
-            # Calculer longueur tronçon (depuis premier enregistrement)
-            geo_shape = records[0].get("geo_shape", "")
-            longueur_metres = 0.0
-            if geo_shape:
-                longueur_metres = calculate_line_length(geo_shape)
+            longueur_metres = arc_longueurs[arc_id]
             
             # Extraire geo_point avant de l'utiliser
             geo_point = records[0].get("geo_point_2d", "")
             
-            # Si longueur = 0, estimer depuis coordonnées (approximation)
+            # Si longueur = 0 (tronçon absent du référentiel et sans géométrie)
             if longueur_metres == 0.0 and geo_point:
                 try:
-                    # Estimation basique : si pas de geo_shape, utiliser longueur moyenne Paris
+                    # Estimation basique : utiliser longueur moyenne Paris
                     # Longueur moyenne d'un tronçon routier à Paris : ~500m
                     longueur_metres = 500.0
                 except Exception:
                     pass
-            libelle = records[0].get("Libelle", "")
-            
-            arrondissement = None
-            zone_fallback = None
-            
-            # Priorité 1: Arrondissement depuis coordonnées
-            if geo_point:
-                try:
-                    lat_str, lon_str = geo_point.split(", ")
-                    lon = float(lon_str)
-                    lat = float(lat_str)
-                    arrondissement = get_arrondissement_from_coordinates(lon, lat)
-                    
-                    # Si pas d'arrondissement, utiliser zone géographique
-                    if not arrondissement:
-                        zone_fallback = get_zone_from_coordinates(lon, lat)
-                except Exception:
-                    pass
             
-            # Priorité 2: Zone depuis libellé si pas d'arrondissement
-            if not arrondissement and libelle:
-                zone_from_libelle = extract_zone_from_libelle(libelle)
-                if zone_from_libelle:
-                    zone_fallback = zone_from_libelle
-            
-            # Priorité 3: Si toujours pas de zone et qu'on a des coordonnées, utiliser quadrant
-            if not zone_fallback and geo_point:
-                try:
-                    lat_str, lon_str = geo_point.split(", ")
-                    lon = float(lon_str)
-                    lat = float(lat_str)
-                    quadrant = get_quadrant_from_coordinates(lon, lat)
-                    if quadrant and quadrant != "Unknown":
-                        zone_fallback = quadrant
-                except Exception:
-                    pass
-            
-            # Gérer arrondissement None (MongoDB n'accepte pas les clés None)
-            if arrondissement is None:
-                arrondissement = "Unknown"
-            
-            # Toujours avoir une zone_fallback (même si "Unknown")
-            if not zone_fallback:
-                zone_fallback = "Unknown"
+            # Zones depuis la table d'affectation (arrondissement, sinon zone / libellé / quadrant)
+            zones = arc_zones[arc_id]
+            arrondissement = zones.arrondissement or "Unknown"  # MongoDB n'accepte pas les clés None
+            zone_fallback = zones.zone_fallback
             
             # Agrégations
             debit_moyen = calculate_mean_value(records, "Débit horaire") or 0.0
@@ -194,9 +210,26 @@ class ComptagesProcessor(BaseProcessor):
             taux_moyen = calculate_mean_value(records, "Taux d'occupation") or 0.0
             etat_dominant = get_mode_value(records, "Etat trafic") or "Inconnu"
             
-            # Pic horaire (simplifié - prendre max débit)
-            pic_record = max(records, key=lambda r: r.get("Débit horaire", 0) or 0)
-            heure_pic = pic_record.get("Date et heure de comptage", "")
+            # Pic horaire depuis le profil horaire du tronçon
+            row = matrices.index.get(arc_id)
+            heure_pic_index = int(heures_pic[row]) if row is not None else -1
+            if heure_pic_index >= 0:
+                heure_pic = format_hour_timestamp(
+                    records[0].get("Date et heure de comptage", ""), heure_pic_index
+                )
+            else:
+                heure_pic = ""
+                heure_pic_index = None
+            
+            # Percentiles horaires du tronçon calculés sur la journée (digests non conservés :
+            # les valeurs horaires sont déjà dans profils_horaires) ; seuls les sketches ville
+            # sont stockés et fusionnables entre chunks / jours
+            debits = [r.get("Débit horaire") for r in records]
+            taux = [r.get("Taux d'occupation") for r in records]
+            ville_debit.update(debits)
+            ville_taux.update(taux)
+            if debit_total > 0:
+                troncons_actifs.add(arc_id)
             
             aggregated_by_arc[arc_id] = {
                 "identifiant_arc": arc_id,
@@ -207,14 +240,18 @@ class ComptagesProcessor(BaseProcessor):
                 "taux_occupation_moyen": taux_moyen,
                 "etat_trafic_dominant": etat_dominant,
                 "heure_pic": heure_pic,
+                "heure_pic_index": heure_pic_index,
                 "longueur_metres": longueur_metres,
                 "arrondissement": arrondissement,
                 "zone_fallback": zone_fallback,  # Zone géographique si arrondissement Unknown
                 "geo_point_2d": geo_point,
-                "records_count": len(records)
+                "records_count": len(records),
+                "debit_percentiles": TDigest(compression).update(debits).quantiles(),
+                "taux_occupation_percentiles": TDigest(compression).update(taux).quantiles()
             }
         
         # Agrégation globale
+        jour = max((str(record.get("Date et heure de comptage") or "")[:10] for record in premiers), default="")
         total_vehicules = sum(a["debit_journalier_total"] for a in aggregated_by_arc.values())
         nombre_troncons = len(aggregated_by_arc)
         moyenne_debit_troncon = total_vehicules / nombre_troncons if nombre_troncons > 0 else 0.0
@@ -224,7 +261,14 @@ class ComptagesProcessor(BaseProcessor):
             "global": {
                 "total_vehicules_jour": total_vehicules,
                 "nombre_troncons": nombre_troncons,
-                "moyenne_debit_par_troncon": moyenne_debit_troncon
+                "moyenne_debit_par_troncon": moyenne_debit_troncon,
+                "jour": jour
+            },
+            "matrices": matrices,
+            "sketches": {
+                "debit": ville_debit.to_dict(),
+                "taux_occupation": ville_taux.to_dict(),
+                "troncons_actifs": troncons_actifs.to_dict()
             }
         }
     
@@ -241,37 +285,43 @@ class ComptagesProcessor(BaseProcessor):
         by_arc = aggregated_data.get("by_arc", {})
         metrics = []
         
-        # Calculer temps perdu pour chaque tronçon
-        for arc_id, arc_data in by_arc.items():
+        # Temps perdu de tous les tronçons (par tronçon et par heure) en un appel vectorisé
+        matrices = aggregated_data.get("matrices")
+        temps_perdu = self.compute_lost_time(by_arc, matrices)
+        
+        # Épisodes de congestion sur les profils horaires
+        episodes = None
+        if matrices is not None:
+            episodes = detect_congestion_runs(
+                matrices.layer("taux_occupation"),
+                seuil_taux=self.config.TAUX_OCCUPATION_SEUIL_CONGESTION,
+                duree_minutes=self.config.DUREE_ALERTE_CONGESTION_MINUTES
+            )
+        
+        # Top 10 alimentés en flux pendant la construction des métriques (tas bornés)
+        top_troncons = TopK(10, key=lambda x: x.get("debit_journalier_total", 0))
+        top_zones = TopK(10, key=lambda x: x.get("temps_perdu_total_minutes", 0))
+        
+        # Construire les métriques de chaque tronçon
+        for position, (arc_id, arc_data) in enumerate(by_arc.items()):
             debit = arc_data.get("debit_horaire_moyen", 0.0)
             taux_occ = arc_data.get("taux_occupation_moyen", 0.0)
-            longueur = arc_data.get("longueur_metres", 0.0)
-            
-            # Calcul temps perdu
-            # Utiliser une longueur par défaut si non disponible (500m = moyenne Paris)
-            longueur_effective = longueur if longueur > 0 else 500.0
             
-            # Calculer temps perdu par véhicule
-            temps_perdu_par_vehicule, _ = calculate_lost_time(
-                debit if debit > 0 else 1.0,  # Éviter division par 0 dans calculate_lost_time
-                taux_occ, 
-                longueur_effective
-            )
-            
-            # Temps perdu total = temps perdu par véhicule × nombre moyen de véhicules/heure × 24h
-            # Ou directement: temps perdu par véhicule × débit journalier / 24
-            debit_journalier = arc_data.get("debit_journalier_total", 0.0)
-            if debit_journalier > 0 and temps_perdu_par_vehicule > 0:
-                # Débit journalier = somme de toutes les heures de la journée
-                # Temps perdu total = (temps perdu par véhicule) × (débit moyen horaire) × 24h
-                # = temps_perdu_par_vehicule × (debit_journalier / 24) × 24
-                # = temps_perdu_par_vehicule × debit_journalier
-                temps_perdu_total = temps_perdu_par_vehicule * debit_journalier
+            # Temps perdu par véhicule et total (tous véhicules), calculés en lot
+            temps_perdu_par_vehicule = float(temps_perdu["temps_perdu_minutes"][position])
+            temps_perdu_total = float(temps_perdu["temps_perdu_total_minutes"][position])
+            
+            # Détecter congestion : épisode d'heures consécutives au-dessus du seuil
+            # d'au moins DUREE_ALERTE_CONGESTION_MINUTES (moyenne journalière à défaut de profil)
+            row = matrices.index.get(arc_id) if episodes is not None else None
+            if row is not None:
+                congestion_alerte = bool(episodes["alerte"][row])
+                duree_congestion = int(episodes["duree_minutes"][row])
+                debut_congestion = int(episodes["debut_heure"][row])
             else:
-                temps_perdu_total = 0.0
-            
-            # Détecter congestion
-            congestion_alerte = taux_occ >= self.config.TAUX_OCCUPATION_SEUIL_CONGESTION
+                congestion_alerte = taux_occ >= self.config.TAUX_OCCUPATION_SEUIL_CONGESTION
+                duree_congestion = 0
+                debut_congestion = -1
             
             # Gérer arrondissement None (MongoDB n'accepte pas les clés None)
             arrondissement = arc_data.get("arrondissement")
@@ -293,63 +343,40 @@ class ComptagesProcessor(BaseProcessor):
                 temps_perdu_total_minutes=temps_perdu_total,  # Temps perdu total (tous véhicules)
                 congestion_alerte=congestion_alerte,
                 arrondissement=arrondissement,
-                geo_point_2d=arc_data.get("geo_point_2d")
+                geo_point_2d=arc_data.get("geo_point_2d"),
+                heure_pic_index=arc_data.get("heure_pic_index"),
+                duree_congestion_minutes=duree_congestion,
+                debut_congestion_heure=debut_congestion if debut_congestion >= 0 else None
             )
             
+            # Percentiles horaires (t-digest)
+            debit_pct = arc_data.get("debit_percentiles", {})
+            taux_pct = arc_data.get("taux_occupation_percentiles", {})
+            metric.debit_p50 = debit_pct.get("p50")
+            metric.debit_p90 = debit_pct.get("p90")
+            metric.debit_p95 = debit_pct.get("p95")
+            metric.taux_occupation_p50 = taux_pct.get("p50")
+            metric.taux_occupation_p90 = taux_pct.get("p90")
+            metric.taux_occupation_p95 = taux_pct.get("p95")
+            
             # Ajouter zone_fallback au dict métrique (toujours présent)
             metric_dict = metric.to_dict()
             metric_dict["zone_fallback"] = zone_fallback  # Toujours ajouter, même si "Unknown"
             metrics.append(metric_dict)
+            top_troncons.push(metric_dict)
+            top_zones.push(metric_dict)
         
         # Top 10 tronçons fréquentés
-        top_10_troncons = sorted(
-            metrics,
-            key=lambda x: x.get("debit_journalier_total", 0),
-            reverse=True
-        )[:10]
+        top_10_troncons = top_troncons.items()
         
         # Top 10 zones congestionnées (par temps perdu total)
-        top_10_zones = sorted(
-            metrics,
-            key=lambda x: x.get("temps_perdu_total_minutes", 0),
-            reverse=True
-        )[:10]
+        top_10_zones = top_zones.items()
         
         # S'assurer que toutes les zones congestionnées ont zone_fallback
-        for zone in top_10_zones:
-            if "zone_fallback" not in zone or not zone.get("zone_fallback"):
-                # Si arrondissement connu
-                arr = zone.get("arrondissement", "Unknown")
-                if arr != "Unknown":
-                    zone["zone_fallback"] = f"Arrondissement {arr}"
-                else:
-                    # Détecter depuis coordonnées
-                    geo_point = zone.get("geo_point_2d")
-                    if geo_point:
-                        try:
-                            lat_str, lon_str = geo_point.split(", ")
-                            lon = float(lon_str)
-                            lat = float(lat_str)
-                            # Essayer plusieurs méthodes
-                            zone_detectee = get_zone_from_coordinates(lon, lat)
-                            if zone_detectee and zone_detectee != "Unknown":
-                                zone["zone_fallback"] = zone_detectee
-                            else:
-                                quadrant = get_quadrant_from_coordinates(lon, lat)
-                                if quadrant and quadrant != "Unknown":
-                                    zone["zone_fallback"] = quadrant
-                                else:
-                                    # Dernier recours : utiliser le libellé
-                                    libelle = zone.get("libelle", "")
-                                    zone_from_libelle = extract_zone_from_libelle(libelle)
-                                    zone["zone_fallback"] = zone_from_libelle if zone_from_libelle else "Unknown"
-                        except Exception:
-                            zone["zone_fallback"] = "Unknown"
-                    else:
-                        zone["zone_fallback"] = "Unknown"
+        fill_zone_fallback(top_10_zones)
         
         # Analyse par zones géographiques (pour zones sans arrondissement)
-        zones_grouped = group_by_zone(metrics)
+        zones_grouped = group_by_zone(metrics, zone_groups(metrics))
         zones_metrics = calculate_zone_metrics(zones_grouped)
         top_zones_affluence = identify_high_traffic_zones(zones_metrics, top_n=10)
         
@@ -362,30 +389,7 @@ class ComptagesProcessor(BaseProcessor):
         ]
         
         # S'assurer que toutes les alertes ont zone_fallback
-        for alerte in alertes:
-            if "zone_fallback" not in alerte:
-                # Si pas de zone_fallback mais arrondissement connu, utiliser arrondissement comme zone
-                arr = alerte.get("arrondissement", "Unknown")
-                if arr != "Unknown":
-                    alerte["zone_fallback"] = f"Arrondissement {arr}"
-                else:
-                    # Essayer de déterminer zone depuis coordonnées
-                    geo_point = alerte.get("geo_point_2d")
-                    if geo_point:
-                        try:
-                            lat_str, lon_str = geo_point.split(", ")
-                            lon = float(lon_str)
-                            lat = float(lat_str)
-                            zone = get_zone_from_coordinates(lon, lat)
-                            if zone and zone != "Unknown":
-                                alerte["zone_fallback"] = zone
-                            else:
-                                quadrant = get_quadrant_from_coordinates(lon, lat)
-                                alerte["zone_fallback"] = quadrant if quadrant else "Unknown"
-                        except Exception:
-                            alerte["zone_fallback"] = "Unknown"
-                    else:
-                        alerte["zone_fallback"] = "Unknown"
+        fill_zone_fallback(alertes)
         
         # Trier par temps perdu total (zones les plus impactées en premier)
         alertes = sorted(
@@ -404,14 +408,364 @@ class ComptagesProcessor(BaseProcessor):
             temps_perdu_total_paris=sum(m.get("temps_perdu_total_minutes", 0) for m in metrics)
         )
         
+        # Sketches ville sérialisés (stockés avec les métriques du jour, fusionnables)
+        sketches = {"ville": aggregated_data.get("sketches", {})}
+        
+        # Corridors congestionnés : alertes regroupées en chaînes de tronçons consécutifs
+        corridors = self.build_congestion_corridors(
+            alertes,
+            {arc_id: by_arc[arc_id].get("longueur_metres", 0.0) for arc_id in by_arc},
+            top_n=None
+        )
+        
+        global_dict = global_metrics.to_dict()
+        global_dict["statistiques_horaires"] = self.summarize_city_sketches(sketches["ville"])
+        global_dict["profil_horaire_ville"] = self.summarize_city_profile(matrices)
+        global_dict["nombre_corridors_congestion"] = len(corridors)
+        global_dict["jour_donnees"] = aggregated_data.get("global", {}).get("jour", "")
+        
         return {
             "metrics": metrics,
             "top_10_troncons": top_10_troncons,
             "top_10_zones_congestionnees": top_10_zones,
             "top_zones_affluence": top_zones_affluence,  # Analyse par zones (avec/sans arrondissement)
             "alertes_congestion": alertes,
-            "global_metrics": global_metrics.to_dict()
+            "corridors_congestion": corridors[:20],  # Top 20 (temps perdu total)
+            "pyramide_spatiale": self.spatial_pyramid(metrics),
+            "global_metrics": global_dict,
+            "profils_horaires": matrices.to_dict() if matrices is not None else None,
+            "sketches": sketches
+        }
+    
+    def build_congestion_corridors(self, alert_metrics: List[Dict],
+                                   longueurs: Optional[Dict[str, float]] = None,
+                                   top_n: Optional[int] = 20) -> List[Dict]:
+        """
+        Regroupe les tronçons en alerte en corridors congestionnés (tronçons consécutifs
+        partageant un nœud du graphe routier, composantes connexes en temps linéaire)
+        
+        Args:
+            alert_metrics: Métriques des tronçons en alerte
+            longueurs: Longueur par tronçon (défaut: référentiel compilé)
+            top_n: Nombre de corridors retournés (par temps perdu total), None pour tous
+        
+        Returns:
+            Liste de corridors (CongestionCorridor.to_dict), les plus impactants en premier
+        """
+        by_arc = {m.get("identifiant_arc"): m for m in alert_metrics if m.get("identifiant_arc")}
+        if not by_arc:
+            return []
+        
+        # Sans graphe (référentiel jamais compilé), chaque tronçon forme son propre corridor
+        graph = get_road_graph()
+        groups = graph.connected_groups(list(by_arc)) if graph is not None else [[arc] for arc in by_arc]
+        
+        if longueurs is None:
+            referentiel = get_compiled_referentiel()
+            arc_ids = list(by_arc)
+            valeurs = referentiel.lengths(arc_ids) if referentiel is not None else np.full(len(arc_ids), np.nan)
+            longueurs = dict(zip(arc_ids, np.nan_to_num(valeurs).tolist()))
+        
+        corridors = []
+        for group in groups:
+            metrics = sorted((by_arc[arc] for arc in group),
+                             key=lambda m: m.get("temps_perdu_total_minutes", 0), reverse=True)
+            corridor = CongestionCorridor(
+                date="",  # Sera rempli dans main
+                corridor_id=f"corridor-{min(group)}",
+                troncons=[m["identifiant_arc"] for m in metrics],
+                longueur_metres=sum(longueurs.get(arc, 0.0) for arc in group),
+                debit_journalier_total=sum(m.get("debit_journalier_total", 0.0) for m in metrics),
+                temps_perdu_total_minutes=sum(m.get("temps_perdu_total_minutes", 0.0) for m in metrics),
+                taux_occupation_moyen=sum(m.get("taux_occupation_moyen", 0.0) for m in metrics) / len(metrics),
+                libelles=list(dict.fromkeys(m["libelle"] for m in metrics if m.get("libelle"))),
+                arrondissements=sorted({
+                    m["arrondissement"] for m in metrics
+                    if m.get("arrondissement") and m["arrondissement"] != "Unknown"
+                })
+            )
+            corridors.append(corridor.to_dict())
+        
+        corridors.sort(key=lambda c: (c["temps_perdu_total_minutes"], c["nombre_troncons"]), reverse=True)
+        return corridors[:top_n] if top_n is not None else corridors
+    
+    def process(self, raw_data: Any, retain_intermediates: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Pipeline complet (cf. BaseProcessor.process), puis comparaison de la journée aux
+        références historiques des tronçons
+        """
+        results = super().process(raw_data, retain_intermediates)
+        if results.get("success") and results.get("indicators"):
+            self.apply_references(results["indicators"])
+        return results
+    
+    def apply_references(self, indicators: Dict, profils: Optional[EntityHourMatrix] = None) -> None:
+        """
+        Compare la journée aux références (tronçon, type de jour, heure) : z-scores du
+        débit, évolution à J-7 ; puis intègre la journée aux références (fin d'exécution)
+        
+        Args:
+            indicators: Indicateurs du jour (metrics, profils_horaires, global_metrics),
+                complétés en place (anomalies_trafic, evolution_semaine_precedente,
+                profil_reference_horaire)
+            profils: Profils horaires fusionnés (défaut : indicators["profils_horaires"])
+        """
+        global_metrics = indicators.get("global_metrics") or {}
+        jour = global_metrics.get("jour_donnees")
+        if not jour or not indicators.get("metrics"):
+            return
+        
+        # Débit journalier par tronçon (un tronçon peut être réparti sur plusieurs chunks)
+        totaux: Dict[str, float] = {}
+        libelles: Dict[str, str] = {}
+        for metric in indicators["metrics"]:
+            arc_id = metric.get("identifiant_arc")
+            if arc_id:
+                totaux[arc_id] = totaux.get(arc_id, 0.0) + (metric.get("debit_journalier_total") or 0.0)
+                libelles.setdefault(arc_id, metric.get("libelle", ""))
+        arc_ids = list(totaux)
+        totals = np.fromiter(totaux.values(), dtype=np.float64, count=len(arc_ids))
+        
+        if profils is None and indicators.get("profils_horaires"):
+            profils = EntityHourMatrix.from_dict(indicators["profils_horaires"])
+        hourly = np.full((len(arc_ids), 24), np.nan)
+        if profils is not None:
+            rows = np.array([profils.index.get(arc_id, -1) for arc_id in arc_ids], dtype=np.int64)
+            hourly[rows >= 0] = profils.layer("debit")[rows[rows >= 0]]
+        
+        references = get_baseline_store(self.config.REFERENCES_TRONCONS_PATH)
+        comparaison = references.compare(arc_ids, jour, hourly, totals)
+        anomalies = [
+            dict(identifiant_arc=arc_ids[row], libelle=libelles[arc_ids[row]],
+                 debit_journalier_total=float(totals[row]), **comparison_entry(comparaison, row))
+            for row in np.flatnonzero(comparaison["anomalie"] & (totals > 0)).tolist()
+        ]
+        anomalies.sort(key=lambda a: abs(a["zscore_jour"] or 0.0), reverse=True)
+        indicators["anomalies_trafic"] = anomalies[:20]  # Top 20 (|z-score|)
+        global_metrics["nombre_anomalies_trafic"] = len(anomalies)
+        indicators["evolution_semaine_precedente"] = week_over_week(
+            totals, comparaison["semaine_precedente"][:, CRENEAU_JOUR]
+        )
+        # Profil ville observé / attendu par heure absolue (jointure météo)
+        indicators["profil_reference_horaire"] = reference_profile(jour, hourly, comparaison)
+        
+        # Tronçons sans débit (capteur muet) exclus des références
+        actifs = np.flatnonzero(totals > 0)
+        references.update([arc_ids[row] for row in actifs.tolist()], jour, hourly[actifs], totals[actifs])
+        try:
+            references.save(self.config.REFERENCES_TRONCONS_PATH)
+        except OSError as e:
+            print(f"  ⚠ Écriture références tronçons impossible: {e}")
+    
+    def spatial_pyramid(self, metrics: List[Dict]) -> Dict[str, Any]:
+        """
+        Pyramide spatiale des tronçons : débit, temps perdu et saturation par cellule
+        geohash à chaque résolution (PYRAMIDE_GEOHASH_PRECISIONS)
+        
+        Args:
+            metrics: Métriques des tronçons (geo_point_2d)
+        
+        Returns:
+            Pyramide (cf. build_spatial_pyramid)
+        """
+        lons, lats = parse_geo_points([m.get("geo_point_2d") for m in metrics])
+        return build_spatial_pyramid(
+            lons, lats,
+            sums={
+                "debit_journalier_total": [m.get("debit_journalier_total", 0.0) for m in metrics],
+                "temps_perdu_total_minutes": [m.get("temps_perdu_total_minutes", 0.0) for m in metrics],
+                "nombre_troncons_satures": [bool(m.get("congestion_alerte", False)) for m in metrics]
+            },
+            means={"taux_occupation_moyen": [m.get("taux_occupation_moyen", 0.0) for m in metrics]},
+            count_key="nombre_troncons"
+        )
+    
+    def compute_lost_time(self, by_arc: Dict[str, Dict],
+                          matrices: Optional[EntityHourMatrix] = None,
+                          vitesse_reference=None) -> Dict[str, np.ndarray]:
+        """
+        Calcule le temps perdu de tous les tronçons en un appel vectorisé
+        
+        Temps perdu total = temps perdu par véhicule (au taux moyen) × débit journalier.
+        Si les matrices sont fournies, la couche "temps_perdu" (minutes par heure) y est ajoutée.
+        
+        Args:
+            by_arc: Agrégations par tronçon
+            matrices: Matrices tronçon × heure (optionnel)
+            vitesse_reference: Vitesse de référence en km/h, ou dict {arc_id: vitesse}
+                               (défaut: config)
+        
+        Returns:
+            Dict de tableaux alignés sur l'ordre de by_arc (voir calculate_lost_time_profiles)
+        """
+        arc_ids = list(by_arc)
+        
+        # Longueur par défaut si non disponible (500m = moyenne Paris)
+        longueurs = np.array(
+            [by_arc[arc_id].get("longueur_metres", 0.0) or 500.0 for arc_id in arc_ids],
+            dtype=np.float64
+        )
+        taux = np.array([by_arc[arc_id].get("taux_occupation_moyen", 0.0) for arc_id in arc_ids], dtype=np.float64)
+        debits = np.array([by_arc[arc_id].get("debit_journalier_total", 0.0) for arc_id in arc_ids], dtype=np.float64)
+        
+        if vitesse_reference is None:
+            vitesse_reference = self.config.VITESSE_REFERENCE_NORMALE
+        if isinstance(vitesse_reference, dict):
+            vitesse_reference = np.array([
+                vitesse_reference.get(arc_id, self.config.VITESSE_REFERENCE_NORMALE)
+                for arc_id in arc_ids
+            ], dtype=np.float64)
+        
+        # Lignes des matrices dans l'ordre de by_arc
+        rows = None
+        if matrices is not None and len(matrices) == len(arc_ids):
+            rows = np.array([matrices.index.get(arc_id, -1) for arc_id in arc_ids], dtype=np.int64)
+            if (rows < 0).any():
+                rows = None
+        
+        result = calculate_lost_time_profiles(
+            longueurs, taux, debits,
+            debit_horaire=matrices.layer("debit")[rows] if rows is not None else None,
+            taux_occupation_horaire=matrices.layer("taux_occupation")[rows] if rows is not None else None,
+            vitesse_reference=vitesse_reference
+        )
+        
+        if rows is not None:
+            temps_perdu_horaire = np.empty((len(matrices), 24), dtype=np.float32)
+            temps_perdu_horaire[rows] = result["temps_perdu_horaire_minutes"]
+            matrices.layers["temps_perdu"] = temps_perdu_horaire
+        
+        return result
+    
+    def simulate_reference_speed(self, aggregated_data: Dict, vitesse_reference) -> Dict[str, Any]:
+        """
+        Recalcule le temps perdu avec une autre vitesse de référence (scénario what-if)
+        
+        Args:
+            aggregated_data: Données agrégées (process(..., retain_intermediates=True)
+                             ou rebuild_intermediates)
+            vitesse_reference: Vitesse en km/h, ou dict {arc_id: vitesse}
+        
+        Returns:
+            Dict avec temps perdu total Paris, profil horaire et temps perdu par tronçon
+        """
+        by_arc = aggregated_data.get("by_arc", {})
+        matrices = aggregated_data.get("matrices")
+        scenario = matrices
+        if matrices is not None:
+            # Ne pas écraser la couche temps perdu du calcul de référence
+            scenario = EntityHourMatrix(matrices.entity_ids, dict(matrices.layers))
+        
+        temps_perdu = self.compute_lost_time(by_arc, scenario, vitesse_reference)
+        
+        result = {
+            "vitesse_reference": vitesse_reference if not isinstance(vitesse_reference, dict) else "par_troncon",
+            "temps_perdu_total_paris": float(temps_perdu["temps_perdu_total_minutes"].sum()),
+            "temps_perdu_par_troncon": dict(zip(by_arc, temps_perdu["temps_perdu_total_minutes"].tolist()))
         }
+        if "temps_perdu_horaire_minutes" in temps_perdu:
+            result["temps_perdu_par_heure"] = temps_perdu["temps_perdu_horaire_minutes"].sum(axis=0).tolist()
+        
+        return result
+    
+    def summarize_city_profile(self, matrices: Optional[EntityHourMatrix]) -> Dict[str, Any]:
+        """
+        Profil horaire ville (24 valeurs par indicateur) depuis les matrices
+        
+        Args:
+            matrices: Matrices tronçon × heure
+        
+        Returns:
+            Dict avec débit total, taux moyen, temps perdu et tronçons congestionnés par heure
+        """
+        if matrices is None or len(matrices) == 0:
+            return {}
+        
+        debit = matrices.layer("debit")
+        taux = matrices.layer("taux_occupation")
+        
+        debit_total = np.nansum(debit, axis=0, dtype=np.float64)
+        mesures_taux = (~np.isnan(taux)).sum(axis=0)
+        taux_moyen = np.nansum(taux, axis=0, dtype=np.float64) / np.maximum(mesures_taux, 1)
+        with np.errstate(invalid="ignore"):
+            congestionnes = (taux >= self.config.TAUX_OCCUPATION_SEUIL_CONGESTION).sum(axis=0)
+        
+        profil = {
+            "debit_total": [round(float(v), 1) for v in debit_total],
+            "taux_occupation_moyen": [
+                round(float(v), 2) if n > 0 else None for v, n in zip(taux_moyen, mesures_taux)
+            ],
+            "troncons_congestionnes": [int(v) for v in congestionnes],
+            "heure_pic": int(debit_total.argmax())
+        }
+        if "temps_perdu" in matrices.layers:
+            temps_perdu = matrices.layer("temps_perdu").sum(axis=0, dtype=np.float64)
+            profil["temps_perdu_total_minutes"] = [round(float(v), 1) for v in temps_perdu]
+        
+        return profil
+    
+    @staticmethod
+    def summarize_city_sketches(city_sketches: Dict) -> Dict[str, Any]:
+        """
+        Résume les sketches ville en statistiques publiables
+        
+        Args:
+            city_sketches: Sketches ville sérialisés (debit, taux_occupation, troncons_actifs)
+        
+        Returns:
+            Dict avec percentiles horaires et nombre de tronçons actifs distincts
+        """
+        return {
+            "debit_horaire_percentiles": summarize_sketch(city_sketches.get("debit")),
+            "taux_occupation_percentiles": summarize_sketch(city_sketches.get("taux_occupation")),
+            "troncons_actifs_distincts": summarize_sketch(
+                city_sketches.get("troncons_actifs")
+            ).get("distincts", 0)
+        }
+    
+    def chunk_indicators(self, chunk_path: str) -> Dict[str, Any]:
+        """
+        Indicateurs d'un chunk (chaque étape libère la précédente dès qu'elle l'a consommée)
+        
+        Args:
+            chunk_path: Chemin du chunk CSV
+        
+        Returns:
+            Indicateurs du chunk (format calculate_indicators)
+        """
+        cleaned = self.validate_and_clean(chunk_path)
+        aggregated = self.aggregate_daily(cleaned)
+        del cleaned
+        return self.calculate_indicators(aggregated)
+    
+    def iter_chunk_indicators(self, chunks: List[str]):
+        """
+        Indicateurs des chunks dans l'ordre, calculés en parallèle si WORKERS_PARALLELES > 1
+        
+        Args:
+            chunks: Chemins des chunks
+        
+        Yields:
+            Tuple (index du chunk, indicateurs ou None, erreur ou None)
+        """
+        workers = min(getattr(self.config, "WORKERS_PARALLELES", WORKERS_PARALLELES), len(chunks))
+        if workers <= 1:
+            for i, chunk_path in enumerate(chunks):
+                print(f"  → Traitement chunk {i+1}/{len(chunks)}...")
+                try:
+                    yield i, self.chunk_indicators(chunk_path), None
+                except Exception as e:
+                    yield i, None, e
+            return
+        
+        print(f"  → Traitement parallèle ({workers} workers, tables partagées)...")
+        with shared_worker_pool(workers, config=self.config) as executor:
+            futures = [executor.submit(_chunk_indicators_worker, chunk_path) for chunk_path in chunks]
+            for i, future in enumerate(futures):
+                try:
+                    yield i, future.result(), None
+                except Exception as e:
+                    yield i, None, e
     
     def process_large_file(self, file_path: str) -> Dict[str, Any]:
         """
@@ -433,33 +787,48 @@ class ComptagesProcessor(BaseProcessor):
             
             # Traiter chaque chunk
             all_metrics = []
-            all_top_10 = []
-            all_top_zones = []
-            all_alertes = []
+            # Sélections top-N fusionnées chunk par chunk (tas bornés, pas de tri global)
+            top_10_merged = TopK(10, key=lambda x: x.get("debit_journalier_total", 0))
+            top_zones_merged = TopK(10, key=lambda x: x.get("temps_perdu_total_minutes", 0))
+            # Alertes : seules les 20 plus impactantes (temps perdu total) sont conservées
+            top_alertes = TopK(20, key=lambda x: x.get("temps_perdu_total_minutes", 0))
+            sketches = SketchAccumulator()  # Sketches ville vivants, sérialisés une fois en fin de fichier
+            profils = None  # Matrices tronçon × heure fusionnées au fil des chunks
             total_vehicules = 0.0
             total_temps_perdu = 0.0
             total_troncons = 0
             total_chunks_treated = 0
+            jour_donnees = ""
             
-            for i, chunk_path in enumerate(chunks):
-                print(f"  → Traitement chunk {i+1}/{len(chunks)}...")
+            for i, indicators, error in self.iter_chunk_indicators(chunks):
+                if error is not None:
+                    print(f"    ⚠ Erreur traitement chunk {i+1}: {error}")
+                    continue
                 try:
-                    chunk_data = load_csv(chunk_path)
-                    cleaned = self.validate_and_clean(chunk_data)
-                    aggregated = self.aggregate_daily(cleaned)
-                    indicators = self.calculate_indicators(aggregated)
-                    
                     # Accumuler les résultats
                     all_metrics.extend(indicators.get("metrics", []))
-                    all_top_10.extend(indicators.get("top_10_troncons", []))
-                    all_top_zones.extend(indicators.get("top_10_zones_congestionnees", []))
-                    all_alertes.extend(indicators.get("alertes_congestion", []))
+                    top_10_merged.extend(indicators.get("top_10_troncons", []))
+                    top_zones_merged.extend(indicators.get("top_10_zones_congestionnees", []))
+                    # Exclure débit = 0 avant sélection
+                    top_alertes.extend(
+                        a for a in indicators.get("alertes_congestion", [])
+                        if a.get("debit_journalier_total", 0) > 0
+                    )
+                    
+                    # Fusionner les sketches ville du chunk dans les sketches vivants
+                    sketches.merge_dicts(indicators.get("sketches", {}).get("ville"))
+                    
+                    # Fusionner les profils horaires (tronçons répartis sur plusieurs chunks)
+                    if indicators.get("profils_horaires"):
+                        chunk_profils = EntityHourMatrix.from_dict(indicators["profils_horaires"])
+                        profils = chunk_profils if profils is None else profils.combine(chunk_profils)
                     
                     # Accumuler totaux globaux
                     global_m = indicators.get("global_metrics", {})
                     total_vehicules += global_m.get("total_vehicules_jour", 0.0)
                     total_temps_perdu += global_m.get("temps_perdu_total_paris", 0.0)
                     total_troncons += len(indicators.get("metrics", []))
+                    jour_donnees = max(jour_donnees, global_m.get("jour_donnees") or "")
                     total_chunks_treated += 1
                 except Exception as e:
                     print(f"    ⚠ Erreur traitement chunk {i+1}: {e}")
@@ -469,86 +838,23 @@ class ComptagesProcessor(BaseProcessor):
             
             # Ré-agréger tous les chunks
             # Top 10 final tronçons (tous chunks confondus)
-            top_10_final = sorted(
-                all_top_10,
-                key=lambda x: x.get("debit_journalier_total", 0),
-                reverse=True
-            )[:10]
+            top_10_final = top_10_merged.items()
             
             # Top 10 final zones (tous chunks confondus)
-            top_10_zones_final = sorted(
-                all_top_zones,
-                key=lambda x: x.get("temps_perdu_total_minutes", 0),
-                reverse=True
-            )[:10]
+            top_10_zones_final = top_zones_merged.items()
             
             # S'assurer que toutes les zones congestionnées ont zone_fallback
-            for zone in top_10_zones_final:
-                if "zone_fallback" not in zone or not zone.get("zone_fallback"):
-                    arr = zone.get("arrondissement", "Unknown")
-                    if arr != "Unknown":
-                        zone["zone_fallback"] = f"Arrondissement {arr}"
-                    else:
-                        geo_point = zone.get("geo_point_2d")
-                        if geo_point:
-                            try:
-                                lat_str, lon_str = geo_point.split(", ")
-                                lon = float(lon_str)
-                                lat = float(lat_str)
-                                zone_detectee = get_zone_from_coordinates(lon, lat)
-                                if zone_detectee and zone_detectee != "Unknown":
-                                    zone["zone_fallback"] = zone_detectee
-                                else:
-                                    quadrant = get_quadrant_from_coordinates(lon, lat)
-                                    zone["zone_fallback"] = quadrant if quadrant else "Unknown"
-                            except Exception:
-                                zone["zone_fallback"] = "Unknown"
-                        else:
-                            zone["zone_fallback"] = "Unknown"
+            fill_zone_fallback(top_10_zones_final)
             
             # Analyse par zones géographiques (pour tous les chunks)
-            zones_grouped = group_by_zone(all_metrics)
+            zones_grouped = group_by_zone(all_metrics, zone_groups(all_metrics))
             zones_metrics = calculate_zone_metrics(zones_grouped)
             top_zones_affluence_final = identify_high_traffic_zones(zones_metrics, top_n=10)
             
-            # Filtrer et nettoyer les alertes (exclure débit = 0, s'assurer zone_fallback présent)
-            alertes_filtrees = []
-            for alerte in all_alertes:
-                # Exclure débit = 0
-                if alerte.get("debit_journalier_total", 0) <= 0:
-                    continue
-                
-                # S'assurer que zone_fallback est présent
-                if "zone_fallback" not in alerte:
-                    arr = alerte.get("arrondissement", "Unknown")
-                    if arr != "Unknown":
-                        alerte["zone_fallback"] = f"Arrondissement {arr}"
-                    else:
-                        geo_point = alerte.get("geo_point_2d")
-                        if geo_point:
-                            try:
-                                lat_str, lon_str = geo_point.split(", ")
-                                lon = float(lon_str)
-                                lat = float(lat_str)
-                                zone = get_zone_from_coordinates(lon, lat)
-                                if zone and zone != "Unknown":
-                                    alerte["zone_fallback"] = zone
-                                else:
-                                    quadrant = get_quadrant_from_coordinates(lon, lat)
-                                    alerte["zone_fallback"] = quadrant if quadrant else "Unknown"
-                            except Exception:
-                                alerte["zone_fallback"] = "Unknown"
-                        else:
-                            alerte["zone_fallback"] = "Unknown"
-                
-                alertes_filtrees.append(alerte)
-            
-            # Trier par temps perdu total
-            alertes_filtrees = sorted(
-                alertes_filtrees,
-                key=lambda x: x.get("temps_perdu_total_minutes", 0),
-                reverse=True
-            )
+            # Nettoyer les alertes retenues (s'assurer zone_fallback présent)
+            # Déjà triées par temps perdu total et limitées à 20
+            alertes_filtrees = top_alertes.items()
+            fill_zone_fallback(alertes_filtrees)
             
             # Métriques globales agrégées
             moyenne_debit = total_vehicules / total_troncons if total_troncons > 0 else 0.0
@@ -569,23 +875,44 @@ class ComptagesProcessor(BaseProcessor):
                 "temps_perdu_total_heures": temps_perdu_total_heures,
                 "repartition_etat_trafic": {}  # À calculer si besoin
             }
+            city_sketches = sketches.to_dict()
+            global_metrics["statistiques_horaires"] = self.summarize_city_sketches(city_sketches)
+            global_metrics["profil_horaire_ville"] = self.summarize_city_profile(profils)
+            
+            # Corridors congestionnés sur l'ensemble des chunks (tronçons d'un même corridor
+            # pouvant être répartis sur plusieurs chunks)
+            corridors = self.build_congestion_corridors(
+                [m for m in all_metrics
+                 if m.get("congestion_alerte", False) and m.get("debit_journalier_total", 0) > 0],
+                top_n=None
+            )
+            global_metrics["nombre_corridors_congestion"] = len(corridors)
+            global_metrics["jour_donnees"] = jour_donnees
+            
+            indicators = {
+                "metrics": all_metrics,
+                "top_10_troncons": top_10_final,
+                "top_10_zones_congestionnees": top_10_zones_final,
+                "top_zones_affluence": top_zones_affluence_final,  # Analyse par zones (avec/sans arrondissement)
+                "alertes_congestion": alertes_filtrees,  # Top 20 (filtrées et nettoyées)
+                "corridors_congestion": corridors[:20],  # Top 20 (temps perdu total)
+                "pyramide_spatiale": self.spatial_pyramid(all_metrics),
+                "global_metrics": global_metrics,
+                "profils_horaires": profils.to_dict() if profils is not None else None,
+                "sketches": {"ville": city_sketches}
+            }
+            self.apply_references(indicators, profils)
+            save_geometry_cache()
             
             # Retourner structure compatible avec process()
             return {
                 "cleaned_data": None,  # Non disponible après chunks
                 "aggregated_data": None,
-                "indicators": {
-                    "metrics": all_metrics,
-                    "top_10_troncons": top_10_final,
-                    "top_10_zones_congestionnees": top_10_zones_final,
-                    "top_zones_affluence": top_zones_affluence_final,  # Analyse par zones (avec/sans arrondissement)
-                    "alertes_congestion": alertes_filtrees[:20],  # Limiter à 20 (filtrées et nettoyées)
-                    "global_metrics": global_metrics
-                },
+                "indicators": indicators,
                 "success": True,
                 "errors": []
             }
         else:
-            # Traitement normal
-            return self.process(load_csv(file_path))
+            # Traitement normal (lecture en flux depuis le chemin)
+            return self.process(file_path)
 
@@ -22,9 +22,18 @@ from processors import (
 )
 
 # Imports utilitaires (depuis processors/utils/)
+from processors.utils.counter_matching import (
+    bike_share_by_corridor, bike_share_of_arcs, counters_from_metrics, match_bike_counters
+)
+from processors.utils.counter_registry import get_counter_registry
 from processors.utils.file_utils import (
     load_json, find_json_files, load_and_combine_json_files, find_csv_files
 )
+from processors.utils.memory_utils import format_peak_rss
+from processors.utils.referentiel_store import get_compiled_referentiel
+from processors.utils.spatial_join import spatial_join_chantiers
+from processors.utils.weather_hours import get_hourly_weather, weather_conditioned_deltas
+from processors.utils.zone_assignment import fill_zone_fallback
 
 # Import services base de données (MongoDB ou DynamoDB)
 import sys
@@ -312,26 +321,218 @@ def initialize_processors(config) -> Dict[str, Any]:
     }
 
 
-def enrich_multi_source(results: Dict, referentiel_data: Optional[Dict] = None) -> Dict:
+def load_chantiers_actifs(chantiers_result: Dict, raw_chantiers: Any) -> list:
+    """
+    Chantiers actifs avec géométrie (agrégations conservées ou reconstruites)
+    
+    Args:
+        chantiers_result: Résultat ChantiersProcessor
+        raw_chantiers: Données brutes chantiers (chemin CSV) pour reconstruction
+    
+    Returns:
+        Liste des chantiers actifs
+    """
+    aggregated = chantiers_result.get("aggregated_data")
+    if aggregated is None and raw_chantiers is not None:
+        # Mode lean : agrégations libérées, reconstruction depuis la source
+        aggregated = ChantiersProcessor(settings).rebuild_intermediates(raw_chantiers)["aggregated_data"]
+    return (aggregated or {}).get("actifs", [])
+
+
+def load_referentiel_arcs(referentiel_result: Dict, raw_referentiel: Any) -> list:
+    """
+    Couples (identifiant arc, geo_shape) du référentiel
+    
+    Args:
+        referentiel_result: Résultat ReferentielProcessor
+        raw_referentiel: Données brutes référentiel (chemin CSV) pour reconstruction
+    
+    Returns:
+        Liste de couples (identifiant, geo_shape)
+    """
+    cleaned = referentiel_result.get("cleaned_data")
+    if cleaned is None:
+        # Géométries du référentiel compilé (sans re-parser le CSV)
+        store = get_compiled_referentiel()
+        if store is not None:
+            return store.arc_geometries()
+    if cleaned is None and raw_referentiel is not None:
+        cleaned = ReferentielProcessor(settings).validate_and_clean(raw_referentiel)
+    return [
+        (record.get("Identifiant arc", ""), record.get("geo_shape"))
+        for record in cleaned or []
+        if record.get("Identifiant arc", "") and record.get("geo_shape")
+    ]
+
+
+def apply_chantiers_join(results: Dict, jointure: Dict) -> None:
+    """
+    Reporte la jointure chantiers ↔ tronçons sur les deux côtés :
+    chantiers actifs (tronçons impactés), référentiel et comptages (impact par tronçon)
+    
+    Args:
+        results: Résultats de traitement (modifiés en place)
+        jointure: Résultat de spatial_join_chantiers
+    """
+    par_chantier = jointure.get("par_chantier", {})
+    par_troncon = jointure.get("par_troncon", {})
+    
+    # Côté chantiers
+    chantiers_indicators = (results.get("chantiers") or {}).get("indicators") or {}
+    for chantier in chantiers_indicators.get("chantiers_actifs", []):
+        liens = par_chantier.get(chantier.get("identifiant", ""))
+        if liens:
+            chantier.update(liens)
+    if chantiers_indicators:
+        chantiers_indicators["jointure_troncons"] = {
+            "troncons_impactes": len(par_troncon),
+            "chantiers_relies": sum(1 for liens in par_chantier.values() if liens["troncons_impactes"]),
+            "longueur_impactee_metres": round(
+                sum(liens["longueur_impactee_metres"] for liens in par_chantier.values()), 1
+            ),
+            "empreintes": jointure.get("empreintes", {})
+        }
+    
+    # Côté tronçons : référentiel (mapping exporté seulement si le référentiel a changé)
+    referentiel_indicators = (results.get("referentiel") or {}).get("indicators") or {}
+    if referentiel_indicators:
+        referentiel_indicators["impacts_chantiers"] = par_troncon
+    mapping = referentiel_indicators.get("mapping", {})
+    for arc_id, impact in par_troncon.items():
+        if arc_id in mapping:
+            mapping[arc_id]["impact_chantiers"] = impact["impact_chantiers"]
+            mapping[arc_id]["chantiers"] = impact["chantiers"]
+    
+    # Côté tronçons : métriques comptages
+    comptages_indicators = (results.get("comptages") or {}).get("indicators") or {}
+    for metric in comptages_indicators.get("metrics", []):
+        impact = par_troncon.get(metric.get("identifiant_arc"))
+        if impact:
+            metric["impact_chantiers"] = impact["impact_chantiers"]
+
+
+def apply_bike_matching(results: Dict, appariement: Dict) -> None:
+    """
+    Reporte l'appariement compteurs vélos ↔ tronçons : tronçon de chaque compteur,
+    part modale vélo par corridor et sur les corridors congestionnés
+    
+    Args:
+        results: Résultats de traitement (modifiés en place)
+        appariement: Résultat de match_bike_counters
+    """
+    par_compteur = appariement.get("par_compteur", {})
+    
+    # Côté vélos
+    bikes_indicators = (results.get("bikes") or {}).get("indicators") or {}
+    bike_metrics = bikes_indicators.get("metrics", [])
+    for metric in bike_metrics:
+        lien = par_compteur.get(metric.get("id_compteur", ""))
+        if lien:
+            metric["identifiant_arc"] = lien["identifiant_arc"]
+            metric["distance_troncon_metres"] = lien["distance_metres"]
+    if bikes_indicators:
+        bikes_indicators["appariement_troncons"] = {
+            "compteurs_apparies": len(par_compteur),
+            "compteurs_non_apparies": len(appariement.get("non_apparies", [])),
+            "troncons_apparies": len(appariement.get("par_troncon", {})),
+            "distance_max_metres": appariement.get("distance_max_metres"),
+            "empreintes": appariement.get("empreintes", {})
+        }
+    
+    # Côté comptages : part vélo par corridor (axe) et sur les corridors congestionnés
+    comptages_indicators = (results.get("comptages") or {}).get("indicators") or {}
+    if comptages_indicators:
+        comptages_indicators["part_velo_corridors"] = bike_share_by_corridor(
+            appariement, bike_metrics, comptages_indicators.get("metrics", [])
+        )
+    for corridor in comptages_indicators.get("corridors_congestion", []):
+        part = bike_share_of_arcs(
+            appariement, bike_metrics, corridor.get("troncons", []), corridor.get("debit_journalier_total", 0.0)
+        )
+        if part:
+            corridor.update(part)
+
+
+def apply_weather_join(results: Dict) -> None:
+    """
+    Jointure météo horaire × profils de mobilité (vélos, trafic routier) sur les heures
+    absolues : écarts au débit attendu conditionnés par la pluie et la température
+    
+    Args:
+        results: Résultats de traitement (modifiés en place)
+    """
+    meteo = get_hourly_weather(settings.METEO_HORAIRE_PATH)
+    if not len(meteo):
+        return
+    
+    impact_mesure = {}
+    for source, label in (("bikes", "velos"), ("comptages", "trafic")):
+        indicators = (results.get(source) or {}).get("indicators") or {}
+        profil = indicators.get("profil_reference_horaire")
+        if not profil:
+            continue
+        jointure = weather_conditioned_deltas(profil, meteo)
+        indicators["meteo"] = jointure
+        impact_mesure[label] = {
+            "effet_pluie_pourcent": jointure["effet_pluie_pourcent"],
+            "ecart_par_condition": jointure["ecart_par_condition"]
+        }
+    
+    weather_indicators = (results.get("weather") or {}).get("indicators") or {}
+    if weather_indicators and impact_mesure:
+        weather_indicators["impact_mesure"] = impact_mesure
+
+
+def enrich_multi_source(results: Dict, referentiel_data: Optional[Dict] = None,
+                        raw_data: Optional[Dict] = None) -> Dict:
     """
     Enrichit les résultats avec jointures multi-sources
     
     Args:
         results: Résultats de traitement
         referentiel_data: Données référentiel pour enrichissement
+        raw_data: Données brutes (chemins CSV) pour reconstruire les géométries
     
     Returns:
         Résultats enrichis
     """
-    # Enrichir comptages avec référentiel
-    # (Simplifié - dans un vrai projet, utiliser referentiel_data pour enrichir)
-    if referentiel_data and "comptages" in results:
-        # TODO: Utiliser referentiel_data pour enrichir les métriques comptages
-        # avec libelles et métadonnées géographiques
-        pass
+    raw_data = raw_data or {}
     
-    # Enrichir avec chantiers (intersection géographique)
-    # (Simplifié - nécessiterait calcul intersections géographiques)
+    # Enrichir avec chantiers (jointure spatiale chantiers ↔ tronçons)
+    chantiers_result = results.get("chantiers") or {}
+    if chantiers_result.get("success") and referentiel_data and referentiel_data.get("success"):
+        try:
+            chantiers = load_chantiers_actifs(chantiers_result, raw_data.get("chantiers"))
+            arcs = load_referentiel_arcs(referentiel_data, raw_data.get("referentiel"))
+            if chantiers and arcs:
+                jointure = spatial_join_chantiers(chantiers, arcs)
+                apply_chantiers_join(results, jointure)
+                print(f"  ✓ Jointure chantiers ↔ tronçons: {len(jointure['par_troncon'])} tronçons impactés")
+        except Exception as e:
+            print(f"  ⚠ Jointure chantiers ↔ tronçons impossible: {e}")
+    
+    # Apparier les compteurs vélos aux tronçons (plus proche tronçon, arbre k-d)
+    bikes_result = results.get("bikes") or {}
+    if bikes_result.get("success") and referentiel_data and referentiel_data.get("success"):
+        try:
+            bike_metrics = (bikes_result.get("indicators") or {}).get("metrics", [])
+            # Coordonnées depuis le registre des compteurs (métriques référencées par code)
+            counters = get_counter_registry().counters([m.get("id_compteur", "") for m in bike_metrics])
+            counters = counters or counters_from_metrics(bike_metrics)
+            arcs = load_referentiel_arcs(referentiel_data, raw_data.get("referentiel"))
+            if counters and arcs:
+                appariement = match_bike_counters(counters, arcs)
+                apply_bike_matching(results, appariement)
+                print(f"  ✓ Appariement compteurs vélos ↔ tronçons: "
+                      f"{len(appariement['par_compteur'])}/{len(counters)} compteurs")
+        except Exception as e:
+            print(f"  ⚠ Appariement compteurs vélos ↔ tronçons impossible: {e}")
+    
+    # Jointure météo horaire ↔ profils horaires de mobilité (heures absolues)
+    try:
+        apply_weather_join(results)
+    except Exception as e:
+        print(f"  ⚠ Jointure météo ↔ mobilité impossible: {e}")
     
     return results
 
@@ -400,19 +601,19 @@ def export_results(results: Dict, config, date: Optional[str] = None) -> None:
                 for zone in indicators["top_10_zones_congestionnees"]:
                     if "date" in zone and zone["date"] == "":
                         zone["date"] = date
-                    # S'assurer que zone_fallback est présent
-                    if "zone_fallback" not in zone or not zone.get("zone_fallback"):
-                        arr = zone.get("arrondissement", "Unknown")
-                        if arr != "Unknown":
-                            zone["zone_fallback"] = f"Arrondissement {arr}"
-                        else:
-                            zone["zone_fallback"] = "Unknown"
+                # S'assurer que zone_fallback est présent (table d'affectation des zones)
+                fill_zone_fallback(indicators["top_10_zones_congestionnees"])
             
             # Remplir date dans les alertes de congestion
             if "alertes_congestion" in indicators:
                 for alerte in indicators["alertes_congestion"]:
                     if "date" in alerte and alerte["date"] == "":
                         alerte["date"] = date
+            
+            # Remplir date dans les corridors congestionnés
+            for corridor in indicators.get("corridors_congestion") or []:
+                if corridor.get("date") == "":
+                    corridor["date"] = date
     
     # Obtenir le service de base de données (MongoDB ou DynamoDB selon config)
     try:
@@ -530,6 +731,7 @@ def main(date: Optional[str] = None):
         if raw_data.get("referentiel"):
             print("  → Traitement référentiel géographique...")
             results["referentiel"] = processors["referentiel"].process(raw_data["referentiel"])
+            print(f"    ✓ referentiel traité ({format_peak_rss()})")
         
         # Traiter autres données
         for data_type, processor in processors.items():
@@ -551,15 +753,21 @@ def main(date: Optional[str] = None):
                     result = processor.process(data)
                 
                 results[data_type] = result
-                print(f"    ✓ {data_type} traité avec succès")
+                print(f"    ✓ {data_type} traité avec succès ({format_peak_rss()})")
             except Exception as e:
                 print(f"    ✗ Erreur traitement {data_type}: {e}")
                 results[data_type] = {"success": False, "errors": [str(e)]}
+            
+            # Mode lean : libérer les données brutes en mémoire dès qu'elles ont été consommées
+            # (les chemins de fichiers sont conservés pour l'enrichissement multi-sources)
+            if not config.RETAIN_INTERMEDIATE_DATA and not isinstance(data, str):
+                raw_data[data_type] = None
+                data = None
         
         # 5. Enrichissement multi-sources
         print("\n[5/6] Enrichissement multi-sources...")
         referentiel_data = results.get("referentiel")
-        results = enrich_multi_source(results, referentiel_data)
+        results = enrich_multi_source(results, referentiel_data, raw_data)
         print("✓ Enrichissement terminé")
         
         # 6. Export résultats (métriques uniquement)
@@ -569,6 +777,7 @@ def main(date: Optional[str] = None):
         
         print("\n" + "=" * 60)
         print("Traitement terminé avec succès!")
+        print(f"Mémoire : {format_peak_rss()}")
         print("=" * 60)
         db_type = get_database_type()
         print(f"\n📊 Métriques exportées dans {db_type.upper()}")
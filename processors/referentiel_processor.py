@@ -2,11 +2,20 @@
 Processeur pour le Référentiel Géographique
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
 from processors.base_processor import BaseProcessor
 from processors.utils.file_utils import load_csv
 from processors.utils.validators import validate_geojson, validate_date_iso
-from processors.utils.geo_utils import calculate_line_length, extract_center_point
+from processors.utils.geometry_batch import compute_geometry_metrics
+from processors.utils.referentiel_store import (
+    CompiledReferentiel, get_compiled_referentiel, source_fingerprint
+)
+from processors.utils.zone_assignment import get_zone_table
+from processors.utils.polyline import POLYLINE_PRECISION, encode_levels
+from config import GEOMETRIE_TOLERANCES_METRES
 
 
 class ReferentielProcessor(BaseProcessor):
@@ -76,23 +85,25 @@ class ReferentielProcessor(BaseProcessor):
         now = datetime.now()
         mapping = {}
         
-        for record in cleaned_data:
+        records = [record for record in cleaned_data if record.get("Identifiant arc", "")]
+        
+        # Longueurs et centres calculés en lot (vectorisé, cache par géométrie)
+        geometries = compute_geometry_metrics([record.get("geo_shape") or None for record in records])
+        longueurs = geometries["longueur_metres"].tolist()
+        centres_lon = geometries["centre_lon"].tolist()
+        centres_lat = geometries["centre_lat"].tolist()
+        
+        for position, record in enumerate(records):
             arc_id = record.get("Identifiant arc", "")
-            if not arc_id:
-                continue
-            
-            # Calculer longueur
-            geo_shape = record.get("geo_shape", "")
-            longueur = 0.0
-            if geo_shape:
-                longueur = calculate_line_length(geo_shape)
             
-            # Extraire centre
-            center = extract_center_point(geo_shape) if geo_shape else None
+            # Centre (point à mi-longueur du tronçon)
+            center = None
+            if centres_lon[position] == centres_lon[position]:  # NaN si géométrie absente
+                center = (centres_lon[position], centres_lat[position])
             
             mapping[arc_id] = {
                 "libelle": record.get("Libelle", ""),
-                "longueur_metres": longueur,
+                "longueur_metres": longueurs[position],
                 "noeud_amont": record.get("Identifiant noeud amont", ""),
                 "noeud_aval": record.get("Identifiant noeud aval", ""),
                 "geo_point_2d": record.get("geo_point_2d", ""),
@@ -132,17 +143,144 @@ class ReferentielProcessor(BaseProcessor):
             }
         }
     
-    def enrich_data(self, data: List[Dict], referentiel_mapping: Dict) -> List[Dict]:
+    def compile(self, data: Any) -> Tuple[CompiledReferentiel, bool]:
+        """
+        Référentiel compilé à jour (recompilé seulement si l'empreinte de la source change)
+        
+        Args:
+            data: Chemin CSV ou liste de dicts
+        
+        Returns:
+            Tuple (référentiel compilé, True si recompilé)
+        """
+        fingerprint = source_fingerprint(data)
+        store = get_compiled_referentiel()
+        if store is not None and store.fingerprint == fingerprint:
+            return store, False
+        
+        cleaned = self.validate_and_clean(data)
+        mapping = self.aggregate_daily(cleaned)["mapping"]
+        geo_shapes = {r["Identifiant arc"]: r.get("geo_shape") for r in cleaned if r.get("geo_shape")}
+        
+        store = CompiledReferentiel.from_mapping(mapping, geo_shapes, fingerprint)
+        # Le mapping complet de cette version est exporté par l'exécution qui la compile
+        store.meta["jour_export_mapping"] = self._processing_day()
+        try:
+            store.save()
+            print(f"  ✓ Référentiel compilé ({len(store)} tronçons, empreinte {fingerprint[:12]})")
+            store = get_compiled_referentiel(refresh=True) or store
+            # Affectation des zones de la nouvelle version (calculée une fois, persistée)
+            zones = get_zone_table()
+            if zones is not None:
+                print(f"  ✓ Zones affectées ({len(zones)} tronçons)")
+        except OSError as e:
+            print(f"  ⚠ Écriture référentiel compilé impossible: {e}")
+        return store, True
+    
+    def _processing_day(self) -> str:
+        """Jour de traitement : partition API_DATE (défaut: aujourd'hui)"""
+        from datetime import datetime
+        
+        return str(getattr(self.config, "API_DATE", "") or datetime.now().strftime("%Y-%m-%d"))
+    
+    def encoded_geometries(self, store: CompiledReferentiel) -> Dict[str, Any]:
+        """
+        Géométries des tronçons sous forme compacte : simplifiées par niveau de zoom
+        (GEOMETRIE_TOLERANCES_METRES) et encodées en polylignes
+        
+        Args:
+            store: Référentiel compilé
+        
+        Returns:
+            Dict {"precision", "tolerances_metres", "troncons": {arc_id: {zoom: polyligne}}}
+        """
+        has_shape = (np.diff(store.coord_offsets) > 0).tolist()
+        levels = encode_levels(store.coords, store.coord_offsets)
+        return {
+            "precision": POLYLINE_PRECISION,
+            "tolerances_metres": dict(GEOMETRIE_TOLERANCES_METRES),
+            "troncons": {
+                arc_id: level
+                for arc_id, level, present in zip(store.arc_ids.tolist(), levels, has_shape)
+                if present
+            }
+        }
+    
+    def process(self, raw_data: Any, retain_intermediates: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Pipeline référentiel via la table compilée : le CSV n'est re-parsé (et le mapping
+        complet exporté) que si la source a changé. referentiel_compile.dernier_export_mapping
+        indique le jour et l'empreinte du document qui contient le mapping en vigueur.
+        
+        Args:
+            raw_data: Chemin CSV ou liste de dicts
+            retain_intermediates: Conserver cleaned_data / aggregated_data (pipeline complet)
+        
+        Returns:
+            Dict avec les résultats (format BaseProcessor.process)
+        """
+        if retain_intermediates is None:
+            retain_intermediates = getattr(self.config, "RETAIN_INTERMEDIATE_DATA", False)
+        if retain_intermediates:
+            return super().process(raw_data, retain_intermediates)
+        
+        try:
+            store, recompiled = self.compile(raw_data)
+            export_mapping = recompiled or getattr(self.config, "REFERENTIEL_EXPORT_MAPPING_QUOTIDIEN", False)
+            # Versions compilées avant le suivi des exports : jour de compilation
+            jour_export = (self._processing_day() if export_mapping else
+                           store.meta.get("jour_export_mapping") or store.meta.get("date_compilation", "")[:10])
+            indicators = {
+                "statistiques": store.statistics(),
+                "referentiel_compile": dict(
+                    store.meta,
+                    dernier_export_mapping={"jour": jour_export, "empreinte": store.fingerprint}
+                )
+            }
+            if export_mapping:
+                indicators["mapping"] = store.to_mapping()
+                indicators["geometries"] = self.encoded_geometries(store)
+            
+            return {
+                "cleaned_data": None,
+                "aggregated_data": None,
+                "indicators": indicators,
+                "success": True,
+                "errors": []
+            }
+        except Exception as e:
+            return {
+                "cleaned_data": None,
+                "aggregated_data": None,
+                "indicators": None,
+                "success": False,
+                "errors": [str(e)]
+            }
+    
+    def enrich_data(self, data: List[Dict], referentiel_mapping: Optional[Dict] = None) -> List[Dict]:
         """
         Enrichit des données avec le référentiel
         
         Args:
             data: Données à enrichir
-            referentiel_mapping: Mapping du référentiel
+            referentiel_mapping: Mapping du référentiel (défaut: référentiel compilé)
         
         Returns:
             Données enrichies
         """
+        if referentiel_mapping is None:
+            store = get_compiled_referentiel()
+            if store is None:
+                return list(data)
+            
+            # Recherche vectorisée de tous les tronçons en une fois
+            positions = store.lookup_many([record.get("Identifiant arc", "") for record in data]).tolist()
+            for record, position in zip(data, positions):
+                if position >= 0:
+                    record["libelle"] = store.libelle(position) or record.get("Libelle", "")
+                    record["longueur_metres"] = float(store.longueur_metres[position])
+            return list(data)
+        
         enriched = []
         
         for record in data:
@@ -156,4 +294,3 @@ class ReferentielProcessor(BaseProcessor):
             enriched.append(record)
         
         return enriched
-
@@ -2,92 +2,146 @@
 Processeur pour les données API Traffic (perturbations RATP)
 """
 
-from typing import List, Dict, Any, Set
-import re
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Set, Union
+import numpy as np
 from processors.base_processor import BaseProcessor
 from processors.utils.validators import validate_date_iso
-from processors.utils.time_utils import parse_iso_date, calculate_time_difference
-from config import SEVERITE_RATP
+from processors.utils.time_utils import parse_iso_date
+from processors.utils.aggregators import select_top_n
+from processors.utils.interval_sweep import DayIntervalBitmaps, covered_length, minutes_in_day
+from processors.utils.disruption_state import DisruptionState, epoch_minute, load_day_state, save_day_state
+from processors.utils.line_extractor import LIGNES_METRO, N_LIGNES_METRO, get_line_extractor
+from config import SEVERITE_RATP, DISPONIBILITE_SEVERITE_MIN
 
-# Lignes de métro valides à Paris (1-14)
-LIGNES_METRO_VALIDES: Set[str] = {str(i) for i in range(1, 15)}  # "1" à "14"
+# Lignes de métro valides à Paris (1-14), LIGNES_METRO : ordre des bitmaps et des codes 0 à 13
+LIGNES_METRO_VALIDES: Set[str] = set(LIGNES_METRO)  # "1" à "14"
 
 
 class TrafficProcessor(BaseProcessor):
     """Processeur pour les perturbations trafic RATP"""
     
-    def validate_and_clean(self, data: Dict) -> List[Dict]:
+    def __init__(self, config=None):
+        super().__init__(config)
+        self._state: Optional[DisruptionState] = None
+    
+    def process(self, raw_data: Any, retain_intermediates: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Pipeline complet (cf. BaseProcessor.process), puis écriture de l'état des
+        perturbations du jour de référence (fin d'exécution)
+        """
+        self._state = None
+        results = super().process(raw_data, retain_intermediates)
+        if results.get("success") and self._state is not None:
+            try:
+                save_day_state(self._state, self._reference_day(), self.config.PERTURBATIONS_RATP_DIR)
+            except OSError as e:
+                print(f"  ⚠ Écriture état perturbations impossible: {e}")
+        return results
+    
+    def _day_state(self) -> DisruptionState:
+        """État des perturbations du jour de référence (relu ou reconstruit, cf. load_day_state)"""
+        if self._state is None:
+            self._state = load_day_state(
+                self._reference_day(), self.config.PERTURBATIONS_RATP_DIR,
+                rebuild=getattr(self.config, "PERTURBATIONS_RECONSTRUCTION", False)
+            )
+        return self._state
+    
+    def validate_and_clean(self, data: Union[Dict, List[Dict]]) -> List[Dict]:
         """
         Validation et nettoyage des données disruptions
         
+        Chaque instantané est appliqué à l'état des perturbations du jour de référence :
+        seules les perturbations nouvelles ou modifiées (empreinte du contenu) sont
+        analysées, un instantané déjà intégré est ignoré. Les perturbations retournées
+        sont celles de l'état observées dans un instantané du jour. L'état n'est écrit
+        qu'en fin de process().
+        
         Args:
-            data: Dict avec clé "disruptions"
+            data: Dict avec clé "disruptions" (un instantané) ou liste d'instantanés
+                dans l'ordre chronologique
         
         Returns:
             Liste des disruptions validées
         """
-        disruptions = data.get("disruptions", [])
-        cleaned = []
+        snapshots = data if isinstance(data, list) else [data]
+        state = self._day_state()
+        for snapshot in snapshots:
+            suivi = state.apply_snapshot(
+                snapshot.get("disruptions", []),
+                epoch_minute(self._snapshot_instant(snapshot)),
+                parse=self._parse_disruption
+            )
+            if not suivi.get("ignore"):
+                print(f"  ✓ Perturbations : {suivi['nouvelles']} nouvelle(s), {suivi['modifiees']} modifiée(s), "
+                      f"{suivi['inchangees']} inchangée(s), {suivi['fermees']} fermée(s)")
         
-        for disruption in disruptions:
-            # Valider dates application_periods
-            periods = disruption.get("application_periods", [])
-            valid_periods = []
-            
-            for period in periods:
-                begin_str = period.get("begin", "")
-                end_str = period.get("end", "")
-                
-                begin_date = parse_iso_date(begin_str)
-                end_date = parse_iso_date(end_str)
-                
-                if begin_date and end_date:
-                    valid_periods.append({
-                        "begin": begin_date,
-                        "end": end_date,
-                        "begin_str": begin_str,
-                        "end_str": end_str
-                    })
-            
-            if not valid_periods:
-                continue  # Pas de période valide
-            
-            # Extraire lignes depuis messages
-            lignes_impactees = []
-            messages = disruption.get("messages", [])
-            for msg in messages:
-                text = msg.get("text", "")
-                # Extraction simple (dans un vrai projet, utiliser NLP)
-                if "Ligne" in text:
-                    # Tente d'extraire numéro ligne
-                    matches = re.findall(r'Ligne\s+(\d+)', text)
-                    # Filtrer pour ne garder que les lignes de métro valides (1-14)
-                    lignes_metro = [m for m in matches if m in LIGNES_METRO_VALIDES]
-                    lignes_impactees.extend(lignes_metro)
-            
-            # Vérifier aussi dans la catégorie (ex: "METRO", "BUS", etc.)
-            category = disruption.get("category", "")
-            if category and "METRO" in category.upper():
-                # Essayer d'extraire depuis catégorie si disponible
-                cat_matches = re.findall(r'(\d+)', category)
-                lignes_metro_cat = [m for m in cat_matches if m in LIGNES_METRO_VALIDES]
-                lignes_impactees.extend(lignes_metro_cat)
+        return state.disruptions_for_day(self._reference_day())
+    
+    def _parse_disruption(self, disruption: Dict) -> Optional[Dict]:
+        """
+        Analyse d'une perturbation brute (dates des périodes, lignes impactées)
+        
+        Args:
+            disruption: Perturbation brute de l'API
+        
+        Returns:
+            Perturbation nettoyée, ou None si aucune période valide
+        """
+        # Valider dates application_periods
+        periods = disruption.get("application_periods", [])
+        valid_periods = []
+        
+        for period in periods:
+            begin_str = period.get("begin", "")
+            end_str = period.get("end", "")
             
-            cleaned_disruption = {
-                "id": disruption.get("id", ""),
-                "disruption_id": disruption.get("disruption_id", ""),
-                "status": disruption.get("status", ""),
-                "application_periods": valid_periods,
-                "severity": disruption.get("severity", {}),
-                "priority": disruption.get("severity", {}).get("priority", 0),
-                "lignes_impactees": list(set(lignes_impactees)),  # Déduplication
-                "cause": disruption.get("cause", ""),
-                "category": disruption.get("category", "")
-            }
+            begin_date = parse_iso_date(begin_str)
+            end_date = parse_iso_date(end_str)
             
-            cleaned.append(cleaned_disruption)
+            if begin_date and end_date:
+                valid_periods.append({
+                    "begin": begin_date,
+                    "end": end_date,
+                    "begin_str": begin_str,
+                    "end_str": end_str
+                })
+        
+        if not valid_periods:
+            return None  # Pas de période valide
+        
+        # Extraire les lignes (métro, RER, tramway, bus) des messages, et les lignes de
+        # métro d'une catégorie "METRO" : un seul parcours par texte, mémoïsé
+        extractor = get_line_extractor()
+        codes = set(extractor.extract_category(disruption.get("category", "")))
+        for msg in disruption.get("messages", []):
+            codes.update(extractor.extract(msg.get("text", "")))
         
-        return cleaned
+        return {
+            "id": disruption.get("id", ""),
+            "disruption_id": disruption.get("disruption_id", ""),
+            "status": disruption.get("status", ""),
+            "application_periods": valid_periods,
+            "severity": disruption.get("severity", {}),
+            "priority": disruption.get("severity", {}).get("priority", 0),
+            "lignes_impactees": extractor.labels_of(sorted(codes)),
+            "cause": disruption.get("cause", ""),
+            "category": disruption.get("category", "")
+        }
+    
+    def _snapshot_instant(self, snapshot: Dict) -> datetime:
+        """Instant d'un instantané : context.current_datetime de l'API, sinon partition API_DATE / API_HOUR"""
+        current = parse_iso_date(str(snapshot.get("context", {}).get("current_datetime", "")))
+        if current:
+            return current
+        hour = str(getattr(self.config, "API_HOUR", "00"))
+        return parse_iso_date(f"{getattr(self.config, 'API_DATE', '')}T{hour}:00:00") or datetime.now()
+    
+    def _reference_day(self) -> datetime:
+        """Jour analysé : partition API_DATE des données (défaut: aujourd'hui)"""
+        day = parse_iso_date(str(getattr(self.config, "API_DATE", "")))
+        return day or datetime.now()
     
     def aggregate_daily(self, cleaned_data: List[Dict]) -> Dict[str, Any]:
         """
@@ -101,8 +155,14 @@ class TrafficProcessor(BaseProcessor):
         """
         active_disruptions = []
         disruptions_by_severity = {"CRITIQUE": 0, "ELEVEE": 0, "MOYENNE": 0, "FAIBLE": 0}
-        lignes_impactees_count = {}
+        extractor = get_line_extractor()
+        line_codes: List[np.ndarray] = []
         total_duration_hours = 0.0
+        jour = self._reference_day()
+        period_lignes: List[str] = []
+        period_starts: List[float] = []
+        period_ends: List[float] = []
+        priorite_disponibilite = SEVERITE_RATP[DISPONIBILITE_SEVERITE_MIN]
         
         for disruption in cleaned_data:
             status = disruption.get("status", "")
@@ -120,23 +180,46 @@ class TrafficProcessor(BaseProcessor):
             else:
                 disruptions_by_severity["FAIBLE"] += 1
             
-            # Compter lignes impactées (uniquement métro valides)
-            for ligne in disruption.get("lignes_impactees", []):
-                if ligne in LIGNES_METRO_VALIDES:  # Double vérification
-                    lignes_impactees_count[ligne] = lignes_impactees_count.get(ligne, 0) + 1
+            # Codes des lignes impactées (comptés en fin de boucle), codes 0 à 13 : métro
+            codes = extractor.codes_of(disruption.get("lignes_impactees", []))
+            line_codes.append(codes)
+            lignes_metro = [LIGNES_METRO[code] for code in codes[codes < N_LIGNES_METRO].tolist()]
             
-            # Calculer durée totale
-            for period in disruption.get("application_periods", []):
-                begin = period.get("begin")
-                end = period.get("end")
-                if begin and end:
-                    duration = calculate_time_difference(begin, end)
-                    total_duration_hours += duration
+            # Durée : union des périodes (chevauchements et doublons comptés une fois)
+            periods = disruption.get("application_periods", [])
+            begins = minutes_in_day([period.get("begin") for period in periods], jour)
+            ends = minutes_in_day([period.get("end") for period in periods], jour)
+            disruption["duration_hours"] = covered_length(begins, ends) / 60.0
+            total_duration_hours += disruption["duration_hours"]
+            
+            # Disponibilité : perturbations actives d'une sévérité suffisante seulement
+            if status != "active" or priority < priorite_disponibilite:
+                continue
+            for ligne in lignes_metro:
+                period_lignes.extend([ligne] * len(periods))
+                period_starts.extend(begins.tolist())
+                period_ends.extend(ends.tolist())
+        
+        # Minutes perturbées du jour par ligne : balayage des périodes des perturbations
+        # actives de sévérité >= DISPONIBILITE_SEVERITE_MIN (une période qui chevauche une autre sur la même ligne ne compte qu'une fois)
+        disponibilite = DayIntervalBitmaps.from_periods(
+            LIGNES_METRO, period_lignes, period_starts, period_ends
+        )
+        
+        # Perturbations par ligne : comptage par code, métro valides seulement dans le détail
+        counts = extractor.count(np.concatenate(line_codes) if line_codes else np.zeros(0, dtype=np.int32))
+        lignes_impactees_count = {
+            LIGNES_METRO[code]: int(counts[code]) for code in np.flatnonzero(counts[:N_LIGNES_METRO]).tolist()
+        }
         
         return {
+            "jour": jour.strftime("%Y-%m-%d"),
+            "disponibilite_lignes": disponibilite,
+            "suivi_perturbations": self._day_state().summary(jour),
             "active_disruptions": active_disruptions,
             "disruptions_by_severity": disruptions_by_severity,
             "lignes_impactees_count": lignes_impactees_count,
+            "lignes_impactees_par_mode": extractor.counts_by_mode(counts),
             "total_duration_hours": total_duration_hours,
             "total_disruptions": len(cleaned_data)
         }
@@ -151,38 +234,24 @@ class TrafficProcessor(BaseProcessor):
         Returns:
             Dict avec indicateurs
         """
-        from utils.traffic_calculations import calculate_traffic_reliability_index
-        
         active_count = len(aggregated_data.get("active_disruptions", []))
         total_count = aggregated_data.get("total_disruptions", 0)
         
-        # Indice de fiabilité
-        reliability_index = calculate_traffic_reliability_index(
-            aggregated_data.get("active_disruptions", []),
-            disruption_field="status"
-        )
+        # Indice de fiabilité : disponibilité moyenne des lignes de métro sur la journée (%)
+        disponibilite = aggregated_data.get("disponibilite_lignes") or DayIntervalBitmaps(LIGNES_METRO)
+        reliability_index = round(float(disponibilite.availability().mean()), 2)
         
         # Top lignes impactées (uniquement métro valides)
         lignes_count = aggregated_data.get("lignes_impactees_count", {})
         # Filtrer pour ne garder que les lignes de métro valides
         lignes_metro_count = {l: c for l, c in lignes_count.items() if l in LIGNES_METRO_VALIDES}
-        top_lignes = sorted(
-            lignes_metro_count.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:10]
+        top_lignes = select_top_n(lignes_metro_count.items(), 10, key=lambda x: x[1])
         
         # Alertes (disruptions critiques)
         alerts = []
         for disruption in aggregated_data.get("active_disruptions", []):
             priority = disruption.get("priority", 0)
-            duration = 0.0
-            
-            for period in disruption.get("application_periods", []):
-                begin = period.get("begin")
-                end = period.get("end")
-                if begin and end:
-                    duration += calculate_time_difference(begin, end)
+            duration = disruption.get("duration_hours", 0.0)
             
             # Filtrer les lignes pour ne garder que les métro valides
             lignes_impactees = disruption.get("lignes_impactees", [])
@@ -208,6 +277,13 @@ class TrafficProcessor(BaseProcessor):
             "total_disruptions_count": total_count,
             "top_lignes_impactees": [{"ligne": l, "count": c} for l, c in top_lignes],
             "alerts": alerts,
-            "disruptions_by_severity": aggregated_data.get("disruptions_by_severity", {})
+            "disruptions_by_severity": aggregated_data.get("disruptions_by_severity", {}),
+            "lignes_impactees_par_mode": aggregated_data.get("lignes_impactees_par_mode", {}),
+            "jour": aggregated_data.get("jour"),
+            "disponibilite_lignes": disponibilite.to_dict(),
+            "suivi_perturbations": aggregated_data.get("suivi_perturbations", {}),
+            # Bitmaps à la minute (lignes 1 à 14, 180 octets chacune) pour les agrégats
+            # hebdomadaires : DayIntervalBitmaps.decode(LIGNES_METRO, ...)
+            "minutes_perturbees_lignes": disponibilite.encode()
         }
 
@@ -2,8 +2,10 @@
 Utilitaires d'agrégation : agrégations horaires, par arrondissement, totaux, etc.
 """
 
+import heapq
 from collections import defaultdict
-from typing import List, Dict, Any, Optional
+from itertools import count
+from typing import List, Dict, Any, Optional, Callable, Iterable
 from datetime import datetime
 from .time_utils import parse_iso_date, normalize_hour
 
@@ -334,8 +336,84 @@ def calculate_top_n(data: List[Dict],
         
         data = aggregated
     
-    # Trier par count_field décroissant
-    sorted_data = sorted(data, key=lambda x: x.get(count_field, 0), reverse=True)
+    # Sélection des n plus grands (tas borné, pas de tri complet)
+    return select_top_n(data, n, key=lambda x: x.get(count_field, 0))
+
+
+class TopK:
+    """
+    Sélection exacte des k plus grands éléments en flux (tas borné de taille k)
+    
+    - push/extend : O(log k) par élément, mémoire O(k)
+    - merge : fusion de sélections partielles (chunks, workers)
+    - items : résultat trié par clé décroissante ; à clé égale, l'ordre
+      d'arrivée est conservé (même résultat que sorted(..., reverse=True)[:k])
+    """
     
-    return sorted_data[:n]
+    def __init__(self, k: int, key: Optional[Callable[[Any], Any]] = None):
+        """
+        Args:
+            k: Nombre d'éléments à conserver
+            key: Fonction de clé (défaut: l'élément lui-même)
+        """
+        self.k = max(0, int(k))
+        self.key = key or (lambda x: x)
+        self._heap = []  # Min-tas de (clé, -rang, élément)
+        self._counter = count()
+    
+    def push(self, item: Any) -> None:
+        """Ajoute un élément"""
+        if self.k == 0:
+            return
+        
+        entry = (self.key(item), -next(self._counter), item)
+        
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif entry[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, entry)
+    
+    def extend(self, items: Iterable[Any]) -> "TopK":
+        """Ajoute plusieurs éléments"""
+        for item in items:
+            self.push(item)
+        return self
+    
+    def merge(self, other: "TopK") -> "TopK":
+        """
+        Fusionne une autre sélection (même k et même clé)
+        
+        Args:
+            other: Sélection partielle (autre chunk / worker)
+        
+        Returns:
+            self
+        """
+        for item in other.items():
+            self.push(item)
+        return self
+    
+    def items(self) -> List[Any]:
+        """Retourne les éléments retenus, triés par clé décroissante"""
+        return [entry[2] for entry in sorted(self._heap, key=lambda e: e[:2], reverse=True)]
+    
+    def __len__(self) -> int:
+        return len(self._heap)
+
+
+def select_top_n(data: Iterable[Any],
+                 n: int,
+                 key: Optional[Callable[[Any], Any]] = None) -> List[Any]:
+    """
+    Retourne les n plus grands éléments (O(len × log n), mémoire O(n))
+    
+    Args:
+        data: Éléments (liste ou flux)
+        n: Nombre d'éléments à retourner
+        key: Fonction de clé
+    
+    Returns:
+        Liste des n plus grands éléments, triés par clé décroissante
+    """
+    return TopK(n, key).extend(data).items()
 
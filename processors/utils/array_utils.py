@@ -0,0 +1,21 @@
+"""
+Utilitaires de tableaux NumPy partagés par les états persistants (.npz / .npy)
+"""
+
+from typing import Sequence
+
+import numpy as np
+
+
+def string_array(values: Sequence[str]) -> np.ndarray:
+    """
+    Tableau unicode à largeur fixe (mmap possible, contrairement aux objets)
+
+    Args:
+        values: Chaînes
+
+    Returns:
+        Tableau de dtype U<largeur max> (U1 si vide)
+    """
+    width = max([len(v) for v in values] + [1])
+    return np.asarray(values, dtype=f"U{width}")
@@ -0,0 +1,396 @@
+"""
+Localisation des arrondissements de Paris par point-dans-polygone
+
+Les polygones sont chargés depuis un GeoJSON (config ARRONDISSEMENTS_GEOJSON, propriétés
+c_ar / c_arinsee du jeu "arrondissements" de opendata.paris.fr, cf.
+build_arrondissements_geojson.py). Un fichier absent ou incomplet (moins des 20
+arrondissements) est une erreur : aucune approximation de repli. Une grille uniforme
+est pré-classée au chargement :
+- cellule sans frontière : arrondissement (ou hors Paris) connu directement, sans test
+- cellule traversée par une frontière : seuls les 1–2 polygones concernés sont testés
+
+Les résultats sont mémoïsés par coordonnées arrondies ; locate_many traite des
+tableaux de points en une fois (NumPy).
+"""
+
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import ARRONDISSEMENTS_GEOJSON, ARRONDISSEMENTS_PARIS
+from .spatial_index import UniformGridIndex, bbox_of_coordinates
+
+# États des cellules de la grille (>= 0 : index de l'arrondissement)
+_CELL_OUTSIDE = -1
+_CELL_BOUNDARY = -2
+
+_MISSING = object()
+
+
+def code_from_properties(properties: Dict[str, Any]) -> Optional[str]:
+    """
+    Code postal de l'arrondissement ("75001"...) depuis les propriétés d'une feature
+
+    Accepte c_ar (1-20), c_arinsee (75101-75120) ou un code postal déjà formé.
+    """
+    for key in ("code_postal", "code"):
+        value = str(properties.get(key, "") or "")
+        if value.startswith("750") and len(value) == 5:
+            return value
+
+    c_ar = properties.get("c_ar")
+    if c_ar is None and properties.get("c_arinsee"):
+        c_ar = int(properties["c_arinsee"]) - 75100
+    try:
+        c_ar = int(c_ar)
+    except (TypeError, ValueError):
+        return None
+    return f"750{c_ar:02d}" if 1 <= c_ar <= 20 else None
+
+
+def _polygons_of_geometry(geometry: Dict[str, Any]) -> List[List[np.ndarray]]:
+    """Liste de polygones (anneaux extérieur + trous) d'une géométrie Polygon / MultiPolygon"""
+    geo_type = geometry.get("type")
+    coordinates = geometry.get("coordinates", [])
+    if geo_type == "Polygon":
+        coordinates = [coordinates]
+    elif geo_type != "MultiPolygon":
+        return []
+
+    polygons = []
+    for polygon in coordinates:
+        rings = [np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon if len(ring) >= 3]
+        if rings:
+            polygons.append(rings)
+    return polygons
+
+
+def _ring_edges(rings: List[np.ndarray]) -> np.ndarray:
+    """Arêtes non horizontales de tous les anneaux : tableau (n, 4) x1, y1, x2, y2"""
+    edges = np.concatenate([np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings])
+    return edges[edges[:, 1] != edges[:, 3]]
+
+
+def _edges_contain(edges: np.ndarray, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """
+    Test point-dans-polygone vectorisé (ray casting, trous compris par parité)
+
+    Args:
+        edges: Arêtes (n, 4) du polygone
+        lons, lats: Points à tester
+
+    Returns:
+        Tableau booléen (un par point)
+    """
+    inside = np.zeros(lons.shape, dtype=bool)
+    for xi, yi, xj, yj in edges:
+        crosses = (yi > lats) != (yj > lats)
+        x_cross = (xj - xi) * (lats - yi) / (yj - yi) + xi
+        inside ^= crosses & (lons < x_cross)
+    return inside
+
+
+def _edges_contain_point(edges: np.ndarray, lon: float, lat: float) -> bool:
+    """Test point-dans-polygone pour un seul point (ray casting sur les arêtes, sans copie)"""
+    yi, yj = edges[:, 1], edges[:, 3]
+    crossing = edges[(yi > lat) != (yj > lat)]
+    if not len(crossing):
+        return False
+    xi, yi, xj, yj = crossing.T
+    return bool(np.count_nonzero(lon < (xj - xi) * (lat - yi) / (yj - yi) + xi) % 2)
+
+
+class ArrondissementLocator:
+    """Moteur de localisation point → arrondissement (grille pré-classée + cache)"""
+
+    def __init__(self, geojson_path: Any = None,
+                 cell_size: float = 0.001,
+                 cache_precision: int = 5,
+                 cache_size: int = 200000):
+        """
+        Args:
+            geojson_path: Fichier GeoJSON des arrondissements (défaut: config)
+            cell_size: Taille des cellules de la grille en degrés (~75 × 110 m)
+            cache_precision: Décimales des coordonnées pour le cache (5 ≈ 1 m)
+            cache_size: Nombre maximal d'entrées en cache
+        """
+        self.geojson_path = Path(geojson_path or ARRONDISSEMENTS_GEOJSON)
+        self.cache_precision = cache_precision
+        self.cache_size = cache_size
+        self._cache: Dict[Tuple[float, float], Optional[str]] = {}
+
+        self.codes: List[str] = []
+        self.polygons: List[Tuple[int, List[np.ndarray]]] = []  # (index code, anneaux)
+        self._edges: List[np.ndarray] = []  # Arêtes par polygone
+        self._load()
+        self._build_grid(cell_size)
+
+    def _load(self) -> None:
+        """
+        Charge les polygones du GeoJSON
+
+        Raises:
+            FileNotFoundError: Fichier absent
+            ValueError: GeoJSON illisible ou arrondissement sans polygone
+        """
+        if not self.geojson_path.exists():
+            raise FileNotFoundError(
+                f"Polygones des arrondissements introuvables: {self.geojson_path} "
+                f"(générer le fichier avec build_arrondissements_geojson.py)"
+            )
+        with open(self.geojson_path, "r", encoding="utf-8") as f:
+            collection = json.load(f)
+
+        code_index: Dict[str, int] = {}
+        for feature in collection.get("features", []):
+            code = code_from_properties(feature.get("properties") or {})
+            if code is None:
+                continue
+            if code not in code_index:
+                code_index[code] = len(self.codes)
+                self.codes.append(code)
+            for rings in _polygons_of_geometry(feature.get("geometry") or {}):
+                self.polygons.append((code_index[code], rings))
+                edges = _ring_edges(rings)
+                self._edges.append(edges)
+
+        covered = {self.codes[code] for code, _ in self.polygons}
+        missing = sorted(set(ARRONDISSEMENTS_PARIS) - covered)
+        if missing:
+            raise ValueError(f"Arrondissements sans polygone dans {self.geojson_path}: {', '.join(missing)}")
+
+    def _build_grid(self, cell_size: float) -> None:
+        """Pré-classe chaque cellule : intérieure, extérieure ou frontière (+ candidats)"""
+        bboxes = [(i, bbox_of_coordinates(rings[0])) for i, (_, rings) in enumerate(self.polygons)]
+        self._bbox_index = UniformGridIndex.build(bboxes, cell_size, margin=cell_size)
+        grid = self._bbox_index
+
+        # Cellules traversées par les arêtes de chaque polygone
+        candidates: Dict[int, List[int]] = {}
+        self._polygon_cells: List[np.ndarray] = []
+        for poly_idx, (_, rings) in enumerate(self.polygons):
+            cells = set()
+            for ring in rings:
+                for (x1, y1), (x2, y2) in zip(ring, np.roll(ring, -1, axis=0)):
+                    edge_bbox = (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+                    cells.update(grid.cells_for_bbox(edge_bbox))
+            for cell in cells:
+                candidates.setdefault(cell, []).append(poly_idx)
+            self._polygon_cells.append(np.fromiter(sorted(cells), dtype=np.int64, count=len(cells)))
+
+        n_cells = grid.n_rows * grid.n_cols
+        self._cell_state = np.full(n_cells, _CELL_OUTSIDE, dtype=np.int32)
+        self._cell_candidates = candidates
+
+        # Cellules sans frontière : un seul test au centre suffit pour toute la cellule
+        for cell in range(n_cells):
+            if cell in candidates:
+                self._cell_state[cell] = _CELL_BOUNDARY
+                continue
+            min_lon, min_lat, max_lon, max_lat = grid.cell_bbox(cell)
+            center_lon, center_lat = (min_lon + max_lon) / 2.0, (min_lat + max_lat) / 2.0
+            for poly_idx in grid.query_point(center_lon, center_lat):
+                if self._polygon_contains(poly_idx, center_lon, center_lat):
+                    self._cell_state[cell] = self.polygons[poly_idx][0]
+                    break
+
+    def to_arrays(self) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+        """
+        État pré-calculé du moteur en tableaux (publication en mémoire partagée)
+
+        Returns:
+            Tuple (tableaux, métadonnées) pour from_arrays
+        """
+        bboxes = np.asarray([bbox_of_coordinates(rings[0]) for _, rings in self.polygons],
+                            dtype=np.float64).reshape(-1, 4)
+        arrays = {
+            "codes": np.asarray(self.codes, dtype="U5"),
+            "polygon_codes": np.asarray([code for code, _ in self.polygons], dtype=np.int32),
+            "polygon_bboxes": bboxes,
+            "edge_offsets": np.concatenate(
+                [[0], np.cumsum([len(edges) for edges in self._edges])]
+            ).astype(np.int64),
+            "edges": np.concatenate(self._edges) if self._edges else np.zeros((0, 4)),
+            "cell_state": self._cell_state,
+            "cell_offsets": np.concatenate(
+                [[0], np.cumsum([len(cells) for cells in self._polygon_cells])]
+            ).astype(np.int64),
+            "cells": np.concatenate(self._polygon_cells) if self._polygon_cells else np.zeros(0, dtype=np.int64)
+        }
+        meta = {
+            "geojson_path": str(self.geojson_path),
+            "cell_size": self._bbox_index.cell_size,
+            "cache_precision": self.cache_precision,
+            "cache_size": self.cache_size
+        }
+        return arrays, meta
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> "ArrondissementLocator":
+        """
+        Moteur reconstruit depuis to_arrays sans relire le GeoJSON ni reclasser la grille
+        (les tableaux sont utilisés tels quels, en lecture seule)
+
+        Args:
+            arrays: Tableaux publiés
+            meta: Métadonnées publiées
+
+        Returns:
+            ArrondissementLocator
+        """
+        locator = cls.__new__(cls)
+        locator.geojson_path = Path(meta["geojson_path"])
+        locator.cache_precision = meta["cache_precision"]
+        locator.cache_size = meta["cache_size"]
+        locator._cache = {}
+        locator.codes = [str(code) for code in arrays["codes"].tolist()]
+
+        edge_offsets = arrays["edge_offsets"].tolist()
+        cell_offsets = arrays["cell_offsets"].tolist()
+        polygon_codes = arrays["polygon_codes"].tolist()
+        locator.polygons = [(code, []) for code in polygon_codes]  # Anneaux non republiés
+        locator._edges = [arrays["edges"][start:end] for start, end in zip(edge_offsets, edge_offsets[1:])]
+        locator._polygon_cells = [arrays["cells"][start:end] for start, end in zip(cell_offsets, cell_offsets[1:])]
+
+        bboxes = [(i, tuple(bbox)) for i, bbox in enumerate(arrays["polygon_bboxes"].tolist())]
+        locator._bbox_index = UniformGridIndex.build(bboxes, meta["cell_size"], margin=meta["cell_size"])
+        locator._cell_state = arrays["cell_state"]
+        locator._cell_candidates = {}
+        for poly_idx, cells in enumerate(locator._polygon_cells):
+            for cell in cells.tolist():
+                locator._cell_candidates.setdefault(cell, []).append(poly_idx)
+        return locator
+
+    def _polygon_contains(self, poly_idx: int, lon: float, lat: float) -> bool:
+        """Test point-dans-polygone pour un point"""
+        return _edges_contain_point(self._edges[poly_idx], lon, lat)
+
+    def _locate_uncached(self, lon: float, lat: float) -> Optional[str]:
+        """Localise un point sans passer par le cache"""
+        cell = self._bbox_index.cell_id(lon, lat)
+        if cell is None:
+            return None
+
+        state = self._cell_state[cell]
+        if state >= 0:
+            return self.codes[state]
+        if state == _CELL_OUTSIDE:
+            return None
+
+        tested = self._cell_candidates.get(cell, [])
+        for poly_idx in tested:
+            if self._polygon_contains(poly_idx, lon, lat):
+                return self.codes[self.polygons[poly_idx][0]]
+
+        # Sécurité : polygone recouvrant la cellule sans y avoir d'arête
+        for poly_idx in self._bbox_index.query_point(lon, lat):
+            if poly_idx not in tested and self._polygon_contains(poly_idx, lon, lat):
+                return self.codes[self.polygons[poly_idx][0]]
+        return None
+
+    def locate(self, lon: float, lat: float) -> Optional[str]:
+        """
+        Arrondissement contenant un point (mémoïsé)
+
+        Args:
+            lon: Longitude
+            lat: Latitude
+
+        Returns:
+            Code postal ("75001"...) ou None hors Paris
+        """
+        key = (round(lon, self.cache_precision), round(lat, self.cache_precision))
+        code = self._cache.get(key, _MISSING)
+        if code is _MISSING:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            code = self._cache[key] = self._locate_uncached(lon, lat)
+        return code
+
+    def locate_indices(self, lons: Sequence[float], lats: Sequence[float]) -> np.ndarray:
+        """
+        Localisation vectorisée d'un tableau de points
+
+        Returns:
+            Tableau int16 d'index dans self.codes (-1 hors Paris)
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        cells = self._bbox_index.cell_ids(lons, lats)
+        states = np.where(cells >= 0, self._cell_state[np.maximum(cells, 0)], _CELL_OUTSIDE)
+        result = np.where(states >= 0, states, -1).astype(np.int16)
+
+        boundary = np.nonzero(states == _CELL_BOUNDARY)[0]
+        if boundary.size == 0:
+            return result
+
+        # Points des cellules frontière : un test vectorisé par polygone candidat
+        boundary_cells = cells[boundary]
+        unresolved = np.ones(boundary.size, dtype=bool)
+        for poly_idx, poly_cells in enumerate(self._polygon_cells):
+            selected = np.nonzero(unresolved & np.isin(boundary_cells, poly_cells))[0]
+            if selected.size == 0:
+                continue
+            points = boundary[selected]
+            inside = _edges_contain(self._edges[poly_idx], lons[points], lats[points])
+            result[points[inside]] = self.polygons[poly_idx][0]
+            unresolved[selected[inside]] = False
+
+        return result
+
+    def locate_many(self, lons: Sequence[float], lats: Sequence[float]) -> List[Optional[str]]:
+        """
+        Localisation vectorisée : codes postaux (None hors Paris)
+
+        Args:
+            lons: Longitudes
+            lats: Latitudes
+
+        Returns:
+            Liste de codes, un par point
+        """
+        indices = self.locate_indices(lons, lats)
+        return [self.codes[i] if i >= 0 else None for i in indices.tolist()]
+
+
+_default_locator: Any = None
+
+
+def get_default_locator() -> ArrondissementLocator:
+    """
+    Moteur partagé, chargé au premier appel depuis ARRONDISSEMENTS_GEOJSON
+
+    Returns:
+        ArrondissementLocator
+
+    Raises:
+        FileNotFoundError: GeoJSON absent
+        ValueError: GeoJSON illisible ou incomplet
+    """
+    global _default_locator
+    if _default_locator is None:
+        _default_locator = ArrondissementLocator()
+    return _default_locator
+
+
+def set_default_locator(locator: Optional[ArrondissementLocator]) -> None:
+    """
+    Remplace le moteur partagé du processus (workers : moteur en mémoire partagée ;
+    None : rechargement depuis le GeoJSON au prochain appel)
+    """
+    global _default_locator
+    _default_locator = locator
+
+
+def locate_arrondissement(lon: float, lat: float) -> Optional[str]:
+    """Arrondissement d'un point via le moteur partagé (None hors Paris)"""
+    return get_default_locator().locate(lon, lat)
+
+
+def locate_arrondissements(lons: Sequence[float], lats: Sequence[float]) -> List[Optional[str]]:
+    """Arrondissements d'un tableau de points via le moteur partagé"""
+    return get_default_locator().locate_many(lons, lats)
@@ -0,0 +1,366 @@
+"""
+Références historiques compactes par (entité, type de jour, heure)
+
+Pour chaque entité (compteur vélo, tronçon) et chaque type de jour (Lundi à Vendredi,
+Weekend, Férié), 24 créneaux horaires plus un créneau journée conservent le nombre
+d'observations, la moyenne et la somme des carrés des écarts (algorithme de Welford)
+ainsi qu'une moyenne mobile exponentielle (EWMA). Les journées des 14 derniers jours
+sont aussi gardées (tampon circulaire) pour la comparaison à J-7, y compris lorsqu'une
+journée est rejouée.
+
+La mise à jour est en O(1) par observation, en fin d'exécution quotidienne ; les
+z-scores et les écarts à la semaine précédente se lisent directement dans ces
+tableaux, sans relire les métriques des semaines passées.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import (
+    REFERENCE_EWMA_ALPHA, REFERENCE_OBSERVATIONS_MIN, REFERENCE_ZSCORE_SEUIL,
+    VARIATION_ANOMALIE_POURCENT
+)
+from .hourly_matrix import HOURS_PER_DAY, epoch_hours_of_day
+from .array_utils import string_array
+from .calendar_dimension import TYPES_JOUR, epoch_day, get_calendar
+
+CRENEAU_JOUR = HOURS_PER_DAY  # Créneau des totaux journaliers
+_SLOTS = HOURS_PER_DAY + 1
+_DAYS_PER_WEEK = 7
+_RING_DAYS = 2 * _DAYS_PER_WEEK  # Tampon circulaire des dernières journées
+
+_COLUMNS = ("ids", "nombre", "moyenne", "m2", "ewma", "semaine", "semaine_jour", "derniere_journee")
+
+
+def day_slots(day: str) -> Dict[str, int]:
+    """
+    Indices d'une journée dans les références
+
+    Args:
+        day: Date (YYYY-MM-DD)
+
+    Returns:
+        Dict {"type_jour": index dans TYPES_JOUR, "jour": jours depuis 1970-01-01}
+    """
+    return {
+        "type_jour": get_calendar().day_info(day)["type_jour"],
+        "jour": epoch_day(day)
+    }
+
+
+class BaselineStore:
+    """
+    Statistiques historiques triées par identifiant d'entité
+
+    Attributes:
+        ids: Identifiants (triés)
+        nombre: Observations par (entité, type de jour, créneau) (n, 7, 25)
+        moyenne, m2: Moyenne et somme des carrés des écarts (Welford)
+        ewma: Moyenne mobile exponentielle
+        semaine: Valeurs des 14 derniers jours, case jour % 14 (n, 14, 25)
+        semaine_jour: Jour (depuis 1970-01-01) de chaque case (n, 14), -1 si aucun
+        derniere_journee: Dernier jour intégré par entité (journées rejouées ignorées)
+    """
+
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None):
+        columns = columns or {}
+        shape = (0, len(TYPES_JOUR), _SLOTS)
+        self.ids = columns.get("ids", string_array([]))
+        self.nombre = columns.get("nombre", np.zeros(shape, dtype=np.int32))
+        self.moyenne = columns.get("moyenne", np.zeros(shape))
+        self.m2 = columns.get("m2", np.zeros(shape))
+        self.ewma = columns.get("ewma", np.zeros(shape, dtype=np.float32))
+        self.semaine = columns.get("semaine", np.full((0, _RING_DAYS, _SLOTS), np.nan, dtype=np.float32))
+        self.semaine_jour = columns.get("semaine_jour", np.zeros((0, _RING_DAYS), dtype=np.int32))
+        self.derniere_journee = columns.get("derniere_journee", np.zeros(0, dtype=np.int32))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self, path: Path) -> None:
+        """Écrit les références (.npz, remplacement atomique)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, **{name: getattr(self, name) for name in _COLUMNS})
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "BaselineStore":
+        """Relit les références (vides si absentes ou illisibles)"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls({name: data[name] for name in _COLUMNS})
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Références historiques illisibles ({path}): {e}")
+            return cls()
+
+    def lookup_many(self, entity_ids: Sequence[str]) -> np.ndarray:
+        """Positions des entités (-1 si absente)"""
+        if len(self.ids) == 0 or len(entity_ids) == 0:
+            return np.full(len(entity_ids), -1, dtype=np.int64)
+        queries = string_array([str(entity_id) for entity_id in entity_ids])
+        positions = np.minimum(np.searchsorted(self.ids, queries), len(self.ids) - 1)
+        return np.where(self.ids[positions] == queries, positions, -1).astype(np.int64)
+
+    def _insert(self, new_ids: np.ndarray) -> None:
+        """Ajoute des entités sans historique"""
+        n = len(new_ids)
+        added = {
+            "ids": new_ids,
+            "nombre": np.zeros((n, len(TYPES_JOUR), _SLOTS), dtype=np.int32),
+            "moyenne": np.zeros((n, len(TYPES_JOUR), _SLOTS)),
+            "m2": np.zeros((n, len(TYPES_JOUR), _SLOTS)),
+            "ewma": np.zeros((n, len(TYPES_JOUR), _SLOTS), dtype=np.float32),
+            "semaine": np.full((n, _RING_DAYS, _SLOTS), np.nan, dtype=np.float32),
+            "semaine_jour": np.full((n, _RING_DAYS), -1, dtype=np.int32),
+            "derniere_journee": np.full(n, -1, dtype=np.int32)
+        }
+        merged = {name: np.concatenate([getattr(self, name), added[name]]) for name in _COLUMNS}
+        order = np.argsort(merged["ids"], kind="stable")
+        for name in _COLUMNS:
+            setattr(self, name, merged[name][order])
+
+    @staticmethod
+    def _observations(hourly: np.ndarray, totals: Sequence[float]) -> np.ndarray:
+        """Profils horaires (n, 24) + totaux journaliers → observations (n, 25)"""
+        hourly = np.asarray(hourly, dtype=np.float64).reshape(-1, HOURS_PER_DAY)
+        return np.column_stack([hourly, np.asarray(totals, dtype=np.float64)])
+
+    def compare(self, entity_ids: Sequence[str], day: str, hourly: np.ndarray,
+                totals: Sequence[float]) -> Dict[str, np.ndarray]:
+        """
+        Compare une journée aux références (à appeler avant update)
+
+        Args:
+            entity_ids: Entités
+            day: Date de la journée (YYYY-MM-DD)
+            hourly: Valeurs horaires (n, 24), NaN si absentes
+            totals: Totaux journaliers (n,)
+
+        Returns:
+            Dict de tableaux (NaN si référence insuffisante) :
+            "zscore" (n, 25), "moyenne" / "ewma" (n, 25) de même type de jour,
+            "semaine_precedente" (n, 25) valeurs du même jour à J-7,
+            "anomalie" (n,) total journalier anormal, "anomalie_horaire" (n, 24)
+        """
+        slots = day_slots(day)
+        values = self._observations(hourly, totals)
+        positions = self.lookup_many(entity_ids)
+        known = positions >= 0
+        rows = positions[known]
+        n = len(positions)
+
+        count = np.zeros((n, _SLOTS), dtype=np.int64)
+        moyenne = np.full((n, _SLOTS), np.nan)
+        m2 = np.zeros((n, _SLOTS))
+        ewma = np.full((n, _SLOTS), np.nan)
+        previous = np.full((n, _SLOTS), np.nan)
+        count[known] = self.nombre[rows, slots["type_jour"]]
+        seen = count > 0
+        moyenne[known] = self.moyenne[rows, slots["type_jour"]]
+        m2[known] = self.m2[rows, slots["type_jour"]]
+        ewma[known] = self.ewma[rows, slots["type_jour"]]
+        moyenne[~seen] = np.nan
+        ewma[~seen] = np.nan
+        week_before = slots["jour"] - _DAYS_PER_WEEK
+        last_week = self.semaine_jour[rows, week_before % _RING_DAYS] == week_before
+        previous[np.flatnonzero(known)[last_week]] = self.semaine[rows[last_week], week_before % _RING_DAYS]
+
+        # z-score : variance non biaisée sur au moins REFERENCE_OBSERVATIONS_MIN jours
+        std = np.sqrt(np.where(count > 1, m2 / np.maximum(count - 1, 1), 0.0))
+        scored = (count >= REFERENCE_OBSERVATIONS_MIN) & (std > 0) & ~np.isnan(values)
+        zscore = np.full((n, _SLOTS), np.nan)
+        zscore[scored] = (values[scored] - moyenne[scored]) / std[scored]
+        outlier = np.abs(np.nan_to_num(zscore)) > REFERENCE_ZSCORE_SEUIL
+
+        # Variation relative (cf. detect_anomalies) dès la première observation
+        with np.errstate(divide="ignore", invalid="ignore"):
+            variation = np.abs(values - moyenne) / moyenne * 100.0
+        outlier |= seen & (moyenne > 0) & (np.nan_to_num(variation) > VARIATION_ANOMALIE_POURCENT)
+
+        return {
+            "zscore": zscore,
+            "moyenne": moyenne,
+            "ewma": ewma,
+            "semaine_precedente": previous,
+            "anomalie": outlier[:, CRENEAU_JOUR],
+            "anomalie_horaire": outlier[:, :HOURS_PER_DAY]
+        }
+
+    def update(self, entity_ids: Sequence[str], day: str, hourly: np.ndarray,
+               totals: Sequence[float]) -> int:
+        """
+        Intègre une journée (mise à jour O(1) par observation ; valeurs NaN ignorées,
+        journée déjà intégrée pour une entité ignorée)
+
+        Une journée antérieure à la dernière intégrée (arrivée en retard) est encore prise
+        en compte tant qu'elle reste dans le tampon des 14 derniers jours : elle y est
+        écrite et compte dans les moyennes / variances (Welford, indépendant de l'ordre),
+        mais pas dans l'EWMA, qui suit l'ordre chronologique. Plus ancienne, elle est
+        ignorée (entités comptées et signalées).
+
+        Args:
+            entity_ids: Entités (distinctes)
+            day: Date de la journée (YYYY-MM-DD)
+            hourly: Valeurs horaires (n, 24), NaN si absentes
+            totals: Totaux journaliers (n,)
+
+        Returns:
+            Nombre d'entités mises à jour
+        """
+        slots = day_slots(day)
+        values = self._observations(hourly, totals)
+        positions = self.lookup_many(entity_ids)
+        if (positions < 0).any():
+            self._insert(np.unique(string_array([str(entity_id) for entity_id in entity_ids])[positions < 0]))
+            positions = self.lookup_many(entity_ids)
+
+        ring = slots["jour"] % _RING_DAYS
+        derniere = self.derniere_journee[positions]
+        fresh = derniere < slots["jour"]
+        # Journée en retard : dans la fenêtre du tampon et pas encore écrite dans son créneau
+        late = (~fresh & (derniere - slots["jour"] < _RING_DAYS)
+                & (self.semaine_jour[positions, ring] != slots["jour"]))
+        too_old = int((derniere - slots["jour"] >= _RING_DAYS).sum())
+        if too_old:
+            print(f"  ⚠ Références : journée {day} hors fenêtre de {_RING_DAYS} jours ignorée "
+                  f"pour {too_old} entité(s)")
+        integrated = fresh | late
+        rows, values, fresh = positions[integrated], values[integrated], fresh[integrated]
+        day_type = slots["type_jour"]
+
+        # Welford et EWMA sur les créneaux observés
+        observed = ~np.isnan(values)
+        count = self.nombre[rows, day_type] + observed
+        moyenne = self.moyenne[rows, day_type]
+        x = np.where(observed, values, moyenne)
+        delta = x - moyenne
+        moyenne = moyenne + np.where(observed, delta / np.maximum(count, 1), 0.0)
+        self.m2[rows, day_type] += np.where(observed, delta * (x - moyenne), 0.0)
+        self.moyenne[rows, day_type] = moyenne
+        ewma = self.ewma[rows, day_type]
+        self.ewma[rows, day_type] = np.where(
+            observed & (fresh[:, None] | (count == 1)),
+            np.where(count == 1, x, REFERENCE_EWMA_ALPHA * x + (1.0 - REFERENCE_EWMA_ALPHA) * ewma), ewma
+        )
+        self.nombre[rows, day_type] = count
+
+        self.semaine[rows, ring] = values
+        self.semaine_jour[rows, ring] = slots["jour"]
+        self.derniere_journee[rows] = np.maximum(self.derniere_journee[rows], slots["jour"])
+        return int(len(rows))
+
+
+def _rounded(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def comparison_entry(comparison: Dict[str, np.ndarray], row: int) -> Dict[str, Any]:
+    """
+    Comparaison d'une entité à ses références (format publié)
+
+    Args:
+        comparison: Résultat de BaselineStore.compare
+        row: Ligne de l'entité
+
+    Returns:
+        Dict {"zscore_jour", "moyenne_reference", "ewma_reference",
+              "total_semaine_precedente", "heures_anormales"} (None si inconnu)
+    """
+    return {
+        "zscore_jour": _rounded(comparison["zscore"][row, CRENEAU_JOUR]),
+        "moyenne_reference": _rounded(comparison["moyenne"][row, CRENEAU_JOUR], 1),
+        "ewma_reference": _rounded(comparison["ewma"][row, CRENEAU_JOUR], 1),
+        "total_semaine_precedente": _rounded(comparison["semaine_precedente"][row, CRENEAU_JOUR], 1),
+        "heures_anormales": np.flatnonzero(comparison["anomalie_horaire"][row]).tolist()
+    }
+
+
+def week_over_week(totals: Sequence[float], previous: Sequence[float]) -> Dict[str, Any]:
+    """
+    Évolution d'un total par rapport au même jour de la semaine précédente, sur les
+    entités présentes les deux jours
+
+    Args:
+        totals: Totaux du jour par entité
+        previous: Totaux à J-7 (NaN si inconnus)
+
+    Returns:
+        Dict {"entites_comparees", "total_jour", "total_semaine_precedente",
+              "variation_pourcent" (None si non comparable)}
+    """
+    totals = np.asarray(totals, dtype=np.float64)
+    previous = np.asarray(previous, dtype=np.float64)
+    both = ~np.isnan(previous) & ~np.isnan(totals)
+    current_total = float(totals[both].sum())
+    previous_total = float(previous[both].sum())
+    return {
+        "entites_comparees": int(both.sum()),
+        "total_jour": round(current_total, 1),
+        "total_semaine_precedente": round(previous_total, 1),
+        "variation_pourcent": (round((current_total - previous_total) / previous_total * 100.0, 1)
+                               if previous_total > 0 else None)
+    }
+
+
+def reference_profile(day: str, hourly: np.ndarray, comparison: Dict[str, np.ndarray],
+                      epoch_hours: Optional[Sequence[int]] = None) -> Dict[str, Any]:
+    """
+    Profil horaire agrégé observé / attendu (moyenne de référence du même type de jour)
+    sur les cellules (entité, heure) ayant une référence, indexé par heures absolues
+
+    Args:
+        day: Date de la journée (YYYY-MM-DD)
+        hourly: Valeurs horaires (n, 24), NaN si absentes
+        comparison: Résultat de BaselineStore.compare sur ces entités
+        epoch_hours: Heures absolues des 24 colonnes (défaut: heures locales Europe/Paris,
+            cf. matrix_epoch_hours pour des horodatages dans un autre fuseau)
+
+    Returns:
+        Dict {"jour", "heures_epoch", "total", "observe", "attendu"} (listes de 24 valeurs ;
+        "observe" / "attendu" à None pour une heure sans référence)
+    """
+    if epoch_hours is None:
+        epoch_hours = epoch_hours_of_day(day)
+    hourly = np.asarray(hourly, dtype=np.float64).reshape(-1, HOURS_PER_DAY)
+    expected = comparison["moyenne"][:, :HOURS_PER_DAY]
+    measured = ~np.isnan(hourly)
+    both = measured & ~np.isnan(expected)
+    covered = both.any(axis=0)
+    observe = np.where(both, hourly, 0.0).sum(axis=0)
+    attendu = np.where(both, expected, 0.0).sum(axis=0)
+    return {
+        "jour": day,
+        "heures_epoch": [int(h) for h in epoch_hours],
+        "total": [round(float(v), 1) for v in np.where(measured, hourly, 0.0).sum(axis=0)],
+        "observe": [round(float(v), 1) if c else None for v, c in zip(observe, covered)],
+        "attendu": [round(float(v), 1) if c else None for v, c in zip(attendu, covered)]
+    }
+
+
+_stores: Dict[str, BaselineStore] = {}
+
+
+def get_baseline_store(path: Path, refresh: bool = False) -> BaselineStore:
+    """
+    Références historiques du processus (chargées une fois par fichier)
+
+    Args:
+        path: Fichier des références (.npz)
+        refresh: Relire le fichier
+
+    Returns:
+        BaselineStore (vide si jamais écrit)
+    """
+    key = str(path)
+    if refresh or key not in _stores:
+        _stores[key] = BaselineStore.load(path)
+    return _stores[key]
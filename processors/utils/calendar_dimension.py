@@ -0,0 +1,343 @@
+"""
+Dimension calendrier précalculée (type de jour, fériés, vacances scolaires)
+
+Chaque jour de CALENDRIER_ANNEE_DEBUT à CALENDRIER_ANNEE_FIN est décrit une fois pour
+toutes dans des colonnes NumPy indexées par jour depuis 1970-01-01 : jour de la semaine,
+type de jour (cf. TYPES_JOUR), férié, vacances scolaires (VACANCES_SCOLAIRES_CSV) et
+numéro de semaine ISO. Hors des périodes couvertes par le fichier des vacances, le
+statut de vacances est inconnu (None, avec avertissement) plutôt que faux. La table est mise en cache (CALENDRIER_CACHE_PATH, reconstruite
+si les années, la source des fériés ou le fichier des vacances changent) : une
+recherche est un accès direct au tableau, scalaire ou vectorisé, sans construire
+d'objet holidays.France() par appel.
+"""
+
+import csv
+import hashlib
+import sys
+from datetime import date as date_type, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import (
+    CALENDRIER_ANNEE_DEBUT, CALENDRIER_ANNEE_FIN, CALENDRIER_CACHE_PATH, VACANCES_SCOLAIRES_CSV
+)
+
+try:
+    import holidays
+except ImportError:
+    holidays = None
+
+TYPES_JOUR = ("Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Weekend", "Férié")
+TYPE_WEEKEND = TYPES_JOUR.index("Weekend")
+TYPE_FERIE = TYPES_JOUR.index("Férié")
+
+_COLUMNS = ("jour_semaine", "type_jour", "ferie", "vacances", "semaine")
+
+DateLike = Union[datetime, date_type, str, int, np.datetime64]
+
+
+def epoch_day(value: DateLike) -> int:
+    """
+    Jour depuis 1970-01-01 d'une date (datetime : date locale, chaîne : "YYYY-MM-DD...")
+
+    Args:
+        value: datetime, date, chaîne ISO, numpy datetime64 ou entier (déjà un jour)
+
+    Returns:
+        Jour (entier)
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date_type):
+        return value.toordinal() - date_type(1970, 1, 1).toordinal()
+    if isinstance(value, np.datetime64):
+        return int(value.astype("datetime64[D]").astype(np.int64))
+    return int(np.datetime64(str(value)[:10], "D").astype(np.int64))
+
+
+def _year(day: int) -> int:
+    """Année d'un jour depuis 1970-01-01"""
+    return int(np.datetime64(day, "D").astype("datetime64[Y]").astype(np.int64)) + 1970
+
+
+def _easter(year: int) -> date_type:
+    """Dimanche de Pâques (calendrier grégorien, algorithme de Meeus / Jones / Butcher)"""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    day = (h + l - 7 * m + 33 * month + 19) % 32
+    return date_type(year, month, day)
+
+
+def french_holidays(years: Sequence[int]) -> Tuple[List[date_type], str]:
+    """
+    Jours fériés nationaux (bibliothèque holidays si disponible, sinon calcul direct)
+
+    Args:
+        years: Années
+
+    Returns:
+        Tuple (dates, source : "holidays" ou "calcul")
+    """
+    if holidays:
+        try:
+            return sorted(holidays.France(years=list(years)).keys()), "holidays"
+        except Exception:
+            pass
+
+    days = []
+    for year in years:
+        easter = _easter(year)
+        days += [date_type(year, month, day) for month, day in
+                 ((1, 1), (5, 1), (5, 8), (7, 14), (8, 15), (11, 1), (11, 11), (12, 25))]
+        days += [easter + timedelta(days=offset) for offset in (1, 39, 50)]  # Lundi de Pâques, Ascension, Pentecôte
+    return sorted(days), "calcul"
+
+
+def load_school_holidays(path: Path = VACANCES_SCOLAIRES_CSV) -> np.ndarray:
+    """
+    Périodes de vacances scolaires (CSV ";" avec start_date / end_date, fin exclue)
+
+    Args:
+        path: Fichier des périodes
+
+    Returns:
+        Tableau (n, 2) de jours [début, fin[ (vide si fichier absent ou illisible)
+    """
+    periods = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for row in csv.DictReader(f, delimiter=";"):
+                try:
+                    periods.append((epoch_day(row["start_date"]), epoch_day(row["end_date"])))
+                except (KeyError, TypeError, ValueError):
+                    continue
+    except OSError as e:
+        print(f"⚠ Vacances scolaires indisponibles ({path}): {e}")
+    return np.asarray(periods, dtype=np.int64).reshape(-1, 2)
+
+
+class CalendarDimension:
+    """
+    Colonnes calendrier d'une plage continue de jours
+
+    Attributes:
+        premier_jour: Premier jour couvert (depuis 1970-01-01)
+        jour_semaine: 0 (lundi) à 6 (int8)
+        type_jour: Index dans TYPES_JOUR (int8)
+        ferie, vacances: Jour férié, vacances scolaires (bool)
+        semaine: Numéro de semaine ISO (int8)
+        vacances_periodes: Périodes [début, fin[ des vacances (pour étendre la plage)
+        vacances_couverture: Jours [début, fin[ couverts par le fichier des vacances
+    """
+
+    def __init__(self, premier_jour: int, columns: Dict[str, np.ndarray],
+                 vacances_periodes: Optional[np.ndarray] = None):
+        self.premier_jour = int(premier_jour)
+        for name in _COLUMNS:
+            setattr(self, name, columns[name])
+        self._set_periods(vacances_periodes)
+        self._hors_couverture_signale = False
+
+    def __len__(self) -> int:
+        return len(self.type_jour)
+
+    def _set_periods(self, vacances_periodes: Optional[np.ndarray]) -> None:
+        self.vacances_periodes = (np.zeros((0, 2), dtype=np.int64) if vacances_periodes is None
+                                  else vacances_periodes)
+        if len(self.vacances_periodes):
+            self.vacances_couverture = (int(self.vacances_periodes[:, 0].min()),
+                                        int(self.vacances_periodes[:, 1].max()))
+        else:
+            self.vacances_couverture = (0, 0)
+
+    def _covered(self, days: np.ndarray) -> np.ndarray:
+        """Jours dont le statut de vacances est connu (avertissement au premier jour hors couverture)"""
+        start, end = self.vacances_couverture
+        covered = (days >= start) & (days < end)
+        if not covered.all() and not self._hors_couverture_signale:
+            self._hors_couverture_signale = True
+            print(f"⚠ Vacances scolaires inconnues hors de la période couverte par "
+                  f"{VACANCES_SCOLAIRES_CSV.name} ({np.datetime64(start, 'D')} - {np.datetime64(end, 'D')})")
+        return covered
+
+    def _extend(self, days: np.ndarray) -> None:
+        """Étend la table aux années des jours demandés (construite une fois, conservée)"""
+        last = self.premier_jour + len(self) - 1
+        extended = CalendarDimension.build(
+            min(_year(int(days.min())), _year(self.premier_jour)),
+            max(_year(int(days.max())), _year(last)),
+            self.vacances_periodes
+        )
+        self.premier_jour = extended.premier_jour
+        for name in _COLUMNS:
+            setattr(self, name, getattr(extended, name))
+
+    @classmethod
+    def build(cls, first_year: int, last_year: int,
+              school_periods: Optional[np.ndarray] = None) -> "CalendarDimension":
+        """
+        Construit la table des années first_year à last_year (incluses)
+
+        Args:
+            first_year, last_year: Années couvertes
+            school_periods: Périodes de vacances [début, fin[ (défaut : VACANCES_SCOLAIRES_CSV)
+
+        Returns:
+            CalendarDimension
+        """
+        school_periods = load_school_holidays() if school_periods is None else school_periods
+        first = epoch_day(f"{first_year:04d}-01-01")
+        days = np.arange(first, epoch_day(f"{last_year + 1:04d}-01-01"), dtype=np.int64)
+
+        weekday = (days + 3) % 7  # 1970-01-01 : jeudi
+        holiday_days, _ = french_holidays(range(first_year, last_year + 1))
+        ferie = np.isin(days, [epoch_day(day) for day in holiday_days])
+        vacances = np.zeros(len(days), dtype=bool)
+        for start, end in school_periods.tolist():
+            vacances[max(start - first, 0):max(end - first, 0)] = True
+
+        # Semaine ISO : semaine du jeudi de la même semaine dans son année
+        thursday = days - weekday + 3
+        january_first = (thursday.astype("datetime64[D]").astype("datetime64[Y]")
+                         .astype("datetime64[D]").astype(np.int64))
+        semaine = (thursday - january_first) // 7 + 1
+
+        type_jour = np.where(ferie, TYPE_FERIE, np.where(weekday >= 5, TYPE_WEEKEND, weekday))
+        return cls(first, {
+            "jour_semaine": weekday.astype(np.int8),
+            "type_jour": type_jour.astype(np.int8),
+            "ferie": ferie,
+            "vacances": vacances,
+            "semaine": semaine.astype(np.int8)
+        }, school_periods)
+
+    def save(self, path: Path, fingerprint: str) -> None:
+        """Écrit la table (.npz, remplacement atomique)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, empreinte=np.array(fingerprint), premier_jour=np.int64(self.premier_jour),
+                 vacances_periodes=self.vacances_periodes,
+                 **{name: getattr(self, name) for name in _COLUMNS})
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: str) -> Optional["CalendarDimension"]:
+        """Relit la table si elle correspond à l'empreinte (None sinon)"""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                if str(data["empreinte"]) != fingerprint:
+                    return None
+                return cls(int(data["premier_jour"]), {name: data[name] for name in _COLUMNS},
+                           data["vacances_periodes"])
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Calendrier en cache illisible ({path}): {e}")
+            return None
+
+    def lookup(self, days: Union[Sequence[int], np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Recherche vectorisée (jours hors plage : table étendue une fois à leurs années)
+
+        Args:
+            days: Jours depuis 1970-01-01
+
+        Returns:
+            Dict {"jour_semaine", "type_jour", "ferie", "vacances", "semaine"} de tableaux,
+            plus "vacances_connues" (jour couvert par le fichier des vacances)
+        """
+        days = np.asarray(days, dtype=np.int64)
+        index = days - self.premier_jour
+        if len(days) and (index.min() < 0 or index.max() >= len(self)):
+            self._extend(days)
+            index = days - self.premier_jour
+        columns = {name: getattr(self, name)[index] for name in _COLUMNS}
+        columns["vacances_connues"] = self._covered(days)
+        return columns
+
+    def day_info(self, value: DateLike) -> Dict[str, Any]:
+        """
+        Description d'un jour (accès direct à la table)
+
+        Args:
+            value: Date (cf. epoch_day)
+
+        Returns:
+            Dict {"jour_semaine", "type_jour" (index TYPES_JOUR), "ferie",
+                  "vacances_scolaires" (None hors couverture du fichier), "semaine"}
+        """
+        day = epoch_day(value)
+        index = day - self.premier_jour
+        if not 0 <= index < len(self):
+            self._extend(np.array([day]))
+            index = day - self.premier_jour
+        start, end = self.vacances_couverture
+        vacances = bool(self.vacances[index]) if start <= day < end else None
+        if vacances is None:
+            self._covered(np.array([day]))
+        return {
+            "jour_semaine": int(self.jour_semaine[index]),
+            "type_jour": int(self.type_jour[index]),
+            "ferie": bool(self.ferie[index]),
+            "vacances_scolaires": vacances,
+            "semaine": int(self.semaine[index])
+        }
+
+    def day_type(self, value: DateLike) -> str:
+        """Type de jour ("Lundi" ... "Vendredi", "Weekend", "Férié")"""
+        return TYPES_JOUR[self.day_info(value)["type_jour"]]
+
+    def is_business_day(self, value: DateLike) -> bool:
+        """Jour ouvré (lundi à vendredi, hors férié)"""
+        return self.day_info(value)["type_jour"] < TYPE_WEEKEND
+
+
+def _fingerprint(first_year: int, last_year: int, school_path: Path) -> str:
+    """Empreinte des sources de la table (années, source des fériés, fichier des vacances)"""
+    try:
+        school = hashlib.sha1(Path(school_path).read_bytes()).hexdigest()[:16]
+    except OSError:
+        school = "absent"
+    return f"{first_year}-{last_year}|{'holidays' if holidays else 'calcul'}|{school}"
+
+
+_calendars: Dict[str, CalendarDimension] = {}
+
+
+def get_calendar(refresh: bool = False) -> CalendarDimension:
+    """
+    Calendrier du processus : cache mémoire, puis fichier CALENDRIER_CACHE_PATH, sinon
+    construit (et mis en cache) depuis les sources
+
+    Args:
+        refresh: Ignorer les caches
+
+    Returns:
+        CalendarDimension
+    """
+    if not refresh and "defaut" in _calendars:
+        return _calendars["defaut"]
+
+    fingerprint = _fingerprint(CALENDRIER_ANNEE_DEBUT, CALENDRIER_ANNEE_FIN, VACANCES_SCOLAIRES_CSV)
+    calendar = None if refresh else CalendarDimension.load(CALENDRIER_CACHE_PATH, fingerprint)
+    if calendar is None:
+        calendar = CalendarDimension.build(CALENDRIER_ANNEE_DEBUT, CALENDRIER_ANNEE_FIN)
+        try:
+            calendar.save(CALENDRIER_CACHE_PATH, fingerprint)
+        except OSError as e:
+            print(f"⚠ Écriture cache calendrier impossible: {e}")
+    _calendars["defaut"] = calendar
+    return calendar
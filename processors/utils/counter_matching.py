@@ -0,0 +1,312 @@
+"""
+Appariement compteurs vélos ↔ tronçons du référentiel (plus proche tronçon)
+
+Les segments des tronçons sont projetés en mètres (projection locale) et découpés en
+morceaux d'au plus _MAX_PIECE_METRES ; un arbre k-d est construit sur les milieux des
+morceaux. Pour un compteur, seuls les morceaux dont le milieu est à moins de
+seuil + demi-longueur maximale sont candidats (O(log n) par compteur), puis la distance
+exacte point-segment départage les candidats.
+
+Le résultat est mis en cache par (empreinte compteurs, empreinte référentiel) et sert
+à calculer la part modale vélo par corridor (axe de même libellé).
+"""
+
+import hashlib
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import APPARIEMENT_COMPTEURS_DISTANCE_METRES, CACHE_DIR
+from .file_utils import load_json, save_json
+from .geometry_batch import EARTH_RADIUS_M, KIND_LINE, GeometryBatch
+from .kdtree import KDTree
+from .spatial_join import fingerprint_arcs
+
+# Longueur maximale d'un morceau de segment indexé (borne le rayon de recherche)
+_MAX_PIECE_METRES = 50.0
+
+# Latitude de référence par défaut (Paris) pour la projection locale
+_DEFAULT_LATITUDE = 48.8566
+
+
+class ArcNearestIndex:
+    """Arbre k-d des segments des tronçons (projection locale en mètres)"""
+
+    def __init__(self, arc_ids: Sequence[str], geo_shapes: Sequence[Any]):
+        """
+        Args:
+            arc_ids: Identifiants des tronçons
+            geo_shapes: Géométries LineString / MultiLineString (une par tronçon)
+        """
+        self.arc_ids = list(arc_ids)
+        batch = GeometryBatch(geo_shapes)
+        table = batch.segments()
+        lines = batch.kinds[table["geometrie"]] == KIND_LINE
+        starts, ends = table["debut"][lines], table["fin"][lines]
+
+        latitude = float(starts[:, 1].mean()) if len(starts) else _DEFAULT_LATITUDE
+        self.scale_y = np.radians(1.0) * EARTH_RADIUS_M
+        self.scale_x = self.scale_y * np.cos(np.radians(latitude))
+        starts, ends = self._project(starts), self._project(ends)
+
+        # Découpage des segments longs en morceaux de longueur <= _MAX_PIECE_METRES
+        lengths = np.hypot(*(ends - starts).T)
+        pieces = np.maximum(np.ceil(lengths / _MAX_PIECE_METRES), 1).astype(np.int64)
+        segment = np.repeat(np.arange(len(starts)), pieces)
+        rank = np.arange(len(segment)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        t0 = (rank / pieces[segment])[:, None]
+        t1 = ((rank + 1) / pieces[segment])[:, None]
+        direction = ends[segment] - starts[segment]
+        self.starts = starts[segment] + t0 * direction
+        self.ends = starts[segment] + t1 * direction
+        self.piece_arc = table["geometrie"][lines][segment]
+
+        self.max_half_length = float((lengths / pieces).max() / 2.0) if len(lengths) else 0.0
+        self.tree = KDTree((self.starts + self.ends) / 2.0)
+
+    def __len__(self) -> int:
+        return len(self.arc_ids)
+
+    def _project(self, lonlat: np.ndarray) -> np.ndarray:
+        """Coordonnées lon/lat (n, 2) → mètres (n, 2)"""
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack([lonlat[:, 0] * self.scale_x, lonlat[:, 1] * self.scale_y])
+
+    def nearest(self, lon: float, lat: float, max_distance: float) -> Tuple[int, float]:
+        """
+        Tronçon le plus proche d'un point
+
+        Args:
+            lon, lat: Coordonnées WGS84
+            max_distance: Distance maximale (m)
+
+        Returns:
+            Tuple (index du tronçon, distance en m), (-1, inf) si aucun tronçon à portée
+        """
+        x, y = self._project([lon, lat])[0]
+        candidates = self.tree.query_radius(x, y, max_distance + self.max_half_length)
+        if candidates.size == 0:
+            return -1, np.inf
+
+        a, b = self.starts[candidates], self.ends[candidates]
+        direction = b - a
+        norm = np.maximum((direction ** 2).sum(axis=1), 1e-12)
+        t = np.clip(((x - a[:, 0]) * direction[:, 0] + (y - a[:, 1]) * direction[:, 1]) / norm, 0.0, 1.0)
+        distances = np.hypot(a[:, 0] + t * direction[:, 0] - x, a[:, 1] + t * direction[:, 1] - y)
+        best = int(np.argmin(distances))
+        if distances[best] > max_distance:
+            return -1, np.inf
+        return int(self.piece_arc[candidates[best]]), float(distances[best])
+
+
+def fingerprint_counters(counters: Iterable[Tuple[str, float, float]]) -> str:
+    """Empreinte des compteurs (identifiant, coordonnées)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for id_compteur, lon, lat in counters:
+        digest.update(f"{id_compteur}|{lon:.7f}|{lat:.7f};".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def counters_from_metrics(metrics: Iterable[Dict]) -> List[Tuple[str, float, float]]:
+    """
+    Compteurs distincts (identifiant, lon, lat) des métriques vélos
+
+    Args:
+        metrics: Métriques vélos (id_compteur, coordinates {"lon", "lat"})
+
+    Returns:
+        Liste triée par identifiant (compteurs sans coordonnées exclus)
+    """
+    counters: Dict[str, Tuple[float, float]] = {}
+    for metric in metrics:
+        coordinates = metric.get("coordinates") or {}
+        try:
+            lon, lat = float(coordinates["lon"]), float(coordinates["lat"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if np.isfinite(lon) and np.isfinite(lat):
+            counters.setdefault(str(metric.get("id_compteur", "")), (lon, lat))
+    return [(id_compteur, lon, lat) for id_compteur, (lon, lat) in sorted(counters.items())]
+
+
+def match_counters_to_arcs(counters: Sequence[Tuple[str, float, float]], index: ArcNearestIndex,
+                           max_distance: float = APPARIEMENT_COMPTEURS_DISTANCE_METRES) -> Dict[str, Any]:
+    """
+    Associe chaque compteur à son tronçon le plus proche
+
+    Args:
+        counters: Compteurs (identifiant, lon, lat)
+        index: Index des segments des tronçons
+        max_distance: Distance maximale compteur ↔ tronçon (m)
+
+    Returns:
+        Dict {"par_compteur": {id: {"identifiant_arc", "distance_metres"}},
+              "par_troncon": {arc_id: [ids compteurs]}, "non_apparies": [ids],
+              "distance_max_metres"}
+    """
+    par_compteur: Dict[str, Dict[str, Any]] = {}
+    par_troncon: Dict[str, List[str]] = {}
+    non_apparies: List[str] = []
+    for id_compteur, lon, lat in counters:
+        arc_index, distance = index.nearest(lon, lat, max_distance)
+        if arc_index < 0:
+            non_apparies.append(id_compteur)
+            continue
+        arc_id = index.arc_ids[arc_index]
+        par_compteur[id_compteur] = {"identifiant_arc": arc_id, "distance_metres": round(distance, 1)}
+        par_troncon.setdefault(arc_id, []).append(id_compteur)
+
+    return {
+        "par_compteur": par_compteur,
+        "par_troncon": par_troncon,
+        "non_apparies": non_apparies,
+        "distance_max_metres": max_distance
+    }
+
+
+_index_cache: Dict[str, ArcNearestIndex] = {}
+_match_cache: Dict[Tuple[str, str, float], Dict[str, Any]] = {}
+
+
+def match_bike_counters(counters: Sequence[Tuple[str, float, float]],
+                        arcs: Sequence[Tuple[str, Any]],
+                        max_distance: float = APPARIEMENT_COMPTEURS_DISTANCE_METRES,
+                        use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Appariement compteurs ↔ tronçons avec cache (mémoire + fichier dans CACHE_DIR)
+
+    Args:
+        counters: Compteurs (identifiant, lon, lat), cf. counters_from_metrics
+        arcs: Couples (identifiant tronçon, geo_shape) du référentiel
+        max_distance: Distance maximale compteur ↔ tronçon (m)
+        use_cache: Réutiliser un résultat calculé pour les mêmes empreintes
+
+    Returns:
+        Résultat de match_counters_to_arcs + "empreintes" {"compteurs", "referentiel"}
+    """
+    arc_ids = [arc_id for arc_id, _ in arcs]
+    geo_shapes = [geo_shape for _, geo_shape in arcs]
+    key = (fingerprint_counters(counters), fingerprint_arcs(arc_ids, geo_shapes), float(max_distance))
+    cache_path = Path(CACHE_DIR) / "appariement_compteurs_troncons.json"
+
+    if use_cache:
+        if key in _match_cache:
+            return _match_cache[key]
+        if cache_path.exists():
+            cached = load_json(str(cache_path)) or {}
+            empreintes = cached.get("empreintes", {})
+            cached_key = (empreintes.get("compteurs"), empreintes.get("referentiel"),
+                          cached.get("distance_max_metres"))
+            if cached_key == key:
+                _match_cache[key] = cached
+                return cached
+
+    index = _index_cache.get(key[1])
+    if index is None:
+        index = ArcNearestIndex(arc_ids, geo_shapes)
+        _index_cache.clear()
+        _index_cache[key[1]] = index
+
+    result = match_counters_to_arcs(counters, index, max_distance)
+    result["empreintes"] = {"compteurs": key[0], "referentiel": key[1]}
+
+    if use_cache:
+        _match_cache.clear()
+        _match_cache[key] = result
+        if not save_json(result, str(cache_path), indent=None):
+            print(f"⚠ Écriture cache appariement compteurs impossible ({cache_path})")
+
+    return result
+
+
+def bike_share_by_corridor(appariement: Dict[str, Any], bike_metrics: Iterable[Dict],
+                           traffic_metrics: Iterable[Dict]) -> List[Dict[str, Any]]:
+    """
+    Part modale vélo par corridor (tronçons appariés regroupés par libellé d'axe)
+
+    Seuls les tronçons portant à la fois un compteur vélo et une mesure de débit
+    véhicules sont comparés, pour que les deux flux portent sur la même section.
+
+    Args:
+        appariement: Résultat de match_bike_counters
+        bike_metrics: Métriques vélos (id_compteur, total_jour)
+        traffic_metrics: Métriques comptages (identifiant_arc, libelle, debit_journalier_total)
+
+    Returns:
+        Liste {"corridor", "troncons", "compteurs", "total_velos", "total_vehicules",
+        "part_velo_pourcent"} triée par volume vélo décroissant
+    """
+    par_compteur = appariement.get("par_compteur", {})
+    velos_par_troncon: Dict[str, float] = {}
+    compteurs_par_troncon: Dict[str, set] = {}
+    for metric in bike_metrics:
+        lien = par_compteur.get(str(metric.get("id_compteur", "")))
+        if lien is None:
+            continue
+        arc_id = lien["identifiant_arc"]
+        velos_par_troncon[arc_id] = velos_par_troncon.get(arc_id, 0.0) + float(metric.get("total_jour") or 0.0)
+        compteurs_par_troncon.setdefault(arc_id, set()).add(str(metric.get("id_compteur", "")))
+
+    corridors: Dict[str, Dict[str, Any]] = {}
+    for metric in traffic_metrics:
+        arc_id = metric.get("identifiant_arc")
+        if arc_id not in velos_par_troncon:
+            continue
+        name = metric.get("libelle") or arc_id
+        corridor = corridors.setdefault(name, {
+            "corridor": name, "troncons": set(), "compteurs": set(),
+            "total_velos": 0.0, "total_vehicules": 0.0
+        })
+        if arc_id not in corridor["troncons"]:
+            corridor["troncons"].add(arc_id)
+            corridor["compteurs"] |= compteurs_par_troncon[arc_id]
+            corridor["total_velos"] += velos_par_troncon[arc_id]
+        corridor["total_vehicules"] += float(metric.get("debit_journalier_total") or 0.0)
+
+    results = []
+    for corridor in corridors.values():
+        total = corridor["total_velos"] + corridor["total_vehicules"]
+        corridor["troncons"] = sorted(corridor["troncons"])
+        corridor["compteurs"] = sorted(corridor["compteurs"])
+        corridor["part_velo_pourcent"] = round(100.0 * corridor["total_velos"] / total, 1) if total > 0 else None
+        results.append(corridor)
+    results.sort(key=lambda corridor: (-corridor["total_velos"], corridor["corridor"]))
+    return results
+
+
+def bike_share_of_arcs(appariement: Dict[str, Any], bike_metrics: Iterable[Dict],
+                       arc_ids: Iterable[str], total_vehicules: float) -> Optional[Dict[str, Any]]:
+    """
+    Volume vélo et part modale d'un ensemble de tronçons (ex: corridor congestionné)
+
+    Args:
+        appariement: Résultat de match_bike_counters
+        bike_metrics: Métriques vélos (id_compteur, total_jour)
+        arc_ids: Tronçons de l'ensemble
+        total_vehicules: Débit véhicules cumulé de l'ensemble
+
+    Returns:
+        Dict {"compteurs_velo", "total_velos", "part_velo_pourcent"} ou None si aucun
+        compteur apparié
+    """
+    arcs = set(arc_ids)
+    par_compteur = appariement.get("par_compteur", {})
+    compteurs = set()
+    total_velos = 0.0
+    for metric in bike_metrics:
+        id_compteur = str(metric.get("id_compteur", ""))
+        lien = par_compteur.get(id_compteur)
+        if lien is not None and lien["identifiant_arc"] in arcs:
+            compteurs.add(id_compteur)
+            total_velos += float(metric.get("total_jour") or 0.0)
+    if not compteurs:
+        return None
+    total = total_velos + float(total_vehicules or 0.0)
+    return {
+        "compteurs_velo": sorted(compteurs),
+        "total_velos": total_velos,
+        "part_velo_pourcent": round(100.0 * total_velos / total, 1) if total > 0 else None
+    }
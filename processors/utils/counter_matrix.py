@@ -0,0 +1,141 @@
+"""
+Moteur compteur × heure pour les comptages vélos
+
+Les relevés sont factorisés une seule fois (compteur → ligne, heure → colonne) : les
+comptages de chaque relevé sont conservés en tableaux plats et sommés dans une matrice
+dense (n_compteurs, 24). Totaux, moyennes horaires, pics et totaux par arrondissement
+sont ensuite des réductions NumPy sur ces tableaux, sans regrouper ni re-parser les
+relevés (la santé des capteurs est suivie en flux, cf. sensor_health).
+"""
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .hourly_matrix import HOURS_PER_DAY, hour_from_iso, peak_hours
+
+
+class CounterHourMatrix:
+    """
+    Relevés factorisés par compteur et par heure
+
+    Attributes:
+        counter_ids: Identifiants des compteurs (ordre de première apparition)
+        first_record: Index du premier relevé de chaque compteur
+        rows: Ligne (compteur) de chaque relevé
+        hours: Heure de chaque relevé (-1 si date illisible)
+        counts: Comptage de chaque relevé (0 si absent)
+        matrix: Sommes des comptages par compteur et par heure (n, 24)
+        present: Nombre de relevés par compteur et par heure (n, 24)
+    """
+
+    def __init__(self, counter_ids: List[str], first_record: np.ndarray, rows: np.ndarray,
+                 hours: np.ndarray, counts: np.ndarray):
+        self.counter_ids = counter_ids
+        self.index = {counter_id: row for row, counter_id in enumerate(counter_ids)}
+        self.first_record = first_record
+        self.rows = rows
+        self.hours = hours
+        self.counts = counts
+
+        n = len(counter_ids)
+        timed = hours >= 0
+        flat = rows[timed] * HOURS_PER_DAY + hours[timed]
+        self.matrix = np.bincount(flat, weights=counts[timed], minlength=n * HOURS_PER_DAY).reshape(n, HOURS_PER_DAY)
+        self.present = np.bincount(flat, minlength=n * HOURS_PER_DAY).reshape(n, HOURS_PER_DAY)
+
+    @classmethod
+    def from_records(cls, records: Sequence[Dict], id_field: str = "id_compteur",
+                     date_field: str = "date", count_field: str = "sum_counts") -> "CounterHourMatrix":
+        """
+        Factorise les relevés en une passe (relevés sans identifiant ignorés)
+
+        Args:
+            records: Relevés (un par compteur et par heure)
+            id_field: Champ identifiant le compteur
+            date_field: Champ date ISO
+            count_field: Champ comptage
+
+        Returns:
+            CounterHourMatrix
+        """
+        counter_ids: List[str] = []
+        index: Dict[str, int] = {}
+        first_record: List[int] = []
+        rows: List[int] = []
+        hours: List[int] = []
+        counts: List[float] = []
+
+        for position, record in enumerate(records):
+            counter_id = record.get(id_field)
+            if not counter_id:
+                continue
+            row = index.get(counter_id)
+            if row is None:
+                row = index[counter_id] = len(counter_ids)
+                counter_ids.append(counter_id)
+                first_record.append(position)
+            hour = hour_from_iso(record.get(date_field))
+            rows.append(row)
+            hours.append(-1 if hour is None else hour)
+            counts.append(record.get(count_field) or 0)
+
+        return cls(
+            counter_ids,
+            np.asarray(first_record, dtype=np.int64),
+            np.asarray(rows, dtype=np.int64),
+            np.asarray(hours, dtype=np.int64),
+            np.asarray(counts, dtype=np.float64)
+        )
+
+    def __len__(self) -> int:
+        return len(self.counter_ids)
+
+    def totals(self) -> np.ndarray:
+        """Total de chaque compteur (tous relevés, y compris sans heure lisible)"""
+        return np.bincount(self.rows, weights=self.counts, minlength=len(self))
+
+    def hourly_means(self) -> np.ndarray:
+        """Moyenne horaire de chaque compteur (total / 24)"""
+        return self.totals() / float(HOURS_PER_DAY)
+
+    def peaks(self) -> np.ndarray:
+        """Heure de pic de chaque compteur (-1 si aucun relevé horodaté)"""
+        values = np.where(self.present > 0, self.matrix, np.nan)
+        return peak_hours(values)[0]
+
+    def record_counts(self) -> np.ndarray:
+        """Nombre de relevés de chaque compteur"""
+        return np.bincount(self.rows, minlength=len(self))
+
+    def group_totals(self, groups: Sequence[Optional[str]]) -> Dict[str, float]:
+        """
+        Totaux par groupe de compteurs (ex: arrondissement)
+
+        Args:
+            groups: Groupe de chaque compteur (None : compteur ignoré)
+
+        Returns:
+            Dict {groupe: total} (ordre de première apparition)
+        """
+        labels = [group for group in groups if group]
+        names = list(dict.fromkeys(labels))
+        codes = {name: code for code, name in enumerate(names)}
+        group_codes = np.asarray([codes.get(group, -1) if group else -1 for group in groups], dtype=np.int64)
+        totals = self.totals()
+        keep = group_codes >= 0
+        sums = np.bincount(group_codes[keep], weights=totals[keep], minlength=len(names))
+        return dict(zip(names, sums.tolist()))
+
+    def iter_counts(self) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Comptages des relevés de chaque compteur (ordre des relevés conservé)
+
+        Yields:
+            Tuple (ligne, comptages)
+        """
+        order = np.argsort(self.rows, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(self.record_counts())])
+        counts = self.counts[order]
+        for row in range(len(self)):
+            yield row, counts[bounds[row]:bounds[row + 1]]
@@ -0,0 +1,198 @@
+"""
+Registre persistant des compteurs vélos (métadonnées stables d'un jour à l'autre)
+
+Nom, coordonnées, arrondissement et dates de première / dernière observation de chaque
+compteur sont conservés dans une table compacte (.npz, colonnes NumPy triées par
+identifiant) dans ETAT_DIR. Chaque exécution ne fait qu'une mise à jour incrémentale :
+seuls les compteurs nouveaux ou déplacés sont localisés, et les métriques du jour
+référencent le compteur par son code entier (stable) au lieu de répéter ses
+métadonnées.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import REGISTRE_COMPTEURS_PATH
+from .array_utils import string_array
+
+_COLUMNS = ("ids", "codes", "noms", "lons", "lats", "arrondissements", "premiere_date", "derniere_date")
+
+# Déplacement (degrés) au-delà duquel un compteur est relocalisé (~1 m)
+_MOVE_TOLERANCE = 1e-5
+
+
+class CounterRegistry:
+    """
+    Table des compteurs triée par identifiant
+
+    Attributes:
+        ids: Identifiants (triés)
+        codes: Code entier stable de chaque compteur (attribué à la première observation)
+        noms, arrondissements: Nom et arrondissement ("" si inconnu)
+        lons, lats: Coordonnées
+        premiere_date, derniere_date: Jours d'observation (YYYY-MM-DD)
+    """
+
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None):
+        columns = columns or {}
+        self.ids = columns.get("ids", string_array([]))
+        self.codes = columns.get("codes", np.zeros(0, dtype=np.int32))
+        self.noms = columns.get("noms", string_array([]))
+        self.lons = columns.get("lons", np.zeros(0))
+        self.lats = columns.get("lats", np.zeros(0))
+        self.arrondissements = columns.get("arrondissements", string_array([]))
+        self.premiere_date = columns.get("premiere_date", string_array([]))
+        self.derniere_date = columns.get("derniere_date", string_array([]))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _columns(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in _COLUMNS}
+
+    def save(self, path: Path = REGISTRE_COMPTEURS_PATH) -> None:
+        """Écrit le registre (.npz, remplacement atomique)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, **self._columns())
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = REGISTRE_COMPTEURS_PATH) -> "CounterRegistry":
+        """Relit le registre (registre vide si absent ou illisible)"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls({name: data[name] for name in _COLUMNS})
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Registre compteurs illisible ({path}): {e}")
+            return cls()
+
+    def lookup_many(self, counter_ids: Sequence[str]) -> np.ndarray:
+        """Positions des compteurs (-1 si absent)"""
+        if len(self.ids) == 0 or len(counter_ids) == 0:
+            return np.full(len(counter_ids), -1, dtype=np.int64)
+        queries = string_array([str(counter_id) for counter_id in counter_ids])
+        positions = np.minimum(np.searchsorted(self.ids, queries), len(self.ids) - 1)
+        return np.where(self.ids[positions] == queries, positions, -1).astype(np.int64)
+
+    def update(self, counter_ids: Sequence[str], noms: Sequence[str],
+               lons: Sequence[float], lats: Sequence[float], date: str,
+               locate: Callable[[List[float], List[float]], List[Optional[str]]]) -> Dict[str, int]:
+        """
+        Mise à jour incrémentale avec les compteurs observés un jour donné
+
+        Args:
+            counter_ids: Identifiants observés (distincts)
+            noms: Nom de chaque compteur
+            lons, lats: Coordonnées observées
+            date: Jour d'observation (YYYY-MM-DD)
+            locate: Localisation d'un lot de points → arrondissements (compteurs nouveaux
+                ou déplacés uniquement)
+
+        Returns:
+            Dict {"nouveaux", "deplaces", "renommes", "vus"} (nombre de compteurs)
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        noms = string_array([str(nom or "") for nom in noms])
+        positions = self.lookup_many(counter_ids)
+        known = positions >= 0
+        stats = {"nouveaux": int((~known).sum()), "deplaces": 0, "renommes": 0, "vus": len(counter_ids)}
+
+        # Compteurs connus : déplacements, renommages, dates d'observation
+        if known.any():
+            rows = positions[known]
+            moved = ((np.abs(self.lons[rows] - lons[known]) > _MOVE_TOLERANCE) |
+                     (np.abs(self.lats[rows] - lats[known]) > _MOVE_TOLERANCE))
+            renamed = self.noms[rows] != noms[known]
+            stats["deplaces"], stats["renommes"] = int(moved.sum()), int(renamed.sum())
+            if renamed.any():
+                self.noms = self.noms.astype(np.result_type(self.noms, noms))
+                self.noms[rows[renamed]] = noms[known][renamed]
+            if moved.any():
+                moved_rows = rows[moved]
+                self.lons[moved_rows] = lons[known][moved]
+                self.lats[moved_rows] = lats[known][moved]
+                self._set_arrondissements(moved_rows, locate(self.lons[moved_rows].tolist(),
+                                                             self.lats[moved_rows].tolist()))
+            day = string_array([date] * len(rows))
+            self.premiere_date = self.premiere_date.astype(np.result_type(self.premiere_date, day))
+            self.derniere_date = self.derniere_date.astype(np.result_type(self.derniere_date, day))
+            first, last = self.premiere_date[rows], self.derniere_date[rows]
+            self.premiere_date[rows] = np.where(day < first, day, first)
+            self.derniere_date[rows] = np.where(day > last, day, last)
+
+        # Nouveaux compteurs : codes suivants, localisation groupée, insertion triée
+        if stats["nouveaux"]:
+            new = ~known
+            next_code = int(self.codes.max()) + 1 if len(self.codes) else 0
+            arrondissements = locate(lons[new].tolist(), lats[new].tolist())
+            added = {
+                "ids": string_array([str(counter_id) for counter_id, is_new
+                                      in zip(counter_ids, new.tolist()) if is_new]),
+                "codes": np.arange(next_code, next_code + stats["nouveaux"], dtype=np.int32),
+                "noms": noms[new],
+                "lons": lons[new],
+                "lats": lats[new],
+                "arrondissements": string_array([a or "" for a in arrondissements]),
+                "premiere_date": string_array([date] * stats["nouveaux"]),
+                "derniere_date": string_array([date] * stats["nouveaux"])
+            }
+            merged = {name: np.concatenate([getattr(self, name), added[name]]) for name in _COLUMNS}
+            order = np.argsort(merged["ids"], kind="stable")
+            for name in _COLUMNS:
+                setattr(self, name, merged[name][order])
+
+        return stats
+
+    def _set_arrondissements(self, rows: np.ndarray, arrondissements: List[Optional[str]]) -> None:
+        values = string_array([a or "" for a in arrondissements])
+        self.arrondissements = self.arrondissements.astype(np.result_type(self.arrondissements, values))
+        self.arrondissements[rows] = values
+
+    def entry(self, position: int) -> Dict[str, Any]:
+        """Métadonnées d'un compteur (format des métriques vélos)"""
+        return {
+            "code_compteur": int(self.codes[position]),
+            "nom_compteur": str(self.noms[position]),
+            "coordinates": {"lon": float(self.lons[position]), "lat": float(self.lats[position])},
+            "arrondissement": str(self.arrondissements[position]) or None,
+            "premiere_date": str(self.premiere_date[position]),
+            "derniere_date": str(self.derniere_date[position])
+        }
+
+    def counters(self, counter_ids: Sequence[str]) -> List[Tuple[str, float, float]]:
+        """Compteurs (identifiant, lon, lat) connus du registre, triés par identifiant"""
+        positions = self.lookup_many(counter_ids)
+        rows = np.unique(positions[positions >= 0])
+        return list(zip(self.ids[rows].tolist(), self.lons[rows].tolist(), self.lats[rows].tolist()))
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Export complet {id_compteur: métadonnées}"""
+        return {str(counter_id): self.entry(position) for position, counter_id in enumerate(self.ids.tolist())}
+
+
+_registry: Dict[str, CounterRegistry] = {}
+
+
+def get_counter_registry(refresh: bool = False) -> CounterRegistry:
+    """
+    Registre des compteurs du processus (chargé une fois depuis REGISTRE_COMPTEURS_PATH)
+
+    Args:
+        refresh: Relire le fichier
+
+    Returns:
+        CounterRegistry (vide si jamais écrit)
+    """
+    if refresh or "defaut" not in _registry:
+        _registry["defaut"] = CounterRegistry.load()
+    return _registry["defaut"]
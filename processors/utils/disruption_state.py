@@ -0,0 +1,406 @@
+"""
+État persistant des perturbations RATP entre instantanés horaires
+
+Chaque perturbation (clé disruption_id:id) est conservée dans une table compacte
+(.npz, colonnes NumPy triées par clé) avec l'empreinte de son contenu brut, ses
+lignes, sa priorité et ses périodes d'application. Un nouvel instantané n'analyse
+(extraction des lignes, parsing des dates) que les perturbations nouvelles ou dont
+l'empreinte a changé, et enregistre les transitions ouverture / fermeture : le coût
+d'une exécution est proportionnel au volume de changements, et les agrégats du
+jour sont dérivés de l'état plutôt que du retraitement des 24 instantanés.
+
+L'état est conservé par jour de référence (un fichier par jour, initialisé avec l'état
+final du jour précédent disponible) : rejouer un jour déjà intégré relit son propre
+état, jamais celui d'un jour postérieur, et un instantané déjà appliqué est ignoré
+(traitement idempotent). La reconstruction explicite repart de l'état de la veille.
+"""
+
+import hashlib
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import PERTURBATIONS_RATP_DIR, PERTURBATIONS_RETENTION_JOURS, PERTURBATIONS_ETATS_JOURS
+from .array_utils import string_array
+
+_COLUMNS = ("ids", "empreintes", "lignes", "priorites", "statuts", "causes", "categories",
+            "premiere_vue", "derniere_vue", "fermee_a", "periodes_offsets",
+            "periodes_debut", "periodes_fin")
+_ROW_COLUMNS = _COLUMNS[:10]  # une valeur par perturbation (hors périodes)
+
+_EPOCH = datetime(1970, 1, 1)
+MINUTES_PER_DAY = 1440
+
+
+def epoch_minute(moment: datetime) -> int:
+    """
+    Minute absolue (depuis 1970-01-01) de l'heure murale d'une date
+
+    Args:
+        moment: Date (naïve ou avec fuseau : l'heure murale est conservée)
+
+    Returns:
+        Minutes depuis 1970-01-01 00:00
+    """
+    return int((moment.replace(tzinfo=None) - _EPOCH).total_seconds() // 60)
+
+
+def datetime_from_epoch_minute(minute: int) -> datetime:
+    """Date naïve (heure murale) d'une minute absolue"""
+    return _EPOCH + timedelta(minutes=int(minute))
+
+
+def disruption_key(disruption: Dict) -> str:
+    """Clé d'une perturbation : disruption_id et identifiant d'impact (plusieurs impacts par perturbation)"""
+    return f"{disruption.get('disruption_id', '')}:{disruption.get('id', '')}"
+
+
+def content_hash(disruption: Dict) -> str:
+    """Empreinte (blake2b 64 bits) du contenu brut d'une perturbation"""
+    payload = json.dumps(disruption, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class DisruptionState:
+    """
+    Table des perturbations suivies, triée par clé
+
+    Attributes:
+        ids: Clés disruption_id:id (triées)
+        empreintes: Empreinte du contenu brut lors de la dernière analyse
+        lignes: Lignes impactées ("4,8,RER B", "" si aucune)
+        priorites, statuts, causes, categories: Champs analysés
+        premiere_vue, derniere_vue: Minutes absolues du premier / dernier instantané
+            contenant la perturbation
+        fermee_a: Minute du premier instantané où elle a disparu (-1 si ouverte)
+        periodes_offsets: Offsets (n + 1) des périodes de chaque perturbation
+        periodes_debut, periodes_fin: Périodes d'application (minutes absolues)
+        horloge: Minute du dernier instantané appliqué (-1 si aucun)
+    """
+
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None, horloge: int = -1):
+        columns = columns or {}
+        self.ids = columns.get("ids", string_array([]))
+        self.empreintes = columns.get("empreintes", string_array([]))
+        self.lignes = columns.get("lignes", string_array([]))
+        self.priorites = columns.get("priorites", np.zeros(0, dtype=np.int16))
+        self.statuts = columns.get("statuts", string_array([]))
+        self.causes = columns.get("causes", string_array([]))
+        self.categories = columns.get("categories", string_array([]))
+        self.premiere_vue = columns.get("premiere_vue", np.zeros(0, dtype=np.int64))
+        self.derniere_vue = columns.get("derniere_vue", np.zeros(0, dtype=np.int64))
+        self.fermee_a = columns.get("fermee_a", np.zeros(0, dtype=np.int64))
+        self.periodes_offsets = columns.get("periodes_offsets", np.zeros(1, dtype=np.int64))
+        self.periodes_debut = columns.get("periodes_debut", np.zeros(0, dtype=np.int64))
+        self.periodes_fin = columns.get("periodes_fin", np.zeros(0, dtype=np.int64))
+        self.horloge = horloge
+        self.dernier_instantane: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self, path: Path) -> None:
+        """Écrit l'état (.npz, remplacement atomique)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, horloge=np.int64(self.horloge),
+                 dernier_instantane=np.array(json.dumps(self.dernier_instantane)),
+                 **{name: getattr(self, name) for name in _COLUMNS})
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "DisruptionState":
+        """Relit l'état (état vide si absent ou illisible)"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                state = cls({name: data[name] for name in _COLUMNS}, int(data["horloge"]))
+                state.dernier_instantane = json.loads(str(data["dernier_instantane"]))
+                return state
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ État perturbations RATP illisible ({path}): {e}")
+            return cls()
+
+    def lookup_many(self, keys: Sequence[str]) -> np.ndarray:
+        """Positions des perturbations (-1 si inconnue)"""
+        if len(self.ids) == 0 or len(keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        queries = string_array([str(key) for key in keys])
+        positions = np.minimum(np.searchsorted(self.ids, queries), len(self.ids) - 1)
+        return np.where(self.ids[positions] == queries, positions, -1).astype(np.int64)
+
+    def _period_slices(self, rows: np.ndarray) -> np.ndarray:
+        """Indices (concaténés) des périodes des lignes de table données"""
+        starts = self.periodes_offsets[rows]
+        counts = self.periodes_offsets[rows + 1] - starts
+        if not counts.sum():
+            return np.zeros(0, dtype=np.int64)
+        shift = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return np.arange(int(counts.sum()), dtype=np.int64) + shift
+
+    def _select(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """Colonnes restreintes à des lignes de table (périodes comprises)"""
+        columns = {name: getattr(self, name)[rows] for name in _ROW_COLUMNS}
+        periods = self._period_slices(rows)
+        counts = self.periodes_offsets[rows + 1] - self.periodes_offsets[rows]
+        columns["periodes_offsets"] = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        columns["periodes_debut"] = self.periodes_debut[periods]
+        columns["periodes_fin"] = self.periodes_fin[periods]
+        return columns
+
+    def apply_snapshot(self, disruptions: Iterable[Dict], instant: int,
+                       parse: Callable[[Dict], Optional[Dict]]) -> Dict[str, Any]:
+        """
+        Applique un instantané de l'API : seules les perturbations nouvelles ou modifiées
+        sont analysées, celles qui ont disparu sont fermées
+
+        Args:
+            disruptions: Perturbations brutes de l'instantané
+            instant: Minute absolue de l'instantané (cf. epoch_minute)
+            parse: Analyse d'une perturbation brute → dict nettoyé ("application_periods"
+                [{"begin", "end"}], "lignes_impactees", "priority", "status", "cause",
+                "category") ou None si invalide (conservée sans période)
+
+        Returns:
+            Dict {"nouvelles", "modifiees", "inchangees", "fermees", "reouvertes",
+            "analysees", "transitions"} ; instantané déjà appliqué ou antérieur à
+            l'horloge : {"ignore": True}
+        """
+        if instant <= self.horloge:
+            print(f"  ⚠ Instantané perturbations déjà intégré à l'état, ignoré "
+                  f"({datetime_from_epoch_minute(instant).isoformat()})")
+            return {"ignore": True}
+
+        # Dédoublonnage de l'instantané (fichiers combinés) : dernière version conservée
+        snapshot: Dict[str, Dict] = {}
+        for disruption in disruptions:
+            snapshot[disruption_key(disruption)] = disruption
+        keys = list(snapshot)
+        hashes = string_array([content_hash(snapshot[key]) for key in keys])
+        positions = self.lookup_many(keys)
+        known = positions >= 0
+        changed = np.zeros(len(keys), dtype=bool)
+        changed[known] = self.empreintes[positions[known]] != hashes[known]
+        stats = {"nouvelles": int((~known).sum()), "modifiees": int(changed.sum()),
+                 "inchangees": int((known & ~changed).sum()), "fermees": 0, "reouvertes": 0}
+        transitions: List[Dict[str, str]] = []
+        stamp = datetime_from_epoch_minute(instant).isoformat()
+
+        # Perturbations connues présentes : réouvertures, dernière vue
+        present = np.zeros(len(self.ids), dtype=bool)
+        present[positions[known]] = True
+        reopened = present & (self.fermee_a >= 0)
+        stats["reouvertes"] = int(reopened.sum())
+        transitions.extend({"id": key, "transition": "reouverture", "instant": stamp}
+                           for key in self.ids[reopened].tolist())
+        self.fermee_a[reopened] = -1
+        self.derniere_vue[present] = instant
+
+        # Perturbations ouvertes absentes de l'instantané : fermeture
+        closing = ~present & (self.fermee_a < 0)
+        stats["fermees"] = int(closing.sum())
+        transitions.extend({"id": key, "transition": "fermeture", "instant": stamp}
+                           for key in self.ids[closing].tolist())
+        self.fermee_a[closing] = instant
+
+        # Analyse des seules perturbations nouvelles ou modifiées
+        to_parse = np.flatnonzero(~known | changed)
+        parsed = [parse(snapshot[keys[i]]) or {} for i in to_parse.tolist()]
+        transitions.extend({"id": keys[i], "transition": "ouverture", "instant": stamp}
+                           for i in np.flatnonzero(~known).tolist())
+        stats["analysees"] = len(parsed)
+
+        # Remplacement des lignes modifiées / insertion des nouvelles, fenêtre de rétention
+        horizon = instant - PERTURBATIONS_RETENTION_JOURS * MINUTES_PER_DAY
+        kept = ~((self.fermee_a >= 0) & (self.derniere_vue < horizon))
+        kept[positions[changed]] = False
+        self._merge(np.flatnonzero(kept), [keys[i] for i in to_parse.tolist()],
+                    hashes[to_parse], parsed, positions[to_parse], instant)
+
+        self.horloge = instant
+        stats["transitions"] = transitions
+        self.dernier_instantane = {name: value for name, value in stats.items() if name != "transitions"}
+        self.dernier_instantane["instant"] = stamp
+        return stats
+
+    def _merge(self, kept: np.ndarray, keys: List[str], hashes: np.ndarray,
+               parsed: List[Dict], previous: np.ndarray, instant: int) -> None:
+        """Conserve les lignes kept et ajoute les perturbations analysées, table retriée par clé"""
+        kept_columns = self._select(kept)
+        first_seen = np.full(len(keys), instant, dtype=np.int64)
+        was_known = previous >= 0
+        first_seen[was_known] = self.premiere_vue[previous[was_known]]
+        periods = [
+            [(epoch_minute(p["begin"]), epoch_minute(p["end"])) for p in entry.get("application_periods", [])]
+            for entry in parsed
+        ]
+        counts = np.array([len(p) for p in periods], dtype=np.int64)
+        flat = [bounds for entry_periods in periods for bounds in entry_periods]
+        added = {
+            "ids": string_array(keys),
+            "empreintes": hashes,
+            "lignes": string_array([",".join(sorted(entry.get("lignes_impactees", []), key=_line_order))
+                                     for entry in parsed]),
+            "priorites": np.array([int(entry.get("priority") or 0) for entry in parsed], dtype=np.int16),
+            "statuts": string_array([str(entry.get("status", "")) for entry in parsed]),
+            "causes": string_array([str(entry.get("cause", "")) for entry in parsed]),
+            "categories": string_array([str(entry.get("category", "")) for entry in parsed]),
+            "premiere_vue": first_seen,
+            "derniere_vue": np.full(len(keys), instant, dtype=np.int64),
+            "fermee_a": np.full(len(keys), -1, dtype=np.int64),
+            "periodes_offsets": np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+            "periodes_debut": np.array([bounds[0] for bounds in flat], dtype=np.int64),
+            "periodes_fin": np.array([bounds[1] for bounds in flat], dtype=np.int64),
+        }
+
+        merged = {name: np.concatenate([kept_columns[name], added[name]]) for name in _ROW_COLUMNS}
+        order = np.argsort(merged["ids"], kind="stable")
+        for name in _ROW_COLUMNS:
+            setattr(self, name, merged[name][order])
+
+        # Périodes : concaténées puis réordonnées avec la table
+        counts = np.concatenate([np.diff(kept_columns["periodes_offsets"]), counts])
+        self.periodes_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.periodes_debut = np.concatenate([kept_columns["periodes_debut"], added["periodes_debut"]])
+        self.periodes_fin = np.concatenate([kept_columns["periodes_fin"], added["periodes_fin"]])
+        reordered = self._select(order)
+        self.periodes_offsets = reordered["periodes_offsets"]
+        self.periodes_debut = reordered["periodes_debut"]
+        self.periodes_fin = reordered["periodes_fin"]
+
+    def disruptions_for_day(self, day: datetime) -> List[Dict[str, Any]]:
+        """
+        Perturbations observées dans au moins un instantané du jour (format nettoyé du
+        TrafficProcessor), perturbations sans période valide exclues
+
+        Args:
+            day: Jour analysé (seule la date est utilisée)
+
+        Returns:
+            Liste de dicts {"id", "disruption_id", "status", "application_periods",
+            "priority", "lignes_impactees", "cause", "category", "ouverte"}
+        """
+        day_start = epoch_minute(datetime(day.year, day.month, day.day))
+        counts = np.diff(self.periodes_offsets)
+        rows = np.flatnonzero((counts > 0) & (self.derniere_vue >= day_start) &
+                              (self.premiere_vue < day_start + MINUTES_PER_DAY))
+        disruptions = []
+        for row in rows.tolist():
+            disruption_id, _, impact_id = str(self.ids[row]).rpartition(":")
+            begin, end = self.periodes_offsets[row], self.periodes_offsets[row + 1]
+            lignes = str(self.lignes[row])
+            disruptions.append({
+                "id": impact_id,
+                "disruption_id": disruption_id,
+                "status": str(self.statuts[row]),
+                "application_periods": [
+                    {"begin": datetime_from_epoch_minute(start), "end": datetime_from_epoch_minute(stop)}
+                    for start, stop in zip(self.periodes_debut[begin:end].tolist(),
+                                           self.periodes_fin[begin:end].tolist())
+                ],
+                "priority": int(self.priorites[row]),
+                "lignes_impactees": lignes.split(",") if lignes else [],
+                "cause": str(self.causes[row]),
+                "category": str(self.categories[row]),
+                "ouverte": bool(self.fermee_a[row] < 0)
+            })
+        return disruptions
+
+    def summary(self, day: Optional[datetime] = None) -> Dict[str, Any]:
+        """
+        Résumé : perturbations suivies / ouvertes, transitions du jour et bilan du
+        dernier instantané
+
+        Args:
+            day: Jour des transitions ouverture / fermeture (défaut: aucun)
+
+        Returns:
+            Dict {"perturbations", "ouvertes", "horloge", "dernier_instantane"
+            [, "ouvertures_jour", "fermetures_jour"]}
+        """
+        result = {
+            "perturbations": len(self),
+            "ouvertes": int((self.fermee_a < 0).sum()),
+            "horloge": datetime_from_epoch_minute(self.horloge).isoformat() if self.horloge >= 0 else None,
+            "dernier_instantane": dict(self.dernier_instantane)
+        }
+        if day is not None:
+            day_start = epoch_minute(datetime(day.year, day.month, day.day))
+            day_end = day_start + MINUTES_PER_DAY
+            result["ouvertures_jour"] = int(((self.premiere_vue >= day_start) & (self.premiere_vue < day_end)).sum())
+            result["fermetures_jour"] = int(((self.fermee_a >= day_start) & (self.fermee_a < day_end)).sum())
+        return result
+
+
+def _line_order(ligne: str) -> Any:
+    """Tri des lignes : numériques d'abord, dans l'ordre"""
+    return (0, int(ligne), "") if ligne.isdigit() else (1, 0, ligne)
+
+
+def day_state_path(day: datetime, directory: Path = PERTURBATIONS_RATP_DIR) -> Path:
+    """Fichier d'état d'un jour de référence"""
+    return Path(directory) / f"perturbations_{day:%Y-%m-%d}.npz"
+
+
+def _previous_state_path(day: datetime, directory: Path) -> Optional[Path]:
+    """Fichier d'état du dernier jour antérieur disponible (None si aucun)"""
+    name = day_state_path(day, directory).name
+    previous = sorted(path for path in Path(directory).glob("perturbations_????-??-??.npz") if path.name < name)
+    return previous[-1] if previous else None
+
+
+def load_day_state(day: datetime, directory: Path = PERTURBATIONS_RATP_DIR,
+                   rebuild: bool = False) -> DisruptionState:
+    """
+    État des perturbations d'un jour de référence
+
+    L'état du jour est relu s'il existe ; sinon (ou en reconstruction) l'état final du
+    dernier jour antérieur disponible sert de point de départ (perturbations ouvertes
+    et dates de première vue conservées), état vide à défaut.
+
+    Args:
+        day: Jour de référence (seule la date est utilisée)
+        directory: Répertoire des états quotidiens
+        rebuild: Ignorer l'état existant du jour
+
+    Returns:
+        DisruptionState
+    """
+    path = day_state_path(day, directory)
+    if path.exists() and not rebuild:
+        return DisruptionState.load(path)
+    previous = _previous_state_path(day, directory)
+    state = DisruptionState.load(previous) if previous else DisruptionState()
+    state.dernier_instantane = {}
+    return state
+
+
+def save_day_state(state: DisruptionState, day: datetime, directory: Path = PERTURBATIONS_RATP_DIR,
+                   keep_days: int = PERTURBATIONS_ETATS_JOURS) -> Path:
+    """
+    Écrit l'état d'un jour de référence et supprime les états de plus de keep_days jours
+
+    Args:
+        state: État à écrire
+        day: Jour de référence
+        directory: Répertoire des états quotidiens
+        keep_days: Jours d'états conservés avant le jour écrit
+
+    Returns:
+        Chemin du fichier écrit
+    """
+    path = day_state_path(day, directory)
+    state.save(path)
+    oldest = day_state_path(day - timedelta(days=keep_days), directory).name
+    for old in Path(directory).glob("perturbations_????-??-??.npz"):
+        if old.name < oldest:
+            old.unlink(missing_ok=True)
+    return path
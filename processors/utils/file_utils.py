@@ -54,6 +54,36 @@ def load_csv(file_path: str,
     return records
 
 
+def iter_csv(file_path: str,
+             separator: str = ";",
+             encoding: str = "utf-8") -> Iterator[Dict]:
+    """
+    Parcourt un fichier CSV ligne par ligne (sans charger tout le fichier en mémoire)
+    
+    Args:
+        file_path: Chemin du fichier CSV
+        separator: Séparateur (défaut: ";")
+        encoding: Encodage (défaut: "utf-8")
+    
+    Yields:
+        Enregistrements (dict) nettoyés, un par ligne
+    """
+    try:
+        # Utiliser utf-8-sig pour retirer automatiquement le BOM si présent
+        actual_encoding = 'utf-8-sig' if encoding == 'utf-8' else encoding
+        
+        with open(file_path, 'r', encoding=actual_encoding) as f:
+            reader = csv.DictReader(f, delimiter=separator)
+            
+            for row in reader:
+                yield {k.strip().lstrip('\ufeff'): v.strip() if isinstance(v, str) else v 
+                       for k, v in row.items()}
+    
+    except Exception as e:
+        print(f"Erreur lecture CSV {file_path}: {e}")
+        return
+
+
 def save_csv(data: List[Dict],
             file_path: str,
             separator: str = ";",
@@ -6,6 +6,7 @@ import json
 import math
 from typing import Optional, List, Tuple, Dict, Any
 from .validators import validate_geojson
+from .arrondissements import locate_arrondissement, locate_arrondissements
 
 
 def calculate_line_length(geo_shape_linestring: Any) -> float:
@@ -76,56 +77,35 @@ def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
 def get_arrondissement_from_coordinates(lon: float, lat: float) -> Optional[str]:
     """
     Détermine l'arrondissement depuis les coordonnées GPS
-    (Version simplifiée - dans un vrai projet, utiliser une API géographique)
+    (point-dans-polygone sur les polygones des arrondissements, résultat mémoïsé)
     
     Args:
         lon: Longitude
         lat: Latitude
     
     Returns:
-        Code arrondissement ou None
+        Code arrondissement ou None (hors Paris)
     """
-    # Vérification zone Paris
-    if not (2.2 <= lon <= 2.4 and 48.8 <= lat <= 48.9):
+    try:
+        return locate_arrondissement(float(lon), float(lat))
+    except (TypeError, ValueError):
         return None
+
+
+def get_arrondissements_from_coordinates(lons: List[float], lats: List[float]) -> List[Optional[str]]:
+    """
+    Détermine les arrondissements d'un lot de points (vectorisé)
     
-    # Approximation basée sur zones géographiques
-    # Zones approximatives des arrondissements Paris
-    
-    # Centre (1er, 2e, 3e, 4e)
-    if 2.33 <= lon <= 2.36 and 48.85 <= lat <= 48.86:
-        if lat < 48.855:
-            return "75004"
-        else:
-            return "75001"
-    
-    # Nord (9e, 10e)
-    if 2.34 <= lon <= 2.37 and 48.87 <= lat <= 48.88:
-        return "75009"
-    
-    # Est (11e, 12e)
-    if 2.37 <= lon <= 2.40 and 48.84 <= lat <= 48.86:
-        if lat < 48.85:
-            return "75012"
-        else:
-            return "75011"
-    
-    # Ouest (16e, 17e)
-    if 2.25 <= lon <= 2.30 and 48.84 <= lat <= 48.88:
-        return "75016"
-    
-    # Sud (13e, 14e, 15e)
-    if 2.30 <= lon <= 2.36 and 48.82 <= lat <= 48.84:
-        if lon < 2.33:
-            return "75015"
-        elif lon < 2.35:
-            return "75014"
-        else:
-            return "75013"
+    Args:
+        lons: Longitudes
+        lats: Latitudes
     
-    # Par défaut, retourner None
-    # Dans un vrai projet, utiliser shapely ou une API géographique
-    return None
+    Returns:
+        Liste de codes arrondissement (None hors Paris)
+    """
+    if not len(lons):
+        return []
+    return locate_arrondissements(lons, lats)
 
 
 def point_in_polygon(point: Tuple[float, float], polygon_coords: List[List[float]]) -> bool:
@@ -212,25 +192,21 @@ def calculate_polygon_area_simple(coordinates: List[List[float]]) -> float:
     if len(coordinates) < 3:
         return 0.0
     
-    # Utiliser la formule de l'aire de Gauss (adaptée pour coordonnées GPS)
+    # Formule de Gauss en projection équirectangulaire locale (latitude moyenne)
+    R = 6371000  # Rayon Terre en m
+    lat_ref = math.radians(sum(c[1] for c in coordinates) / len(coordinates))
+    scale_x = R * math.cos(lat_ref)
+    
     area = 0.0
     n = len(coordinates)
     
     for i in range(n):
         j = (i + 1) % n
-        lat1, lon1 = coordinates[i][1], coordinates[i][0]  # Inverser pour lat/lon
-        lat2, lon2 = coordinates[j][1], coordinates[j][0]
-        
-        # Approximation simple (dans un vrai projet, utiliser projection UTM)
-        area += math.radians(lon1) * math.radians(lat2) - math.radians(lon2) * math.radians(lat1)
-    
-    area = abs(area) / 2.0
-    
-    # Convertir en m² (approximation)
-    R = 6371000  # Rayon Terre en m
-    area_m2 = area * R * R
+        x1, y1 = math.radians(coordinates[i][0]) * scale_x, math.radians(coordinates[i][1]) * R
+        x2, y2 = math.radians(coordinates[j][0]) * scale_x, math.radians(coordinates[j][1]) * R
+        area += x1 * y2 - x2 * y1
     
-    return area_m2
+    return abs(area) / 2.0
 
 
 def extract_center_point(geo_shape: Any) -> Optional[Tuple[float, float]]:
@@ -0,0 +1,455 @@
+"""
+Noyaux géométriques vectorisés : longueurs, surfaces et centres de lots de géométries
+
+Toutes les coordonnées d'un lot sont aplaties dans un tableau contigu (lon, lat) avec
+des offsets par partie (ligne / anneau extérieur) et par géométrie : haversines de
+segments, surfaces projetées (équirectangulaire locale) et centres sont calculés pour
+toutes les formes en une fois. Les résultats sont mis en cache par empreinte de
+géométrie : une forme inchangée n'est jamais recalculée (cache persistant optionnel).
+"""
+
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import CACHE_DIR
+
+EARTH_RADIUS_M = 6371000.0
+
+# Types de géométrie
+KIND_NONE = 0
+KIND_POINT = 1
+KIND_LINE = 2
+KIND_POLYGON = 3
+
+
+def geometry_hash(geo_shape: Any) -> Optional[str]:
+    """
+    Empreinte d'une géométrie GeoJSON (chaîne brute ou dict)
+
+    Returns:
+        Empreinte hexadécimale (16 octets) ou None si géométrie vide
+    """
+    if not geo_shape:
+        return None
+    if not isinstance(geo_shape, str):
+        geo_shape = json.dumps(geo_shape, sort_keys=True, separators=(",", ":"))
+    return hashlib.blake2b(geo_shape.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _parts_of_geometry(geo_shape: Any) -> Tuple[int, List[Sequence]]:
+    """
+    Parties d'une géométrie : lignes pour (Multi)LineString, anneaux extérieurs
+    pour (Multi)Polygon, point unique pour Point
+
+    Returns:
+        Tuple (type, liste de listes de coordonnées)
+    """
+    try:
+        if isinstance(geo_shape, str):
+            geo_shape = json.loads(geo_shape)
+        geo_type = geo_shape.get("type")
+        coordinates = geo_shape.get("coordinates") or []
+    except (ValueError, AttributeError):
+        return KIND_NONE, []
+
+    if geo_type == "Point" and len(coordinates) >= 2:
+        return KIND_POINT, [[coordinates]]
+    if geo_type == "LineString":
+        return KIND_LINE, [coordinates]
+    if geo_type == "MultiLineString":
+        return KIND_LINE, list(coordinates)
+    if geo_type == "Polygon":
+        return KIND_POLYGON, coordinates[:1]
+    if geo_type == "MultiPolygon":
+        return KIND_POLYGON, [polygon[0] for polygon in coordinates if polygon]
+    return KIND_NONE, []
+
+
+class GeometryBatch:
+    """
+    Lot de géométries aplaties
+
+    Attributes:
+        coords: Coordonnées (N, 2) lon/lat float64 de toutes les parties
+        part_offsets: Début de chaque partie dans coords (n_parties + 1)
+        geometry_offsets: Première partie de chaque géométrie (n + 1)
+        kinds: Type de chaque géométrie (int8)
+    """
+
+    def __init__(self, geo_shapes: Sequence[Any]):
+        """
+        Args:
+            geo_shapes: Géométries GeoJSON (chaînes ou dicts, None accepté)
+        """
+        coordinates: List[Tuple[float, float]] = []
+        part_offsets = [0]
+        geometry_offsets = [0]
+        kinds = []
+
+        for geo_shape in geo_shapes:
+            kind, parts = _parts_of_geometry(geo_shape) if geo_shape else (KIND_NONE, [])
+            valid_parts = []
+            for part in parts:
+                try:
+                    points = [(float(p[0]), float(p[1])) for p in part]
+                except (TypeError, ValueError, IndexError):
+                    continue
+                if points:
+                    valid_parts.append(points)
+
+            kinds.append(kind if valid_parts else KIND_NONE)
+            for points in valid_parts:
+                coordinates.extend(points)
+                part_offsets.append(len(coordinates))
+            geometry_offsets.append(len(part_offsets) - 1)
+
+        self.coords = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.part_offsets = np.asarray(part_offsets, dtype=np.int64)
+        self.geometry_offsets = np.asarray(geometry_offsets, dtype=np.int64)
+        self.kinds = np.asarray(kinds, dtype=np.int8)
+
+        # Index partie → géométrie et point → partie
+        self.part_geometry = np.repeat(np.arange(len(self.kinds)), np.diff(self.geometry_offsets))
+        self.point_part = np.repeat(np.arange(len(self.part_offsets) - 1), np.diff(self.part_offsets))
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def _segments(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Segments internes aux parties
+
+        Returns:
+            Tuple (index du premier point de chaque segment, géométrie du segment)
+        """
+        if len(self.coords) < 2:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        same_part = self.point_part[:-1] == self.point_part[1:]
+        starts = np.nonzero(same_part)[0]
+        return starts, self.part_geometry[self.point_part[starts]]
+
+    def _segment_lengths(self, starts: np.ndarray) -> np.ndarray:
+        """Longueurs haversine (m) des segments commençant aux points donnés"""
+        lon1, lat1 = np.radians(self.coords[starts]).T
+        lon2, lat2 = np.radians(self.coords[starts + 1]).T
+        a = (np.sin((lat2 - lat1) / 2.0) ** 2 +
+             np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2)
+        return 2.0 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1.0 - a))
+
+    def line_lengths(self) -> np.ndarray:
+        """
+        Longueur de chaque géométrie linéaire (somme des parties)
+
+        Returns:
+            Longueurs en mètres (n,), 0 pour les autres types
+        """
+        starts, segment_geometry = self._segments()
+        lengths = self._segment_lengths(starts)
+        totals = np.bincount(segment_geometry, weights=lengths, minlength=len(self))
+        return np.where(self.kinds == KIND_LINE, totals, 0.0)
+
+    def segments(self) -> Dict[str, np.ndarray]:
+        """
+        Table des segments de toutes les parties (triés par géométrie)
+
+        Returns:
+            Dict {"debut": (S, 2) lon/lat, "fin": (S, 2), "geometrie": (S,), "longueur": (S,) m}
+        """
+        starts, segment_geometry = self._segments()
+        return {
+            "debut": self.coords[starts],
+            "fin": self.coords[starts + 1],
+            "geometrie": segment_geometry,
+            "longueur": self._segment_lengths(starts)
+        }
+
+    def _reference_cos(self) -> np.ndarray:
+        """Cosinus de la latitude moyenne de chaque géométrie (projection locale)"""
+        point_geometry = self.part_geometry[self.point_part]
+        counts = np.bincount(point_geometry, minlength=len(self))
+        sums = np.bincount(point_geometry, weights=self.coords[:, 1], minlength=len(self))
+        return np.cos(np.radians(sums / np.maximum(counts, 1)))
+
+    def _ring_terms(self) -> Dict[str, np.ndarray]:
+        """
+        Termes du shoelace en projection équirectangulaire locale (anneaux fermés
+        implicitement), agrégés par géométrie
+
+        Returns:
+            Dict {"surface", "moment_x", "moment_y", "moyenne_x", "moyenne_y"} (n,)
+        """
+        n = len(self)
+        point_geometry = self.part_geometry[self.point_part]
+        x = EARTH_RADIUS_M * np.radians(self.coords[:, 0]) * self._reference_cos()[point_geometry]
+        y = EARTH_RADIUS_M * np.radians(self.coords[:, 1])
+
+        # Point suivant dans le même anneau (retour au premier point en fin d'anneau)
+        following = np.arange(1, len(x) + 1)
+        following[self.part_offsets[1:] - 1] = self.part_offsets[:-1]
+
+        cross = x * y[following] - x[following] * y
+        n_parts = len(self.part_offsets) - 1
+        ring_area = np.bincount(self.point_part, weights=cross, minlength=n_parts) / 2.0
+        ring_mx = np.bincount(self.point_part, weights=(x + x[following]) * cross, minlength=n_parts)
+        ring_my = np.bincount(self.point_part, weights=(y + y[following]) * cross, minlength=n_parts)
+
+        # Orientation normalisée par anneau (extérieurs tous comptés positivement)
+        sign = np.where(ring_area < 0, -1.0, 1.0)
+        counts = np.maximum(np.bincount(point_geometry, minlength=n), 1)
+        return {
+            "surface": np.bincount(self.part_geometry, weights=np.abs(ring_area), minlength=n),
+            "moment_x": np.bincount(self.part_geometry, weights=ring_mx * sign, minlength=n),
+            "moment_y": np.bincount(self.part_geometry, weights=ring_my * sign, minlength=n),
+            "moyenne_x": np.bincount(point_geometry, weights=x, minlength=n) / counts,
+            "moyenne_y": np.bincount(point_geometry, weights=y, minlength=n) / counts
+        }
+
+    def polygon_areas(self) -> np.ndarray:
+        """
+        Surface de chaque géométrie polygonale (somme des anneaux extérieurs)
+
+        Returns:
+            Surfaces en m² (n,), 0 pour les autres types
+        """
+        if len(self.coords) == 0:
+            return np.zeros(len(self))
+        return np.where(self.kinds == KIND_POLYGON, self._ring_terms()["surface"], 0.0)
+
+    def centers(self) -> np.ndarray:
+        """
+        Centre de chaque géométrie :
+        - Point : le point
+        - Ligne : point situé à mi-longueur (sur la ligne)
+        - Polygone : centroïde pondéré par la surface (moyenne des sommets si dégénéré)
+
+        Returns:
+            Tableau (n, 2) lon/lat, NaN si géométrie vide ou invalide
+        """
+        n = len(self)
+        centers = np.full((n, 2), np.nan)
+        if len(self.coords) == 0:
+            return centers
+
+        # Repli (et points) : premier sommet de la géométrie
+        valid = self.kinds != KIND_NONE
+        centers[valid] = self.coords[self.part_offsets[self.geometry_offsets[:-1][valid]]]
+
+        # Lignes : interpolation au point de mi-longueur
+        starts, segment_geometry = self._segments()
+        if starts.size and (self.kinds == KIND_LINE).any():
+            lengths = self._segment_lengths(starts)
+            cumulative = np.cumsum(lengths)
+            before = cumulative - lengths
+            totals = np.bincount(segment_geometry, weights=lengths, minlength=n)
+            first_segment = np.searchsorted(segment_geometry, np.arange(n), side="left")
+
+            lines = np.nonzero((self.kinds == KIND_LINE) & (totals > 0))[0]
+            targets = before[first_segment[lines]] + totals[lines] / 2.0
+            segments = np.minimum(np.searchsorted(cumulative, targets, side="left"), len(lengths) - 1)
+            fraction = np.clip((targets - before[segments]) / np.maximum(lengths[segments], 1e-12), 0.0, 1.0)
+
+            start_points = self.coords[starts[segments]]
+            end_points = self.coords[starts[segments] + 1]
+            centers[lines] = start_points + (end_points - start_points) * fraction[:, None]
+
+        # Polygones : centroïde pondéré par la surface des anneaux extérieurs
+        polygons = np.nonzero(self.kinds == KIND_POLYGON)[0]
+        if polygons.size:
+            terms = self._ring_terms()
+            area = terms["surface"][polygons]
+            degenerate = area <= 1e-9
+            safe_area = np.where(degenerate, 1.0, area)
+            px = np.where(degenerate, terms["moyenne_x"][polygons], terms["moment_x"][polygons] / (6.0 * safe_area))
+            py = np.where(degenerate, terms["moyenne_y"][polygons], terms["moment_y"][polygons] / (6.0 * safe_area))
+
+            centers[polygons, 0] = np.degrees(px / (EARTH_RADIUS_M * self._reference_cos()[polygons]))
+            centers[polygons, 1] = np.degrees(py / EARTH_RADIUS_M)
+
+        return centers
+
+
+class GeometryCache:
+    """
+    Cache des métriques géométriques par empreinte (longueur, surface, centre)
+
+    Persistant si un chemin est fourni (fichier .npz rechargé à la création). Peut aussi
+    s'appuyer sur des tableaux triés en lecture seule (mémoire partagée entre workers) :
+    les entrées ajoutées ensuite restent locales au processus.
+    """
+
+    def __init__(self, path: Any = None, max_entries: int = 500000):
+        """
+        Args:
+            path: Fichier de persistance (.npz), None pour un cache mémoire seul
+            max_entries: Nombre maximal d'entrées
+        """
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.entries: Dict[str, Tuple[float, float, float, float]] = {}
+        self.dirty = False
+        self.shared_keys: Optional[np.ndarray] = None  # Empreintes triées (lecture seule)
+        self.shared_values: Optional[np.ndarray] = None
+        if self.path and self.path.exists():
+            self.load()
+
+    def load(self) -> None:
+        """Recharge le cache persistant (ignoré si illisible)"""
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                keys = data["keys"].tolist()
+                values = data["values"].tolist()
+            self.entries = dict(zip(keys, map(tuple, values)))
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Cache géométries illisible ({self.path}): {e}")
+            self.entries = {}
+
+    def save(self) -> None:
+        """Écrit le cache persistant s'il a changé"""
+        if not self.path or not self.dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            keys = np.asarray(list(self.entries), dtype="U32")
+            values = np.asarray(list(self.entries.values()), dtype=np.float64).reshape(-1, 4)
+            tmp_path = self.path.with_name(self.path.stem + ".tmp.npz")
+            np.savez(tmp_path, keys=keys, values=values)
+            tmp_path.replace(self.path)
+            self.dirty = False
+        except OSError as e:
+            print(f"⚠ Écriture cache géométries impossible ({self.path}): {e}")
+
+    @classmethod
+    def from_arrays(cls, keys: np.ndarray, values: np.ndarray) -> "GeometryCache":
+        """
+        Cache non persistant adossé à des tableaux partagés (voir to_arrays)
+
+        Args:
+            keys: Empreintes triées (U32)
+            values: Métriques (n, 4)
+
+        Returns:
+            GeometryCache
+        """
+        cache = cls()
+        cache.shared_keys = keys
+        cache.shared_values = values
+        return cache
+
+    def to_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Contenu du cache en tableaux triés par empreinte (publication en mémoire partagée)
+
+        Returns:
+            Tuple (empreintes U32, métriques (n, 4))
+        """
+        entries = dict(self.entries)
+        if self.shared_keys is not None:
+            for key, row in zip(self.shared_keys.tolist(), self.shared_values.tolist()):
+                entries.setdefault(key, tuple(row))
+        keys = sorted(entries)
+        values = np.asarray([entries[key] for key in keys], dtype=np.float64).reshape(-1, 4)
+        return np.asarray(keys, dtype="U32"), values
+
+    def get(self, key: str) -> Optional[Tuple[float, float, float, float]]:
+        """Métriques en cache (longueur, surface, lon, lat) ou None"""
+        value = self.entries.get(key)
+        if value is None and self.shared_keys is not None and len(self.shared_keys):
+            position = int(np.searchsorted(self.shared_keys, key))
+            if position < len(self.shared_keys) and self.shared_keys[position] == key:
+                value = tuple(self.shared_values[position].tolist())
+        return value
+
+    def put(self, key: str, value: Tuple[float, float, float, float]) -> None:
+        """Ajoute des métriques au cache (vidé s'il est plein)"""
+        if len(self.entries) >= self.max_entries:
+            self.entries.clear()
+        self.entries[key] = value
+        self.dirty = True
+
+
+_default_cache: Optional[GeometryCache] = None
+
+
+def get_geometry_cache() -> GeometryCache:
+    """Cache partagé, persistant dans CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = GeometryCache(Path(CACHE_DIR) / "geometries.npz")
+    return _default_cache
+
+
+def save_geometry_cache() -> None:
+    """Écrit le cache partagé s'il a changé (une fois en fin d'exécution)"""
+    if _default_cache is not None:
+        _default_cache.save()
+
+
+def set_geometry_cache(cache: Optional[GeometryCache]) -> None:
+    """Remplace le cache partagé du processus (workers : cache en mémoire partagée)"""
+    global _default_cache
+    _default_cache = cache
+
+
+def compute_geometry_metrics(geo_shapes: Sequence[Any],
+                             cache: Optional[GeometryCache] = None) -> Dict[str, np.ndarray]:
+    """
+    Longueurs, surfaces et centres d'un lot de géométries (calcul vectorisé des seules
+    géométries absentes du cache, une fois par empreinte)
+
+    Args:
+        geo_shapes: Géométries GeoJSON (chaînes ou dicts, None accepté)
+        cache: Cache des métriques (défaut: cache partagé, marqué modifié et écrit en fin
+            d'exécution par save_geometry_cache)
+
+    Returns:
+        Dict de tableaux (n,) : "longueur_metres", "surface_m2", "centre_lon", "centre_lat"
+        (centre NaN si géométrie vide ou invalide)
+    """
+    if cache is None:
+        cache = get_geometry_cache()
+
+    values = np.zeros((len(geo_shapes), 4))
+    values[:, 2:] = np.nan
+
+    # Géométries à calculer : une entrée par empreinte absente du cache
+    cached_positions, cached_rows = [], []
+    missing: Dict[str, int] = {}  # empreinte → rang dans le lot à calculer
+    missing_positions, missing_slots = [], []
+    for i, geo_shape in enumerate(geo_shapes):
+        key = geometry_hash(geo_shape)
+        if key is None:
+            continue
+        cached = cache.get(key)
+        if cached is not None:
+            cached_positions.append(i)
+            cached_rows.append(cached)
+        else:
+            slot = missing.setdefault(key, len(missing))
+            missing_positions.append(i)
+            missing_slots.append(slot)
+
+    if cached_positions:
+        values[cached_positions] = cached_rows
+
+    if missing:
+        first_positions = np.zeros(len(missing), dtype=np.int64)
+        first_positions[missing_slots[::-1]] = missing_positions[::-1]
+        batch = GeometryBatch([geo_shapes[i] for i in first_positions.tolist()])
+        computed = np.column_stack([batch.line_lengths(), batch.polygon_areas(), batch.centers()])
+        values[missing_positions] = computed[missing_slots]
+        for key, row in zip(missing, computed.tolist()):
+            cache.put(key, tuple(row))
+
+    return {
+        "longueur_metres": values[:, 0],
+        "surface_m2": values[:, 1],
+        "centre_lon": values[:, 2],
+        "centre_lat": values[:, 3]
+    }
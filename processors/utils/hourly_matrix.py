@@ -0,0 +1,442 @@
+"""
+Matrices denses entité × heure (24 colonnes) pour profils horaires
+
+Les entités (tronçons, compteurs...) et les heures sont factorisées une seule fois :
+chaque couche est une matrice NumPy (float32 pour les mesures, NaN si absente ;
+uint8 pour les états codés). Pics, durées et totaux horaires deviennent des
+réductions vectorisées sur ces matrices.
+"""
+
+import base64
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .calendar_dimension import DateLike, epoch_day
+from .time_utils import parse_iso_date
+
+HOURS_PER_DAY = 24
+
+# Codes des états de trafic (matrice uint8, 0 = inconnu / absent)
+ETATS_TRAFIC = ("Inconnu", "Fluide", "Pré-saturé", "Saturé", "Bloqué")
+_ETAT_CODES = {etat: code for code, etat in enumerate(ETATS_TRAFIC)}
+
+
+def encode_etat_trafic(etat: Optional[str]) -> int:
+    """
+    Code un état de trafic normalisé
+
+    Args:
+        etat: État normalisé ("Fluide", "Saturé"...)
+
+    Returns:
+        Code uint8 (0 si inconnu)
+    """
+    return _ETAT_CODES.get(etat, 0)
+
+
+def hour_from_iso(date_str: Optional[str]) -> Optional[int]:
+    """
+    Extrait l'heure locale d'une date ISO 8601 (sans parsing complet si possible)
+
+    Args:
+        date_str: Date ISO ("2025-11-03T12:00:00+01:00")
+
+    Returns:
+        Heure (0-23) ou None
+    """
+    if not date_str:
+        return None
+
+    # Chemin rapide : format ISO standard "YYYY-MM-DDTHH..."
+    if len(date_str) >= 13 and date_str[10] in "T " and date_str[11:13].isdigit():
+        hour = int(date_str[11:13])
+        return hour if hour < HOURS_PER_DAY else None
+
+    parsed = parse_iso_date(date_str)
+    return parsed.hour if parsed else None
+
+
+def _utc_offset_minutes(suffix: str) -> Optional[int]:
+    """Décalage UTC (minutes) d'un suffixe ISO ("", "Z", "+01:00", "+0100")"""
+    suffix = suffix.strip()
+    if suffix in ("", "Z"):
+        return 0
+    digits = suffix[1:].replace(":", "")
+    if suffix[0] not in "+-" or len(digits) != 4 or not digits.isdigit():
+        return None
+    minutes = int(digits[:2]) * 60 + int(digits[2:])
+    return -minutes if suffix[0] == "-" else minutes
+
+
+def epoch_hours_from_iso(dates: Iterable[Optional[str]]) -> np.ndarray:
+    """
+    Heures absolues (heures UTC depuis 1970-01-01) d'un lot de dates ISO 8601
+
+    Args:
+        dates: Dates ISO ("2025-11-03T12:00:00+01:00", fuseau absent : UTC)
+
+    Returns:
+        Tableau int64 (-1 si date illisible)
+    """
+    dates = list(dates)
+    hours = np.full(len(dates), -1, dtype=np.int64)
+    local: List[str] = []
+    offsets: List[int] = []
+    positions: List[int] = []
+    for position, date_str in enumerate(dates):
+        if not date_str:
+            continue
+        offset = None
+        # Chemin rapide : "YYYY-MM-DDTHH[:MM:SS][fuseau]"
+        if len(date_str) >= 13 and date_str[10] in "T " and date_str[11:13].isdigit():
+            offset = _utc_offset_minutes(date_str[19:] if len(date_str) >= 19 else "")
+            stamp = f"{date_str[:10]}T{date_str[11:13]}"
+        if offset is None:
+            parsed = parse_iso_date(date_str)
+            if parsed is None:
+                continue
+            delta = parsed.utcoffset()
+            offset = int(delta.total_seconds() // 60) if delta is not None else 0
+            stamp = parsed.strftime("%Y-%m-%dT%H")
+        local.append(stamp)
+        offsets.append(offset)
+        positions.append(position)
+
+    if local:
+        try:
+            local_hours = np.array(local, dtype="datetime64[h]").astype(np.int64)
+        except ValueError:
+            local_hours = np.array([_safe_hour(stamp) for stamp in local], dtype=np.int64)
+        utc_hours = (local_hours * 60 - np.asarray(offsets, dtype=np.int64)) // 60
+        hours[positions] = np.where(local_hours >= 0, utc_hours, -1)
+    return hours
+
+
+def _safe_hour(stamp: str) -> int:
+    """Heure absolue d'un horodatage "YYYY-MM-DDTHH" (-1 si invalide)"""
+    try:
+        return int(np.datetime64(stamp, "h").astype(np.int64))
+    except ValueError:
+        return -1
+
+
+def iso_from_epoch_hour(epoch_hour: int) -> str:
+    """Horodatage ISO UTC d'une heure absolue ("2025-11-03T08:00:00+00:00")"""
+    return f"{np.datetime64(int(epoch_hour), 'h')}:00:00+00:00"
+
+
+def _last_sunday_epoch_hour(year: int, month: int) -> int:
+    """Heure absolue de 01:00 UTC le dernier dimanche d'un mois (changement d'heure UE)"""
+    month_end = np.datetime64(f"{year}-{month + 1:02d}-01", "D") - 1
+    # 1970-01-01 était un jeudi : (jour + 4) % 7 = jours écoulés depuis le dimanche (dimanche = 0)
+    day = int(month_end.astype(np.int64))
+    day -= (day + 4) % 7
+    return day * HOURS_PER_DAY + 1
+
+
+def epoch_hours_of_day(day: DateLike) -> np.ndarray:
+    """
+    Heures absolues UTC des 24 heures locales (Europe/Paris) d'une journée, index
+    commun aux matrices horaires (colonnes 0-23) et aux séries datées (epoch_hours_from_iso)
+
+    Args:
+        day: Journée (date, "YYYY-MM-DD"...)
+
+    Returns:
+        Tableau int64 (24,) ; heure locale inexistante (passage à l'heure d'été) :
+        même heure absolue que l'heure suivante
+    """
+    local = epoch_day(day) * HOURS_PER_DAY + np.arange(HOURS_PER_DAY, dtype=np.int64)
+    year = int(np.datetime64(epoch_day(day), "D").astype("datetime64[Y]").astype(np.int64)) + 1970
+    summer_start = _last_sunday_epoch_hour(year, 3)
+    summer_end = _last_sunday_epoch_hour(year, 10)
+    summer = (local - 2 >= summer_start) & (local - 2 < summer_end)
+    return np.where(summer, local - 2, local - 1)
+
+
+def matrix_epoch_hours(day: str, dates: Sequence[Optional[str]], epoch_hours: np.ndarray) -> np.ndarray:
+    """
+    Heures absolues des 24 colonnes d'une matrice horaire (colonne = heure lue dans la
+    date ISO, cf. hour_from_iso), d'après les enregistrements de la journée : correct
+    quel que soit le fuseau des horodatages (UTC, Europe/Paris)
+
+    Args:
+        day: Journée (YYYY-MM-DD)
+        dates: Dates ISO des enregistrements
+        epoch_hours: Heures absolues des mêmes enregistrements (epoch_hours_from_iso)
+
+    Returns:
+        Tableau int64 (24,) ; colonnes sans enregistrement : heures locales Europe/Paris
+    """
+    columns = epoch_hours_of_day(day)
+    distinct, first = np.unique(np.asarray(epoch_hours, dtype=np.int64), return_index=True)
+    for epoch_hour, position in zip(distinct.tolist(), first.tolist()):
+        date_str = dates[position]
+        if epoch_hour < 0 or not date_str or str(date_str)[:10] != day:
+            continue
+        hour = hour_from_iso(date_str)
+        if hour is not None:
+            columns[hour] = epoch_hour
+    return columns
+
+
+def format_hour_timestamp(date_str: str, hour: int) -> str:
+    """
+    Construit l'horodatage ISO d'une heure de la journée d'une date de référence
+
+    Args:
+        date_str: Date ISO de référence (même jour)
+        hour: Heure (0-23)
+
+    Returns:
+        Horodatage ISO ("2025-11-03T08:00:00+01:00")
+    """
+    if len(date_str) >= 19 and date_str[10] in "T ":
+        return f"{date_str[:11]}{hour:02d}:00:00{date_str[19:]}"
+    return f"{date_str[:10]}T{hour:02d}:00:00"
+
+
+def _encode_matrix(values: np.ndarray, dtype: str) -> str:
+    """Encode une matrice en base64 (little-endian)"""
+    little_endian = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder("<"))
+    return base64.b64encode(little_endian.tobytes()).decode("ascii")
+
+
+def _decode_matrix(encoded: str, dtype: str, rows: int) -> np.ndarray:
+    """Décode une matrice base64 (little-endian)"""
+    values = np.frombuffer(base64.b64decode(encoded), dtype=np.dtype(dtype).newbyteorder("<"))
+    return values.astype(dtype).reshape(rows, HOURS_PER_DAY)
+
+
+class EntityHourMatrix:
+    """
+    Couches entité × 24 heures partageant le même index d'entités
+
+    Couches float32 : moyenne des mesures de la cellule (NaN si aucune mesure).
+    Couches uint8 : codes (dernier code observé, 0 si aucun).
+    """
+
+    def __init__(self, entity_ids: List[str], layers: Optional[Dict[str, np.ndarray]] = None):
+        """
+        Args:
+            entity_ids: Identifiants des entités (ordre des lignes)
+            layers: Couches {nom: matrice (n_entites, 24)}
+        """
+        self.entity_ids = list(entity_ids)
+        self.index = {entity_id: row for row, entity_id in enumerate(self.entity_ids)}
+        self.layers: Dict[str, np.ndarray] = dict(layers or {})
+
+    @classmethod
+    def from_records(cls, records: Iterable[Dict],
+                     id_field: str,
+                     date_field: str,
+                     value_fields: Dict[str, str],
+                     code_fields: Optional[Dict[str, Tuple[str, Callable[[Any], int]]]] = None
+                     ) -> "EntityHourMatrix":
+        """
+        Construit les matrices en une passe sur les enregistrements
+
+        Args:
+            records: Enregistrements (un par entité et par heure)
+            id_field: Champ identifiant l'entité
+            date_field: Champ date ISO
+            value_fields: Couches float32 {nom_couche: champ}
+            code_fields: Couches uint8 {nom_couche: (champ, fonction_codage)}
+
+        Returns:
+            EntityHourMatrix
+        """
+        code_fields = code_fields or {}
+        entity_ids: List[str] = []
+        index: Dict[str, int] = {}
+        rows: List[int] = []
+        hours: List[int] = []
+        values: Dict[str, List[float]] = {name: [] for name in value_fields}
+        codes: Dict[str, List[int]] = {name: [] for name in code_fields}
+
+        # Factorisation entités / heures (seule boucle Python)
+        for record in records:
+            hour = hour_from_iso(record.get(date_field))
+            if hour is None:
+                continue
+
+            entity_id = record.get(id_field)
+            row = index.get(entity_id)
+            if row is None:
+                row = index[entity_id] = len(entity_ids)
+                entity_ids.append(entity_id)
+
+            rows.append(row)
+            hours.append(hour)
+            for name, field in value_fields.items():
+                value = record.get(field)
+                values[name].append(np.nan if value is None else value)
+            for name, (field, encode) in code_fields.items():
+                codes[name].append(encode(record.get(field)))
+
+        n_entities = len(entity_ids)
+        row_idx = np.asarray(rows, dtype=np.int64)
+        hour_idx = np.asarray(hours, dtype=np.int64)
+        flat_idx = row_idx * HOURS_PER_DAY + hour_idx
+        size = n_entities * HOURS_PER_DAY
+
+        layers = {}
+        for name in value_fields:
+            column = np.asarray(values[name], dtype=np.float64)
+            valid = ~np.isnan(column)
+            sums = np.bincount(flat_idx[valid], weights=column[valid], minlength=size)
+            counts = np.bincount(flat_idx[valid], minlength=size)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = np.where(counts > 0, sums / np.maximum(counts, 1), np.nan)
+            layers[name] = mean.astype(np.float32).reshape(n_entities, HOURS_PER_DAY)
+
+        for name in code_fields:
+            matrix = np.zeros(size, dtype=np.uint8)
+            matrix[flat_idx] = np.asarray(codes[name], dtype=np.uint8)
+            layers[name] = matrix.reshape(n_entities, HOURS_PER_DAY)
+
+        return cls(entity_ids, layers)
+
+    def __len__(self) -> int:
+        return len(self.entity_ids)
+
+    def layer(self, name: str) -> np.ndarray:
+        """Retourne une couche (KeyError si absente)"""
+        return self.layers[name]
+
+    def select(self, entity_ids: Iterable[str]) -> "EntityHourMatrix":
+        """
+        Sous-matrice de quelques entités (entités inconnues ou répétées ignorées)
+
+        Args:
+            entity_ids: Identifiants à conserver (ordre conservé)
+
+        Returns:
+            Nouvelle matrice
+        """
+        kept = [entity_id for entity_id in dict.fromkeys(entity_ids) if entity_id in self.index]
+        rows = np.asarray([self.index[entity_id] for entity_id in kept], dtype=np.int64)
+        return EntityHourMatrix(kept, {name: values[rows] for name, values in self.layers.items()})
+
+    def row(self, name: str, entity_id: str) -> Optional[np.ndarray]:
+        """
+        Profil horaire d'une entité pour une couche
+
+        Returns:
+            Vecteur de 24 valeurs ou None si entité inconnue
+        """
+        row = self.index.get(entity_id)
+        if row is None:
+            return None
+        return self.layers[name][row]
+
+    def combine(self, other: "EntityHourMatrix") -> "EntityHourMatrix":
+        """
+        Fusionne une autre matrice (ex: chunk suivant) : les entités nouvelles sont
+        ajoutées, les cellules vides (NaN / 0) sont complétées par l'autre matrice
+
+        Returns:
+            Nouvelle matrice fusionnée
+        """
+        entity_ids = self.entity_ids + [e for e in other.entity_ids if e not in self.index]
+        merged = EntityHourMatrix(entity_ids)
+        other_rows = np.asarray([merged.index[e] for e in other.entity_ids], dtype=np.int64)
+
+        for name in set(self.layers) | set(other.layers):
+            reference = self.layers.get(name, other.layers.get(name))
+            empty = np.nan if reference.dtype.kind == "f" else 0
+            matrix = np.full((len(entity_ids), HOURS_PER_DAY), empty, dtype=reference.dtype)
+
+            if name in self.layers:
+                matrix[:len(self.entity_ids)] = self.layers[name]
+            if name in other.layers and len(other_rows):
+                current = matrix[other_rows]
+                incoming = other.layers[name]
+                missing = np.isnan(current) if matrix.dtype.kind == "f" else current == 0
+                matrix[other_rows] = np.where(missing, incoming, current)
+
+            merged.layers[name] = matrix
+
+        return merged
+
+    def to_dict(self, layers: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Sérialise les matrices (base64, float32 / uint8) pour stockage compact
+
+        Args:
+            layers: Couches à inclure (défaut: toutes)
+
+        Returns:
+            Dict JSON {"entites", "heures", "couches": {nom: {"dtype", "data"}}}
+        """
+        names = list(layers) if layers is not None else list(self.layers)
+        return {
+            "entites": self.entity_ids,
+            "heures": HOURS_PER_DAY,
+            "couches": {
+                name: {
+                    "dtype": self.layers[name].dtype.name,
+                    "data": _encode_matrix(self.layers[name], self.layers[name].dtype.name)
+                }
+                for name in names if name in self.layers
+            }
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EntityHourMatrix":
+        """Désérialise des matrices stockées avec to_dict"""
+        entity_ids = data.get("entites", [])
+        layers = {
+            name: _decode_matrix(layer["data"], layer["dtype"], len(entity_ids))
+            for name, layer in data.get("couches", {}).items()
+        }
+        return cls(entity_ids, layers)
+
+
+def peak_hours(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Heure de pic par ligne (première heure du maximum)
+
+    Args:
+        values: Matrice (n, 24) avec NaN pour valeurs absentes
+
+    Returns:
+        Tuple (heures int16, -1 si ligne vide ; valeurs au pic, NaN si ligne vide)
+    """
+    if values.shape[0] == 0:
+        return np.zeros(0, dtype=np.int16), np.zeros(0, dtype=values.dtype)
+
+    empty = np.isnan(values).all(axis=1)
+    filled = np.where(np.isnan(values), -np.inf, values)
+    hours = filled.argmax(axis=1).astype(np.int16)
+    peaks = filled[np.arange(values.shape[0]), hours]
+
+    hours[empty] = -1
+    peaks = np.where(empty, np.nan, peaks).astype(values.dtype)
+    return hours, peaks
+
+
+def longest_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Plus longue suite d'heures consécutives à True par ligne
+
+    Args:
+        mask: Matrice booléenne (n, 24)
+
+    Returns:
+        Tuple (longueurs int16, heures de début int16 avec -1 si aucune)
+    """
+    n = mask.shape[0]
+    current = np.zeros(n, dtype=np.int16)
+    best = np.zeros(n, dtype=np.int16)
+    best_start = np.full(n, -1, dtype=np.int16)
+
+    # 24 itérations vectorisées sur toutes les lignes
+    for hour in range(mask.shape[1]):
+        current = np.where(mask[:, hour], current + 1, 0).astype(np.int16)
+        improved = current > best
+        best = np.where(improved, current, best)
+        best_start = np.where(improved, hour - current + 1, best_start).astype(np.int16)
+
+    return best, best_start
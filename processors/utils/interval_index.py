@@ -0,0 +1,249 @@
+"""
+Index d'intervalles de dates (chantiers actifs à une date ou sur une période)
+
+Les intervalles [début, fin] (jours depuis 1970-01-01, bornes incluses) sont indexés
+une seule fois dans un arbre d'intervalles centré statique, stocké à plat dans des
+tableaux NumPy : « actifs à la date D » et « actifs sur [D1, D2] » se résolvent en
+O(log n + k) pour n'importe quelle date de traitement (rejeu d'historique compris),
+sans comparaison à l'heure courante.
+
+Une matrice jour × groupe (arrondissement) des intervalles actifs et de leur poids
+(impact) est aussi précalculée par tableau de différences, avec ses sommes cumulées :
+la charge sur une période quelconque se lit en O(1).
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .calendar_dimension import DateLike, epoch_day
+
+
+class IntervalIndex:
+    """
+    Arbre d'intervalles centré statique (tableaux à plat)
+
+    Chaque nœud porte un centre et les intervalles qui le contiennent, triés par
+    début croissant et par fin décroissante ; les intervalles entièrement à gauche
+    (fin < centre) ou à droite (début > centre) descendent dans les sous-arbres.
+    """
+
+    def __init__(self, starts: Sequence[int], ends: Sequence[int]):
+        """
+        Args:
+            starts: Débuts des intervalles (jours, inclus)
+            ends: Fins des intervalles (jours, incluses ; fin < début : intervalle ignoré)
+        """
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.ends = np.asarray(ends, dtype=np.int64)
+        valid = np.flatnonzero(self.ends >= self.starts)
+        self._by_start = valid[np.argsort(self.starts[valid], kind="stable")]
+        self._sorted_starts = self.starts[self._by_start]
+        self._build(valid)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def _build(self, valid: np.ndarray) -> None:
+        """Construit l'arbre (pile explicite, un nœud par centre)"""
+        centers: List[int] = []
+        lefts: List[int] = []
+        rights: List[int] = []
+        node_by_start: List[np.ndarray] = []
+        node_by_end: List[np.ndarray] = []
+
+        stack: List[Tuple[np.ndarray, int, str]] = [(valid, -1, "")]
+        while stack:
+            members, parent, side = stack.pop()
+            if not len(members):
+                continue
+            # Centre : borne médiane (une borne réelle, le nœud n'est donc jamais vide)
+            bounds = np.sort(np.concatenate([self.starts[members], self.ends[members]]))
+            center = int(bounds[len(bounds) // 2])
+            left = members[self.ends[members] < center]
+            right = members[self.starts[members] > center]
+            here = members[(self.starts[members] <= center) & (self.ends[members] >= center)]
+
+            node = len(centers)
+            centers.append(center)
+            lefts.append(-1)
+            rights.append(-1)
+            node_by_start.append(here[np.argsort(self.starts[here], kind="stable")])
+            node_by_end.append(here[np.argsort(-self.ends[here], kind="stable")])
+            if parent >= 0:
+                (lefts if side == "gauche" else rights)[parent] = node
+            stack.append((left, node, "gauche"))
+            stack.append((right, node, "droite"))
+
+        self._centers = np.asarray(centers, dtype=np.int64)
+        self._lefts = np.asarray(lefts, dtype=np.int64)
+        self._rights = np.asarray(rights, dtype=np.int64)
+        counts = np.array([len(members) for members in node_by_start], dtype=np.int64)
+        self._offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self._node_by_start = (np.concatenate(node_by_start) if node_by_start
+                               else np.zeros(0, dtype=np.int64))
+        self._node_by_end = (np.concatenate(node_by_end) if node_by_end
+                             else np.zeros(0, dtype=np.int64))
+        self._node_starts = self.starts[self._node_by_start]
+        self._node_neg_ends = -self.ends[self._node_by_end]
+
+    def active_on(self, day: DateLike) -> np.ndarray:
+        """
+        Intervalles contenant un jour (début <= jour <= fin)
+
+        Args:
+            day: Jour (date, "YYYY-MM-DD" ou jour depuis 1970-01-01)
+
+        Returns:
+            Positions des intervalles (triées)
+        """
+        query = epoch_day(day)
+        found: List[np.ndarray] = []
+        node = 0 if len(self._centers) else -1
+        while node >= 0:
+            lo, hi = self._offsets[node], self._offsets[node + 1]
+            center = self._centers[node]
+            if query < center:
+                # Intervalles du nœud commençant au plus tard au jour demandé
+                count = np.searchsorted(self._node_starts[lo:hi], query, side="right")
+                found.append(self._node_by_start[lo:lo + count])
+                node = self._lefts[node]
+            elif query > center:
+                # Intervalles du nœud finissant au plus tôt au jour demandé
+                count = np.searchsorted(self._node_neg_ends[lo:hi], -query, side="right")
+                found.append(self._node_by_end[lo:lo + count])
+                node = self._rights[node]
+            else:
+                found.append(self._node_by_start[lo:hi])
+                break
+        return np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def active_between(self, first_day: DateLike, last_day: DateLike) -> np.ndarray:
+        """
+        Intervalles actifs au moins un jour d'une période [premier jour, dernier jour]
+
+        Args:
+            first_day: Premier jour de la période
+            last_day: Dernier jour de la période (inclus)
+
+        Returns:
+            Positions des intervalles (triées)
+        """
+        first, last = epoch_day(first_day), epoch_day(last_day)
+        if last < first:
+            return np.zeros(0, dtype=np.int64)
+        # Actifs au premier jour + commencés pendant la période
+        lo = np.searchsorted(self._sorted_starts, first, side="right")
+        hi = np.searchsorted(self._sorted_starts, last, side="right")
+        return np.sort(np.concatenate([self.active_on(first), self._by_start[lo:hi]]))
+
+
+class DailyActivityMatrix:
+    """
+    Matrice jour × groupe du nombre d'intervalles actifs et de leur poids cumulé
+
+    Attributes:
+        premier_jour: Jour (depuis 1970-01-01) de la première ligne
+        groupes: Libellés des colonnes
+        actifs: Nombre d'intervalles actifs (jours, groupes) int32
+        poids: Somme des poids des intervalles actifs (jours, groupes) float64
+    """
+
+    def __init__(self, premier_jour: int, groupes: Sequence[str],
+                 actifs: np.ndarray, poids: np.ndarray):
+        self.premier_jour = int(premier_jour)
+        self.groupes = list(groupes)
+        self.actifs = actifs
+        self.poids = poids
+        # Sommes cumulées (ligne 0 nulle) : totaux d'une période en O(1)
+        self._cumul_actifs = np.vstack([np.zeros((1, len(self.groupes))), np.cumsum(actifs, axis=0)])
+        self._cumul_poids = np.vstack([np.zeros((1, len(self.groupes))), np.cumsum(poids, axis=0)])
+
+    @classmethod
+    def from_intervals(cls, starts: Sequence[int], ends: Sequence[int],
+                       groups: Sequence[str], weights: Optional[Sequence[float]] = None
+                       ) -> "DailyActivityMatrix":
+        """
+        Construit la matrice par tableau de différences (+1 au début, -1 après la fin)
+
+        Args:
+            starts: Débuts (jours, inclus)
+            ends: Fins (jours, incluses)
+            groups: Groupe de chaque intervalle
+            weights: Poids de chaque intervalle (défaut: 1)
+
+        Returns:
+            DailyActivityMatrix couvrant du premier début à la dernière fin
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        labels, codes = np.unique(np.array([str(g) for g in groups], dtype=str), return_inverse=True)
+        weights = np.ones(len(starts)) if weights is None else np.asarray(weights, dtype=np.float64)
+        valid = ends >= starts
+        if not valid.any():
+            empty = np.zeros((0, len(labels)))
+            return cls(0, labels.tolist(), empty.astype(np.int32), empty)
+
+        first = int(starts[valid].min())
+        n_days = int(ends[valid].max()) - first + 1
+        n_groups = len(labels)
+        size = (n_days + 1) * n_groups
+        start_cells = (starts[valid] - first) * n_groups + codes[valid]
+        end_cells = (ends[valid] - first + 1) * n_groups + codes[valid]
+        delta_count = (np.bincount(start_cells, minlength=size) -
+                       np.bincount(end_cells, minlength=size)).reshape(n_days + 1, n_groups)
+        delta_weight = (np.bincount(start_cells, weights=weights[valid], minlength=size) -
+                        np.bincount(end_cells, weights=weights[valid], minlength=size)
+                        ).reshape(n_days + 1, n_groups)
+        actifs = np.cumsum(delta_count[:n_days], axis=0).astype(np.int32)
+        poids = np.cumsum(delta_weight[:n_days], axis=0)
+        return cls(first, labels.tolist(), actifs, poids)
+
+    def day(self, day: DateLike) -> Dict[str, Dict[str, float]]:
+        """
+        Intervalles actifs et poids par groupe un jour donné
+
+        Args:
+            day: Jour
+
+        Returns:
+            Dict {groupe: {"actifs", "poids"}} (groupes sans intervalle actif omis)
+        """
+        row = epoch_day(day) - self.premier_jour
+        if row < 0 or row >= len(self.actifs):
+            return {}
+        return {
+            groupe: {"actifs": int(self.actifs[row, col]), "poids": round(float(self.poids[row, col]), 2)}
+            for col, groupe in enumerate(self.groupes)
+            if self.actifs[row, col] > 0
+        }
+
+    def period(self, first_day: DateLike, last_day: DateLike) -> Dict[str, Dict[str, float]]:
+        """
+        Charge cumulée par groupe sur une période (sommes cumulées, O(1) par groupe)
+
+        Args:
+            first_day: Premier jour de la période
+            last_day: Dernier jour de la période (inclus)
+
+        Returns:
+            Dict {groupe: {"jours_actifs" (somme des intervalles actifs par jour),
+            "actifs_moyen", "poids_moyen"}} (groupes sans activité omis)
+        """
+        first, last = epoch_day(first_day), epoch_day(last_day)
+        n_days = last - first + 1
+        if n_days <= 0 or not len(self.actifs):
+            return {}
+        lo = int(np.clip(first - self.premier_jour, 0, len(self.actifs)))
+        hi = int(np.clip(last - self.premier_jour + 1, 0, len(self.actifs)))
+        jours_actifs = self._cumul_actifs[hi] - self._cumul_actifs[lo]
+        poids = self._cumul_poids[hi] - self._cumul_poids[lo]
+        return {
+            groupe: {
+                "jours_actifs": int(jours_actifs[col]),
+                "actifs_moyen": round(float(jours_actifs[col]) / n_days, 2),
+                "poids_moyen": round(float(poids[col]) / n_days, 2)
+            }
+            for col, groupe in enumerate(self.groupes)
+            if jours_actifs[col] > 0
+        }
@@ -0,0 +1,241 @@
+"""
+Balayage d'intervalles (sweep-line) pour les durées de perturbation
+
+Les périodes [début, fin) d'une même clé (ligne, perturbation...) sont triées une
+seule fois par leur début puis fusionnées : les chevauchements et les périodes
+dupliquées (plusieurs instantanés d'une même perturbation) ne sont comptés qu'une
+fois. Les périodes d'une journée sont aussi exposées en bitmaps à la minute
+(1440 bits, 180 octets par ligne) : l'union ou l'intersection de plusieurs jours
+(agrégats hebdomadaires) se réduit à des OU / ET bit à bit.
+"""
+
+import base64
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+MINUTES_PER_DAY = 1440
+_BITMAP_BYTES = MINUTES_PER_DAY // 8
+
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fusionne des intervalles [début, fin) qui se chevauchent ou se touchent
+
+    Args:
+        starts: Débuts des intervalles
+        ends: Fins des intervalles (les intervalles vides ou inversés sont ignorés)
+
+    Returns:
+        Tuple (débuts, fins) des intervalles disjoints, triés par début
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    valid = ends > starts
+    starts, ends = starts[valid], ends[valid]
+    if not len(starts):
+        return starts, ends
+
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    reach = np.maximum.accumulate(ends)
+    # Un nouvel intervalle commence là où le début dépasse la fin atteinte jusque-là
+    new_block = np.empty(len(starts), dtype=bool)
+    new_block[0] = True
+    new_block[1:] = starts[1:] > reach[:-1]
+    block_starts = np.flatnonzero(new_block)
+    block_ends = np.append(block_starts[1:], len(starts)) - 1
+    return starts[block_starts], reach[block_ends]
+
+
+def covered_length(starts: np.ndarray, ends: np.ndarray) -> float:
+    """
+    Longueur totale couverte par des intervalles, chevauchements comptés une fois
+
+    Args:
+        starts: Débuts des intervalles
+        ends: Fins des intervalles
+
+    Returns:
+        Longueur de l'union des intervalles
+    """
+    merged_starts, merged_ends = merge_intervals(starts, ends)
+    return float((merged_ends - merged_starts).sum())
+
+
+def minutes_in_day(moments: Iterable[Optional[datetime]], day: datetime) -> np.ndarray:
+    """
+    Minutes écoulées depuis minuit du jour donné (heure locale telle que publiée)
+
+    Args:
+        moments: Dates (naïves ou avec fuseau : l'heure murale est conservée)
+        day: Jour de référence (seule la date est utilisée)
+
+    Returns:
+        Tableau float64 (NaN si date absente), non borné au jour
+    """
+    midnight = datetime(day.year, day.month, day.day)
+    return np.array([
+        np.nan if moment is None
+        else (moment.replace(tzinfo=None) - midnight).total_seconds() / 60.0
+        for moment in moments
+    ], dtype=np.float64)
+
+
+class DayIntervalBitmaps:
+    """
+    Bitmaps à la minute (1440 bits par clé) des périodes couvertes d'une journée
+
+    Chaque ligne de la matrice packée (n_cles, 180) uint8 correspond à une clé ;
+    le bit m vaut 1 si la minute [m, m+1) est couverte par au moins une période.
+    """
+
+    def __init__(self, keys: Sequence[str], bits: Optional[np.ndarray] = None):
+        """
+        Args:
+            keys: Clés (ordre des lignes)
+            bits: Matrice packée (n_cles, 180) uint8 (défaut: aucune minute couverte)
+        """
+        self.keys = list(keys)
+        self.index = {key: row for row, key in enumerate(self.keys)}
+        if bits is None:
+            bits = np.zeros((len(self.keys), _BITMAP_BYTES), dtype=np.uint8)
+        self.bits = bits
+
+    @classmethod
+    def from_periods(cls, keys: Sequence[str],
+                     period_keys: Sequence[str],
+                     starts: np.ndarray,
+                     ends: np.ndarray) -> "DayIntervalBitmaps":
+        """
+        Construit les bitmaps par balayage : tri des bornes et fusion par clé
+
+        Args:
+            keys: Clés retenues (les périodes d'autres clés sont ignorées)
+            period_keys: Clé de chaque période
+            starts: Débuts des périodes (minutes depuis minuit, non bornées)
+            ends: Fins des périodes (minutes depuis minuit, non bornées)
+
+        Returns:
+            DayIntervalBitmaps
+        """
+        result = cls(keys)
+        rows = np.array([result.index.get(key, -1) for key in period_keys], dtype=np.int64)
+        # Bornage au jour, minutes entamées comptées comme perturbées
+        starts = np.floor(np.clip(np.asarray(starts, dtype=np.float64), 0, MINUTES_PER_DAY))
+        ends = np.ceil(np.clip(np.asarray(ends, dtype=np.float64), 0, MINUTES_PER_DAY))
+        keep = (rows >= 0) & (ends > starts)
+        rows, starts, ends = rows[keep], starts[keep], ends[keep]
+        if not len(rows):
+            return result
+
+        # Clés décalées sur des plages disjointes : un seul tri des bornes, puis fusion
+        # des chevauchements à l'intérieur de chaque clé
+        offset = rows.astype(np.float64) * (2 * MINUTES_PER_DAY)
+        merged_starts, merged_ends = merge_intervals(starts + offset, ends + offset)
+        merged_rows = (merged_starts // (2 * MINUTES_PER_DAY)).astype(np.int64)
+        base = merged_rows * (2 * MINUTES_PER_DAY)
+        first = merged_rows * MINUTES_PER_DAY + (merged_starts - base).astype(np.int64)
+        last = merged_rows * MINUTES_PER_DAY + (merged_ends - base).astype(np.int64)
+
+        # Tableau de différences : +1 au début, -1 à la fin, somme cumulée > 0 = couvert
+        size = len(result.keys) * MINUTES_PER_DAY
+        delta = np.bincount(first, minlength=size + 1) - np.bincount(last, minlength=size + 1)
+        covered = np.cumsum(delta[:size]) > 0
+        result.bits = np.packbits(covered.reshape(len(result.keys), MINUTES_PER_DAY), axis=1)
+        return result
+
+    def _aligned(self, other: "DayIntervalBitmaps") -> np.ndarray:
+        """Bitmaps d'un autre objet réordonnés selon les clés de celui-ci (0 si absente)"""
+        if other.keys == self.keys:
+            return other.bits
+        aligned = np.zeros_like(self.bits)
+        for row, key in enumerate(self.keys):
+            other_row = other.index.get(key)
+            if other_row is not None:
+                aligned[row] = other.bits[other_row]
+        return aligned
+
+    def union(self, other: "DayIntervalBitmaps") -> "DayIntervalBitmaps":
+        """
+        Minutes couvertes dans l'une ou l'autre journée (OU bit à bit)
+
+        Args:
+            other: Bitmaps d'une autre journée
+
+        Returns:
+            Nouveaux bitmaps sur les clés de celui-ci
+        """
+        return DayIntervalBitmaps(self.keys, self.bits | self._aligned(other))
+
+    def intersection(self, other: "DayIntervalBitmaps") -> "DayIntervalBitmaps":
+        """
+        Minutes couvertes dans les deux journées (ET bit à bit)
+
+        Args:
+            other: Bitmaps d'une autre journée
+
+        Returns:
+            Nouveaux bitmaps sur les clés de celui-ci
+        """
+        return DayIntervalBitmaps(self.keys, self.bits & self._aligned(other))
+
+    def covered_minutes(self) -> np.ndarray:
+        """
+        Nombre de minutes couvertes par clé
+
+        Returns:
+            Tableau int64 (n_cles,)
+        """
+        return np.unpackbits(self.bits, axis=1).sum(axis=1, dtype=np.int64)
+
+    def availability(self) -> np.ndarray:
+        """
+        Pourcentage de la journée sans période couverte, par clé
+
+        Returns:
+            Tableau float64 (n_cles,) entre 0 et 100
+        """
+        return 100.0 * (1.0 - self.covered_minutes() / MINUTES_PER_DAY)
+
+    def encode(self) -> str:
+        """
+        Sérialise les bitmaps en base64 (ordre des clés)
+
+        Returns:
+            Chaîne base64 de la matrice packée
+        """
+        return base64.b64encode(self.bits.tobytes()).decode("ascii")
+
+    @classmethod
+    def decode(cls, keys: Sequence[str], encoded: str) -> "DayIntervalBitmaps":
+        """
+        Reconstruit des bitmaps sérialisés par encode()
+
+        Args:
+            keys: Clés (même ordre qu'à l'encodage)
+            encoded: Chaîne base64
+
+        Returns:
+            DayIntervalBitmaps
+        """
+        bits = np.frombuffer(base64.b64decode(encoded), dtype=np.uint8)
+        return cls(keys, bits.reshape(len(keys), _BITMAP_BYTES).copy())
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """
+        Minutes couvertes et disponibilité par clé
+
+        Returns:
+            Dict {cle: {"minutes_perturbees", "disponibilite"}}
+        """
+        minutes = self.covered_minutes()
+        availability = self.availability()
+        return {
+            key: {
+                "minutes_perturbees": int(minutes[row]),
+                "disponibilite": round(float(availability[row]), 2),
+            }
+            for row, key in enumerate(self.keys)
+        }
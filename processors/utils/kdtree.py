@@ -0,0 +1,111 @@
+"""
+Arbre k-d statique (2D) pour les recherches de plus proches voisins
+
+Les points sont permutés une fois à la construction (partition médiane alternée sur
+x / y, tableau implicite : un nœud = un intervalle de la permutation) ; une requête ne
+descend que dans les sous-arbres dont le demi-plan est à portée, soit O(log n) en
+moyenne au lieu d'un parcours de tous les points.
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+
+class KDTree:
+    """Arbre k-d 2D sur un tableau de points (n, 2)"""
+
+    def __init__(self, points: np.ndarray, leaf_size: int = 16):
+        """
+        Args:
+            points: Coordonnées (n, 2) (unités cartésiennes, ex: mètres projetés)
+            leaf_size: Nombre maximal de points par feuille (testés en vectorisé)
+        """
+        self.points = np.ascontiguousarray(points, dtype=np.float64).reshape(-1, 2)
+        self.leaf_size = max(1, int(leaf_size))
+        self.order = np.arange(len(self.points))
+        self._build(0, len(self.points), 0)
+        self.sorted_points = self.points[self.order]
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def _build(self, start: int, end: int, depth: int) -> None:
+        """Partition médiane de l'intervalle [start, end) selon l'axe depth % 2"""
+        stack = [(start, end, depth)]
+        while stack:
+            start, end, depth = stack.pop()
+            if end - start <= self.leaf_size:
+                continue
+            axis = depth % 2
+            mid = (start + end) // 2
+            segment = self.order[start:end]
+            partition = np.argpartition(self.points[segment, axis], mid - start)
+            self.order[start:end] = segment[partition]
+            stack.append((start, mid, depth + 1))
+            stack.append((mid + 1, end, depth + 1))
+
+    def query_radius(self, x: float, y: float, radius: float) -> np.ndarray:
+        """
+        Index des points à distance <= radius de (x, y)
+
+        Returns:
+            Tableau d'index (ordre quelconque)
+        """
+        found: List[np.ndarray] = []
+        radius_sq = radius * radius
+        stack = [(0, len(self.points), 0)]
+        while stack:
+            start, end, depth = stack.pop()
+            if end - start <= self.leaf_size:
+                block = self.sorted_points[start:end]
+                d2 = (block[:, 0] - x) ** 2 + (block[:, 1] - y) ** 2
+                hits = np.nonzero(d2 <= radius_sq)[0]
+                if hits.size:
+                    found.append(self.order[start + hits])
+                continue
+            mid = (start + end) // 2
+            px, py = self.sorted_points[mid]
+            if (px - x) ** 2 + (py - y) ** 2 <= radius_sq:
+                found.append(self.order[mid:mid + 1])
+            delta = (x - px) if depth % 2 == 0 else (y - py)
+            # Sous-arbre du côté de la requête toujours visité, l'autre si le plan est à portée
+            if delta <= radius:
+                stack.append((start, mid, depth + 1))
+            if delta >= -radius:
+                stack.append((mid + 1, end, depth + 1))
+        return np.concatenate(found) if found else np.zeros(0, dtype=np.int64)
+
+    def nearest(self, x: float, y: float, max_distance: float = np.inf) -> Tuple[int, float]:
+        """
+        Plus proche point de (x, y) à distance <= max_distance
+
+        Returns:
+            Tuple (index, distance), (-1, inf) si aucun point à portée
+        """
+        best_index = -1
+        best_sq = max_distance * max_distance if np.isfinite(max_distance) else np.inf
+        stack = [(0, len(self.points), 0, 0.0)]
+        while stack:
+            start, end, depth, plane_sq = stack.pop()
+            if plane_sq > best_sq:
+                continue  # Sous-arbre hors de portée depuis sa mise en pile
+            if end - start <= self.leaf_size:
+                if end > start:
+                    block = self.sorted_points[start:end]
+                    d2 = (block[:, 0] - x) ** 2 + (block[:, 1] - y) ** 2
+                    i = int(np.argmin(d2))
+                    if d2[i] <= best_sq:
+                        best_index, best_sq = int(self.order[start + i]), float(d2[i])
+                continue
+            mid = (start + end) // 2
+            px, py = self.sorted_points[mid]
+            d2 = (px - x) ** 2 + (py - y) ** 2
+            if d2 <= best_sq:
+                best_index, best_sq = int(self.order[mid]), float(d2)
+            delta = (x - px) if depth % 2 == 0 else (y - py)
+            near, far = ((start, mid), (mid + 1, end)) if delta <= 0 else ((mid + 1, end), (start, mid))
+            # Côté lointain empilé en premier : visité après le côté proche, s'il reste à portée
+            stack.append((far[0], far[1], depth + 1, delta * delta))
+            stack.append((near[0], near[1], depth + 1, 0.0))
+        return best_index, (float(np.sqrt(best_sq)) if best_index >= 0 else np.inf)
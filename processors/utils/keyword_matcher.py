@@ -0,0 +1,99 @@
+"""
+Recherche simultanée de mots-clés dans un texte (automate d'Aho-Corasick)
+
+Tous les mots-clés sont compilés une fois dans un automate (transitions + liens
+d'échec) : un texte est parcouru en une seule passe quel que soit le nombre de
+mots-clés, au lieu d'un test "mot in texte" par mot-clé.
+"""
+
+from collections import deque
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+
+class KeywordMatcher:
+    """Automate d'Aho-Corasick : mot-clé → valeur associée (recherche de sous-chaînes)"""
+
+    def __init__(self, keywords: Iterable[Tuple[str, Hashable]], lowercase: bool = True):
+        """
+        Args:
+            keywords: Couples (mot-clé, valeur) ; l'ordre définit la priorité des valeurs
+            lowercase: Comparaison insensible à la casse
+        """
+        self.lowercase = lowercase
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[Set[int]] = [set()]
+        self.values: List[Hashable] = []  # Valeurs par ordre de priorité
+        self._priority: Dict[Hashable, int] = {}
+
+        for keyword, value in keywords:
+            if value not in self._priority:
+                self._priority[value] = len(self.values)
+                self.values.append(value)
+            self._add(keyword.lower() if lowercase else keyword, self._priority[value])
+        self._build_links()
+
+    def _add(self, keyword: str, value_index: int) -> None:
+        """Insère un mot-clé dans le trie"""
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(set())
+            state = next_state
+        self._outputs[state].add(value_index)
+
+    def _build_links(self) -> None:
+        """Liens d'échec (parcours en largeur) et propagation des sorties"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] |= self._outputs[self._fail[next_state]]
+
+    def find_all(self, text: str) -> Set[int]:
+        """
+        Index (priorité) des valeurs dont au moins un mot-clé apparaît dans le texte
+
+        Args:
+            text: Texte à analyser
+
+        Returns:
+            Ensemble d'index dans self.values
+        """
+        found: Set[int] = set()
+        if not text:
+            return found
+        if self.lowercase:
+            text = text.lower()
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if outputs[state]:
+                found |= outputs[state]
+        return found
+
+    def first(self, text: str) -> Optional[Any]:
+        """
+        Valeur la plus prioritaire trouvée dans le texte
+
+        Args:
+            text: Texte à analyser
+
+        Returns:
+            Valeur ou None si aucun mot-clé
+        """
+        found = self.find_all(text)
+        return self.values[min(found)] if found else None
@@ -0,0 +1,213 @@
+"""
+Extraction compilée des lignes de transport citées dans les messages de perturbation
+
+Une seule expression régulière compilée (alternative nommée par mode : métro, RER,
+tramway, bus) parcourt chaque texte une seule fois. Les lignes trouvées sont
+internées en petits entiers (codes) : les lignes de métro 1 à 14 occupent les codes
+0 à 13 dans l'ordre de LIGNES_METRO, les autres lignes reçoivent un code à leur
+première apparition. Le résultat est mémoïsé par texte (les mêmes messages
+reviennent à chaque instantané horaire) et les comptages par ligne se font par
+indexation de tableaux (np.bincount) plutôt que par dictionnaires de chaînes.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Lignes de métro suivies (1-14) : codes 0 à 13, ordre des bitmaps de disponibilité
+LIGNES_METRO: Tuple[str, ...] = tuple(str(i) for i in range(1, 15))
+N_LIGNES_METRO = len(LIGNES_METRO)
+# Lignes de métro "bis" (codes internés à leur première apparition)
+LIGNES_METRO_BIS: Tuple[str, ...] = ("3bis", "7bis")
+
+MODES = ("metro", "rer", "tram", "bus")
+
+_LINE_PATTERN = re.compile(
+    r"(?i:\bm[ée]tro)\s*(?P<metro>\d{1,2}(?:bis)?)\b"
+    r"|(?i:\bRER)\s*(?P<rer>[A-E])\b"
+    r"|(?i:\btram(?:way)?)\s*T?(?P<tram>\d{1,2}[ab]?)\b"
+    r"|\bT(?P<tram_court>\d{1,2}[ab]?)\b"
+    r"|(?i:\bbus)\s*(?P<bus>N?\d{1,3})\b"
+    r"|(?i:\bnoctilien)\s*(?P<noctilien>N?\d{1,3})\b"
+    r"|\bLigne\s+(?:(?P<ligne_tram>T\d{1,2}[ab]?)|(?P<ligne_rer>[A-E])|(?P<ligne>N?\d{1,3}(?:bis)?))\b"
+)
+_CATEGORY_NUMBER = re.compile(r"\d+")
+
+# Taille maximale du cache (textes distincts) avant remise à zéro
+_CACHE_MAX = 65536
+
+
+def mode_of_label(label: str) -> str:
+    """Mode d'une ligne d'après son libellé ("RER B", "T3a", "Bus 72", sinon métro)"""
+    if label.startswith("RER "):
+        return "rer"
+    if label.startswith("Bus "):
+        return "bus"
+    if label[:1] == "T" and label[1:2].isdigit():
+        return "tram"
+    return "metro"
+
+
+def _metro_or_bus(number: str) -> Tuple[str, str]:
+    """Ligne "métro N" / "Ligne N" : métro si N vaut 1 à 14, 3bis ou 7bis, bus sinon"""
+    label = number.lower()
+    if label in LIGNES_METRO or label in LIGNES_METRO_BIS:
+        return "metro", label
+    return "bus", number.upper()
+
+
+class LineExtractor:
+    """
+    Extraction des lignes (métro, RER, tramway, bus) et registre de codes internés
+
+    Attributes:
+        labels: Libellé de chaque code ("4", "RER B", "T3a", "Bus 72")
+        modes: Mode de chaque code (index dans MODES)
+    """
+
+    def __init__(self):
+        self.labels: List[str] = []
+        self.modes: List[int] = []
+        self._codes: Dict[str, int] = {}
+        self._cache: Dict[str, Tuple[int, ...]] = {}
+        self._category_cache: Dict[str, Tuple[int, ...]] = {}
+        for ligne in LIGNES_METRO:
+            self.intern(ligne, "metro")
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def intern(self, label: str, mode: Optional[str] = None) -> int:
+        """
+        Code d'une ligne (créé à la première apparition)
+
+        Args:
+            label: Libellé de la ligne
+            mode: Mode de transport (cf. MODES, défaut: déduit du libellé)
+
+        Returns:
+            Code entier de la ligne
+        """
+        code = self._codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self._codes[label] = code
+            self.labels.append(label)
+            self.modes.append(MODES.index(mode or mode_of_label(label)))
+        return code
+
+    def _scan(self, text: str) -> Tuple[int, ...]:
+        """Parcourt le texte une fois et retourne les codes distincts (triés)"""
+        codes = set()
+        for match in _LINE_PATTERN.finditer(text):
+            group, value = next((name, value) for name, value in match.groupdict().items() if value)
+            if group in ("metro", "ligne"):
+                mode, number = _metro_or_bus(value)
+                codes.add(self.intern(number if mode == "metro" else f"Bus {number}", mode))
+            elif group in ("rer", "ligne_rer"):
+                codes.add(self.intern(f"RER {value.upper()}", "rer"))
+            elif group in ("tram", "tram_court", "ligne_tram"):
+                codes.add(self.intern(f"T{value.lstrip('Tt').lower()}", "tram"))
+            else:
+                codes.add(self.intern(f"Bus {value.upper()}", "bus"))
+        return tuple(sorted(codes))
+
+    def extract(self, text: Optional[str]) -> Tuple[int, ...]:
+        """
+        Codes des lignes citées dans un texte (mémoïsé par texte)
+
+        Args:
+            text: Texte d'un message
+
+        Returns:
+            Tuple trié des codes distincts
+        """
+        if not text:
+            return ()
+        codes = self._cache.get(text)
+        if codes is None:
+            if len(self._cache) >= _CACHE_MAX:
+                self._cache.clear()
+            codes = self._cache[text] = self._scan(text)
+        return codes
+
+    def extract_category(self, category: Optional[str]) -> Tuple[int, ...]:
+        """
+        Lignes de métro d'une catégorie "METRO..." (nombres 1 à 14 qu'elle contient)
+
+        Args:
+            category: Catégorie de la perturbation
+
+        Returns:
+            Tuple trié des codes distincts (vide si la catégorie n'est pas métro)
+        """
+        if not category:
+            return ()
+        codes = self._category_cache.get(category)
+        if codes is None:
+            found = set()
+            if "METRO" in category.upper():
+                found = {self._codes[n] for n in _CATEGORY_NUMBER.findall(category) if n in LIGNES_METRO}
+            codes = self._category_cache[category] = tuple(sorted(found))
+        return codes
+
+    def codes_of(self, labels: Iterable[str]) -> np.ndarray:
+        """
+        Codes de libellés (internés si absents, ex: lignes relues de l'état persistant)
+
+        Args:
+            labels: Libellés de lignes
+
+        Returns:
+            Tableau int32 des codes
+        """
+        codes = self._codes
+        return np.array([codes[label] if label in codes else self.intern(label) for label in labels],
+                        dtype=np.int32)
+
+    def labels_of(self, codes: Sequence[int]) -> List[str]:
+        """Libellés de codes"""
+        return [self.labels[code] for code in codes]
+
+    def count(self, codes: np.ndarray) -> np.ndarray:
+        """
+        Nombre d'occurrences de chaque code
+
+        Args:
+            codes: Codes (une occurrence par perturbation et ligne)
+
+        Returns:
+            Tableau int64 (len(self),) indexé par code
+        """
+        return np.bincount(np.asarray(codes, dtype=np.int64), minlength=len(self.labels))
+
+    def counts_by_mode(self, counts: np.ndarray) -> Dict[str, int]:
+        """
+        Agrège des comptages par code en comptages par mode
+
+        Args:
+            counts: Comptages indexés par code (cf. count)
+
+        Returns:
+            Dict {mode: total}
+        """
+        modes = np.asarray(self.modes[:len(counts)], dtype=np.int64)
+        totals = np.bincount(modes, weights=counts[:len(modes)], minlength=len(MODES))
+        return {mode: int(totals[i]) for i, mode in enumerate(MODES)}
+
+
+_extractor: Optional[LineExtractor] = None
+
+
+def get_line_extractor() -> LineExtractor:
+    """
+    Extracteur de lignes du processus (codes et cache partagés entre instantanés)
+
+    Returns:
+        LineExtractor
+    """
+    global _extractor
+    if _extractor is None:
+        _extractor = LineExtractor()
+    return _extractor
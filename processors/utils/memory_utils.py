@@ -0,0 +1,46 @@
+"""
+Utilitaires mémoire : mesure du pic de mémoire résidente (RSS) du processus
+"""
+
+import sys
+from typing import Optional
+
+try:
+    import resource
+except ImportError:
+    # Module indisponible (Windows) : mesure désactivée
+    resource = None
+
+
+def get_peak_rss_mb() -> Optional[float]:
+    """
+    Retourne le pic de mémoire résidente (RSS) du processus courant
+
+    Returns:
+        Pic RSS en MB ou None si mesure indisponible
+    """
+    if resource is None:
+        return None
+
+    try:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return None
+
+    # ru_maxrss est en octets sous macOS, en kilo-octets sous Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def format_peak_rss() -> str:
+    """
+    Formate le pic RSS pour affichage dans les logs
+
+    Returns:
+        Chaîne "pic RSS: X MB" (ou "pic RSS: n/a")
+    """
+    peak = get_peak_rss_mb()
+    if peak is None:
+        return "pic RSS: n/a"
+    return f"pic RSS: {peak:.1f} MB"
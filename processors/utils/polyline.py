@@ -0,0 +1,225 @@
+"""
+Couche de sortie géométrique compacte : simplification et encodage polyline
+
+Les géométries stockées et servies (tronçons du référentiel, chantiers) sont simplifiées
+par Douglas-Peucker à une tolérance par niveau de zoom (GEOMETRIE_TOLERANCES_METRES),
+puis encodées en polylignes (algorithme "encoded polyline" : coordonnées arrondies à
+10^-precision degré, deltas successifs, entiers zigzag en blocs de 5 bits → ASCII).
+L'encodage est vectorisé sur toutes les lignes d'un lot ; decode_polyline est
+l'opération inverse côté client / dashboard.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import GEOMETRIE_TOLERANCES_METRES
+from .geometry_batch import EARTH_RADIUS_M, KIND_LINE, KIND_POINT, KIND_POLYGON, GeometryBatch
+
+POLYLINE_PRECISION = 5  # 10^-5 degré ≈ 1 m
+
+_KIND_NAMES = {KIND_POINT: "Point", KIND_LINE: "LineString", KIND_POLYGON: "Polygon"}
+
+
+def simplify_mask(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Points conservés par Douglas-Peucker (distance au segment, unités des points)
+
+    Args:
+        points: Coordonnées cartésiennes (n, 2)
+        tolerance: Écart maximal toléré
+
+    Returns:
+        Masque booléen (n,) ; extrémités toujours conservées
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        a, b = points[first], points[last]
+        inner = points[first + 1:last]
+        direction = b - a
+        norm = float(direction @ direction)
+        if norm > 0.0:
+            t = np.clip((inner - a) @ direction / norm, 0.0, 1.0)
+            distances = np.hypot(*(a + t[:, None] * direction - inner).T)
+        else:
+            distances = np.hypot(*(inner - a).T)  # Anneau fermé : distance au point de départ
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return keep
+
+
+def simplify_lines(coords: np.ndarray, offsets: np.ndarray,
+                   tolerance_m: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Simplifie un lot de lignes lon/lat (projection équirectangulaire locale en mètres)
+
+    Args:
+        coords: Coordonnées (N, 2) lon/lat de toutes les lignes
+        offsets: Début de chaque ligne dans coords (n + 1)
+        tolerance_m: Écart maximal toléré (m), <= 0 : pas de simplification
+
+    Returns:
+        Tuple (coordonnées conservées, offsets)
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    if tolerance_m <= 0 or len(coords) == 0:
+        return coords, offsets
+
+    scale = np.radians(1.0) * EARTH_RADIUS_M
+    projected = coords * np.array([scale * np.cos(np.radians(coords[:, 1].mean())), scale])
+    keep = np.ones(len(coords), dtype=bool)
+    for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist()):
+        if end - start <= 2:
+            continue
+        mask = simplify_mask(projected[start:end], tolerance_m)
+        closed = bool((coords[start] == coords[end - 1]).all())
+        if closed and mask.sum() < 4:
+            continue  # Anneau dégénéré : conservé tel quel
+        keep[start:end] = mask
+
+    point_line = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+    counts = np.bincount(point_line[keep], minlength=len(offsets) - 1)
+    return coords[keep], np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+
+def encode_lines(coords: np.ndarray, offsets: np.ndarray,
+                 precision: int = POLYLINE_PRECISION) -> List[str]:
+    """
+    Encode un lot de lignes lon/lat en polylignes (ordre lat, lon du format standard)
+
+    Args:
+        coords: Coordonnées (N, 2) lon/lat
+        offsets: Début de chaque ligne dans coords (n + 1)
+        precision: Nombre de décimales conservées
+
+    Returns:
+        Liste de n chaînes
+    """
+    coords = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    n_lines = len(offsets) - 1
+    if len(coords) == 0:
+        return [""] * n_lines
+
+    # Entiers lat, lon puis deltas (premier point de chaque ligne : valeur absolue)
+    integers = np.round(coords[:, ::-1] * 10 ** precision).astype(np.int64)
+    deltas = np.diff(integers, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    starts = offsets[:-1][np.diff(offsets) > 0]
+    deltas[starts] = integers[starts]
+    values = deltas.reshape(-1)
+
+    # Zigzag puis blocs de 5 bits (bit 0x20 : bloc suivant), décalés de 63
+    zigzag = np.where(values < 0, ~(values << 1), values << 1)
+    n_chunks = np.ones(len(zigzag), dtype=np.int64)
+    remaining = zigzag >> 5
+    while remaining.any():
+        n_chunks += remaining > 0
+        remaining >>= 5
+    value_index = np.repeat(np.arange(len(zigzag)), n_chunks)
+    chunk_rank = np.arange(len(value_index)) - np.repeat(np.cumsum(n_chunks) - n_chunks, n_chunks)
+    chunks = (zigzag[value_index] >> (5 * chunk_rank)) & 31
+    chunks = chunks | np.where(chunk_rank < n_chunks[value_index] - 1, 0x20, 0)
+    text = (chunks + 63).astype(np.uint8).tobytes().decode("ascii")
+
+    # Découpe par ligne : nombre de caractères des 2 valeurs de chaque point
+    char_offsets = np.concatenate([[0], np.cumsum(n_chunks.reshape(-1, 2).sum(axis=1))])[offsets]
+    return [text[char_offsets[i]:char_offsets[i + 1]] for i in range(n_lines)]
+
+
+def decode_polyline(encoded: str, precision: int = POLYLINE_PRECISION) -> List[List[float]]:
+    """
+    Décode une polyligne
+
+    Args:
+        encoded: Chaîne encodée (encode_lines)
+        precision: Nombre de décimales de l'encodage
+
+    Returns:
+        Coordonnées [[lon, lat], ...] (ordre GeoJSON)
+    """
+    values = []
+    current = shift = 0
+    for char in encoded:
+        chunk = ord(char) - 63
+        current |= (chunk & 31) << shift
+        shift += 5
+        if chunk < 0x20:
+            values.append(~(current >> 1) if current & 1 else current >> 1)
+            current = shift = 0
+    points = np.cumsum(np.asarray(values, dtype=np.int64).reshape(-1, 2), axis=0) / 10 ** precision
+    return points[:, ::-1].tolist()
+
+
+def encode_levels(coords: np.ndarray, offsets: np.ndarray,
+                  tolerances: Optional[Dict[str, float]] = None,
+                  precision: int = POLYLINE_PRECISION) -> List[Dict[str, str]]:
+    """
+    Polylignes d'un lot de lignes à chaque niveau de zoom
+
+    Un niveau identique au niveau plus détaillé suivant n'est pas répété : le client
+    utilise le premier niveau présent à partir du zoom demandé (en allant vers les
+    tolérances plus fines).
+
+    Args:
+        coords: Coordonnées (N, 2) lon/lat de toutes les lignes
+        offsets: Début de chaque ligne dans coords (n + 1)
+        tolerances: Tolérance (m) par niveau de zoom (défaut GEOMETRIE_TOLERANCES_METRES)
+        precision: Nombre de décimales de l'encodage
+
+    Returns:
+        Liste (une entrée par ligne) de {zoom: polyligne}
+    """
+    tolerances = GEOMETRIE_TOLERANCES_METRES if tolerances is None else tolerances
+    levels: List[Dict[str, str]] = [{} for _ in range(len(offsets) - 1)]
+    finer: List[Optional[str]] = [None] * len(levels)
+    # Du niveau le plus détaillé (tolérance la plus faible) au plus grossier
+    for zoom, tolerance in sorted(tolerances.items(), key=lambda item: item[1]):
+        encoded = encode_lines(*simplify_lines(coords, offsets, tolerance), precision)
+        for line, text in enumerate(encoded):
+            if text != finer[line]:
+                levels[line][str(zoom)] = text
+                finer[line] = text
+    return levels
+
+
+def encode_geometries(geo_shapes: Sequence[Any],
+                      tolerances: Optional[Dict[str, float]] = None,
+                      precision: int = POLYLINE_PRECISION) -> List[Optional[Dict[str, Any]]]:
+    """
+    Forme compacte d'un lot de géométries, simplifiée à chaque niveau de zoom
+
+    Args:
+        geo_shapes: Géométries GeoJSON (chaînes ou dicts, None accepté)
+        tolerances: Tolérance (m) par niveau de zoom (défaut GEOMETRIE_TOLERANCES_METRES)
+        precision: Nombre de décimales de l'encodage
+
+    Returns:
+        Liste (une entrée par géométrie) de {"type", "parties": [{zoom: polyligne}]}
+        (cf. encode_levels) ou None si géométrie absente
+    """
+    batch = GeometryBatch(geo_shapes)
+    results: List[Optional[Dict[str, Any]]] = [
+        {"type": _KIND_NAMES[kind], "parties": []} if kind in _KIND_NAMES else None
+        for kind in batch.kinds.tolist()
+    ]
+    levels = encode_levels(batch.coords, batch.part_offsets, tolerances, precision)
+    for part, geometry in enumerate(batch.part_geometry.tolist()):
+        if results[geometry] is not None:
+            results[geometry]["parties"].append(levels[part])
+    return results
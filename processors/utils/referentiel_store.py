@@ -0,0 +1,364 @@
+"""
+Référentiel compilé : table de correspondance binaire partagée entre exécutions et processus
+
+Le référentiel (mapping tronçon → libellé, longueur, nœuds, centre, géométrie) est compilé
+une fois en tableaux NumPy parallèles triés par identifiant de tronçon, écrits en .npy
+dans un répertoire versionné (CACHE_DIR/referentiel/v<version>-<empreinte>) et rechargés
+en mémoire partagée (mmap, lecture seule). La compilation n'est refaite que si
+l'empreinte de la source change ; current.json désigne la version active.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import REFERENTIEL_STORE_DIR
+from .array_utils import string_array
+from .geometry_batch import GeometryBatch, KIND_LINE
+
+FORMAT_VERSION = 1
+_POINTER_FILE = "current.json"
+_ARRAYS = (
+    "arc_ids", "longueur_metres", "noeud_amont", "noeud_aval", "centre",
+    "libelle_offsets", "libelles", "geo_point_offsets", "geo_points", "coord_offsets", "coords"
+)
+
+
+def source_fingerprint(source: Any) -> str:
+    """
+    Empreinte d'une source référentiel (contenu du fichier CSV ou liste de dicts)
+
+    Returns:
+        Empreinte hexadécimale
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    else:
+        for record in source:
+            digest.update(json.dumps(record, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _text_column(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Textes de longueur variable : octets UTF-8 concaténés et offsets
+
+    Returns:
+        Tuple (offsets int64 (n + 1), octets uint8)
+    """
+    encoded = [str(v or "").encode("utf-8") for v in values]
+    offsets = np.concatenate([[0], np.cumsum([len(b) for b in encoded])]).astype(np.int64)
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8).copy()
+
+
+def _text_at(offsets: np.ndarray, blob: np.ndarray, position: int) -> str:
+    """Texte d'une position d'une colonne (_text_column)"""
+    start, end = int(offsets[position]), int(offsets[position + 1])
+    return bytes(blob[start:end]).decode("utf-8")
+
+
+class CompiledReferentiel:
+    """
+    Référentiel compilé en tableaux parallèles (mmap)
+
+    Attributes:
+        arc_ids: Identifiants triés (unicode)
+        longueur_metres: Longueurs (float64, 0 si géométrie absente)
+        noeud_amont, noeud_aval: Identifiants des nœuds (unicode)
+        centre: Centres (n, 2) lon/lat (NaN si absent)
+        libelle_offsets, libelles: Libellés UTF-8 concaténés (offsets n + 1)
+        geo_point_offsets, geo_points: geo_point_2d d'origine (même format)
+        coord_offsets, coords: Géométries (points (N, 2) et offsets n + 1)
+        meta: Métadonnées (version, empreinte, nombre de tronçons, date)
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any], directory: Optional[Path] = None):
+        self.meta = meta
+        self.directory = directory
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @property
+    def fingerprint(self) -> str:
+        return self.meta.get("empreinte", "")
+
+    def __len__(self) -> int:
+        return len(self.arc_ids)
+
+    @classmethod
+    def from_mapping(cls, mapping: Dict[str, Dict[str, Any]],
+                     geo_shapes: Optional[Dict[str, Any]] = None,
+                     fingerprint: str = "") -> "CompiledReferentiel":
+        """
+        Compile un mapping référentiel (sortie de ReferentielProcessor.aggregate_daily)
+
+        Args:
+            mapping: {arc_id: {"libelle", "longueur_metres", "noeud_amont", "noeud_aval",
+                "geo_point_2d", "center"}}
+            geo_shapes: Géométries par tronçon (optionnel, pour la jointure spatiale)
+            fingerprint: Empreinte de la source
+
+        Returns:
+            CompiledReferentiel (en mémoire)
+        """
+        geo_shapes = geo_shapes or {}
+        arc_ids = sorted(mapping)
+        entries = [mapping[arc_id] for arc_id in arc_ids]
+
+        libelle_offsets, libelles = _text_column([e.get("libelle") for e in entries])
+        geo_point_offsets, geo_points = _text_column([e.get("geo_point_2d") for e in entries])
+
+        centres = np.full((len(arc_ids), 2), np.nan)
+        for i, entry in enumerate(entries):
+            center = entry.get("center")
+            if center:
+                centres[i] = center[:2]
+
+        # Géométries linéaires aplaties (première ligne de chaque tronçon)
+        batch = GeometryBatch([geo_shapes.get(arc_id) for arc_id in arc_ids])
+        lines = []
+        for i, kind in enumerate(batch.kinds.tolist()):
+            if kind == KIND_LINE:
+                part = batch.geometry_offsets[i]
+                lines.append(batch.coords[batch.part_offsets[part]:batch.part_offsets[part + 1]])
+            else:
+                lines.append(np.zeros((0, 2)))
+        coord_offsets = np.concatenate([[0], np.cumsum([len(line) for line in lines])]).astype(np.int64)
+        coords = np.concatenate(lines) if lines else np.zeros((0, 2))
+
+        arrays = {
+            "arc_ids": string_array(arc_ids),
+            "longueur_metres": np.asarray([float(e.get("longueur_metres") or 0.0) for e in entries]),
+            "noeud_amont": string_array([str(e.get("noeud_amont") or "") for e in entries]),
+            "noeud_aval": string_array([str(e.get("noeud_aval") or "") for e in entries]),
+            "centre": centres,
+            "libelle_offsets": libelle_offsets,
+            "libelles": libelles,
+            "geo_point_offsets": geo_point_offsets,
+            "geo_points": geo_points,
+            "coord_offsets": coord_offsets,
+            "coords": np.ascontiguousarray(coords, dtype=np.float64).reshape(-1, 2)
+        }
+        meta = {
+            "version": FORMAT_VERSION,
+            "empreinte": fingerprint,
+            "nombre_troncons": len(arc_ids),
+            "date_compilation": datetime.now().isoformat(timespec="seconds")
+        }
+        return cls(arrays, meta)
+
+    def save(self, root: Any = None) -> Path:
+        """
+        Écrit la version compilée dans un nouveau répertoire puis bascule current.json
+
+        Args:
+            root: Répertoire racine (défaut: REFERENTIEL_STORE_DIR)
+
+        Returns:
+            Répertoire de la version écrite
+        """
+        root = Path(root or REFERENTIEL_STORE_DIR)
+        name = f"v{FORMAT_VERSION}-{self.fingerprint[:16] or 'local'}"
+        directory = root / name
+        tmp_directory = root / f".{name}.tmp{os.getpid()}"
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        tmp_directory.mkdir(parents=True)
+
+        for array_name in _ARRAYS:
+            np.save(tmp_directory / f"{array_name}.npy", getattr(self, array_name), allow_pickle=False)
+        with open(tmp_directory / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        tmp_directory.rename(directory)
+
+        # Bascule atomique de la version active (les lecteurs en cours gardent leur mmap)
+        pointer_tmp = root / f".{_POINTER_FILE}.tmp{os.getpid()}"
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            json.dump({**self.meta, "repertoire": name}, f, indent=2)
+        os.replace(pointer_tmp, root / _POINTER_FILE)
+
+        # Nettoyage des versions précédentes
+        for old in root.glob("v*-*"):
+            if old.is_dir() and old.name != name:
+                shutil.rmtree(old, ignore_errors=True)
+
+        self.directory = directory
+        return directory
+
+    @classmethod
+    def load(cls, root: Any = None) -> Optional["CompiledReferentiel"]:
+        """
+        Charge la version active en mmap (lecture seule)
+
+        Returns:
+            CompiledReferentiel ou None si absent / version de format différente
+        """
+        root = Path(root or REFERENTIEL_STORE_DIR)
+        pointer = root / _POINTER_FILE
+        if not pointer.exists():
+            return None
+        try:
+            with open(pointer, "r", encoding="utf-8") as f:
+                current = json.load(f)
+            if current.get("version") != FORMAT_VERSION:
+                return None
+            directory = root / current["repertoire"]
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Référentiel compilé illisible ({root}): {e}")
+            return None
+        return cls.load_directory(directory)
+
+    @classmethod
+    def load_directory(cls, directory: Any) -> Optional["CompiledReferentiel"]:
+        """
+        Charge une version compilée précise en mmap (lecture seule)
+
+        Args:
+            directory: Répertoire de la version (v<version>-<empreinte>)
+
+        Returns:
+            CompiledReferentiel ou None si illisible
+        """
+        directory = Path(directory)
+        try:
+            with open(directory / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            arrays = {
+                name: np.load(directory / f"{name}.npy", mmap_mode="r", allow_pickle=False)
+                for name in _ARRAYS
+            }
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠ Référentiel compilé illisible ({directory}): {e}")
+            return None
+        return cls(arrays, meta, directory)
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Tableaux du référentiel compilé (publication en mémoire partagée)"""
+        return {name: getattr(self, name) for name in _ARRAYS}
+
+    def lookup_many(self, arc_ids: Sequence[str]) -> np.ndarray:
+        """
+        Positions des tronçons (recherche dichotomique vectorisée)
+
+        Returns:
+            Tableau int64 (-1 si tronçon inconnu)
+        """
+        if len(self.arc_ids) == 0 or len(arc_ids) == 0:
+            return np.full(len(arc_ids), -1, dtype=np.int64)
+        queries = string_array([str(arc_id) for arc_id in arc_ids])
+        positions = np.searchsorted(self.arc_ids, queries)
+        positions = np.minimum(positions, len(self.arc_ids) - 1)
+        found = np.asarray(self.arc_ids[positions]) == queries
+        return np.where(found, positions, -1).astype(np.int64)
+
+    def lookup(self, arc_id: str) -> int:
+        """Position d'un tronçon (-1 si inconnu)"""
+        return int(self.lookup_many([arc_id])[0])
+
+    def lengths(self, arc_ids: Sequence[str]) -> np.ndarray:
+        """Longueurs des tronçons (NaN si inconnu ou longueur nulle)"""
+        positions = self.lookup_many(arc_ids)
+        values = np.asarray(self.longueur_metres)[np.maximum(positions, 0)] if len(positions) else np.zeros(0)
+        return np.where((positions >= 0) & (values > 0), values, np.nan)
+
+    def libelle(self, position: int) -> str:
+        """Libellé d'un tronçon par position"""
+        return _text_at(self.libelle_offsets, self.libelles, position)
+
+    def geo_point(self, position: int) -> str:
+        """geo_point_2d d'origine d'un tronçon par position"""
+        return _text_at(self.geo_point_offsets, self.geo_points, position)
+
+    def geo_shape(self, position: int) -> Optional[Dict[str, Any]]:
+        """Géométrie LineString d'un tronçon par position (None si absente)"""
+        start, end = int(self.coord_offsets[position]), int(self.coord_offsets[position + 1])
+        if end - start < 2:
+            return None
+        return {"type": "LineString", "coordinates": np.asarray(self.coords[start:end]).tolist()}
+
+    def get(self, arc_id: str) -> Optional[Dict[str, Any]]:
+        """Entrée du mapping pour un tronçon (format ReferentielProcessor.aggregate_daily)"""
+        position = self.lookup(arc_id)
+        return self.entry(position) if position >= 0 else None
+
+    def entry(self, position: int) -> Dict[str, Any]:
+        """Entrée du mapping pour une position"""
+        centre = self.centre[position]
+        return {
+            "libelle": self.libelle(position),
+            "longueur_metres": float(self.longueur_metres[position]),
+            "noeud_amont": str(self.noeud_amont[position]),
+            "noeud_aval": str(self.noeud_aval[position]),
+            "geo_point_2d": self.geo_point(position),
+            "center": None if np.isnan(centre[0]) else (float(centre[0]), float(centre[1])),
+            "actif": True
+        }
+
+    def to_mapping(self) -> Dict[str, Dict[str, Any]]:
+        """Mapping complet {arc_id: entrée} (export)"""
+        return {str(arc_id): self.entry(position) for position, arc_id in enumerate(self.arc_ids.tolist())}
+
+    def arc_geometries(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Couples (identifiant, geo_shape) des tronçons ayant une géométrie"""
+        geometries = []
+        for position, arc_id in enumerate(self.arc_ids.tolist()):
+            geo_shape = self.geo_shape(position)
+            if geo_shape:
+                geometries.append((arc_id, geo_shape))
+        return geometries
+
+    def statistics(self) -> Dict[str, Any]:
+        """Statistiques du référentiel (même format que calculate_indicators)"""
+        longueurs = np.asarray(self.longueur_metres)
+        positives = longueurs[longueurs > 0]
+        return {
+            "nombre_troncons": len(self),
+            "longueur_totale_metres": float(positives.sum()),
+            "longueur_moyenne_metres": float(positives.mean()) if positives.size else 0.0
+        }
+
+
+_loaded: Dict[str, Any] = {}
+
+
+def get_compiled_referentiel(refresh: bool = False) -> Optional[CompiledReferentiel]:
+    """
+    Référentiel compilé actif (chargé une fois par processus, rechargé si current.json change)
+
+    Args:
+        refresh: Forcer le rechargement
+
+    Returns:
+        CompiledReferentiel ou None si jamais compilé
+    """
+    if not refresh and _loaded.get("fixe") is not None:
+        return _loaded["fixe"]
+    pointer = Path(REFERENTIEL_STORE_DIR) / _POINTER_FILE
+    try:
+        stamp = pointer.stat().st_mtime_ns
+    except OSError:
+        return None
+    if refresh or _loaded.get("stamp") != stamp:
+        _loaded["store"] = CompiledReferentiel.load()
+        _loaded["stamp"] = stamp
+    return _loaded.get("store")
+
+
+def set_compiled_referentiel(store: Optional[CompiledReferentiel]) -> None:
+    """
+    Fixe le référentiel compilé du processus (workers : version publiée par le parent,
+    sans suivi de current.json) ; None rétablit le chargement depuis REFERENTIEL_STORE_DIR
+    """
+    _loaded["fixe"] = store
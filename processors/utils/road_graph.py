@@ -0,0 +1,270 @@
+"""
+Graphe du réseau routier (nœuds amont / aval des tronçons) en structure CSR
+
+Les identifiants de nœuds sont convertis en index entiers ; pour chaque nœud, les
+tronçons sortants (nœud amont) et entrants (nœud aval) sont rangés dans des tableaux
+d'offsets + index (compressed sparse row). Le graphe est compilé une fois par version du
+référentiel (persisté dans CACHE_DIR/graphe) et permet :
+- voisinages à k sauts (parcours en largeur vectorisé par front)
+- corridors congestionnés : composantes connexes des tronçons saturés consécutifs
+  (partageant un nœud), en temps linéaire
+"""
+
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import CACHE_DIR
+from .array_utils import string_array
+from .referentiel_store import get_compiled_referentiel
+
+GRAPH_FORMAT_VERSION = 1
+_ARRAYS = ("arc_ids", "nodes", "arc_amont", "arc_aval", "out_offsets", "out_arcs", "in_offsets", "in_arcs")
+
+# Sens de parcours
+DIRECTION_AVAL = "aval"  # Tronçons suivants (dans le sens de circulation)
+DIRECTION_AMONT = "amont"  # Tronçons précédents
+DIRECTION_TOUS = "tous"  # Tronçons partageant un nœud
+
+
+def _csr(keys: np.ndarray, n_keys: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Regroupe des index par clé : offsets (n_keys + 1) et valeurs triées par clé
+
+    Args:
+        keys: Clé de chaque élément (-1 : élément ignoré)
+        n_keys: Nombre de clés
+
+    Returns:
+        Tuple (offsets int64, index des éléments int32)
+    """
+    valid = np.nonzero(keys >= 0)[0]
+    order = valid[np.argsort(keys[valid], kind="stable")]
+    counts = np.bincount(keys[valid], minlength=n_keys)
+    offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+    return offsets, order.astype(np.int32)
+
+
+def _gather(offsets: np.ndarray, values: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Concatène les lignes CSR de plusieurs clés sans boucle Python"""
+    starts = offsets[keys]
+    lengths = offsets[keys + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.zeros(0, dtype=values.dtype)
+    shifts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return values[np.arange(total) + shifts]
+
+
+class RoadGraph:
+    """
+    Réseau routier : tronçons (arêtes orientées) entre nœuds, adjacence CSR
+
+    Attributes:
+        arc_ids: Identifiants des tronçons (ordre du référentiel compilé, triés)
+        nodes: Identifiants des nœuds (triés)
+        arc_amont, arc_aval: Index du nœud amont / aval de chaque tronçon (-1 si inconnu)
+        out_offsets, out_arcs: Tronçons sortants de chaque nœud
+        in_offsets, in_arcs: Tronçons entrants de chaque nœud
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], key: str = ""):
+        self.key = key
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+
+    def __len__(self) -> int:
+        return len(self.arc_ids)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.nodes)
+
+    @classmethod
+    def from_arcs(cls, arc_ids: Sequence[str], noeuds_amont: Sequence[str],
+                  noeuds_aval: Sequence[str], key: str = "") -> "RoadGraph":
+        """
+        Compile le graphe depuis les tronçons (identifiants triés ou non)
+
+        Args:
+            arc_ids: Identifiants des tronçons
+            noeuds_amont: Nœud amont de chaque tronçon ("" si inconnu)
+            noeuds_aval: Nœud aval de chaque tronçon
+
+        Returns:
+            RoadGraph (tronçons triés par identifiant)
+        """
+        arc_ids = string_array([str(arc_id) for arc_id in arc_ids])
+        amont = string_array([str(node or "") for node in noeuds_amont])
+        aval = string_array([str(node or "") for node in noeuds_aval])
+        order = np.argsort(arc_ids, kind="stable")
+        arc_ids, amont, aval = arc_ids[order], amont[order], aval[order]
+
+        nodes, inverse = np.unique(np.concatenate([amont, aval]), return_inverse=True)
+        inverse = inverse.astype(np.int32)
+        if len(nodes) and nodes[0] == "":
+            inverse = inverse - 1  # Nœud vide → -1
+            nodes = nodes[1:]
+        arc_amont, arc_aval = inverse[:len(arc_ids)], inverse[len(arc_ids):]
+
+        out_offsets, out_arcs = _csr(arc_amont, len(nodes))
+        in_offsets, in_arcs = _csr(arc_aval, len(nodes))
+        arrays = {
+            "arc_ids": arc_ids, "nodes": nodes,
+            "arc_amont": arc_amont, "arc_aval": arc_aval,
+            "out_offsets": out_offsets, "out_arcs": out_arcs,
+            "in_offsets": in_offsets, "in_arcs": in_arcs
+        }
+        return cls(arrays, key)
+
+    def save(self, path: Path) -> None:
+        """Écrit le graphe (.npz, remplacement atomique)"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, **{name: getattr(self, name) for name in _ARRAYS})
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, key: str = "") -> Optional["RoadGraph"]:
+        """Relit un graphe écrit par save (None si absent ou illisible)"""
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls({name: data[name] for name in _ARRAYS}, key)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Graphe routier illisible ({path}): {e}")
+            return None
+
+    def positions(self, arc_ids: Sequence[str]) -> np.ndarray:
+        """Positions des tronçons dans le graphe (-1 si inconnu)"""
+        if len(self.arc_ids) == 0 or len(arc_ids) == 0:
+            return np.full(len(arc_ids), -1, dtype=np.int64)
+        queries = string_array([str(arc_id) for arc_id in arc_ids])
+        positions = np.minimum(np.searchsorted(self.arc_ids, queries), len(self.arc_ids) - 1)
+        return np.where(self.arc_ids[positions] == queries, positions, -1).astype(np.int64)
+
+    def _next_arcs(self, arcs: np.ndarray, direction: str) -> np.ndarray:
+        """Tronçons adjacents à un ensemble de tronçons (avec doublons)"""
+        parts = []
+        if direction in (DIRECTION_AVAL, DIRECTION_TOUS):
+            nodes = self.arc_aval[arcs]
+            parts.append(_gather(self.out_offsets, self.out_arcs, nodes[nodes >= 0]))
+        if direction in (DIRECTION_AMONT, DIRECTION_TOUS):
+            nodes = self.arc_amont[arcs]
+            parts.append(_gather(self.in_offsets, self.in_arcs, nodes[nodes >= 0]))
+        if direction == DIRECTION_TOUS:
+            # Tronçons partageant le même nœud de départ / d'arrivée (voies parallèles, sens inverse)
+            nodes = self.arc_amont[arcs]
+            parts.append(_gather(self.out_offsets, self.out_arcs, nodes[nodes >= 0]))
+            nodes = self.arc_aval[arcs]
+            parts.append(_gather(self.in_offsets, self.in_arcs, nodes[nodes >= 0]))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int32)
+
+    def k_hop(self, arc_ids: Sequence[str], k: int, direction: str = DIRECTION_TOUS) -> Dict[str, int]:
+        """
+        Voisinage à k sauts d'un ensemble de tronçons (parcours en largeur par front)
+
+        Args:
+            arc_ids: Tronçons de départ
+            k: Nombre maximal de sauts
+            direction: DIRECTION_AVAL, DIRECTION_AMONT ou DIRECTION_TOUS
+
+        Returns:
+            Dict {arc_id: distance en sauts} (départs inclus à distance 0)
+        """
+        distances = np.full(len(self), -1, dtype=np.int32)
+        frontier = self.positions(arc_ids)
+        frontier = np.unique(frontier[frontier >= 0])
+        distances[frontier] = 0
+        for hop in range(1, k + 1):
+            if frontier.size == 0:
+                break
+            candidates = np.unique(self._next_arcs(frontier, direction))
+            frontier = candidates[distances[candidates] < 0]
+            distances[frontier] = hop
+        reached = np.nonzero(distances >= 0)[0]
+        return dict(zip(self.arc_ids[reached].tolist(), distances[reached].tolist()))
+
+    def connected_groups(self, arc_ids: Sequence[str]) -> List[List[str]]:
+        """
+        Composantes connexes d'un sous-ensemble de tronçons (tronçons consécutifs :
+        partageant un nœud), en temps linéaire (union-find)
+
+        Args:
+            arc_ids: Tronçons du sous-ensemble (ex: tronçons saturés)
+
+        Returns:
+            Liste de groupes d'identifiants (tronçons inconnus du graphe : groupes isolés)
+        """
+        arc_ids = list(dict.fromkeys(arc_ids))
+        positions = self.positions(arc_ids)
+        known = np.nonzero(positions >= 0)[0]
+
+        parent = list(range(len(arc_ids)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        # Couples (nœud, membre) des deux extrémités, triés par nœud : membres consécutifs
+        # d'un même nœud reliés
+        if known.size:
+            members = np.concatenate([known, known])
+            nodes = np.concatenate([self.arc_amont[positions[known]], self.arc_aval[positions[known]]])
+            valid = nodes >= 0
+            members, nodes = members[valid], nodes[valid]
+            order = np.argsort(nodes, kind="stable")
+            members, nodes = members[order], nodes[order]
+            same = np.nonzero(nodes[1:] == nodes[:-1])[0]
+            for a, b in zip(members[same].tolist(), members[same + 1].tolist()):
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups: Dict[int, List[str]] = {}
+        for i, arc_id in enumerate(arc_ids):
+            groups.setdefault(find(i), []).append(arc_id)
+        return list(groups.values())
+
+
+_graphs: Dict[str, RoadGraph] = {}
+
+
+def get_road_graph() -> Optional[RoadGraph]:
+    """
+    Graphe du référentiel compilé actif (compilé une fois par version, persisté dans
+    CACHE_DIR/graphe)
+
+    Returns:
+        RoadGraph ou None si aucun référentiel compilé
+    """
+    store = get_compiled_referentiel()
+    if store is None:
+        return None
+    key = f"v{GRAPH_FORMAT_VERSION}-{store.fingerprint[:16] or 'local'}"
+    graph = _graphs.get(key)
+    if graph is not None:
+        return graph
+
+    directory = Path(CACHE_DIR) / "graphe"
+    path = directory / f"graphe-{key}.npz"
+    graph = RoadGraph.load(path, key)
+    if graph is None:
+        graph = RoadGraph.from_arcs(store.arc_ids, store.noeud_amont, store.noeud_aval, key)
+        try:
+            graph.save(path)
+            for old in directory.glob("graphe-*.npz"):
+                if old != path:
+                    old.unlink()
+        except OSError as e:
+            print(f"⚠ Écriture graphe routier impossible: {e}")
+
+    _graphs.clear()
+    _graphs[key] = graph
+    return graph
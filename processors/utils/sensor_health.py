@@ -0,0 +1,325 @@
+"""
+Suivi incrémental de l'état de santé des capteurs (compteurs vélos, tronçons)
+
+Les relevés sont consommés en flux, par micro-lots horaires, sans jamais relire
+l'historique : chaque capteur n'a qu'un état de taille fixe (dernière heure reçue,
+dernière heure active, dernière valeur non nulle et longueur de sa série, heures
+manquantes, défaillance en cours). Un lot est trié une fois par (capteur, heure) ;
+séries et seuils sont ensuite évalués par des opérations NumPy, reprises depuis l'état
+conservé.
+
+Deux règles, signalées à l'heure exacte du franchissement du seuil :
+- inactif : CAPTEUR_DEFAILLANT_HEURES heures consécutives sans comptage non nul
+  (relevés nuls ou absents) ;
+- valeur constante : plus de CAPTEUR_VALEUR_CONSTANTE_RELEVES relevés non nuls
+  consécutifs identiques (valeur bloquée).
+Une défaillance est levée au premier relevé qui rompt la règle (événement "retabli").
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import CAPTEUR_DEFAILLANT_HEURES, CAPTEUR_VALEUR_CONSTANTE_RELEVES
+from .hourly_matrix import iso_from_epoch_hour
+from .array_utils import string_array
+
+CAUSE_INACTIF = "inactif"
+CAUSE_VALEUR_CONSTANTE = "valeur_constante"
+_CAUSES = (CAUSE_INACTIF, CAUSE_VALEUR_CONSTANTE)
+
+_COLUMNS = ("ids", "derniere_heure", "derniere_activite", "derniere_valeur", "serie_constante",
+            "heures_manquantes", "plus_long_trou", "inactif_depuis", "constant_depuis")
+_INT_COLUMNS = ("derniere_heure", "derniere_activite", "serie_constante", "heures_manquantes",
+                "plus_long_trou", "inactif_depuis", "constant_depuis")
+
+
+def _previous(values: np.ndarray, first: np.ndarray, carried: np.ndarray) -> np.ndarray:
+    """Valeur précédente dans le groupe (valeur reprise de l'état pour le premier élément)"""
+    shifted = np.empty_like(values)
+    shifted[1:] = values[:-1]
+    return np.where(first, carried, shifted)
+
+
+class SensorHealthTracker:
+    """
+    État de santé par capteur (heures absolues UTC, cf. epoch_hours_from_iso)
+
+    Attributes:
+        ids: Identifiants (triés)
+        derniere_heure: Dernière heure consommée (-1 si aucune)
+        derniere_activite: Dernière heure avec comptage non nul (première heure - 1 si aucune)
+        derniere_valeur, serie_constante: Dernière valeur non nulle et nombre de relevés
+            non nuls consécutifs égaux à cette valeur
+        heures_manquantes, plus_long_trou: Heures sans relevé entre deux relevés
+            (cumul, plus long trou)
+        inactif_depuis, constant_depuis: Heure de début de la défaillance en cours (-1 sinon)
+        horloge: Heure la plus récente vue, tous capteurs confondus
+    """
+
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None, horloge: int = -1,
+                 inactive_hours: Optional[int] = None, constant_records: Optional[int] = None):
+        columns = columns or {}
+        self.ids = columns.get("ids", string_array([]))
+        for name in _INT_COLUMNS:
+            setattr(self, name, columns.get(name, np.zeros(0, dtype=np.int64)).astype(np.int64))
+        self.derniere_valeur = columns.get("derniere_valeur", np.zeros(0)).astype(np.float64)
+        self.horloge = int(horloge)
+        self.inactive_hours = CAPTEUR_DEFAILLANT_HEURES if inactive_hours is None else int(inactive_hours)
+        self.constant_records = (CAPTEUR_VALEUR_CONSTANTE_RELEVES if constant_records is None
+                                 else int(constant_records))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self, path: Path) -> None:
+        """Écrit l'état (.npz, remplacement atomique)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, horloge=np.int64(self.horloge),
+                 **{name: getattr(self, name) for name in _COLUMNS})
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "SensorHealthTracker":
+        """Relit l'état (état vide si absent ou illisible)"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls({name: data[name] for name in _COLUMNS}, int(data["horloge"]))
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ État de santé capteurs illisible ({path}): {e}")
+            return cls()
+
+    def lookup_many(self, sensor_ids: Sequence[str]) -> np.ndarray:
+        """Positions des capteurs (-1 si inconnu)"""
+        if len(self.ids) == 0 or len(sensor_ids) == 0:
+            return np.full(len(sensor_ids), -1, dtype=np.int64)
+        queries = string_array([str(sensor_id) for sensor_id in sensor_ids])
+        positions = np.minimum(np.searchsorted(self.ids, queries), len(self.ids) - 1)
+        return np.where(self.ids[positions] == queries, positions, -1).astype(np.int64)
+
+    def _insert(self, new_ids: np.ndarray, first_hours: np.ndarray) -> None:
+        """Ajoute des capteurs (état initial : inactifs depuis l'heure précédant leur premier relevé)"""
+        n = len(new_ids)
+        added = {name: np.zeros(n, dtype=np.int64) for name in _INT_COLUMNS}
+        added.update({
+            "ids": new_ids,
+            "derniere_heure": np.full(n, -1, dtype=np.int64),
+            "derniere_activite": first_hours - 1,
+            "derniere_valeur": np.full(n, np.nan),
+            "inactif_depuis": np.full(n, -1, dtype=np.int64),
+            "constant_depuis": np.full(n, -1, dtype=np.int64)
+        })
+        merged = {name: np.concatenate([getattr(self, name), added[name]]) for name in _COLUMNS}
+        order = np.argsort(merged["ids"], kind="stable")
+        for name in _COLUMNS:
+            setattr(self, name, merged[name][order])
+
+    def consume(self, sensor_ids: Sequence[Optional[str]], hours: Sequence[int],
+                values: Sequence[float]) -> List[Dict[str, Any]]:
+        """
+        Consomme un micro-lot de relevés (ordre quelconque)
+
+        Les relevés d'une heure déjà consommée pour un capteur sont ignorés (lots
+        rejoués ou se recouvrant) ; plusieurs relevés d'une même heure sont sommés.
+
+        Args:
+            sensor_ids: Capteur de chaque relevé (vide : relevé ignoré)
+            hours: Heure absolue de chaque relevé (-1 : relevé ignoré)
+            values: Comptage de chaque relevé (absent = 0)
+
+        Returns:
+            Événements du lot triés par heure : [{"id_capteur", "heure", "cause",
+            "etat": "defaillant" | "retabli"}]
+        """
+        hours = np.asarray(hours, dtype=np.int64)
+        values = np.nan_to_num(np.asarray(values, dtype=np.float64))
+        keep = (hours >= 0) & np.array([bool(sensor_id) for sensor_id in sensor_ids], dtype=bool)
+        kept_ids = [str(sensor_id) for sensor_id, kept in zip(sensor_ids, keep.tolist()) if kept]
+        hours, values = hours[keep], values[keep]
+
+        # Nouveaux capteurs, puis relevés non encore consommés
+        positions = self.lookup_many(kept_ids)
+        unknown = positions < 0
+        if unknown.any():
+            new_ids, inverse = np.unique(string_array(kept_ids)[unknown], return_inverse=True)
+            first_hours = np.full(len(new_ids), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(first_hours, inverse, hours[unknown])
+            self._insert(new_ids, first_hours)
+            positions = self.lookup_many(kept_ids)
+        fresh = hours > self.derniere_heure[positions]
+        rows, hours, values = positions[fresh], hours[fresh], values[fresh]
+
+        events: List[tuple] = []
+        if len(rows):
+            # Tri (capteur, heure) et cumul des relevés d'une même heure
+            order = np.lexsort((hours, rows))
+            rows, hours, values = rows[order], hours[order], values[order]
+            starts = np.flatnonzero(np.concatenate([[True], (rows[1:] != rows[:-1]) | (hours[1:] != hours[:-1])]))
+            rows, hours, values = rows[starts], hours[starts], np.add.reduceat(values, starts)
+            first = np.concatenate([[True], rows[1:] != rows[:-1]])
+
+            # Trous entre relevés successifs
+            previous_hours = _previous(hours, first, self.derniere_heure[rows])
+            gaps = np.where(previous_hours >= 0, hours - previous_hours - 1, 0)
+            self.heures_manquantes += np.bincount(rows, weights=gaps, minlength=len(self)).astype(np.int64)
+            np.maximum.at(self.plus_long_trou, rows, gaps)
+            np.maximum.at(self.derniere_heure, rows, hours)
+
+            active = values != 0
+            if active.any():
+                events += self._update_inactivity(rows[active], hours[active])
+                events += self._update_constant(rows[active], hours[active], values[active])
+            self.horloge = max(self.horloge, int(hours.max()))
+
+        events += self._check_inactive()
+        return self._format_events(events)
+
+    def advance(self, hour: int) -> List[Dict[str, Any]]:
+        """
+        Avance l'horloge sans relevé (capteurs silencieux) et signale les capteurs
+        devenus inactifs
+
+        Args:
+            hour: Heure absolue courante
+
+        Returns:
+            Événements (cf. consume)
+        """
+        self.horloge = max(self.horloge, int(hour))
+        return self._format_events(self._check_inactive())
+
+    def _update_inactivity(self, rows: np.ndarray, hours: np.ndarray) -> List[tuple]:
+        """Relevés non nuls (triés par capteur, heure) : silences clos par une activité"""
+        first = np.concatenate([[True], rows[1:] != rows[:-1]])
+        previous_active = _previous(hours, first, self.derniere_activite[rows])
+        too_long = hours - previous_active - 1 >= self.inactive_hours
+        flagged = first & (self.inactif_depuis[rows] >= 0)  # Déjà signalé par un lot précédent
+
+        failing = too_long & ~flagged
+        restored = too_long | flagged
+        np.maximum.at(self.derniere_activite, rows, hours)
+        self.inactif_depuis[rows] = -1
+        return ([(row, hour, 0, True) for row, hour in
+                 zip(rows[failing].tolist(), (previous_active[failing] + self.inactive_hours).tolist())] +
+                [(row, hour, 0, False) for row, hour in zip(rows[restored].tolist(), hours[restored].tolist())])
+
+    def _update_constant(self, rows: np.ndarray, hours: np.ndarray, values: np.ndarray) -> List[tuple]:
+        """Relevés non nuls (triés par capteur, heure) : séries de valeurs identiques"""
+        n = len(rows)
+        limit = self.constant_records
+        first = np.concatenate([[True], rows[1:] != rows[:-1]])
+        last = np.concatenate([rows[1:] != rows[:-1], [True]])
+        carried = self.serie_constante[rows]
+
+        # Longueur de série à chaque relevé (reprise de la série en cours pour le premier)
+        continues = values == _previous(values, first, self.derniere_valeur[rows])
+        continues &= ~first | (carried > 0)
+        run_start = first | ~continues
+        base = np.where(first & continues, carried, 0)
+        index = np.arange(n)
+        start = np.maximum.accumulate(np.where(run_start, index, 0))
+        length = index - start + 1 + base[start]
+
+        crossed = length == limit + 1
+        broken = ~continues & (_previous(length, first, carried) > limit)
+
+        # État : dernière série de chaque capteur (heure du franchissement si dans le lot)
+        last_rows = rows[last]
+        last_length = length[last]
+        crossing = index[last] - (last_length - limit - 1)
+        self.derniere_valeur[last_rows] = values[last]
+        self.serie_constante[last_rows] = last_length
+        self.constant_depuis[last_rows] = np.where(
+            last_length <= limit, -1,
+            np.where(crossing >= start[last], hours[np.clip(crossing, 0, n - 1)], self.constant_depuis[last_rows])
+        )
+        return ([(row, hour, 1, True) for row, hour in zip(rows[crossed].tolist(), hours[crossed].tolist())] +
+                [(row, hour, 1, False) for row, hour in zip(rows[broken].tolist(), hours[broken].tolist())])
+
+    def _check_inactive(self) -> List[tuple]:
+        """Silences en cours ayant atteint le seuil à l'horloge courante"""
+        if self.horloge < 0:
+            return []
+        opening = (self.horloge - self.derniere_activite >= self.inactive_hours) & (self.inactif_depuis < 0)
+        rows = np.flatnonzero(opening)
+        self.inactif_depuis[rows] = self.derniere_activite[rows] + self.inactive_hours
+        return [(row, hour, 0, True) for row, hour in zip(rows.tolist(), self.inactif_depuis[rows].tolist())]
+
+    def _format_events(self, events: List[tuple]) -> List[Dict[str, Any]]:
+        """(ligne, heure, cause, défaillant) → événements triés par heure puis capteur"""
+        ids = self.ids.tolist()
+        return [
+            {
+                "id_capteur": ids[row],
+                "heure": iso_from_epoch_hour(hour),
+                "cause": _CAUSES[cause],
+                "etat": "defaillant" if failing else "retabli"
+            }
+            for row, hour, cause, failing in sorted(events, key=lambda event: (event[1], ids[event[0]], not event[3]))
+        ]
+
+    def failing_mask(self, sensor_ids: Sequence[str]) -> np.ndarray:
+        """Capteurs en défaillance (inconnus : False)"""
+        positions = self.lookup_many(sensor_ids)
+        known = positions >= 0
+        rows = positions[known]
+        mask = np.zeros(len(positions), dtype=bool)
+        mask[known] = (self.inactif_depuis[rows] >= 0) | (self.constant_depuis[rows] >= 0)
+        return mask
+
+    def status(self, position: int) -> Dict[str, Any]:
+        """État d'un capteur"""
+        causes = {
+            CAUSE_INACTIF: int(self.inactif_depuis[position]),
+            CAUSE_VALEUR_CONSTANTE: int(self.constant_depuis[position])
+        }
+        active = int(self.derniere_activite[position])
+        return {
+            "id_capteur": str(self.ids[position]),
+            "defaillant": any(since >= 0 for since in causes.values()),
+            "causes": {cause: iso_from_epoch_hour(since) for cause, since in causes.items() if since >= 0},
+            "derniere_activite": (iso_from_epoch_hour(active)
+                                  if np.isfinite(self.derniere_valeur[position]) else None),
+            "heures_manquantes": int(self.heures_manquantes[position]),
+            "plus_long_trou_heures": int(self.plus_long_trou[position])
+        }
+
+    def summary(self) -> Dict[str, Any]:
+        """Résumé : nombre de capteurs suivis et défaillants par cause"""
+        inactive = self.inactif_depuis >= 0
+        constant = self.constant_depuis >= 0
+        return {
+            "capteurs": len(self),
+            "defaillants": int((inactive | constant).sum()),
+            "inactifs": int(inactive.sum()),
+            "valeurs_constantes": int(constant.sum()),
+            "horloge": iso_from_epoch_hour(self.horloge) if self.horloge >= 0 else None
+        }
+
+
+_trackers: Dict[str, SensorHealthTracker] = {}
+
+
+def get_sensor_health(path: Path, refresh: bool = False) -> SensorHealthTracker:
+    """
+    État de santé persistant du processus (chargé une fois par fichier)
+
+    Args:
+        path: Fichier d'état (.npz)
+        refresh: Relire le fichier
+
+    Returns:
+        SensorHealthTracker (vide si jamais écrit)
+    """
+    key = str(path)
+    if refresh or key not in _trackers:
+        _trackers[key] = SensorHealthTracker.load(path)
+    return _trackers[key]
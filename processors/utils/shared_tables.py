@@ -0,0 +1,270 @@
+"""
+Tables de référence en lecture seule partagées entre processus workers (sans copie)
+
+Le processus parent publie une fois le référentiel compilé, le moteur des arrondissements
+et le cache des géométries :
+- tableaux NumPy copiés dans un segment multiprocessing.shared_memory par table
+- référentiel compilé déjà sur disque : seul son répertoire est publié (mmap des .npy)
+
+Le manifeste (noms des segments, dtype / forme / offset de chaque tableau) est un petit
+dict sérialisable transmis aux workers ; chacun s'y attache par nom et obtient des vues
+NumPy en lecture seule sur les mêmes pages mémoire. La mémoire par worker reste
+constante quel que soit le nombre de workers.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from pathlib import PurePath
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .arrondissements import ArrondissementLocator, get_default_locator, set_default_locator
+from .geometry_batch import GeometryCache, get_geometry_cache, set_geometry_cache
+from .referentiel_store import (
+    CompiledReferentiel, get_compiled_referentiel, set_compiled_referentiel
+)
+
+TABLE_REFERENTIEL = "referentiel"
+TABLE_ARRONDISSEMENTS = "arrondissements"
+TABLE_GEOMETRIES = "geometries"
+
+_ALIGNMENT = 64  # Alignement des tableaux dans un segment (octets)
+
+# Segments attachés par ce processus (gardés ouverts tant que les vues sont utilisées)
+_attached: List[shared_memory.SharedMemory] = []
+
+# Configuration transmise par le parent (workers du pool uniquement)
+_worker_config: Dict[str, Any] = {}
+
+_CONFIG_TYPES = (str, int, float, bool, PurePath, type(None))
+
+
+def _aligned(size: int) -> int:
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _attach_segment(name: str) -> shared_memory.SharedMemory:
+    """
+    S'attache à un segment existant (les workers du pool partagent le resource_tracker
+    du parent : seul le parent, propriétaire, détruit le segment)
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:  # Python < 3.13 : inscription dédoublonnée par le resource_tracker
+        return shared_memory.SharedMemory(name=name)
+
+
+class SharedTables:
+    """
+    Tables publiées par le processus parent (propriétaire des segments)
+
+    Utilisable comme gestionnaire de contexte : les segments sont libérés à la sortie.
+    """
+
+    def __init__(self):
+        self.manifest: Dict[str, Dict[str, Any]] = {}
+        self._segments: List[shared_memory.SharedMemory] = []
+
+    def publish(self, name: str, arrays: Dict[str, np.ndarray], meta: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Copie un ensemble de tableaux dans un segment de mémoire partagée
+
+        Args:
+            name: Nom de la table
+            arrays: Tableaux à publier (types numériques ou unicode, pas d'objets)
+            meta: Métadonnées sérialisables
+        """
+        arrays = {key: np.ascontiguousarray(value) for key, value in arrays.items()}
+        layout = {}
+        size = 0
+        for key, value in arrays.items():
+            if value.dtype.hasobject:
+                raise ValueError(f"Tableau objet non partageable: {name}.{key}")
+            layout[key] = (value.dtype.str, value.shape, size)
+            size = _aligned(size + value.nbytes)
+
+        segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        self._segments.append(segment)
+        for key, value in arrays.items():
+            dtype, shape, offset = layout[key]
+            np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=offset)[...] = value
+
+        self.manifest[name] = {"segment": segment.name, "tableaux": layout, "meta": meta or {}}
+
+    def publish_directory(self, name: str, directory: Any, meta: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Publie une table déjà présente sur disque en .npy (partagée via mmap, sans copie)
+
+        Args:
+            name: Nom de la table
+            directory: Répertoire des tableaux
+            meta: Métadonnées sérialisables
+        """
+        self.manifest[name] = {"repertoire": str(directory), "meta": meta or {}}
+
+    def nbytes(self) -> int:
+        """Taille totale des segments publiés (octets)"""
+        return sum(segment.size for segment in self._segments)
+
+    def close(self) -> None:
+        """Libère les segments publiés (les workers doivent être terminés)"""
+        for segment in self._segments:
+            segment.close()
+            try:
+                segment.unlink()
+            except FileNotFoundError:
+                pass
+        self._segments = []
+        self.manifest = {}
+
+    def __enter__(self) -> "SharedTables":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def attach_table(entry: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """
+    Vues en lecture seule sur les tableaux d'une table publiée (aucune copie)
+
+    Args:
+        entry: Entrée du manifeste (SharedTables.manifest[name])
+
+    Returns:
+        Dict nom → tableau
+    """
+    segment = _attach_segment(entry["segment"])
+    _attached.append(segment)
+    arrays = {}
+    for key, (dtype, shape, offset) in entry["tableaux"].items():
+        view = np.ndarray(tuple(shape), dtype=np.dtype(dtype), buffer=segment.buf, offset=offset)
+        view.flags.writeable = False
+        arrays[key] = view
+    return arrays
+
+
+def publish_default_tables(tables: Optional[SharedTables] = None) -> SharedTables:
+    """
+    Publie les tables de référence du processus courant : référentiel compilé,
+    moteur des arrondissements, cache des géométries (tables indisponibles ignorées)
+
+    Args:
+        tables: Publication à compléter (défaut: nouvelle)
+
+    Returns:
+        SharedTables (à fermer par l'appelant)
+    """
+    tables = tables or SharedTables()
+
+    store = get_compiled_referentiel()
+    if store is not None:
+        if store.directory is not None:
+            tables.publish_directory(TABLE_REFERENTIEL, store.directory, store.meta)
+        else:
+            tables.publish(TABLE_REFERENTIEL, store.to_arrays(), store.meta)
+
+    arrays, meta = get_default_locator().to_arrays()
+    tables.publish(TABLE_ARRONDISSEMENTS, arrays, meta)
+
+    keys, values = get_geometry_cache().to_arrays()
+    tables.publish(TABLE_GEOMETRIES, {"keys": keys, "values": values})
+
+    return tables
+
+
+def install_shared_tables(manifest: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Initialisation d'un worker : s'attache aux tables publiées et les installe comme
+    tables par défaut du processus (get_compiled_referentiel, get_default_locator,
+    get_geometry_cache)
+
+    Args:
+        manifest: SharedTables.manifest du parent
+    """
+    entry = manifest.get(TABLE_REFERENTIEL)
+    if entry is not None:
+        if "repertoire" in entry:
+            store = CompiledReferentiel.load_directory(entry["repertoire"])
+        else:
+            store = CompiledReferentiel(attach_table(entry), entry["meta"])
+        if store is not None:
+            set_compiled_referentiel(store)
+
+    entry = manifest.get(TABLE_ARRONDISSEMENTS)
+    if entry is not None:
+        set_default_locator(ArrondissementLocator.from_arrays(attach_table(entry), entry["meta"]))
+
+    entry = manifest.get(TABLE_GEOMETRIES)
+    if entry is not None:
+        arrays = attach_table(entry)
+        set_geometry_cache(GeometryCache.from_arrays(arrays["keys"], arrays["values"]))
+
+
+def config_snapshot(config: Any) -> Dict[str, Any]:
+    """
+    Paramètres sérialisables d'une configuration (module settings ou objet), à
+    transmettre aux workers : constantes en majuscules de types simples
+
+    Args:
+        config: Configuration du processeur parent
+
+    Returns:
+        Dict nom → valeur
+    """
+    def simple(value: Any) -> bool:
+        if isinstance(value, (list, tuple)):
+            return all(simple(item) for item in value)
+        if isinstance(value, dict):
+            return all(isinstance(key, str) and simple(item) for key, item in value.items())
+        return isinstance(value, _CONFIG_TYPES)
+
+    return {name: getattr(config, name) for name in dir(config)
+            if name.isupper() and simple(getattr(config, name))}
+
+
+def _install_worker(manifest: Dict[str, Dict[str, Any]], config: Optional[Dict[str, Any]]) -> None:
+    """Initialisation d'un worker : tables partagées et configuration du parent"""
+    install_shared_tables(manifest)
+    _worker_config.clear()
+    _worker_config.update(config or {})
+
+
+def get_worker_config() -> Optional[SimpleNamespace]:
+    """
+    Configuration du processus parent dans un worker du pool (None hors pool ou si
+    le parent n'en a pas transmis)
+    """
+    return SimpleNamespace(**_worker_config) if _worker_config else None
+
+
+@contextmanager
+def shared_worker_pool(max_workers: int, tables: Optional[SharedTables] = None,
+                       config: Any = None) -> Iterator[ProcessPoolExecutor]:
+    """
+    Pool de processus dont les workers partagent les tables de référence du parent
+    et sa configuration (cf. get_worker_config)
+
+    Args:
+        max_workers: Nombre de workers
+        tables: Tables déjà publiées (défaut: publish_default_tables, libérées en sortie)
+        config: Configuration du parent (transmise via config_snapshot)
+
+    Yields:
+        ProcessPoolExecutor
+    """
+    owned = tables is None
+    if owned:
+        tables = publish_default_tables()
+    try:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_install_worker,
+                                 initargs=(tables.manifest,
+                                           None if config is None else config_snapshot(config))) as executor:
+            yield executor
+    finally:
+        if owned:
+            tables.close()
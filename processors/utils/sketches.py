@@ -0,0 +1,407 @@
+"""
+Sketches statistiques fusionnables : quantiles (t-digest) et cardinalités (HyperLogLog)
+
+Les sketches sont sérialisables (dict JSON compact) et fusionnables entre chunks,
+workers et jours : les percentiles mensuels se calculent en fusionnant les sketches
+quotidiens stockés avec les métriques, sans relire les données brutes.
+
+Seuls les sketches ville sont conservés : les percentiles par tronçon / compteur se
+calculent sur la journée (au plus 24 valeurs, déjà publiées dans les profils horaires),
+leurs digests ne sont pas stockés.
+"""
+
+import base64
+import hashlib
+import math
+import sys
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional
+
+# Percentiles publiés par défaut
+DEFAULT_QUANTILES = (0.5, 0.9, 0.95)
+
+
+def _encode_array(values: array) -> str:
+    """Encode un array typé en base64 (little-endian)"""
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode("ascii")
+
+
+def _decode_array(typecode: str, encoded: str) -> array:
+    """Décode un array typé depuis base64 (little-endian)"""
+    values = array(typecode)
+    values.frombytes(base64.b64decode(encoded))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+class TDigest:
+    """
+    t-digest "merging" : estimation de quantiles en mémoire bornée
+
+    Les centroïdes des queues de distribution restent petits (précision sur p90/p95),
+    ceux du centre sont fusionnés. Taille ~ O(compression) quel que soit le volume.
+    """
+
+    def __init__(self, compression: float = 100.0):
+        """
+        Args:
+            compression: Paramètre de compression (plus grand = plus précis, plus gros)
+        """
+        self.compression = float(compression)
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self._means: List[float] = []
+        self._weights: List[float] = []
+        self._buffer: List[tuple] = []
+        self._buffer_limit = max(50, int(5 * self.compression))
+
+    def add(self, value: Optional[float], weight: float = 1.0) -> None:
+        """
+        Ajoute une observation (None / NaN ignorés)
+
+        Args:
+            value: Valeur observée
+            weight: Poids de l'observation
+        """
+        if value is None or weight <= 0:
+            return
+        value = float(value)
+        if math.isnan(value):
+            return
+
+        self._buffer.append((value, float(weight)))
+        self.total += weight
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        if len(self._buffer) >= self._buffer_limit:
+            self._compress()
+
+    def update(self, values: Iterable[Optional[float]]) -> "TDigest":
+        """Ajoute plusieurs observations"""
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: "TDigest") -> "TDigest":
+        """
+        Fusionne un autre digest (chunk, worker, autre jour)
+
+        Returns:
+            self
+        """
+        if other.total <= 0:
+            return self
+
+        other._compress()
+        self._buffer.extend(zip(other._means, other._weights))
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self) -> None:
+        """Fusionne le tampon dans les centroïdes (borne de taille 4·n·q(1-q)/δ)"""
+        if not self._buffer:
+            return
+
+        items = sorted(list(zip(self._means, self._weights)) + self._buffer)
+        self._buffer = []
+
+        total = sum(w for _, w in items)
+        means = []
+        weights = []
+
+        cur_mean, cur_weight = items[0]
+        weight_before = 0.0
+
+        for mean, weight in items[1:]:
+            proposed = cur_weight + weight
+            q = (weight_before + proposed / 2.0) / total
+            limit = 4.0 * total * q * (1.0 - q) / self.compression
+
+            if proposed <= limit:
+                cur_mean += (mean - cur_mean) * weight / proposed
+                cur_weight = proposed
+            else:
+                means.append(cur_mean)
+                weights.append(cur_weight)
+                weight_before += cur_weight
+                cur_mean, cur_weight = mean, weight
+
+        means.append(cur_mean)
+        weights.append(cur_weight)
+
+        self._means = means
+        self._weights = weights
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estime un quantile
+
+        Args:
+            q: Quantile (0-1)
+
+        Returns:
+            Valeur estimée ou None si digest vide
+        """
+        self._compress()
+        if self.total <= 0:
+            return None
+
+        q = min(1.0, max(0.0, q))
+        means = self._means
+        weights = self._weights
+
+        if len(means) == 1:
+            return means[0]
+
+        if len(means) == self.total:
+            # Centroïdes unitaires (petits volumes, ex: 24 valeurs horaires) : quantile exact
+            position = q * (len(means) - 1)
+            lower = int(position)
+            upper = min(lower + 1, len(means) - 1)
+            return means[lower] + (means[upper] - means[lower]) * (position - lower)
+
+        target = q * self.total
+
+        # Avant le centre du premier centroïde : interpoler depuis le min
+        first_center = weights[0] / 2.0
+        if target <= first_center:
+            if first_center <= 0:
+                return self.min
+            return self.min + (means[0] - self.min) * target / first_center
+
+        cumulative = 0.0
+        for i in range(len(means) - 1):
+            center = cumulative + weights[i] / 2.0
+            next_center = cumulative + weights[i] + weights[i + 1] / 2.0
+            if target <= next_center:
+                span = next_center - center
+                fraction = (target - center) / span if span > 0 else 0.0
+                return means[i] + (means[i + 1] - means[i]) * fraction
+            cumulative += weights[i]
+
+        # Après le centre du dernier centroïde : interpoler jusqu'au max
+        last_center = self.total - weights[-1] / 2.0
+        span = self.total - last_center
+        fraction = (target - last_center) / span if span > 0 else 1.0
+        return means[-1] + (self.max - means[-1]) * min(1.0, fraction)
+
+    def quantiles(self, qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Optional[float]]:
+        """
+        Estime plusieurs quantiles
+
+        Returns:
+            Dict {"p50": ..., "p90": ..., "p95": ...}
+        """
+        return {f"p{int(round(q * 100))}": self.quantile(q) for q in qs}
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Sérialise le digest (centroïdes float32 / poids uint32 en base64)"""
+        self._compress()
+        return {
+            "type": "tdigest",
+            "compression": self.compression,
+            "total": self.total,
+            "min": self.min if self.total > 0 else None,
+            "max": self.max if self.total > 0 else None,
+            "means": _encode_array(array("f", self._means)),
+            "weights": _encode_array(array("I", (int(round(w)) for w in self._weights)))
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TDigest":
+        """Désérialise un digest"""
+        digest = cls(data.get("compression", 100.0))
+        means = list(_decode_array("f", data.get("means", "")))
+        weights = [float(w) for w in _decode_array("I", data.get("weights", ""))]
+        digest._means = means
+        digest._weights = weights
+        digest.total = sum(weights)
+        if digest.total > 0:
+            digest.min = data.get("min") if data.get("min") is not None else min(means)
+            digest.max = data.get("max") if data.get("max") is not None else max(means)
+        return digest
+
+
+class HyperLogLog:
+    """
+    HyperLogLog : estimation du nombre d'éléments distincts en mémoire fixe (2^p octets)
+    Erreur relative ~ 1.04 / sqrt(2^p) (p=12 → ~1.6 %), exact en pratique pour
+    les petites cardinalités (comptage linéaire).
+    """
+
+    def __init__(self, p: int = 12):
+        """
+        Args:
+            p: Précision (nombre de bits d'index, 4-16)
+        """
+        self.p = max(4, min(16, int(p)))
+        self.m = 1 << self.p
+        self.registers = bytearray(self.m)
+
+    def add(self, value: Any) -> None:
+        """Ajoute un élément (converti en chaîne)"""
+        if value is None:
+            return
+
+        digest = hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest()
+        h = int.from_bytes(digest, "big")
+        index = h >> (64 - self.p)
+        remaining_bits = 64 - self.p
+        w = h & ((1 << remaining_bits) - 1)
+        rank = remaining_bits - w.bit_length() + 1
+
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[Any]) -> "HyperLogLog":
+        """Ajoute plusieurs éléments"""
+        for value in values:
+            self.add(value)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        """
+        Fusionne un autre HLL de même précision (max des registres)
+
+        Returns:
+            self
+        """
+        if other.p != self.p:
+            raise ValueError(f"Précisions HyperLogLog incompatibles: {self.p} != {other.p}")
+
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        """Estime le nombre d'éléments distincts"""
+        m = self.m
+        alpha = 0.7213 / (1.0 + 1.079 / m)
+        harmonic = sum(2.0 ** -r for r in self.registers)
+        estimate = alpha * m * m / harmonic
+
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros > 0:
+            # Petites cardinalités : comptage linéaire
+            estimate = m * math.log(m / zeros)
+
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Sérialise les registres (compressés zlib, base64)"""
+        return {
+            "type": "hll",
+            "p": self.p,
+            "registers": base64.b64encode(zlib.compress(bytes(self.registers), 9)).decode("ascii")
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        """Désérialise un HLL"""
+        hll = cls(data.get("p", 12))
+        registers = zlib.decompress(base64.b64decode(data.get("registers", "")))
+        if len(registers) == hll.m:
+            hll.registers = bytearray(registers)
+        return hll
+
+
+def sketch_from_dict(data: Dict[str, Any]):
+    """
+    Désérialise un sketch selon son type
+
+    Args:
+        data: Sketch sérialisé (to_dict)
+
+    Returns:
+        TDigest ou HyperLogLog
+    """
+    sketch_type = data.get("type")
+    if sketch_type == "tdigest":
+        return TDigest.from_dict(data)
+    if sketch_type == "hll":
+        return HyperLogLog.from_dict(data)
+    raise ValueError(f"Type de sketch inconnu: {sketch_type}")
+
+
+def merge_sketch_dicts(sketches: Iterable[Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+    """
+    Fusionne des sketches sérialisés de même type (chunks, workers, jours)
+
+    Args:
+        sketches: Sketches sérialisés (None ignorés)
+
+    Returns:
+        Sketch fusionné sérialisé ou None
+    """
+    merged = None
+    for data in sketches:
+        if not data:
+            continue
+        sketch = sketch_from_dict(data)
+        merged = sketch if merged is None else merged.merge(sketch)
+
+    return merged.to_dict() if merged is not None else None
+
+
+class SketchAccumulator:
+    """
+    Sketches vivants par nom, fusionnés au fil des chunks : chaque chunk n'est
+    désérialisé qu'une fois et l'ensemble n'est sérialisé qu'à la fin (to_dict)
+    """
+
+    def __init__(self):
+        self.sketches: Dict[str, Any] = {}
+
+    def merge_dicts(self, serialized: Optional[Dict[str, Optional[Dict[str, Any]]]]) -> "SketchAccumulator":
+        """
+        Fusionne les sketches sérialisés d'un chunk ({nom: sketch})
+
+        Args:
+            serialized: Sketches sérialisés (to_dict) par nom, None ignorés
+
+        Returns:
+            self
+        """
+        for name, data in (serialized or {}).items():
+            if not data:
+                continue
+            sketch = sketch_from_dict(data)
+            current = self.sketches.get(name)
+            self.sketches[name] = sketch if current is None else current.merge(sketch)
+        return self
+
+    def to_dict(self) -> Dict[str, Dict[str, Any]]:
+        """Sketches sérialisés par nom"""
+        return {name: sketch.to_dict() for name, sketch in self.sketches.items()}
+
+
+def summarize_sketch(data: Optional[Dict[str, Any]],
+                     qs: Iterable[float] = DEFAULT_QUANTILES) -> Dict[str, Any]:
+    """
+    Résume un sketch sérialisé en valeurs publiables
+
+    Args:
+        data: Sketch sérialisé
+        qs: Quantiles à calculer (t-digest)
+
+    Returns:
+        Dict de percentiles (t-digest) ou {"distincts": n} (HyperLogLog)
+    """
+    if not data:
+        return {}
+
+    sketch = sketch_from_dict(data)
+    if isinstance(sketch, HyperLogLog):
+        return {"distincts": sketch.count()}
+    return sketch.quantiles(qs)
@@ -0,0 +1,156 @@
+"""
+Index spatial par grille uniforme (lon/lat)
+
+Chaque objet est inscrit dans les cellules recouvertes par sa boîte englobante :
+une requête ne teste que les objets des cellules concernées au lieu de tous.
+"""
+
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+BBox = Tuple[float, float, float, float]  # (min_lon, min_lat, max_lon, max_lat)
+
+
+def bbox_of_coordinates(coordinates: Sequence[Sequence[float]]) -> Optional[BBox]:
+    """
+    Boîte englobante d'une liste de coordonnées [lon, lat]
+
+    Returns:
+        (min_lon, min_lat, max_lon, max_lat) ou None si vide
+    """
+    if not len(coordinates):
+        return None
+    points = np.asarray(coordinates, dtype=np.float64)[:, :2]
+    min_lon, min_lat = points.min(axis=0)
+    max_lon, max_lat = points.max(axis=0)
+    return float(min_lon), float(min_lat), float(max_lon), float(max_lat)
+
+
+class UniformGridIndex:
+    """Grille uniforme : cellule (i, j) → identifiants des objets qui la recouvrent"""
+
+    def __init__(self, bounds: BBox, cell_size: float):
+        """
+        Args:
+            bounds: Emprise indexée (min_lon, min_lat, max_lon, max_lat)
+            cell_size: Taille des cellules en degrés
+        """
+        self.min_lon, self.min_lat, self.max_lon, self.max_lat = bounds
+        self.cell_size = float(cell_size)
+        self.n_cols = max(1, int(math.ceil((self.max_lon - self.min_lon) / self.cell_size)))
+        self.n_rows = max(1, int(math.ceil((self.max_lat - self.min_lat) / self.cell_size)))
+        self.cells: Dict[int, List[Any]] = {}
+        self.bboxes: Dict[Any, BBox] = {}
+
+    @classmethod
+    def build(cls, items: Iterable[Tuple[Any, BBox]],
+              cell_size: float,
+              margin: float = 0.0) -> "UniformGridIndex":
+        """
+        Construit l'index sur un ensemble d'objets
+
+        Args:
+            items: Couples (identifiant, bbox)
+            cell_size: Taille des cellules en degrés
+            margin: Marge ajoutée à l'emprise
+
+        Returns:
+            UniformGridIndex
+        """
+        items = [(item_id, bbox) for item_id, bbox in items if bbox is not None]
+        if items:
+            boxes = np.asarray([bbox for _, bbox in items], dtype=np.float64)
+            bounds = (
+                float(boxes[:, 0].min()) - margin, float(boxes[:, 1].min()) - margin,
+                float(boxes[:, 2].max()) + margin, float(boxes[:, 3].max()) + margin
+            )
+        else:
+            bounds = (0.0, 0.0, cell_size, cell_size)
+
+        index = cls(bounds, cell_size)
+        for item_id, bbox in items:
+            index.insert(item_id, bbox)
+        return index
+
+    def _col(self, lon: float) -> int:
+        return min(self.n_cols - 1, max(0, int((lon - self.min_lon) // self.cell_size)))
+
+    def _row(self, lat: float) -> int:
+        return min(self.n_rows - 1, max(0, int((lat - self.min_lat) // self.cell_size)))
+
+    def cell_id(self, lon: float, lat: float) -> Optional[int]:
+        """Identifiant de la cellule contenant le point (None hors emprise)"""
+        if not (self.min_lon <= lon <= self.max_lon and self.min_lat <= lat <= self.max_lat):
+            return None
+        return self._row(lat) * self.n_cols + self._col(lon)
+
+    def cell_ids(self, lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+        """
+        Identifiants de cellules pour des tableaux de points (vectorisé)
+
+        Returns:
+            Tableau int64 (-1 hors emprise)
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        cols = np.clip(((lons - self.min_lon) // self.cell_size), 0, self.n_cols - 1).astype(np.int64)
+        rows = np.clip(((lats - self.min_lat) // self.cell_size), 0, self.n_rows - 1).astype(np.int64)
+        inside = (
+            (lons >= self.min_lon) & (lons <= self.max_lon) &
+            (lats >= self.min_lat) & (lats <= self.max_lat)
+        )
+        return np.where(inside, rows * self.n_cols + cols, -1)
+
+    def cell_bbox(self, cell_id: int) -> BBox:
+        """Boîte englobante d'une cellule"""
+        row, col = divmod(cell_id, self.n_cols)
+        min_lon = self.min_lon + col * self.cell_size
+        min_lat = self.min_lat + row * self.cell_size
+        return min_lon, min_lat, min_lon + self.cell_size, min_lat + self.cell_size
+
+    def cells_for_bbox(self, bbox: BBox) -> List[int]:
+        """Cellules recouvertes par une boîte englobante"""
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if max_lon < self.min_lon or min_lon > self.max_lon or max_lat < self.min_lat or min_lat > self.max_lat:
+            return []
+        col_start, col_end = self._col(min_lon), self._col(max_lon)
+        row_start, row_end = self._row(min_lat), self._row(max_lat)
+        return [
+            row * self.n_cols + col
+            for row in range(row_start, row_end + 1)
+            for col in range(col_start, col_end + 1)
+        ]
+
+    def insert(self, item_id: Any, bbox: BBox) -> None:
+        """Inscrit un objet dans toutes les cellules recouvertes par sa bbox"""
+        self.bboxes[item_id] = bbox
+        for cell in self.cells_for_bbox(bbox):
+            self.cells.setdefault(cell, []).append(item_id)
+
+    def query_point(self, lon: float, lat: float) -> List[Any]:
+        """Candidats dont la bbox recouvre la cellule du point"""
+        cell = self.cell_id(lon, lat)
+        if cell is None:
+            return []
+        return self.cells.get(cell, [])
+
+    def query_bbox(self, bbox: BBox) -> Set[Any]:
+        """
+        Candidats dont la bbox intersecte la bbox demandée
+
+        Returns:
+            Ensemble d'identifiants (bbox vérifiées, sans doublons)
+        """
+        min_lon, min_lat, max_lon, max_lat = bbox
+        result = set()
+        for cell in self.cells_for_bbox(bbox):
+            for item_id in self.cells.get(cell, ()):
+                if item_id in result:
+                    continue
+                item_box = self.bboxes[item_id]
+                if (item_box[0] <= max_lon and item_box[2] >= min_lon and
+                        item_box[1] <= max_lat and item_box[3] >= min_lat):
+                    result.add(item_id)
+        return result
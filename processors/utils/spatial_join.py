@@ -0,0 +1,415 @@
+"""
+Jointure spatiale chantiers ↔ tronçons du référentiel
+
+Les segments des tronçons (LineString du référentiel) sont aplatis en tableaux NumPy et
+les tronçons indexés par boîte englobante dans une grille uniforme. Chaque chantier
+actif n'est testé que contre les segments des tronçons candidats de sa bbox :
+- polygone : extrémité du segment dans le polygone ou segment coupant une arête
+- point / ligne : segment à moins de JOINTURE_CHANTIERS_TOLERANCE_METRES d'un sommet,
+  ou coupant la ligne
+
+Le facteur IMPACT_CHANTIERS est pondéré par la part de longueur du tronçon touchée.
+Le résultat est mis en cache par (empreinte chantiers, empreinte référentiel).
+"""
+
+import hashlib
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import CACHE_DIR, IMPACT_CHANTIERS, JOINTURE_CHANTIERS_TOLERANCE_METRES
+from .arrondissements import _polygons_of_geometry
+from .file_utils import load_json, save_json
+from .geometry_batch import EARTH_RADIUS_M, KIND_LINE, GeometryBatch, geometry_hash
+from .spatial_index import UniformGridIndex
+
+# Taille maximale des blocs segments × arêtes testés en une fois
+_MAX_PAIRS = 200000
+
+
+def _cross(ax: np.ndarray, ay: np.ndarray, bx: np.ndarray, by: np.ndarray) -> np.ndarray:
+    """Produit vectoriel 2D"""
+    return ax * by - ay * bx
+
+
+def _segments_cross(starts: np.ndarray, ends: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    """
+    Segments coupant (ou touchant) au moins une arête
+
+    Args:
+        starts, ends: Extrémités des segments (S, 2)
+        edges: Arêtes (E, 4) x1, y1, x2, y2
+
+    Returns:
+        Tableau booléen (S,)
+    """
+    hits = np.zeros(len(starts), dtype=bool)
+    if len(edges) == 0 or len(starts) == 0:
+        return hits
+
+    qx1, qy1, qx2, qy2 = (edges[:, k][None, :] for k in range(4))
+    block = max(1, _MAX_PAIRS // len(edges))
+    for first in range(0, len(starts), block):
+        px1, py1 = starts[first:first + block, 0:1], starts[first:first + block, 1:2]
+        px2, py2 = ends[first:first + block, 0:1], ends[first:first + block, 1:2]
+        d1 = _cross(qx2 - qx1, qy2 - qy1, px1 - qx1, py1 - qy1)
+        d2 = _cross(qx2 - qx1, qy2 - qy1, px2 - qx1, py2 - qy1)
+        d3 = _cross(px2 - px1, py2 - py1, qx1 - px1, qy1 - py1)
+        d4 = _cross(px2 - px1, py2 - py1, qx2 - px1, qy2 - py1)
+        crossing = (d1 * d2 <= 0) & (d3 * d4 <= 0) & ~((d1 == 0) & (d2 == 0))
+        hits[first:first + block] = crossing.any(axis=1)
+    return hits
+
+
+def _segments_near(starts: np.ndarray, ends: np.ndarray, points: np.ndarray,
+                   tolerance_m: float) -> np.ndarray:
+    """
+    Segments à moins de tolerance_m d'au moins un point (projection locale)
+
+    Returns:
+        Tableau booléen (S,)
+    """
+    if len(points) == 0 or len(starts) == 0:
+        return np.zeros(len(starts), dtype=bool)
+
+    scale = np.radians(1.0) * EARTH_RADIUS_M
+    scale_x = scale * np.cos(np.radians(points[:, 1].mean()))
+    ax, ay = starts[:, 0:1] * scale_x, starts[:, 1:2] * scale
+    bx, by = ends[:, 0:1] * scale_x, ends[:, 1:2] * scale
+    px, py = points[None, :, 0] * scale_x, points[None, :, 1] * scale
+
+    dx, dy = bx - ax, by - ay
+    norm = np.maximum(dx * dx + dy * dy, 1e-12)
+    t = np.clip(((px - ax) * dx + (py - ay) * dy) / norm, 0.0, 1.0)
+    distance2 = (ax + t * dx - px) ** 2 + (ay + t * dy - py) ** 2
+    return (distance2 <= tolerance_m * tolerance_m).any(axis=1)
+
+
+class ArcSegmentIndex:
+    """Index des segments des tronçons (grille uniforme sur les bbox des tronçons)"""
+
+    def __init__(self, arc_ids: Sequence[str], geo_shapes: Sequence[Any], cell_size: float = 0.002):
+        """
+        Args:
+            arc_ids: Identifiants des tronçons
+            geo_shapes: Géométries LineString / MultiLineString (une par tronçon)
+            cell_size: Taille des cellules de la grille en degrés (~150 × 220 m)
+        """
+        self.arc_ids = list(arc_ids)
+        batch = GeometryBatch(geo_shapes)
+        table = batch.segments()
+
+        lines = batch.kinds[table["geometrie"]] == KIND_LINE
+        self.starts = table["debut"][lines]
+        self.ends = table["fin"][lines]
+        self.segment_arc = table["geometrie"][lines]
+        self.segment_length = table["longueur"][lines]
+
+        n_arcs = len(self.arc_ids)
+        self.arc_length = np.bincount(self.segment_arc, weights=self.segment_length, minlength=n_arcs)
+        self.arc_first = np.searchsorted(self.segment_arc, np.arange(n_arcs), side="left")
+        self.arc_last = np.searchsorted(self.segment_arc, np.arange(n_arcs), side="right")
+
+        # Boîtes englobantes des tronçons
+        bounds = np.full((n_arcs, 4), np.nan)
+        if len(self.segment_arc):
+            lons = np.minimum(self.starts[:, 0], self.ends[:, 0]), np.maximum(self.starts[:, 0], self.ends[:, 0])
+            lats = np.minimum(self.starts[:, 1], self.ends[:, 1]), np.maximum(self.starts[:, 1], self.ends[:, 1])
+            bounds[:, 0:2] = np.inf
+            bounds[:, 2:4] = -np.inf
+            np.minimum.at(bounds[:, 0], self.segment_arc, lons[0])
+            np.minimum.at(bounds[:, 1], self.segment_arc, lats[0])
+            np.maximum.at(bounds[:, 2], self.segment_arc, lons[1])
+            np.maximum.at(bounds[:, 3], self.segment_arc, lats[1])
+
+        indexed = np.nonzero(self.arc_last > self.arc_first)[0]
+        self.grid = UniformGridIndex.build(
+            ((int(i), tuple(bounds[i].tolist())) for i in indexed), cell_size, margin=cell_size
+        )
+
+    def candidate_segments(self, bbox: Tuple[float, float, float, float]) -> np.ndarray:
+        """Segments des tronçons dont la bbox intersecte la bbox demandée"""
+        arcs = sorted(self.grid.query_bbox(bbox))
+        if not arcs:
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([np.arange(self.arc_first[a], self.arc_last[a]) for a in arcs])
+
+    def _polygon_pairs(self, polygons: List[Tuple[int, List[np.ndarray]]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Couples (chantier, segment) en intersection pour des polygones, testés par passes
+        vectorisées sur les lignes (couple candidat × arête du polygone)
+
+        Args:
+            polygons: Couples (index chantier, anneaux du polygone)
+
+        Returns:
+            Tuple (index chantiers, index segments)
+        """
+        pair_polygon, pair_segment, edge_tables = [], [], []
+        for poly_index, (_, rings) in enumerate(polygons):
+            exterior = rings[0]
+            bbox = (exterior[:, 0].min(), exterior[:, 1].min(), exterior[:, 0].max(), exterior[:, 1].max())
+            segments = self.candidate_segments(bbox)
+            pair_polygon.append(np.full(segments.size, poly_index, dtype=np.int64))
+            pair_segment.append(segments)
+            edge_tables.append(np.concatenate([np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings]))
+
+        pair_polygon = np.concatenate(pair_polygon) if pair_polygon else np.zeros(0, dtype=np.int64)
+        pair_segment = np.concatenate(pair_segment) if pair_segment else np.zeros(0, dtype=np.int64)
+        if pair_polygon.size == 0:
+            return pair_polygon, pair_segment
+
+        # Lignes (couple, arête) : arêtes du polygone répétées pour chacun de ses couples,
+        # par blocs d'au plus _MAX_PAIRS lignes (un couple n'est jamais coupé)
+        edge_counts = np.asarray([len(edges) for edges in edge_tables], dtype=np.int64)
+        edge_offsets = np.concatenate([[0], np.cumsum(edge_counts)])
+        edges = np.concatenate(edge_tables)
+        rows_end = np.cumsum(edge_counts[pair_polygon])
+        inside = np.zeros(pair_polygon.size, dtype=bool)
+        first = 0
+        while first < pair_polygon.size:
+            rows_before = rows_end[first - 1] if first else 0
+            last = max(first + 1, int(np.searchsorted(rows_end, rows_before + _MAX_PAIRS, side="right")))
+            inside[first:last] = self._pairs_hit(
+                pair_polygon[first:last], pair_segment[first:last], edges, edge_counts, edge_offsets
+            )
+            first = last
+
+        owners = np.asarray([owner for owner, _ in polygons], dtype=np.int64)
+        return owners[pair_polygon[inside]], pair_segment[inside]
+
+    def _pairs_hit(self, pair_polygon: np.ndarray, pair_segment: np.ndarray, edges: np.ndarray,
+                   edge_counts: np.ndarray, edge_offsets: np.ndarray) -> np.ndarray:
+        """
+        Teste un bloc de couples (polygone, segment) : extrémité dans le polygone ou
+        segment coupant une arête
+
+        Returns:
+            Tableau booléen (couples,)
+        """
+        counts = edge_counts[pair_polygon]
+        row_pair = np.repeat(np.arange(pair_polygon.size), counts)
+        row_edge = (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+                    + np.repeat(edge_offsets[pair_polygon], counts))
+
+        x1, y1, x2, y2 = edges[row_edge].T
+        starts = self.starts[pair_segment][row_pair]
+        ends = self.ends[pair_segment][row_pair]
+
+        # Extrémités dans le polygone (parité du ray casting, trous compris)
+        inside = np.zeros(pair_polygon.size, dtype=bool)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for point in (starts, ends):
+                px, py = point[:, 0], point[:, 1]
+                crosses = (y1 > py) != (y2 > py)
+                x_cross = (x2 - x1) * (py - y1) / np.where(y2 != y1, y2 - y1, 1.0) + x1
+                parity = np.bincount(row_pair, weights=crosses & (px < x_cross), minlength=pair_polygon.size)
+                inside |= (parity.astype(np.int64) % 2) == 1
+
+        # Segments coupant une arête
+        d1 = _cross(x2 - x1, y2 - y1, starts[:, 0] - x1, starts[:, 1] - y1)
+        d2 = _cross(x2 - x1, y2 - y1, ends[:, 0] - x1, ends[:, 1] - y1)
+        d3 = _cross(ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1], x1 - starts[:, 0], y1 - starts[:, 1])
+        d4 = _cross(ends[:, 0] - starts[:, 0], ends[:, 1] - starts[:, 1], x2 - starts[:, 0], y2 - starts[:, 1])
+        crossing = (d1 * d2 <= 0) & (d3 * d4 <= 0) & ~((d1 == 0) & (d2 == 0))
+        return inside | (np.bincount(row_pair, weights=crossing, minlength=pair_polygon.size) > 0)
+
+    def _near_segments(self, points: np.ndarray, tolerance_m: float) -> np.ndarray:
+        """Segments à moins de tolerance_m des sommets d'un point / d'une ligne, ou la coupant"""
+        margin = tolerance_m / (np.radians(1.0) * EARTH_RADIUS_M * np.cos(np.radians(points[:, 1].mean())))
+        bbox = (points[:, 0].min() - margin, points[:, 1].min() - margin,
+                points[:, 0].max() + margin, points[:, 1].max() + margin)
+        segments = self.candidate_segments(bbox)
+        if segments.size == 0:
+            return segments
+        starts, ends = self.starts[segments], self.ends[segments]
+        near = _segments_near(starts, ends, points, tolerance_m)
+        if len(points) > 1:
+            line_edges = np.hstack([points[:-1], points[1:]])
+            near[~near] = _segments_cross(starts[~near], ends[~near], line_edges)
+        return segments[near]
+
+    def match(self, geo_shapes: Sequence[Any], tolerance_m: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Tronçons touchés par chaque géométrie de chantier
+
+        Args:
+            geo_shapes: Géométries GeoJSON des chantiers
+            tolerance_m: Distance max pour les chantiers ponctuels / linéaires
+
+        Returns:
+            Tuple (index chantier, index tronçon, longueur touchée en mètres), un par couple
+        """
+        polygons: List[Tuple[int, List[np.ndarray]]] = []
+        hit_owner, hit_segment = [], []
+
+        for owner, geo_shape in enumerate(geo_shapes):
+            if isinstance(geo_shape, str):
+                try:
+                    geo_shape = json.loads(geo_shape)
+                except ValueError:
+                    continue
+            if not isinstance(geo_shape, dict):
+                continue
+
+            shape_polygons = _polygons_of_geometry(geo_shape)
+            if shape_polygons:
+                polygons.extend((owner, rings) for rings in shape_polygons)
+                continue
+
+            # Chantiers ponctuels / linéaires (rares) : test par distance
+            points = GeometryBatch([geo_shape]).coords
+            if len(points):
+                segments = self._near_segments(points, tolerance_m)
+                hit_owner.append(np.full(segments.size, owner, dtype=np.int64))
+                hit_segment.append(segments)
+
+        if polygons:
+            owners, segments = self._polygon_pairs(polygons)
+            hit_owner.append(owners)
+            hit_segment.append(segments)
+
+        if not hit_owner:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0)
+
+        # Couples (chantier, segment) uniques puis longueurs cumulées par (chantier, tronçon)
+        n_segments = max(len(self.segment_arc), 1)
+        pairs = np.unique(np.concatenate(hit_owner) * n_segments + np.concatenate(hit_segment))
+        owners, segments = np.divmod(pairs, n_segments)
+        keys, inverse = np.unique(owners * len(self.arc_ids) + self.segment_arc[segments], return_inverse=True)
+        lengths = np.bincount(inverse, weights=self.segment_length[segments], minlength=keys.size)
+        chantier_index, arc_index = np.divmod(keys, len(self.arc_ids))
+        return chantier_index, arc_index, lengths
+
+
+def fingerprint_chantiers(chantiers: Iterable[Dict]) -> str:
+    """Empreinte des chantiers (identifiant, impact, géométrie)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for chantier in chantiers:
+        digest.update(str(chantier.get("Identifiant", "")).encode("utf-8"))
+        digest.update(str(chantier.get("Impact sur la circulation", "")).encode("utf-8"))
+        digest.update((geometry_hash(chantier.get("geo_shape")) or "").encode("ascii"))
+    return digest.hexdigest()
+
+
+def fingerprint_arcs(arc_ids: Sequence[str], geo_shapes: Sequence[Any]) -> str:
+    """Empreinte du référentiel (identifiants et géométries des tronçons)"""
+    digest = hashlib.blake2b(digest_size=16)
+    for arc_id, geo_shape in zip(arc_ids, geo_shapes):
+        digest.update(str(arc_id).encode("utf-8"))
+        digest.update((geometry_hash(geo_shape) or "").encode("ascii"))
+    return digest.hexdigest()
+
+
+def join_chantiers_troncons(chantiers: Sequence[Dict], index: ArcSegmentIndex,
+                            tolerance_m: float = JOINTURE_CHANTIERS_TOLERANCE_METRES) -> Dict[str, Any]:
+    """
+    Relie chaque chantier aux tronçons qu'il touche
+
+    Args:
+        chantiers: Chantiers (Identifiant, Impact sur la circulation, geo_shape)
+        index: Index des segments des tronçons
+        tolerance_m: Distance max pour les chantiers ponctuels / linéaires
+
+    Returns:
+        Dict {"par_chantier": {id: {...}}, "par_troncon": {arc_id: {...}}}
+        - par_chantier : tronçons touchés, longueur touchée, impact pondéré (km équivalents)
+        - par_troncon : chantiers, facteur d'impact combiné (%) pondéré par la part touchée
+    """
+    chantiers = [c for c in chantiers if c.get("Identifiant", "") and c.get("geo_shape")]
+    chantier_index, arc_index, longueurs = index.match([c["geo_shape"] for c in chantiers], tolerance_m)
+    parts = np.minimum(1.0, longueurs / np.maximum(index.arc_length[arc_index], 1e-9))
+
+    par_chantier: Dict[str, Dict[str, Any]] = {}
+    par_troncon: Dict[str, Dict[str, Any]] = {}
+    maintien: Dict[str, float] = {}  # Part du trafic maintenue par tronçon (produit)
+    impacts = [IMPACT_CHANTIERS.get(c.get("Impact sur la circulation", ""), 0) / 100.0 for c in chantiers]
+
+    for chantier in chantiers:
+        par_chantier[chantier["Identifiant"]] = {
+            "troncons_impactes": [],
+            "nombre_troncons_impactes": 0,
+            "longueur_impactee_metres": 0.0,
+            "impact_pondere_km": 0.0
+        }
+
+    for position, arc_position, longueur, part in zip(
+            chantier_index.tolist(), arc_index.tolist(), longueurs.tolist(), parts.tolist()):
+        chantier_id = chantiers[position]["Identifiant"]
+        arc_id = index.arc_ids[arc_position]
+        impact = impacts[position]
+
+        liens = par_chantier[chantier_id]
+        liens["troncons_impactes"].append(arc_id)
+        liens["nombre_troncons_impactes"] += 1
+        liens["longueur_impactee_metres"] += longueur
+        liens["impact_pondere_km"] += impact * longueur / 1000.0
+
+        entry = par_troncon.setdefault(arc_id, {"chantiers": [], "impact_chantiers": 0.0})
+        entry["chantiers"].append(chantier_id)
+        maintien[arc_id] = maintien.get(arc_id, 1.0) * (1.0 - impact * part)
+
+    for liens in par_chantier.values():
+        liens["longueur_impactee_metres"] = round(liens["longueur_impactee_metres"], 1)
+        liens["impact_pondere_km"] = round(liens["impact_pondere_km"], 3)
+
+    for arc_id, part_maintenue in maintien.items():
+        par_troncon[arc_id]["impact_chantiers"] = round(100.0 * (1.0 - part_maintenue), 1)
+
+    return {"par_chantier": par_chantier, "par_troncon": par_troncon}
+
+
+_index_cache: Dict[str, ArcSegmentIndex] = {}
+_join_cache: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+
+def spatial_join_chantiers(chantiers: Sequence[Dict],
+                           arcs: Sequence[Tuple[str, Any]],
+                           use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Jointure chantiers ↔ tronçons avec cache (mémoire + fichier dans CACHE_DIR)
+
+    Args:
+        chantiers: Chantiers actifs (Identifiant, Impact sur la circulation, geo_shape)
+        arcs: Couples (identifiant tronçon, geo_shape) du référentiel
+        use_cache: Réutiliser un résultat calculé pour les mêmes empreintes
+
+    Returns:
+        Résultat de join_chantiers_troncons + "empreintes" {"chantiers", "referentiel"}
+    """
+    arc_ids = [arc_id for arc_id, _ in arcs]
+    geo_shapes = [geo_shape for _, geo_shape in arcs]
+    key = (fingerprint_chantiers(chantiers), fingerprint_arcs(arc_ids, geo_shapes))
+    cache_path = Path(CACHE_DIR) / "jointure_chantiers_troncons.json"
+
+    if use_cache:
+        if key in _join_cache:
+            return _join_cache[key]
+        if cache_path.exists():
+            cached = load_json(str(cache_path)) or {}
+            empreintes = cached.get("empreintes", {})
+            if (empreintes.get("chantiers"), empreintes.get("referentiel")) == key:
+                _join_cache[key] = cached
+                return cached
+
+    index = _index_cache.get(key[1])
+    if index is None:
+        index = ArcSegmentIndex(arc_ids, geo_shapes)
+        _index_cache.clear()
+        _index_cache[key[1]] = index
+
+    result = join_chantiers_troncons(chantiers, index)
+    result["empreintes"] = {"chantiers": key[0], "referentiel": key[1]}
+
+    if use_cache:
+        _join_cache.clear()
+        _join_cache[key] = result
+        if not save_json(result, str(cache_path), indent=None):
+            print(f"⚠ Écriture cache jointure chantiers impossible ({cache_path})")
+
+    return result
@@ -0,0 +1,212 @@
+"""
+Pyramide spatiale multi-résolution (cellules geohash) des métriques
+
+Chaque entité (tronçon, compteur) est codée une fois en geohash entier à la précision
+la plus fine ; ses valeurs sont sommées par cellule fine, puis chaque niveau plus
+grossier est obtenu en agrégeant les cellules du niveau inférieur (décalage de 5 bits
+par caractère geohash). Le coût est un passage sur les entités plus O(cellules) par
+niveau, et un niveau de zoom se lit directement sans ré-agréger les entités.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import PYRAMIDE_GEOHASH_PRECISIONS
+
+GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_MAX_PRECISION = 12  # 60 bits : tient dans un int64
+
+
+def _bit_split(precision: int) -> Tuple[int, int]:
+    """Nombre de bits longitude / latitude d'un geohash de la précision donnée"""
+    bits = 5 * precision
+    return (bits + 1) // 2, bits // 2
+
+
+def geohash_precision_for(cell_size_m: float, latitude: float = 48.8566) -> int:
+    """
+    Précision geohash la plus grossière dont les cellules ne dépassent pas cell_size_m
+
+    Args:
+        cell_size_m: Taille maximale d'une cellule (m)
+        latitude: Latitude de référence (largeur des cellules en longitude)
+
+    Returns:
+        Précision (1 à 12)
+    """
+    metres_per_degree = 111320.0
+    for precision in range(1, _MAX_PRECISION + 1):
+        lon_bits, lat_bits = _bit_split(precision)
+        width = 360.0 / (1 << lon_bits) * metres_per_degree * np.cos(np.radians(latitude))
+        height = 180.0 / (1 << lat_bits) * metres_per_degree
+        if max(width, height) <= cell_size_m:
+            return precision
+    return _MAX_PRECISION
+
+
+def geohash_codes(lons: np.ndarray, lats: np.ndarray, precision: int) -> np.ndarray:
+    """
+    Geohash entiers (bits longitude / latitude entrelacés, longitude en tête)
+
+    Args:
+        lons, lats: Coordonnées WGS84 (n,), finies
+        precision: Nombre de caractères geohash (1 à 12)
+
+    Returns:
+        Codes int64 (n,)
+    """
+    precision = min(max(int(precision), 1), _MAX_PRECISION)
+    lon_bits, lat_bits = _bit_split(precision)
+    lon_cells = np.clip(((np.asarray(lons) + 180.0) / 360.0 * (1 << lon_bits)).astype(np.int64),
+                        0, (1 << lon_bits) - 1)
+    lat_cells = np.clip(((np.asarray(lats) + 90.0) / 180.0 * (1 << lat_bits)).astype(np.int64),
+                        0, (1 << lat_bits) - 1)
+
+    codes = np.zeros(len(lon_cells), dtype=np.int64)
+    for bit in range(5 * precision):
+        if bit % 2 == 0:
+            value = (lon_cells >> (lon_bits - 1 - bit // 2)) & 1
+        else:
+            value = (lat_cells >> (lat_bits - 1 - bit // 2)) & 1
+        codes = (codes << 1) | value
+    return codes
+
+
+def geohash_strings(codes: np.ndarray, precision: int) -> List[str]:
+    """Geohash entiers → chaînes base32"""
+    chars = np.array(list(GEOHASH_BASE32))
+    codes = np.asarray(codes, dtype=np.int64)
+    columns = [chars[(codes >> (5 * (precision - 1 - k))) & 31] for k in range(precision)]
+    if not columns or len(codes) == 0:
+        return [""] * len(codes)
+    return ["".join(row) for row in np.column_stack(columns).tolist()]
+
+
+def geohash_cells(lons: Sequence[float], lats: Sequence[float], cell_size_m: float) -> List[Optional[str]]:
+    """
+    Cellule geohash de chaque point, à la précision la plus grossière dont les cellules
+    ne dépassent pas cell_size_m
+
+    Args:
+        lons, lats: Coordonnées WGS84 (n,), NaN si absentes
+        cell_size_m: Taille maximale d'une cellule (m)
+
+    Returns:
+        Geohash (chaîne) par point, None si non localisable
+    """
+    lons, lats = np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64)
+    located = np.isfinite(lons) & np.isfinite(lats)
+    precision = geohash_precision_for(cell_size_m)
+    cells: List[Optional[str]] = [None] * len(lons)
+    rows = np.flatnonzero(located)
+    for row, cell in zip(rows.tolist(), geohash_strings(geohash_codes(lons[rows], lats[rows], precision), precision)):
+        cells[row] = cell
+    return cells
+
+
+def geohash_centers(codes: np.ndarray, precision: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Centres des cellules geohash
+
+    Returns:
+        Tuple (longitudes, latitudes)
+    """
+    lon_bits, lat_bits = _bit_split(precision)
+    codes = np.asarray(codes, dtype=np.int64)
+    lon_cells = np.zeros(len(codes), dtype=np.int64)
+    lat_cells = np.zeros(len(codes), dtype=np.int64)
+    for bit in range(5 * precision):
+        value = (codes >> (5 * precision - 1 - bit)) & 1
+        if bit % 2 == 0:
+            lon_cells = (lon_cells << 1) | value
+        else:
+            lat_cells = (lat_cells << 1) | value
+    lons = (lon_cells + 0.5) * (360.0 / (1 << lon_bits)) - 180.0
+    lats = (lat_cells + 0.5) * (180.0 / (1 << lat_bits)) - 90.0
+    return lons, lats
+
+
+def _rollup(codes: np.ndarray, columns: Dict[str, np.ndarray], shift: int) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """Agrège des cellules vers leurs cellules parentes (codes décalés de shift bits)"""
+    parents, inverse = np.unique(codes >> shift, return_inverse=True)
+    return parents, {
+        name: np.bincount(inverse, weights=values, minlength=len(parents))
+        for name, values in columns.items()
+    }
+
+
+def build_spatial_pyramid(lons: Sequence[float], lats: Sequence[float],
+                          sums: Dict[str, Sequence[float]],
+                          means: Optional[Dict[str, Sequence[float]]] = None,
+                          precisions: Optional[Sequence[int]] = None,
+                          count_key: str = "nombre") -> Dict[str, Any]:
+    """
+    Pyramide d'agrégats par cellule geohash, construite de la résolution la plus fine
+    vers la plus grossière
+
+    Args:
+        lons, lats: Coordonnées de chaque entité (NaN : entité ignorée)
+        sums: Colonnes sommées par cellule {nom: valeurs}
+        means: Colonnes moyennées par cellule (moyenne sur les entités)
+        precisions: Précisions geohash des niveaux (défaut PYRAMIDE_GEOHASH_PRECISIONS)
+        count_key: Nom du champ nombre d'entités par cellule
+
+    Returns:
+        Dict {"precisions": [...], "entites_sans_coordonnees": n,
+              "niveaux": {"<précision>": [{"geohash", "centre": {"lon", "lat"}, count_key,
+              <sommes>, <moyennes>}]}}
+    """
+    means = means or {}
+    precisions = sorted({min(max(int(p), 1), _MAX_PRECISION)
+                         for p in (precisions or PYRAMIDE_GEOHASH_PRECISIONS)}, reverse=True)
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    valid = np.isfinite(lons) & np.isfinite(lats)
+
+    columns = {count_key: valid[valid].astype(np.float64)}
+    integers = {count_key}  # Sommes de colonnes entières / booléennes restituées en entiers
+    for name, values in list(sums.items()) + list(means.items()):
+        values = np.asarray(values)
+        if name in sums and values.dtype.kind in "biu":
+            integers.add(name)
+        columns[name] = np.nan_to_num(values.astype(np.float64)[valid])
+
+    # Niveau le plus fin depuis les entités, puis chaque niveau depuis le précédent
+    niveaux: Dict[str, List[Dict[str, Any]]] = {}
+    codes = geohash_codes(lons[valid], lats[valid], precisions[0]) if precisions else None
+    previous = precisions[0] if precisions else 0
+    for precision in precisions:
+        codes, columns = _rollup(codes, columns, 5 * (previous - precision))
+        previous = precision
+
+        counts = columns[count_key]
+        centre_lons, centre_lats = geohash_centers(codes, precision)
+        cells = {
+            "geohash": geohash_strings(codes, precision),
+            "lon": np.round(centre_lons, 6).tolist(),
+            "lat": np.round(centre_lats, 6).tolist(),
+            count_key: counts.astype(np.int64).tolist()
+        }
+        for name in sums:
+            cells[name] = (columns[name].astype(np.int64) if name in integers else columns[name]).tolist()
+        for name in means:
+            cells[name] = (columns[name] / np.maximum(counts, 1)).tolist()
+
+        niveaux[str(precision)] = [
+            {
+                "geohash": cells["geohash"][i],
+                "centre": {"lon": cells["lon"][i], "lat": cells["lat"][i]},
+                **{name: cells[name][i] for name in [count_key, *sums, *means]}
+            }
+            for i in range(len(codes))
+        ]
+
+    return {
+        "precisions": sorted(precisions),
+        "entites_sans_coordonnees": int((~valid).sum()),
+        "niveaux": niveaux
+    }
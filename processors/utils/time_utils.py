@@ -11,10 +11,7 @@ except ImportError:
     def parse(date_string):
         return datetime.strptime(date_string, "%Y-%m-%dT%H:%M:%S%z")
 
-try:
-    import holidays
-except ImportError:
-    holidays = None
+from .calendar_dimension import get_calendar
 
 
 def parse_iso_date(date_string: str) -> Optional[datetime]:
@@ -41,25 +38,10 @@ def get_day_type(date: datetime) -> str:
         date: Date à analyser
     
     Returns:
-        Type de jour ("Lundi", "Mardi", ..., "Dimanche", "Weekend", "Férié")
+        Type de jour ("Lundi", "Mardi", ..., "Vendredi", "Weekend", "Férié"),
+        lu dans la dimension calendrier précalculée
     """
-    # Vérifier si jour férié (France)
-    if holidays:
-        try:
-            fr_holidays = holidays.France()
-            if date.date() in fr_holidays:
-                return "Férié"
-        except Exception:
-            pass
-    
-    # Vérifier weekend
-    weekday = date.weekday()
-    if weekday >= 5:  # Samedi (5) ou Dimanche (6)
-        return "Weekend"
-    
-    # Jours de semaine
-    days = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
-    return days[weekday]
+    return get_calendar().day_type(date)
 
 
 def normalize_hour(hour: int) -> int:
@@ -124,15 +106,9 @@ def is_business_day(date: datetime) -> bool:
         date: Date à vérifier
     
     Returns:
-        True si jour ouvré
-    """
-    if holidays:
-        try:
-            fr_holidays = holidays.France()
-            return date.weekday() < 5 and date.date() not in fr_holidays
-        except Exception:
-            return date.weekday() < 5
-    return date.weekday() < 5
+        True si jour ouvré (lundi à vendredi hors férié, dimension calendrier)
+    """
+    return get_calendar().is_business_day(date)
 
 
 def get_time_slot(hour: int) -> str:
@@ -3,9 +3,12 @@ Calculs spécifiques au trafic : temps perdu, alertes congestion, fiabilité, et
 """
 
 from typing import Dict, List, Optional, Tuple
+import math
 import sys
 from pathlib import Path
 
+import numpy as np
+
 # Importer config depuis le répertoire parent
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 from config import (
@@ -18,6 +21,7 @@ from config import (
 )
 from .aggregators import group_by_field, aggregate_by_hour, calculate_daily_total
 from .time_utils import parse_iso_date
+from .hourly_matrix import longest_runs
 
 
 def calculate_observed_speed(taux_occupation: float, 
@@ -96,6 +100,169 @@ def calculate_lost_time(debit_horaire: float,
     return temps_perdu, temps_perdu_total
 
 
+def calculate_observed_speed_batch(taux_occupation: np.ndarray,
+                                   vitesse_reference=None) -> np.ndarray:
+    """
+    Forme vectorisée de calculate_observed_speed (même modèle par paliers)
+    
+    Args:
+        taux_occupation: Taux d'occupation (tableau de forme quelconque)
+        vitesse_reference: Vitesse de référence, scalaire ou tableau compatible (défaut: config)
+    
+    Returns:
+        Vitesses observées en km/h (float64)
+    """
+    if vitesse_reference is None:
+        vitesse_reference = VITESSE_REFERENCE_NORMALE
+    
+    taux = np.asarray(taux_occupation, dtype=np.float64)
+    vitesse_reference = np.asarray(vitesse_reference, dtype=np.float64)
+    faible = TAUX_OCCUPATION_VITESSE["faible"]
+    moyen = TAUX_OCCUPATION_VITESSE["moyen"]
+    eleve = TAUX_OCCUPATION_VITESSE["eleve"]
+    
+    # Taux > 70% → vitesse critique fixe (20 km/h)
+    return np.select(
+        [taux < faible[1], taux < moyen[1], taux < eleve[1]],
+        [vitesse_reference * faible[2], vitesse_reference * moyen[2], vitesse_reference * eleve[2]],
+        default=20.0
+    )
+
+
+def calculate_lost_time_batch(debit_horaire: np.ndarray,
+                              taux_occupation: np.ndarray,
+                              longueur_metres: np.ndarray,
+                              vitesse_reference=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Forme vectorisée de calculate_lost_time (mêmes règles, tableaux compatibles)
+    
+    Pour des matrices tronçon × heure, passer longueurs et vitesses en colonne (n, 1).
+    Les valeurs NaN (mesure absente) donnent un temps perdu nul.
+    
+    Args:
+        debit_horaire: Débits horaires
+        taux_occupation: Taux d'occupation
+        longueur_metres: Longueurs des tronçons en mètres
+        vitesse_reference: Vitesse de référence, scalaire ou tableau (défaut: config)
+    
+    Returns:
+        Tuple (temps perdu par véhicule, temps perdu total) en minutes (float64)
+    """
+    if vitesse_reference is None:
+        vitesse_reference = VITESSE_REFERENCE_NORMALE
+    
+    debit = np.nan_to_num(np.asarray(debit_horaire, dtype=np.float64), nan=0.0)
+    taux = np.asarray(taux_occupation, dtype=np.float64)
+    longueur_metres = np.asarray(longueur_metres, dtype=np.float64)
+    vitesse_reference = np.asarray(vitesse_reference, dtype=np.float64)
+    
+    vitesse_observee = calculate_observed_speed_batch(taux, vitesse_reference)
+    longueur_km = longueur_metres / 1000.0
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        temps_normal = (longueur_km / vitesse_reference) * 60.0
+        temps_observe = (longueur_km / vitesse_observee) * 60.0
+        temps_perdu = np.maximum(0.0, temps_observe - temps_normal)
+    
+    # Pas de perte sans véhicule, sans longueur ou sans mesure
+    valide = (debit > 0) & (longueur_metres > 0) & ~np.isnan(taux)
+    temps_perdu = np.where(valide, temps_perdu, 0.0)
+    
+    return temps_perdu, temps_perdu * debit
+
+
+def calculate_lost_time_profiles(longueur_metres: np.ndarray,
+                                 taux_occupation_moyen: np.ndarray,
+                                 debit_journalier: np.ndarray,
+                                 debit_horaire: Optional[np.ndarray] = None,
+                                 taux_occupation_horaire: Optional[np.ndarray] = None,
+                                 vitesse_reference=None) -> Dict[str, np.ndarray]:
+    """
+    Temps perdu de tous les tronçons, par tronçon et par heure, en un appel
+    
+    Par tronçon : temps perdu par véhicule au taux moyen, × débit journalier.
+    Par heure : même modèle appliqué à chaque cellule des matrices tronçon × 24.
+    
+    Args:
+        longueur_metres: Longueurs (n,)
+        taux_occupation_moyen: Taux d'occupation moyens (n,)
+        debit_journalier: Débits journaliers (n,)
+        debit_horaire: Matrice débit (n, 24), optionnelle
+        taux_occupation_horaire: Matrice taux d'occupation (n, 24), optionnelle
+        vitesse_reference: Vitesse de référence, scalaire ou par tronçon (n,) (défaut: config)
+    
+    Returns:
+        Dict avec "temps_perdu_minutes" (par véhicule), "temps_perdu_total_minutes" (n,)
+        et "temps_perdu_horaire_minutes" (n, 24) si les matrices sont fournies
+    """
+    if vitesse_reference is None:
+        vitesse_reference = VITESSE_REFERENCE_NORMALE
+    
+    longueur_metres = np.asarray(longueur_metres, dtype=np.float64)
+    debit_journalier = np.asarray(debit_journalier, dtype=np.float64)
+    vitesse_reference = np.asarray(vitesse_reference, dtype=np.float64)
+    
+    # Temps perdu par véhicule indépendant du débit (débit unitaire)
+    par_vehicule, _ = calculate_lost_time_batch(
+        1.0, taux_occupation_moyen, longueur_metres, vitesse_reference
+    )
+    total = np.where(debit_journalier > 0, par_vehicule * debit_journalier, 0.0)
+    
+    result = {
+        "temps_perdu_minutes": par_vehicule,
+        "temps_perdu_total_minutes": total
+    }
+    
+    if debit_horaire is not None and taux_occupation_horaire is not None:
+        vitesse_colonne = vitesse_reference.reshape(-1, 1) if vitesse_reference.ndim else vitesse_reference
+        _, horaire = calculate_lost_time_batch(
+            debit_horaire, taux_occupation_horaire,
+            longueur_metres.reshape(-1, 1), vitesse_colonne
+        )
+        result["temps_perdu_horaire_minutes"] = horaire
+    
+    return result
+
+
+def detect_congestion_runs(taux_occupation: np.ndarray,
+                           seuil_taux: float = None,
+                           duree_minutes: int = None) -> Dict[str, np.ndarray]:
+    """
+    Détecte les épisodes de congestion (heures consécutives au-dessus du seuil)
+    
+    Args:
+        taux_occupation: Matrice taux d'occupation (tronçons × 24, NaN si absent)
+        seuil_taux: Seuil taux d'occupation (défaut: config)
+        duree_minutes: Durée minimale pour alerte (défaut: config)
+    
+    Returns:
+        Dict de vecteurs par tronçon :
+        - duree_minutes: durée du plus long épisode
+        - debut_heure: heure de début du plus long épisode (-1 si aucun)
+        - heures_congestion: nombre total d'heures au-dessus du seuil
+        - alerte: épisode >= durée minimale
+    """
+    if seuil_taux is None:
+        seuil_taux = TAUX_OCCUPATION_SEUIL_CONGESTION
+    
+    if duree_minutes is None:
+        duree_minutes = DUREE_ALERTE_CONGESTION_MINUTES
+    
+    # Comparaison False pour NaN : une heure sans mesure interrompt l'épisode
+    with np.errstate(invalid="ignore"):
+        congestion = np.asarray(taux_occupation) >= seuil_taux
+    
+    longueurs, debuts = longest_runs(congestion)
+    heures_minimales = max(1, math.ceil(duree_minutes / 60.0))
+    
+    return {
+        "duree_minutes": longueurs.astype(np.int32) * 60,
+        "debut_heure": debuts,
+        "heures_congestion": congestion.sum(axis=1).astype(np.int16),
+        "alerte": longueurs >= heures_minimales
+    }
+
+
 def detect_congestion_alerts(data: List[Dict],
                             taux_occupation_field: str = "Taux d'occupation",
                             date_field: str = "Date et heure de comptage",
@@ -11,7 +11,9 @@ from pathlib import Path
 
 # Importer config depuis le répertoire parent
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
-from config import CAPTEUR_DEFAILLANT_HEURES, VARIATION_ANOMALIE_POURCENT
+from config import VARIATION_ANOMALIE_POURCENT
+from .hourly_matrix import epoch_hours_from_iso
+from .sensor_health import SensorHealthTracker
 
 
 def validate_coordinates(lon: float, lat: float) -> bool:
@@ -64,7 +66,8 @@ def detect_failing_sensors(data: List[Dict],
                            count_field: str = "sum_counts",
                            threshold_hours: int = None) -> List[str]:
     """
-    Détecte les capteurs défaillants (inactifs > threshold_hours)
+    Détecte les capteurs défaillants sur un lot de relevés (cf. SensorHealthTracker) :
+    threshold_hours heures consécutives sans comptage non nul, ou valeur bloquée
     
     Args:
         data: Liste des données
@@ -76,43 +79,17 @@ def detect_failing_sensors(data: List[Dict],
     Returns:
         Liste des IDs capteurs défaillants
     """
-    if threshold_hours is None:
-        threshold_hours = CAPTEUR_DEFAILLANT_HEURES
-    
-    failing_sensors = []
-    
-    # Grouper par capteur
-    sensors_data = {}
-    for record in data:
-        sensor_id = record.get(sensor_id_field)
-        if not sensor_id:
-            continue
-        
-        if sensor_id not in sensors_data:
-            sensors_data[sensor_id] = []
-        
-        sensors_data[sensor_id].append(record)
-    
-    # Vérifier chaque capteur
-    for sensor_id, records in sensors_data.items():
-        # Trier par date
-        sorted_records = sorted(records, key=lambda x: x.get(date_field, ""))
-        
-        # Vérifier si inactif (count = 0 ou null)
-        inactive_count = sum(1 for r in sorted_records 
-                           if not r.get(count_field) or r.get(count_field) == 0)
-        
-        # Si toutes les données sont nulles ou 0
-        if len(sorted_records) > 0 and inactive_count == len(sorted_records):
-            failing_sensors.append(sensor_id)
-            continue
-        
-        # Vérifier si valeur constante (anomalie)
-        values = [r.get(count_field) for r in sorted_records if r.get(count_field)]
-        if len(values) > 12 and len(set(values)) == 1:  # Même valeur pendant > 12h
-            failing_sensors.append(sensor_id)
-    
-    return failing_sensors
+    tracker = SensorHealthTracker(inactive_hours=threshold_hours)
+    sensor_ids = [record.get(sensor_id_field) for record in data]
+    tracker.consume(
+        sensor_ids,
+        epoch_hours_from_iso(record.get(date_field) for record in data),
+        [record.get(count_field) or 0 for record in data]
+    )
+    
+    # Ordre de première apparition
+    seen = list(dict.fromkeys(sensor_id for sensor_id in sensor_ids if sensor_id))
+    return [sensor_id for sensor_id, failing in zip(seen, tracker.failing_mask(seen).tolist()) if failing]
 
 
 def validate_geojson(geo_shape: Any) -> bool:
@@ -0,0 +1,274 @@
+"""
+Météo horaire alignée sur les heures absolues et jointure avec les profils de mobilité
+
+Les heures du flux Visual Crossing (observées et prévues) sont conservées dans une
+table persistante (.npz, colonnes NumPy triées par heure absolue UTC, cf.
+epoch_hours_from_iso / epoch_hours_of_day) : les prévisions des jours suivants
+restent disponibles sans nouvel appel API, une observation remplace la prévision
+de la même heure. La jointure avec un profil horaire de mobilité (observé /
+attendu par heure absolue) calcule en une passe vectorisée les écarts au débit
+attendu conditionnés par la pluie et la température.
+"""
+
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import (
+    CONDITIONS_METEO, METEO_HORAIRE_PATH, METEO_PLUIE_HORAIRE_MM, METEO_RETENTION_JOURS
+)
+from .hourly_matrix import HOURS_PER_DAY, iso_from_epoch_hour
+from .array_utils import string_array
+
+_MEASURES = ("temp", "precip", "vent", "probabilite_pluie")
+_COLUMNS = ("heures",) + _MEASURES + ("prevision", "conditions")
+
+# Classes de conditions (code → libellé) pour les écarts conditionnés
+CLASSES_PLUIE = ("sec", "pluie")
+CLASSES_TEMPERATURE = ("froid", "doux", "chaud")
+
+
+class HourlyWeather:
+    """
+    Table météo horaire triée par heure absolue (UTC)
+
+    Attributes:
+        heures: Heures absolues (triées, distinctes)
+        temp, precip, vent, probabilite_pluie: Mesures float32 (NaN si absentes)
+        prevision: True si la valeur est une prévision (False : observation)
+        conditions: Libellé des conditions
+    """
+
+    def __init__(self, columns: Optional[Dict[str, np.ndarray]] = None):
+        columns = columns or {}
+        self.heures = columns.get("heures", np.zeros(0, dtype=np.int64))
+        for name in _MEASURES:
+            setattr(self, name, columns.get(name, np.zeros(0, dtype=np.float32)))
+        self.prevision = columns.get("prevision", np.zeros(0, dtype=bool))
+        self.conditions = columns.get("conditions", string_array([]))
+
+    def __len__(self) -> int:
+        return len(self.heures)
+
+    def save(self, path: Path = METEO_HORAIRE_PATH) -> None:
+        """Écrit la table (.npz, remplacement atomique)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, **{name: getattr(self, name) for name in _COLUMNS})
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path = METEO_HORAIRE_PATH) -> "HourlyWeather":
+        """Relit la table (table vide si absente ou illisible)"""
+        path = Path(path)
+        if not path.exists():
+            return cls()
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls({name: data[name] for name in _COLUMNS})
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Météo horaire illisible ({path}): {e}")
+            return cls()
+
+    def merge(self, hours: Sequence[Dict[str, Any]], oldest_kept: Optional[int] = None) -> Dict[str, int]:
+        """
+        Intègre des heures météo : une observation remplace toujours la valeur
+        connue, une prévision ne remplace qu'une prévision
+
+        Args:
+            hours: Heures nettoyées {"heure_epoch", "temp", "precip", "vent",
+                "probabilite_pluie", "prevision", "conditions"}
+            oldest_kept: Heure absolue la plus ancienne conservée (défaut: aucune purge)
+
+        Returns:
+            Dict {"ajoutees", "remplacees", "ignorees"} (nombre d'heures)
+        """
+        stats = {"ajoutees": 0, "remplacees": 0, "ignorees": 0}
+        incoming = {}
+        for hour in hours:
+            incoming[int(hour["heure_epoch"])] = hour  # Dernière valeur d'une même heure
+        if incoming:
+            epoch = np.fromiter(incoming, dtype=np.int64, count=len(incoming))
+            values = list(incoming.values())
+            added = {"heures": epoch}
+            for name in _MEASURES:
+                added[name] = np.array([np.nan if v.get(name) is None else v[name] for v in values],
+                                       dtype=np.float32)
+            added["prevision"] = np.array([bool(v.get("prevision")) for v in values])
+            added["conditions"] = string_array([str(v.get("conditions") or "") for v in values])
+
+            positions = self.lookup_many(epoch)
+            known = positions >= 0
+            # Une prévision n'écrase pas une observation
+            replace = known.copy()
+            replace[known] = ~(added["prevision"][known] & ~self.prevision[positions[known]])
+            stats["remplacees"] = int(replace.sum())
+            stats["ignorees"] = int((known & ~replace).sum())
+            stats["ajoutees"] = int((~known).sum())
+
+            for name in _COLUMNS[1:]:
+                column = getattr(self, name)
+                if name == "conditions":
+                    column = column.astype(np.result_type(column, added[name]))
+                column[positions[replace]] = added[name][replace]
+                setattr(self, name, column)
+            new = ~known
+            merged = {name: np.concatenate([getattr(self, name), added[name][new]]) for name in _COLUMNS}
+            order = np.argsort(merged["heures"], kind="stable")
+            for name in _COLUMNS:
+                setattr(self, name, merged[name][order])
+
+        if oldest_kept is not None:
+            kept = self.heures >= oldest_kept
+            for name in _COLUMNS:
+                setattr(self, name, getattr(self, name)[kept])
+        return stats
+
+    def lookup_many(self, epoch_hours: np.ndarray) -> np.ndarray:
+        """Positions des heures absolues (-1 si absente)"""
+        epoch_hours = np.asarray(epoch_hours, dtype=np.int64)
+        if len(self.heures) == 0 or len(epoch_hours) == 0:
+            return np.full(len(epoch_hours), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.heures, epoch_hours), len(self.heures) - 1)
+        return np.where(self.heures[positions] == epoch_hours, positions, -1).astype(np.int64)
+
+    def align(self, epoch_hours: Sequence[int]) -> Dict[str, np.ndarray]:
+        """
+        Mesures alignées sur un index d'heures absolues
+
+        Args:
+            epoch_hours: Heures absolues (ex: epoch_hours_of_day(jour))
+
+        Returns:
+            Dict {"temp", "precip", "vent", "probabilite_pluie"} float64 (NaN si heure
+            inconnue), "prevision" bool, "connue" bool
+        """
+        positions = self.lookup_many(np.asarray(epoch_hours, dtype=np.int64))
+        known = positions >= 0
+        rows = np.maximum(positions, 0)
+        aligned = {}
+        for name in _MEASURES:
+            column = getattr(self, name)
+            aligned[name] = (np.where(known, column[rows], np.nan) if len(column)
+                             else np.full(len(positions), np.nan))
+        aligned["prevision"] = known & (self.prevision[rows] if len(self.prevision) else False)
+        aligned["connue"] = known
+        return aligned
+
+    def to_dict(self, epoch_hours: Sequence[int]) -> Dict[str, Any]:
+        """
+        Série publiable sur un index d'heures absolues
+
+        Args:
+            epoch_hours: Heures absolues
+
+        Returns:
+            Dict {"heures_epoch", "temp", "precip", "vent", "probabilite_pluie",
+            "prevision"} (listes, None si heure inconnue)
+        """
+        aligned = self.align(epoch_hours)
+        series = {"heures_epoch": [int(h) for h in epoch_hours]}
+        for name in _MEASURES:
+            series[name] = [None if np.isnan(v) else round(float(v), 2) for v in aligned[name]]
+        series["prevision"] = [bool(v) for v in aligned["prevision"]]
+        return series
+
+
+def retention_start(epoch_hour: int) -> int:
+    """Heure absolue la plus ancienne conservée (METEO_RETENTION_JOURS avant epoch_hour)"""
+    return int(epoch_hour) - METEO_RETENTION_JOURS * HOURS_PER_DAY
+
+
+def weather_conditioned_deltas(profile: Dict[str, Any], weather: HourlyWeather) -> Dict[str, Any]:
+    """
+    Jointure profil horaire de mobilité × météo horaire : écart au débit attendu par
+    heure et par condition (pluie / sec, froid / doux / chaud)
+
+    Args:
+        profile: Profil {"heures_epoch", "observe", "attendu"} (cf. reference_profile),
+            "attendu" à None pour une heure sans référence
+        weather: Météo horaire
+
+    Returns:
+        Dict {"heures": [...], "ecart_par_condition": {...}, "effet_pluie_pourcent"}
+    """
+    epoch_hours = np.asarray(profile.get("heures_epoch", []), dtype=np.int64)
+    observe = np.array([np.nan if v is None else v for v in profile.get("observe", [])], dtype=np.float64)
+    attendu = np.array([np.nan if v is None else v for v in profile.get("attendu", [])], dtype=np.float64)
+    meteo = weather.align(epoch_hours)
+
+    valid = ~np.isnan(observe) & ~np.isnan(attendu) & (np.nan_to_num(attendu) > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ecart = np.where(valid, (observe / attendu - 1.0) * 100.0, np.nan)
+
+    # Classes de conditions (-1 : météo inconnue)
+    pluie = np.where(np.isnan(meteo["precip"]), -1,
+                     (np.nan_to_num(meteo["precip"]) >= METEO_PLUIE_HORAIRE_MM).astype(np.int64))
+    temperature = np.select(
+        [np.isnan(meteo["temp"]),
+         meteo["temp"] < CONDITIONS_METEO["FROID"]["temp"],
+         meteo["temp"] > CONDITIONS_METEO["CHAUD"]["temp"]],
+        [-1, 0, 2], default=1
+    )
+
+    # Écart agrégé par classe : rapport des sommes observé / attendu (heures valides)
+    par_condition = {}
+    for labels, codes in ((CLASSES_PLUIE, pluie), (CLASSES_TEMPERATURE, temperature)):
+        usable = valid & (codes >= 0)
+        n = len(labels)
+        heures = np.bincount(codes[usable], minlength=n)
+        sums_obs = np.bincount(codes[usable], weights=observe[usable], minlength=n)
+        sums_att = np.bincount(codes[usable], weights=attendu[usable], minlength=n)
+        for code, label in enumerate(labels):
+            par_condition[label] = {
+                "heures": int(heures[code]),
+                "ecart_pourcent": (round(float((sums_obs[code] / sums_att[code] - 1.0) * 100.0), 2)
+                                   if heures[code] else None)
+            }
+
+    effet_pluie = None
+    if par_condition["pluie"]["heures"] and par_condition["sec"]["heures"]:
+        effet_pluie = round(par_condition["pluie"]["ecart_pourcent"] - par_condition["sec"]["ecart_pourcent"], 2)
+
+    heures_detail: List[Dict[str, Any]] = []
+    for i, epoch_hour in enumerate(epoch_hours.tolist()):
+        heures_detail.append({
+            "heure": iso_from_epoch_hour(epoch_hour),
+            "observe": None if np.isnan(observe[i]) else round(float(observe[i]), 1),
+            "attendu": None if np.isnan(attendu[i]) else round(float(attendu[i]), 1),
+            "ecart_pourcent": None if np.isnan(ecart[i]) else round(float(ecart[i]), 2),
+            "temp": None if np.isnan(meteo["temp"][i]) else round(float(meteo["temp"][i]), 1),
+            "precip": None if np.isnan(meteo["precip"][i]) else round(float(meteo["precip"][i]), 2),
+            "pluie": bool(pluie[i] == 1),
+            "prevision": bool(meteo["prevision"][i])
+        })
+
+    return {
+        "heures": heures_detail,
+        "ecart_par_condition": par_condition,
+        "effet_pluie_pourcent": effet_pluie
+    }
+
+
+_tables: Dict[str, HourlyWeather] = {}
+
+
+def get_hourly_weather(path: Path = METEO_HORAIRE_PATH, refresh: bool = False) -> HourlyWeather:
+    """
+    Météo horaire du processus (chargée une fois par fichier)
+
+    Args:
+        path: Fichier de la table (.npz)
+        refresh: Relire le fichier
+
+    Returns:
+        HourlyWeather (vide si jamais écrite)
+    """
+    key = str(path)
+    if refresh or key not in _tables:
+        _tables[key] = HourlyWeather.load(path)
+    return _tables[key]
@@ -6,6 +6,25 @@ Gère les cas où l'arrondissement n'est pas disponible
 from typing import Dict, List, Tuple, Optional
 from collections import defaultdict
 
+import numpy as np
+
+from .aggregators import select_top_n
+from .keyword_matcher import KeywordMatcher
+from .spatial_pyramid import geohash_cells
+
+# Mots-clés de rues/quartiers par zone (ordre = priorité en cas de correspondances multiples)
+ZONES_LIBELLE = [
+    ("Centre", ["châtelet", "louvre", "rivoli", "hôtel de ville"]),
+    ("Nord", ["gare du nord", "gare de l'est", "belleville", "ménilmontant"]),
+    ("Est", ["nation", "bastille", "oberkampf"]),
+    ("Ouest", ["arc de triomphe", "champs-élysées", "concorde", "madeleine"]),
+    ("Sud", ["montparnasse", "gare d'austerlitz", "gobelins"])
+]
+
+_LIBELLE_MATCHER = KeywordMatcher(
+    (keyword, zone) for zone, keywords in ZONES_LIBELLE for keyword in keywords
+)
+
 
 def get_zone_from_coordinates(lon: float, lat: float) -> str:
     """
@@ -118,39 +137,62 @@ def extract_zone_from_libelle(libelle: str) -> Optional[str]:
     if not libelle:
         return None
     
-    libelle_lower = libelle.lower()
-    
-    # Mapping de rues/quartiers vers zones
-    # Centre
-    if any(word in libelle_lower for word in ["châtelet", "louvre", "rivoli", "hôtel de ville"]):
-        return "Centre"
-    
-    # Nord
-    if any(word in libelle_lower for word in ["gare du nord", "gare de l'est", "belleville", "ménilmontant"]):
-        return "Nord"
-    
-    # Est
-    if any(word in libelle_lower for word in ["nation", "bastille", "oberkampf"]):
-        return "Est"
+    # Un seul parcours du libellé pour tous les mots-clés (Aho-Corasick)
+    return _LIBELLE_MATCHER.first(libelle)
+
+
+def zones_from_coordinates(lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """
+    get_zone_from_coordinates vectorisé sur des tableaux de points
     
-    # Ouest
-    if any(word in libelle_lower for word in ["arc de triomphe", "champs-élysées", "concorde", "madeleine"]):
-        return "Ouest"
+    Args:
+        lons: Longitudes
+        lats: Latitudes
     
-    # Sud
-    if any(word in libelle_lower for word in ["montparnasse", "gare d'austerlitz", "gobelins"]):
-        return "Sud"
+    Returns:
+        Tableau de zones (unicode), "Unknown" hors emprise ou coordonnées NaN
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    west, east = lons < 2.33, lons > 2.37
+    north, south = lats > 48.86, lats < 48.85
+    conditions = [
+        ~((lons >= 2.2) & (lons <= 2.5) & (lats >= 48.7) & (lats <= 49.0)),
+        (lons >= 2.33) & (lons <= 2.37) & (lats >= 48.85) & (lats <= 48.87),
+        north & west, north & east, north,
+        south & west, south & east, south,
+        east, west
+    ]
+    choices = ["Unknown", "Centre", "Nord-Ouest", "Nord-Est", "Nord",
+               "Sud-Ouest", "Sud-Est", "Sud", "Est", "Ouest"]
+    return np.select(conditions, choices, default=quadrants_from_coordinates(lons, lats))
+
+
+def quadrants_from_coordinates(lons: np.ndarray, lats: np.ndarray) -> np.ndarray:
+    """
+    get_quadrant_from_coordinates vectorisé sur des tableaux de points
     
-    return None
+    Returns:
+        Tableau de quadrants (unicode), "Unknown" hors emprise ou coordonnées NaN
+    """
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    inside = (lons >= 2.2) & (lons <= 2.4) & (lats >= 48.8) & (lats <= 48.9)
+    west, north = lons < 2.3522, lats > 48.8566
+    quadrants = np.where(north, np.where(west, "Nord-Ouest", "Nord-Est"),
+                         np.where(west, "Sud-Ouest", "Sud-Est"))
+    return np.where(inside, quadrants, "Unknown")
 
 
-def group_by_zone(metrics: List[Dict]) -> Dict[str, List[Dict]]:
+def group_by_zone(metrics: List[Dict], zone_groups: Optional[Dict[str, str]] = None) -> Dict[str, List[Dict]]:
     """
     Groupe les métriques par zone géographique
     (Utilise arrondissement si disponible, sinon zone ou quadrant)
     
     Args:
         metrics: Liste des métriques de tronçons
+        zone_groups: Zone de regroupement pré-calculée par tronçon (table d'affectation) ;
+            les tronçons absents passent par la cascade ci-dessous
     
     Returns:
         Dict {zone: [métriques]}
@@ -158,6 +200,12 @@ def group_by_zone(metrics: List[Dict]) -> Dict[str, List[Dict]]:
     by_zone = defaultdict(list)
     
     for metric in metrics:
+        if zone_groups:
+            zone = zone_groups.get(metric.get("identifiant_arc"))
+            if zone:
+                by_zone[zone].append(metric)
+                continue
+        
         # Priorité 1: Arrondissement
         arrondissement = metric.get("arrondissement")
         if arrondissement and arrondissement != "Unknown":
@@ -212,11 +260,10 @@ def calculate_zone_metrics(by_zone: Dict[str, List[Dict]]) -> List[Dict]:
         nombre_troncons_satures = len([m for m in metrics if m.get("congestion_alerte", False)])
         
         # Tronçons les plus fréquentés de la zone
-        top_troncons = sorted(
-            metrics,
-            key=lambda x: x.get("debit_journalier_total", 0),
-            reverse=True
-        )[:5]
+        top_troncons = select_top_n(
+            metrics, 5,
+            key=lambda x: x.get("debit_journalier_total", 0)
+        )
         
         zone_metrics.append({
             "zone": zone,
@@ -256,53 +303,38 @@ def identify_high_traffic_zones(zone_metrics: List[Dict], top_n: int = 10) -> Li
     # 2. Temps perdu
     # 3. Taux de saturation
     
-    sorted_zones = sorted(
-        zone_metrics,
+    return select_top_n(
+        zone_metrics, top_n,
         key=lambda x: (
             x["total_vehicules"],
             x["temps_perdu_total_minutes"],
             x["taux_saturation"]
-        ),
-        reverse=True
+        )
     )
-    
-    return sorted_zones[:top_n]
 
 
 def create_zone_clusters(metrics: List[Dict], cluster_size: int = 500) -> Dict[str, List[Dict]]:
     """
-    Crée des clusters géographiques pour l'analyse
+    Crée des clusters géographiques pour l'analyse : cellules geohash de la pyramide
+    spatiale (cf. spatial_pyramid.geohash_cells)
     (Utile quand arrondissement non disponible)
     
     Args:
         metrics: Liste des métriques
-        cluster_size: Taille approximative des clusters (en mètres)
+        cluster_size: Taille maximale des clusters (en mètres)
     
     Returns:
-        Dict {cluster_id: [métriques]}
+        Dict {geohash de la cellule: [métriques]}, "no_coordinates" si non localisable
     """
-    clusters = defaultdict(list)
-    
-    for metric in metrics:
-        geo_point = metric.get("geo_point_2d")
-        if not geo_point:
-            clusters["no_coordinates"].append(metric)
-            continue
-        
+    lons, lats = np.full(len(metrics), np.nan), np.full(len(metrics), np.nan)
+    for i, metric in enumerate(metrics):
         try:
-            lat_str, lon_str = geo_point.split(", ")
-            lon = float(lon_str)
-            lat = float(lat_str)
-            
-            # Créer un ID de cluster basé sur la grille
-            # Diviser Paris en grille de ~500m
-            cluster_lon = int(lon * 1000) // cluster_size
-            cluster_lat = int(lat * 1000) // cluster_size
-            cluster_id = f"Cluster_{cluster_lon}_{cluster_lat}"
-            
-            clusters[cluster_id].append(metric)
-        except Exception:
-            clusters["no_coordinates"].append(metric)
+            lat_str, lon_str = metric.get("geo_point_2d").split(", ")
+            lons[i], lats[i] = float(lon_str), float(lat_str)
+        except (AttributeError, ValueError):
+            continue
     
+    clusters = defaultdict(list)
+    for cell, metric in zip(geohash_cells(lons, lats, cluster_size), metrics):
+        clusters[cell or "no_coordinates"].append(metric)
     return dict(clusters)
-
@@ -0,0 +1,331 @@
+"""
+Affectation tronçon → zones (arrondissement, zone, quadrant), calculée une fois par version
+
+La cascade arrondissement → zone depuis coordonnées → zone depuis libellé → quadrant est
+évaluée en lot pour tous les tronçons du référentiel compilé (localisation vectorisée,
+mots-clés des libellés en une passe Aho-Corasick) puis persistée dans CACHE_DIR/zones,
+indexée par l'empreinte du référentiel et du GeoJSON des arrondissements. Les étapes
+suivantes (agrégation, indicateurs, regroupement par zone, export) ne font plus qu'une
+recherche dans la table.
+"""
+
+import hashlib
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+from config import CACHE_DIR, ARRONDISSEMENTS_GEOJSON
+from .arrondissements import get_default_locator
+from .array_utils import string_array
+from .referentiel_store import get_compiled_referentiel
+from .zone_analysis import (
+    extract_zone_from_libelle, zones_from_coordinates, quadrants_from_coordinates
+)
+
+ZONE_FORMAT_VERSION = 1
+_COLUMNS = ("arrondissement", "zone", "zone_libelle", "quadrant", "zone_fallback", "zone_groupe")
+
+
+class ArcZone(NamedTuple):
+    """Zones d'un tronçon (None si non déterminée)"""
+    arrondissement: Optional[str]
+    zone: Optional[str]  # Zone depuis coordonnées
+    zone_libelle: Optional[str]
+    quadrant: Optional[str]
+    zone_fallback: str  # Zone affichée si arrondissement inconnu (jamais vide)
+    zone_groupe: str  # Clé de regroupement (group_by_zone)
+
+
+def parse_geo_points(geo_points: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Coordonnées de points au format "lat, lon" (geo_point_2d)
+
+    Returns:
+        Tuple (longitudes, latitudes), NaN si absent ou illisible
+    """
+    lons = np.full(len(geo_points), np.nan)
+    lats = np.full(len(geo_points), np.nan)
+    parsed: Dict[str, Tuple[float, float]] = {}
+    for i, geo_point in enumerate(geo_points):
+        if not geo_point:
+            continue
+        point = parsed.get(geo_point)
+        if point is None:
+            try:
+                lat_str, lon_str = geo_point.split(", ")
+                point = (float(lon_str), float(lat_str))
+            except (ValueError, AttributeError):
+                point = (np.nan, np.nan)
+            parsed[geo_point] = point
+        lons[i], lats[i] = point
+    return lons, lats
+
+
+def compute_zone_columns(geo_points: Sequence[str], libelles: Sequence[str]) -> Dict[str, np.ndarray]:
+    """
+    Cascade d'affectation des zones évaluée en lot (mêmes règles que l'agrégation par tronçon)
+
+    Args:
+        geo_points: geo_point_2d des tronçons ("lat, lon")
+        libelles: Libellés des tronçons
+
+    Returns:
+        Dict de colonnes unicode (voir _COLUMNS), "" si non déterminé
+    """
+    n = len(geo_points)
+    lons, lats = parse_geo_points(geo_points)
+    has_coords = ~np.isnan(lons) & ~np.isnan(lats)
+
+    arrondissement = np.full(n, "", dtype="U5")
+    if has_coords.any():
+        locator = get_default_locator()
+        positions = np.nonzero(has_coords)[0]
+        indices = locator.locate_indices(lons[positions], lats[positions])
+        codes = np.asarray(locator.codes + [""], dtype="U5")
+        arrondissement[positions] = codes[indices]  # -1 → "" (hors Paris)
+
+    zone = np.where(has_coords, zones_from_coordinates(lons, lats), "")
+    quadrant = np.where(has_coords, quadrants_from_coordinates(lons, lats), "")
+
+    # Mots-clés : une passe par libellé distinct
+    zones_libelle: Dict[str, str] = {}
+    for libelle in libelles:
+        if libelle not in zones_libelle:
+            zones_libelle[libelle] = extract_zone_from_libelle(libelle) or ""
+    zone_libelle = np.asarray([zones_libelle[libelle] for libelle in libelles], dtype="U16")
+
+    # Zone affichée : zone (coordonnées) si hors arrondissement, remplacée par le libellé,
+    # sinon quadrant, sinon "Unknown"
+    sans_arrondissement = arrondissement == ""
+    zone_fallback = np.where(sans_arrondissement, zone, "").astype("U24")
+    zone_fallback = np.where(sans_arrondissement & (zone_libelle != ""), zone_libelle, zone_fallback)
+    zone_fallback = np.where((zone_fallback == "") & has_coords & (quadrant != "Unknown"), quadrant, zone_fallback)
+    zone_fallback = np.where(zone_fallback == "", "Unknown", zone_fallback)
+
+    # Regroupement : arrondissement, sinon libellé, sinon zone (coordonnées), sinon "Unknown"
+    zone_groupe = np.where(
+        ~sans_arrondissement, np.char.add("Arrondissement ", arrondissement),
+        np.where(zone_libelle != "", zone_libelle, np.where(has_coords, zone, "Unknown"))
+    ).astype("U24")
+
+    return {
+        "arrondissement": arrondissement,
+        "zone": zone.astype("U16"),
+        "zone_libelle": zone_libelle,
+        "quadrant": quadrant.astype("U16"),
+        "zone_fallback": zone_fallback,
+        "zone_groupe": zone_groupe
+    }
+
+
+def _rows(columns: Dict[str, np.ndarray], positions: Any) -> List[ArcZone]:
+    """Lignes ArcZone aux positions données ("" → None pour les zones facultatives)"""
+    values = [columns[name][positions].tolist() for name in _COLUMNS]
+    return [
+        ArcZone(arrondissement or None, zone or None, zone_libelle or None, quadrant or None,
+                zone_fallback, zone_groupe)
+        for arrondissement, zone, zone_libelle, quadrant, zone_fallback, zone_groupe in zip(*values)
+    ]
+
+
+class ZoneTable:
+    """Table d'affectation des zones triée par identifiant de tronçon"""
+
+    def __init__(self, arc_ids: np.ndarray, columns: Dict[str, np.ndarray], key: str = ""):
+        self.arc_ids = arc_ids
+        self.columns = columns
+        self.key = key
+
+    def __len__(self) -> int:
+        return len(self.arc_ids)
+
+    @classmethod
+    def build(cls, arc_ids: Sequence[str], geo_points: Sequence[str],
+              libelles: Sequence[str], key: str = "") -> "ZoneTable":
+        """
+        Calcule la table pour un ensemble de tronçons
+
+        Args:
+            arc_ids: Identifiants des tronçons
+            geo_points: geo_point_2d par tronçon
+            libelles: Libellés par tronçon
+            key: Clé de version (empreintes des sources)
+
+        Returns:
+            ZoneTable
+        """
+        order = np.argsort(np.asarray(arc_ids, dtype=str), kind="stable")
+        columns = compute_zone_columns(geo_points, libelles)
+        return cls(string_array([str(arc_ids[i]) for i in order.tolist()]),
+                   {name: column[order] for name, column in columns.items()}, key)
+
+    def save(self, path: Path) -> None:
+        """Écrit la table (.npz, remplacement atomique)"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.stem + ".tmp.npz")
+        np.savez(tmp_path, arc_ids=self.arc_ids, **self.columns)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path, key: str = "") -> Optional["ZoneTable"]:
+        """Relit une table écrite par save (None si absente ou illisible)"""
+        if not path.exists():
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                return cls(data["arc_ids"], {name: data[name] for name in _COLUMNS}, key)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"⚠ Table des zones illisible ({path}): {e}")
+            return None
+
+    def lookup_many(self, arc_ids: Sequence[str]) -> np.ndarray:
+        """Positions des tronçons (-1 si absent)"""
+        if len(self.arc_ids) == 0 or len(arc_ids) == 0:
+            return np.full(len(arc_ids), -1, dtype=np.int64)
+        queries = string_array([str(arc_id) for arc_id in arc_ids])
+        positions = np.minimum(np.searchsorted(self.arc_ids, queries), len(self.arc_ids) - 1)
+        return np.where(self.arc_ids[positions] == queries, positions, -1).astype(np.int64)
+
+    def get(self, arc_id: str) -> Optional[ArcZone]:
+        """Zones d'un tronçon (None si absent de la table)"""
+        position = int(self.lookup_many([arc_id])[0])
+        return _rows(self.columns, [position])[0] if position >= 0 else None
+
+
+def _zone_table_key(store: Any) -> str:
+    """Clé de version : format, empreinte du référentiel, contenu du GeoJSON des arrondissements"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{ZONE_FORMAT_VERSION}:{store.fingerprint}".encode("utf-8"))
+    try:
+        digest.update(Path(ARRONDISSEMENTS_GEOJSON).read_bytes())
+    except OSError:
+        digest.update(b"sans-polygones")
+    return digest.hexdigest()
+
+
+_tables: Dict[str, ZoneTable] = {}
+
+
+def get_zone_table() -> Optional[ZoneTable]:
+    """
+    Table des zones du référentiel compilé actif (calculée une fois par version,
+    persistée dans CACHE_DIR/zones)
+
+    Returns:
+        ZoneTable ou None si aucun référentiel compilé
+    """
+    store = get_compiled_referentiel()
+    if store is None:
+        return None
+    key = _zone_table_key(store)
+    table = _tables.get(key)
+    if table is not None:
+        return table
+
+    directory = Path(CACHE_DIR) / "zones"
+    path = directory / f"zones-{key}.npz"
+    table = ZoneTable.load(path, key)
+    if table is None:
+        n = len(store)
+        table = ZoneTable.build(
+            store.arc_ids.tolist(),
+            [store.geo_point(i) for i in range(n)],
+            [store.libelle(i) for i in range(n)],
+            key
+        )
+        try:
+            table.save(path)
+            for old in directory.glob("zones-*.npz"):
+                if old != path:
+                    old.unlink()
+        except OSError as e:
+            print(f"⚠ Écriture table des zones impossible: {e}")
+
+    _tables.clear()
+    _tables[key] = table
+    return table
+
+
+def zone_rows(arc_ids: Sequence[str], geo_points: Sequence[str],
+              libelles: Sequence[str]) -> List[ArcZone]:
+    """
+    Zones d'un lot de tronçons : table du référentiel, calcul en lot pour les tronçons absents
+
+    Args:
+        arc_ids: Identifiants des tronçons
+        geo_points: geo_point_2d par tronçon (utilisé pour les tronçons hors référentiel)
+        libelles: Libellés par tronçon (idem)
+
+    Returns:
+        Liste d'ArcZone (une par tronçon, dans l'ordre)
+    """
+    rows: List[Optional[ArcZone]] = [None] * len(arc_ids)
+    table = get_zone_table()
+    positions = table.lookup_many(arc_ids) if table is not None else np.full(len(arc_ids), -1)
+
+    found = np.nonzero(positions >= 0)[0]
+    if found.size:
+        for i, row in zip(found.tolist(), _rows(table.columns, positions[found])):
+            rows[i] = row
+
+    missing = np.nonzero(positions < 0)[0].tolist()
+    if missing:
+        columns = compute_zone_columns([geo_points[i] for i in missing], [libelles[i] for i in missing])
+        for i, row in zip(missing, _rows(columns, slice(None))):
+            rows[i] = row
+    return rows
+
+
+def assign_zones(arc_ids: Sequence[str], geo_points: Sequence[str],
+                 libelles: Sequence[str]) -> Dict[str, ArcZone]:
+    """
+    Zones d'un lot de tronçons (voir zone_rows)
+
+    Returns:
+        Dict {arc_id: ArcZone}
+    """
+    return dict(zip(arc_ids, zone_rows(arc_ids, geo_points, libelles)))
+
+
+def _metric_zone_rows(metrics: Sequence[Dict[str, Any]]) -> List[ArcZone]:
+    """Zones des tronçons d'une liste de métriques"""
+    return zone_rows(
+        [metric.get("identifiant_arc") or "" for metric in metrics],
+        [metric.get("geo_point_2d") or "" for metric in metrics],
+        [metric.get("libelle") or "" for metric in metrics]
+    )
+
+
+def zone_groups(metrics: Sequence[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Clés de regroupement par zone des tronçons de métriques (pour group_by_zone)
+
+    Returns:
+        Dict {identifiant_arc: zone}
+    """
+    return {
+        metric.get("identifiant_arc"): zones.zone_groupe
+        for metric, zones in zip(metrics, _metric_zone_rows(metrics))
+        if metric.get("identifiant_arc")
+    }
+
+
+def fill_zone_fallback(items: Sequence[Dict[str, Any]]) -> None:
+    """
+    Complète zone_fallback absent (arrondissement connu, sinon table d'affectation)
+
+    Args:
+        items: Métriques / alertes / zones (modifiées sur place)
+    """
+    missing = [item for item in items if not item.get("zone_fallback")]
+    if not missing:
+        return
+    for item, zones in zip(missing, _metric_zone_rows(missing)):
+        arrondissement = item.get("arrondissement", "Unknown")
+        if arrondissement and arrondissement != "Unknown":
+            item["zone_fallback"] = f"Arrondissement {arrondissement}"
+        else:
+            item["zone_fallback"] = zones.zone_fallback
@@ -2,9 +2,11 @@
 Processeur pour les données API Weather (météo)
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from processors.base_processor import BaseProcessor
 from processors.utils.validators import validate_date_iso
+from processors.utils.hourly_matrix import epoch_hours_of_day, HOURS_PER_DAY
+from processors.utils.weather_hours import get_hourly_weather, retention_start
 from models.weather_metrics import WeatherMetrics
 
 
@@ -23,10 +25,14 @@ class WeatherProcessor(BaseProcessor):
         """
         cleaned = {
             "current_conditions": data.get("currentConditions", {}),
-            "days": []
+            "days": [],
+            "hours": []
         }
         
         days = data.get("days", [])
+        # Heure courante du flux : heures postérieures sans source explicite = prévisions
+        current_epoch = (data.get("currentConditions") or {}).get("datetimeEpoch")
+        current_hour = int(current_epoch) // 3600 if current_epoch else None
         
         for day in days:
             # Valider cohérence températures
@@ -51,9 +57,57 @@ class WeatherProcessor(BaseProcessor):
             }
             
             cleaned["days"].append(cleaned_day)
+            cleaned["hours"].extend(self._clean_hours(day, current_hour))
         
         return cleaned
     
+    @staticmethod
+    def _clean_hours(day: Dict, current_hour: Optional[int]) -> List[Dict[str, Any]]:
+        """
+        Heures d'une journée Visual Crossing, indexées par heure absolue UTC
+        
+        Args:
+            day: Journée brute (clé "hours")
+            current_hour: Heure absolue des conditions courantes (None si inconnue)
+        
+        Returns:
+            Liste d'heures {"heure_epoch", "temp", "precip", "vent", "probabilite_pluie",
+            "prevision", "conditions"}
+        """
+        hours = day.get("hours") or []
+        if not hours:
+            return []
+        local_hours = epoch_hours_of_day(day.get("datetime", "")) if day.get("datetime") else None
+        cleaned_hours = []
+        for hour in hours:
+            epoch = hour.get("datetimeEpoch")
+            if epoch is not None:
+                heure_epoch = int(epoch) // 3600
+            elif local_hours is not None and str(hour.get("datetime", ""))[:2].isdigit():
+                heure_epoch = int(local_hours[min(int(str(hour["datetime"])[:2]), HOURS_PER_DAY - 1)])
+            else:
+                continue
+            source = hour.get("source")
+            prevision = source == "fcst" if source else (current_hour is not None and heure_epoch > current_hour)
+            cleaned_hours.append({
+                "heure_epoch": heure_epoch,
+                "temp": hour.get("temp"),
+                "precip": hour.get("precip"),
+                "vent": hour.get("windspeed"),
+                "probabilite_pluie": hour.get("precipprob"),
+                "prevision": prevision,
+                "conditions": hour.get("conditions", "")
+            })
+        return cleaned_hours
+    
+    def _reference_day(self, days: List[Dict]) -> Dict:
+        """Journée analysée : celle de la partition API_DATE si présente, sinon la première"""
+        api_date = str(getattr(self.config, "API_DATE", ""))
+        for day in days:
+            if day.get("datetime", "") == api_date:
+                return day
+        return days[0]
+    
     def aggregate_daily(self, cleaned_data: Dict) -> Dict[str, Any]:
         """
         Agrégations quotidiennes météo
@@ -62,15 +116,25 @@ class WeatherProcessor(BaseProcessor):
             cleaned_data: Données nettoyées
         
         Returns:
-            Dict avec agrégations (prend le premier jour disponible)
+            Dict avec agrégations (jour API_DATE, ou premier jour disponible), série
+            horaire du jour et prévisions des jours suivants
         """
         days = cleaned_data.get("days", [])
         
         if not days:
             return {"metrics": None}
         
-        # Prendre le premier jour (ou jour courant)
-        day_data = days[0]
+        day_data = self._reference_day(days)
+        
+        # Météo horaire persistante : observations et prévisions indexées par heure absolue
+        # (les prévisions restent disponibles pour les jours suivants sans nouvel appel)
+        meteo = get_hourly_weather(self.config.METEO_HORAIRE_PATH)
+        heures_jour = epoch_hours_of_day(day_data["datetime"])
+        meteo_stats = meteo.merge(cleaned_data.get("hours", []), oldest_kept=retention_start(int(heures_jour[0])))
+        try:
+            meteo.save(self.config.METEO_HORAIRE_PATH)
+        except OSError as e:
+            print(f"  ⚠ Écriture météo horaire impossible: {e}")
         
         aggregated = {
             "date": day_data.get("datetime", ""),
@@ -99,7 +163,24 @@ class WeatherProcessor(BaseProcessor):
         
         aggregated["categories"] = categories
         
-        return {"metrics": aggregated}
+        previsions = [
+            {
+                "date": day.get("datetime", ""),
+                "temp_moyenne": day.get("temp", 0.0),
+                "temp_min": day.get("tempmin", 0.0),
+                "temp_max": day.get("tempmax", 0.0),
+                "precip_totale": day.get("precip", 0.0),
+                "vent_moyen": day.get("windspeed", 0.0),
+                "conditions": day.get("conditions", "Inconnu")
+            }
+            for day in days if day.get("datetime", "") > aggregated["date"]
+        ]
+        
+        return {
+            "metrics": aggregated,
+            "meteo_horaire": dict(meteo.to_dict(heures_jour.tolist()), mise_a_jour=meteo_stats),
+            "previsions": previsions
+        }
     
     def calculate_indicators(self, aggregated_data: Dict) -> Dict[str, Any]:
         """
@@ -145,6 +226,8 @@ class WeatherProcessor(BaseProcessor):
         return {
             "metrics": metrics.to_dict(),
             "impact_mobilite": impact,
-            "categories": metrics_data.get("categories", [])
+            "categories": metrics_data.get("categories", []),
+            "meteo_horaire": aggregated_data.get("meteo_horaire"),
+            "previsions": aggregated_data.get("previsions", [])
         }
 
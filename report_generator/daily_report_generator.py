@@ -208,10 +208,22 @@ class DailyReportGenerator:
         chantiers_actifs = chantiers_metrics.get("chantiers_actifs", []) if chantiers_metrics else []
         print(f"  ✓ Chantiers actifs: {len(chantiers_actifs)} éléments")
         
-        # Évolution (simplifié - nécessiterait données historiques)
-        evolution = {
-            "note": "Nécessite données historiques pour comparaison"
-        }
+        # Évolution vs même jour de la semaine précédente (références historiques calculées
+        # par les processeurs, entités présentes les deux jours)
+        evolution = {}
+        if comptages_metrics and comptages_metrics.get("evolution_semaine_precedente"):
+            evolution["trafic"] = dict(
+                comptages_metrics["evolution_semaine_precedente"],
+                nombre_anomalies=comptages_metrics.get("global_metrics", {}).get("nombre_anomalies_trafic", 0)
+            )
+        if bikes_metrics and bikes_metrics.get("evolution_semaine_precedente"):
+            evolution["velos"] = dict(
+                bikes_metrics["evolution_semaine_precedente"],
+                nombre_anomalies=len(bikes_metrics.get("anomalies", []))
+            )
+        if not any(e.get("entites_comparees") for e in evolution.values()):
+            evolution["note"] = "Pas de données à J-7 pour comparaison"
+        print(f"  ✓ Évolution J-7: {', '.join(k for k in evolution if k != 'note') or 'non disponible'}")
         
         # Impact météo (gérer le cas où weather_metrics est None)
         meteo_impact = weather_metrics.get("metrics", {}) if weather_metrics else {}
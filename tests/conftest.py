@@ -0,0 +1,13 @@
+"""
+Configuration pytest : sorties, caches et états persistants dans un répertoire
+temporaire (jamais dans output/ du projet), supprimé en fin de session
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+if "OUTPUT_DIR" not in os.environ:
+    os.environ["OUTPUT_DIR"] = tempfile.mkdtemp(prefix="cityflow-tests-")
+    atexit.register(shutil.rmtree, os.environ["OUTPUT_DIR"], ignore_errors=True)
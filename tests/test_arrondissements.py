@@ -0,0 +1,87 @@
+"""
+Tests du moteur de localisation des arrondissements (processors.utils.arrondissements),
+comparé à un test point-dans-polygone direct sur les anneaux du GeoJSON
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from config import ARRONDISSEMENTS_GEOJSON
+from processors.utils.arrondissements import ArrondissementLocator, code_from_properties
+
+
+def _rings_by_code():
+    with open(ARRONDISSEMENTS_GEOJSON, "r", encoding="utf-8") as f:
+        collection = json.load(f)
+    rings = {}
+    for feature in collection["features"]:
+        geometry = feature["geometry"]
+        polygons = [geometry["coordinates"]] if geometry["type"] == "Polygon" else geometry["coordinates"]
+        rings.setdefault(code_from_properties(feature["properties"]), []).extend(
+            ring for polygon in polygons for ring in polygon
+        )
+    return rings
+
+
+def _point_in_rings(rings, lon, lat):
+    """Ray casting (parité sur tous les anneaux, trous compris)"""
+    inside = False
+    for ring in rings:
+        for (xi, yi), (xj, yj) in zip(ring, ring[1:] + ring[:1]):
+            if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+    return inside
+
+
+@pytest.fixture(scope="module")
+def locator():
+    return ArrondissementLocator()
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    lons, lats = rng.uniform(2.22, 2.47, 1500), rng.uniform(48.81, 48.91, 1500)
+    rings = _rings_by_code()
+    expected = []
+    for lon, lat in zip(lons.tolist(), lats.tolist()):
+        codes = [code for code, code_rings in rings.items() if _point_in_rings(code_rings, lon, lat)]
+        assert len(codes) <= 1
+        expected.append(codes[0] if codes else None)
+    return lons, lats, expected
+
+
+def test_locate_matches_point_in_polygon(locator, points):
+    lons, lats, expected = points
+    assert [locator.locate(lon, lat) for lon, lat in zip(lons.tolist(), lats.tolist())] == expected
+    assert locator.locate_many(lons, lats) == expected
+    assert sum(code is not None for code in expected) > 500  # Grille intérieure et frontières
+
+
+def test_shared_arrays_locator_matches(locator, points):
+    lons, lats, expected = points
+    arrays, meta = locator.to_arrays()
+    for values in arrays.values():
+        values.flags.writeable = False
+    shared = ArrondissementLocator.from_arrays(arrays, meta)
+    assert shared.locate_many(lons, lats) == expected
+    assert [shared.locate(lon, lat) for lon, lat in zip(lons.tolist(), lats.tolist())] == expected
+
+
+def test_cache_hits_skip_the_geometry(points, monkeypatch):
+    lons, lats, expected = points
+    engine = ArrondissementLocator()
+    calls = []
+    uncached = engine._locate_uncached
+    monkeypatch.setattr(engine, "_locate_uncached", lambda lon, lat: calls.append(1) or uncached(lon, lat))
+
+    sample = list(zip(np.round(lons[:200], 5).tolist(), np.round(lats[:200], 5).tolist()))
+    first = [engine.locate(lon, lat) for lon, lat in sample]
+    assert len(calls) == 200
+    # Même point, ou écart inférieur à la précision du cache : résultat mémoïsé
+    again = [engine.locate(lon + 2e-7, lat - 2e-7) for lon, lat in sample]
+    assert again == first
+    assert len(calls) == 200
+    assert first == [engine._locate_uncached(lon, lat) for lon, lat in sample]
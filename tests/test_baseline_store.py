@@ -0,0 +1,148 @@
+"""
+Tests des références historiques compactes (processors.utils.baseline_store)
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from config.settings import REFERENCE_EWMA_ALPHA, REFERENCE_OBSERVATIONS_MIN
+from processors.utils.baseline_store import CRENEAU_JOUR, BaselineStore, day_slots
+
+LUNDIS = [(date(2025, 10, 6) + timedelta(weeks=k)).isoformat() for k in range(6)]
+ENTITES = ["arc_b", "arc_a", "arc_c"]
+
+
+def _day(rng, n=len(ENTITES)):
+    """Journée aléatoire : profils horaires (quelques heures manquantes) et totaux"""
+    hourly = rng.uniform(10, 100, size=(n, 24))
+    hourly[rng.random(size=(n, 24)) < 0.1] = np.nan
+    return hourly, np.nansum(hourly, axis=1)
+
+
+def _days(seed=0):
+    rng = np.random.default_rng(seed)
+    return [(day,) + _day(rng) for day in LUNDIS]
+
+
+def _columns(store):
+    return {name: np.copy(getattr(store, name)) for name in
+            ("ids", "nombre", "moyenne", "m2", "ewma", "semaine", "semaine_jour", "derniere_journee")}
+
+
+def _assert_same(store, expected):
+    for name, values in expected.items():
+        np.testing.assert_array_equal(getattr(store, name), values, err_msg=name)
+
+
+def test_welford_and_ewma_match_full_history():
+    days = _days()
+    store = BaselineStore()
+    for day, hourly, totals in days:
+        store.update(ENTITES, day, hourly, totals)
+
+    lundi = day_slots(LUNDIS[0])["type_jour"]
+    history = np.stack([np.column_stack([hourly, totals]) for _, hourly, totals in days])  # (jours, n, 25)
+    for entity_index, entity in enumerate(ENTITES):
+        row = store.lookup_many([entity])[0]
+        values = history[:, entity_index]
+        observed = ~np.isnan(values)
+        np.testing.assert_array_equal(store.nombre[row, lundi], observed.sum(axis=0))
+        np.testing.assert_allclose(store.moyenne[row, lundi], np.nanmean(values, axis=0))
+        variance = store.m2[row, lundi] / np.maximum(store.nombre[row, lundi] - 1, 1)
+        np.testing.assert_allclose(variance, np.nanvar(values, axis=0, ddof=1))
+
+        # EWMA créneau journée (toujours observé)
+        ewma = values[0, CRENEAU_JOUR]
+        for value in values[1:, CRENEAU_JOUR]:
+            ewma = REFERENCE_EWMA_ALPHA * value + (1 - REFERENCE_EWMA_ALPHA) * ewma
+        assert store.ewma[row, lundi, CRENEAU_JOUR] == pytest.approx(ewma, rel=1e-5)
+
+
+def test_save_load_round_trip(tmp_path):
+    store = BaselineStore()
+    for day, hourly, totals in _days():
+        store.update(ENTITES, day, hourly, totals)
+    path = tmp_path / "references.npz"
+    store.save(path)
+
+    loaded = BaselineStore.load(path)
+    _assert_same(loaded, _columns(store))
+    day, hourly, totals = _days(seed=1)[-1]
+    for name, values in store.compare(ENTITES, day, hourly, totals).items():
+        np.testing.assert_array_equal(loaded.compare(ENTITES, day, hourly, totals)[name], values)
+
+
+def test_entities_split_across_micro_batches():
+    days = _days()
+    whole, split = BaselineStore(), BaselineStore()
+    for day, hourly, totals in days:
+        whole.update(ENTITES, day, hourly, totals)
+        # Une même journée intégrée en deux lots d'entités (chunks)
+        assert split.update(ENTITES[:2], day, hourly[:2], totals[:2]) == 2
+        assert split.update(ENTITES[2:], day, hourly[2:], totals[2:]) == 1
+    _assert_same(split, _columns(whole))
+
+
+def test_replay_of_integrated_day_is_ignored():
+    days = _days()
+    store = BaselineStore()
+    for day, hourly, totals in days:
+        store.update(ENTITES, day, hourly, totals)
+    expected = _columns(store)
+
+    # Rejeu du dernier jour puis d'un jour plus ancien, avec d'autres valeurs
+    for day, _, _ in (days[-1], days[1]):
+        hourly, totals = _day(np.random.default_rng(7))
+        assert store.update(ENTITES, day, hourly, totals) == 0
+    _assert_same(store, expected)
+
+
+def test_out_of_order_days_inside_window_are_integrated():
+    rng = np.random.default_rng(3)
+    days = [((date(2025, 11, 3) + timedelta(days=k)).isoformat(),) + _day(rng) for k in range(10)]
+    ordered, shuffled = BaselineStore(), BaselineStore()
+    for day, hourly, totals in days:
+        ordered.update(ENTITES, day, hourly, totals)
+    for index in (0, 1, 2, 5, 3, 4, 9, 6, 8, 7):
+        day, hourly, totals = days[index]
+        assert shuffled.update(ENTITES, day, hourly, totals) == len(ENTITES)
+
+    # Statistiques de Welford et tampon indépendants de l'ordre d'arrivée
+    for name in ("ids", "nombre", "semaine_jour", "derniere_journee"):
+        np.testing.assert_array_equal(getattr(shuffled, name), getattr(ordered, name), err_msg=name)
+    for name in ("moyenne", "m2", "semaine"):
+        np.testing.assert_allclose(getattr(shuffled, name), getattr(ordered, name), rtol=1e-9, err_msg=name)
+
+    # Journée en retard déjà intégrée, puis journée hors de la fenêtre de 14 jours : ignorées
+    expected = _columns(shuffled)
+    day, hourly, totals = days[3]
+    assert shuffled.update(ENTITES, day, hourly, totals) == 0
+    old_day = (date(2025, 11, 3) - timedelta(days=10)).isoformat()
+    assert shuffled.update(ENTITES, old_day, hourly, totals) == 0
+    _assert_same(shuffled, expected)
+
+
+def test_compare_reads_previous_week_and_zscores():
+    days = _days()
+    store = BaselineStore()
+    for day, hourly, totals in days[:-1]:
+        store.update(ENTITES, day, hourly, totals)
+
+    day, hourly, totals = days[-1]
+    comparison = store.compare(ENTITES, day, hourly, totals)
+    _, previous_hourly, previous_totals = days[-2]
+    expected_previous = np.column_stack([previous_hourly, previous_totals])
+    np.testing.assert_allclose(comparison["semaine_precedente"], expected_previous, rtol=1e-6)
+
+    assert len(days) - 1 >= REFERENCE_OBSERVATIONS_MIN
+    rows = store.lookup_many(ENTITES)
+    lundi = day_slots(day)["type_jour"]
+    std = np.sqrt(store.m2[rows, lundi, CRENEAU_JOUR] / (store.nombre[rows, lundi, CRENEAU_JOUR] - 1))
+    expected_z = (totals - store.moyenne[rows, lundi, CRENEAU_JOUR]) / std
+    np.testing.assert_allclose(comparison["zscore"][:, CRENEAU_JOUR], expected_z)
+
+    # Entité inconnue : aucune référence
+    unknown = store.compare(["arc_z"], day, hourly[:1], totals[:1])
+    assert np.isnan(unknown["zscore"]).all() and not unknown["anomalie"].any()
@@ -0,0 +1,49 @@
+"""
+Tests des états persistants de BikesProcessor : santé des capteurs, registre et
+références intégrés uniquement après une exécution réussie
+"""
+
+from processors.bikes_processor import BikesProcessor
+from processors.utils.baseline_store import get_baseline_store
+from processors.utils.counter_registry import get_counter_registry
+from processors.utils.sensor_health import get_sensor_health
+
+
+def _data(jour="2025-11-10"):
+    """Relevés horaires de deux compteurs (le second toujours à zéro)"""
+    results = []
+    for hour in range(24):
+        for index, valeur in (("c1", 10 + hour), ("c2", 0)):
+            results.append({"id_compteur": index, "nom_compteur": f"Compteur {index}",
+                            "sum_counts": valeur, "date": f"{jour}T{hour:02d}:00:00+00:00",
+                            "coordinates": {"lon": 2.35, "lat": 48.85}})
+    return {"results": results}
+
+
+def _state():
+    processor = BikesProcessor()
+    return (len(get_counter_registry()),
+            get_sensor_health(processor.config.SANTE_CAPTEURS_VELOS_PATH).horloge,
+            len(get_baseline_store(processor.config.REFERENCES_VELOS_PATH).ids))
+
+
+def test_aggregate_daily_leaves_persistent_state_untouched():
+    processor = BikesProcessor()
+    before = _state()
+    rebuilt = processor.rebuild_intermediates(_data())
+    assert set(rebuilt["aggregated_data"]["by_counter"]) == {"c1", "c2"}
+    assert rebuilt["aggregated_data"]["registre"]["nombre_compteurs"] >= 2
+    assert _state() == before
+
+
+def test_process_updates_persistent_state_after_success():
+    processor = BikesProcessor()
+    results = processor.process(_data("2025-11-11"))
+    assert results["success"], results["errors"]
+    registre, horloge, references = _state()
+    assert registre >= 2 and horloge >= 0 and references >= 1
+    assert processor.config.REFERENCES_VELOS_PATH.exists()
+
+    # Rejeu de la même journée : états inchangés
+    assert processor.process(_data("2025-11-11"))["success"]
+    assert _state() == (registre, horloge, references)
@@ -0,0 +1,78 @@
+"""
+Tests de la dimension calendrier (processors.utils.calendar_dimension) : calcul de
+Pâques, fériés sans la bibliothèque holidays, vacances scolaires et recherche vectorisée
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from processors.utils import calendar_dimension
+from processors.utils.calendar_dimension import (
+    TYPE_FERIE, TYPE_WEEKEND, CalendarDimension, _easter, epoch_day, french_holidays
+)
+
+PAQUES = {1818: date(1818, 3, 22), 1943: date(1943, 4, 25), 2000: date(2000, 4, 23),
+          2019: date(2019, 4, 21), 2024: date(2024, 3, 31), 2025: date(2025, 4, 20),
+          2026: date(2026, 4, 5), 2038: date(2038, 4, 25)}
+
+PERIODES = np.array([[epoch_day("2025-10-18"), epoch_day("2025-11-03")],
+                     [epoch_day("2025-12-20"), epoch_day("2026-01-05")]], dtype=np.int64)
+
+
+@pytest.mark.parametrize("year", sorted(PAQUES))
+def test_easter_matches_known_dates(year):
+    assert _easter(year) == PAQUES[year]
+
+
+def test_holidays_fallback_without_library(monkeypatch):
+    monkeypatch.setattr(calendar_dimension, "holidays", None)
+    days, source = french_holidays([2025])
+    assert source == "calcul"
+    assert days == sorted([
+        date(2025, 1, 1), date(2025, 4, 21), date(2025, 5, 1), date(2025, 5, 8), date(2025, 5, 29),
+        date(2025, 6, 9), date(2025, 7, 14), date(2025, 8, 15), date(2025, 11, 1), date(2025, 11, 11),
+        date(2025, 12, 25)
+    ])
+
+
+def test_day_types_and_school_holidays():
+    calendar = CalendarDimension.build(2025, 2026, PERIODES)
+    assert calendar.day_type("2025-11-11") == "Férié"
+    assert calendar.day_type("2025-11-08") == "Weekend"
+    assert calendar.day_type("2025-11-10") == "Lundi"
+    assert not calendar.is_business_day("2025-12-25")
+
+    # Fin de période exclue (reprise des cours), jours couverts hors vacances : False
+    assert calendar.day_info("2025-10-18")["vacances_scolaires"] is True
+    assert calendar.day_info("2025-11-02")["vacances_scolaires"] is True
+    assert calendar.day_info("2025-11-03")["vacances_scolaires"] is False
+    # Hors de la période couverte par le fichier : statut inconnu
+    assert calendar.day_info("2026-10-19")["vacances_scolaires"] is None
+    assert calendar.day_info("2025-09-01")["vacances_scolaires"] is None
+
+
+def test_vectorized_lookup_matches_day_info_and_caches_extension():
+    calendar = CalendarDimension.build(2025, 2025, PERIODES)
+    first = date(2024, 12, 20)
+    days = [epoch_day(first + timedelta(days=k)) for k in range(0, 800, 3)]
+
+    columns = calendar.lookup(days)
+    extended = len(calendar)
+    assert extended > 365
+    for row, day in enumerate(days):
+        info = calendar.day_info(day)
+        assert info["jour_semaine"] == columns["jour_semaine"][row] == (first + timedelta(days=3 * row)).weekday()
+        assert info["type_jour"] == columns["type_jour"][row]
+        assert info["ferie"] == columns["ferie"][row] == (columns["type_jour"][row] == TYPE_FERIE)
+        assert info["semaine"] == columns["semaine"][row] == (first + timedelta(days=3 * row)).isocalendar()[1]
+        expected = bool(columns["vacances"][row]) if columns["vacances_connues"][row] else None
+        assert info["vacances_scolaires"] == expected
+    assert (columns["type_jour"][np.isin(columns["jour_semaine"], [5, 6])] >= TYPE_WEEKEND).all()
+
+    # Années étendues conservées : pas de reconstruction aux recherches suivantes
+    columns_again = calendar.lookup(days)
+    assert len(calendar) == extended
+    for name, values in columns.items():
+        np.testing.assert_array_equal(columns_again[name], values)
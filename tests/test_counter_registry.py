@@ -0,0 +1,84 @@
+"""
+Tests du registre persistant des compteurs vélos (processors.utils.counter_registry)
+"""
+
+import numpy as np
+
+from processors.utils.counter_registry import CounterRegistry
+
+
+class LocateSpy:
+    """Localisation factice : arrondissement d'après la longitude, points localisés comptés"""
+
+    def __init__(self):
+        self.points = 0
+
+    def __call__(self, lons, lats):
+        self.points += len(lons)
+        return [f"7500{int(lon * 10) % 10}" if lon > 0 else None for lon in lons]
+
+
+def _update(registry, rows, date, locate):
+    ids, noms, lons, lats = zip(*rows) if rows else ((), (), (), ())
+    return registry.update(list(ids), list(noms), list(lons), list(lats), date, locate)
+
+
+def test_save_load_round_trip(tmp_path):
+    registry = CounterRegistry()
+    _update(registry, [("b", "Rivoli", 2.35, 48.86), ("a", "Sébastopol", 2.31, 48.87),
+                       ("c", "Hors Paris", -1.0, 47.0)], "2025-11-03", LocateSpy())
+    path = tmp_path / "registre.npz"
+    registry.save(path)
+
+    loaded = CounterRegistry.load(path)
+    assert loaded.to_dict() == registry.to_dict()
+    assert loaded.ids.tolist() == ["a", "b", "c"]
+    assert loaded.entry(2)["arrondissement"] is None
+    assert not list(tmp_path.glob("*.tmp.npz"))
+
+
+def test_load_missing_file_returns_empty_registry(tmp_path):
+    assert len(CounterRegistry.load(tmp_path / "absent.npz")) == 0
+
+
+def test_incremental_micro_batches():
+    registry = CounterRegistry()
+    locate = LocateSpy()
+    stats = _update(registry, [("a", "A", 2.31, 48.8), ("b", "B", 2.32, 48.8)], "2025-11-03", locate)
+    assert stats == {"nouveaux": 2, "deplaces": 0, "renommes": 0, "vus": 2}
+    assert locate.points == 2
+
+    # Lot suivant : b déplacé et renommé, c nouveau, a absent
+    stats = _update(registry, [("b", "B bis", 2.34, 48.8), ("c", "C", 2.33, 48.8)], "2025-11-04", locate)
+    assert stats == {"nouveaux": 1, "deplaces": 1, "renommes": 1, "vus": 2}
+    assert locate.points == 4  # Seuls les compteurs déplacés ou nouveaux sont localisés
+
+    entries = registry.to_dict()
+    assert [entries[k]["code_compteur"] for k in ("a", "b", "c")] == [0, 1, 2]  # Codes stables
+    assert entries["b"]["nom_compteur"] == "B bis"
+    assert entries["b"]["arrondissement"] == "75003"
+    assert (entries["a"]["premiere_date"], entries["a"]["derniere_date"]) == ("2025-11-03", "2025-11-03")
+    assert (entries["b"]["premiere_date"], entries["b"]["derniere_date"]) == ("2025-11-03", "2025-11-04")
+    assert np.all(registry.ids[:-1] < registry.ids[1:])
+
+
+def test_replay_of_integrated_day_is_idempotent(tmp_path):
+    rows = [("a", "A", 2.31, 48.8), ("b", "B", 2.32, 48.8)]
+    registry = CounterRegistry()
+    _update(registry, rows, "2025-11-03", LocateSpy())
+    _update(registry, rows, "2025-11-04", LocateSpy())
+    path = tmp_path / "registre.npz"
+    registry.save(path)
+    before = registry.to_dict()
+
+    # Rejeu du 3 (puis d'un jour antérieur) : aucune localisation, dates étendues seulement
+    replayed = CounterRegistry.load(path)
+    locate = LocateSpy()
+    stats = _update(replayed, rows, "2025-11-03", locate)
+    assert stats == {"nouveaux": 0, "deplaces": 0, "renommes": 0, "vus": 2}
+    assert locate.points == 0
+    assert replayed.to_dict() == before
+
+    _update(replayed, rows, "2025-11-01", locate)
+    assert replayed.to_dict()["a"]["premiere_date"] == "2025-11-01"
+    assert replayed.to_dict()["a"]["derniere_date"] == "2025-11-04"
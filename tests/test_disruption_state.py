@@ -0,0 +1,183 @@
+"""
+Tests de l'état persistant des perturbations RATP (processors.utils.disruption_state)
+et de son rejeu par jour de référence dans TrafficProcessor
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from config import settings
+from processors.traffic_processor import TrafficProcessor
+from processors.utils.disruption_state import (
+    DisruptionState, day_state_path, epoch_minute, load_day_state, save_day_state
+)
+
+JOUR = datetime(2025, 11, 4)
+
+
+def _raw(index, version, day=JOUR):
+    """Perturbation brute déterministe (contenu fonction de la version)"""
+    rng = random.Random(index * 100 + version)
+    periods = []
+    for _ in range(rng.randint(0, 3)):
+        begin = day + timedelta(minutes=rng.randint(-600, 1400))
+        end = begin + timedelta(minutes=rng.randint(1, 500))
+        periods.append({"begin": begin.strftime("%Y%m%dT%H%M%S"), "end": end.strftime("%Y%m%dT%H%M%S")})
+    return {"id": f"i{index}", "disruption_id": f"d{index % 7}", "status": "active",
+            "severity": {"priority": rng.choice([10, 30, 50])},
+            "messages": [{"text": f"Ligne {rng.randint(1, 14)} : v{version}"}], "application_periods": periods}
+
+
+class ParseSpy:
+    """Analyse minimale d'une perturbation brute, appels comptés"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, disruption):
+        self.calls += 1
+        periods = [{"begin": datetime.strptime(p["begin"], "%Y%m%dT%H%M%S"),
+                    "end": datetime.strptime(p["end"], "%Y%m%dT%H%M%S")}
+                   for p in disruption["application_periods"]]
+        if not periods:
+            return None
+        return {"application_periods": periods, "priority": disruption["severity"]["priority"],
+                "status": disruption["status"], "lignes_impactees": [disruption["messages"][0]["text"].split()[1]]}
+
+
+def _view(state):
+    return {d["id"]: d for d in state.disruptions_for_day(JOUR)}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_snapshots_parse_only_changes_and_survive_reloads(seed, tmp_path):
+    rng = random.Random(seed)
+    state = DisruptionState()
+    versions, seen, closed = {}, {}, set()
+    start = epoch_minute(JOUR)
+    path = tmp_path / "etat.npz"
+
+    for step in range(24):
+        present = rng.sample(range(30), rng.randint(0, 15))
+        for index in present:
+            if index not in versions or rng.random() < 0.2:
+                versions[index] = versions.get(index, -1) + 1
+        snapshot = [_raw(index, versions[index]) for index in present]
+        if snapshot and rng.random() < 0.3:
+            snapshot.append(dict(snapshot[0]))  # Doublon (fichiers combinés)
+
+        parse = ParseSpy()
+        stats = state.apply_snapshot(snapshot, start + step * 60, parse)
+        changed = [index for index in present if seen.get(index) != versions[index]]
+        assert parse.calls == stats["analysees"] == len(changed)
+        seen.update({index: versions[index] for index in present})
+        closed = (closed | set(seen)) - set(present)
+
+        if step % 5 == 0:
+            state.save(path)
+            state = DisruptionState.load(path)
+
+    view = _view(state)
+    expected = {f"i{index}": ParseSpy()(_raw(index, version)) for index, version in seen.items()}
+    assert set(view) == {key for key, parsed in expected.items() if parsed}
+    for key, disruption in view.items():
+        parsed = expected[key]
+        assert disruption["priority"] == parsed["priority"]
+        assert disruption["lignes_impactees"] == parsed["lignes_impactees"]
+        assert disruption["application_periods"] == parsed["application_periods"]
+        assert disruption["ouverte"] == (int(key[1:]) not in closed)
+
+
+def test_save_load_round_trip(tmp_path):
+    state = DisruptionState()
+    state.apply_snapshot([_raw(1, 0), _raw(2, 0), _raw(3, 0)], epoch_minute(JOUR), ParseSpy())
+    state.apply_snapshot([_raw(1, 1), _raw(3, 0)], epoch_minute(JOUR) + 60, ParseSpy())
+    path = tmp_path / "etat.npz"
+    state.save(path)
+
+    loaded = DisruptionState.load(path)
+    assert loaded.summary(JOUR) == state.summary(JOUR)
+    assert loaded.disruptions_for_day(JOUR) == state.disruptions_for_day(JOUR)
+
+
+def test_applied_or_older_snapshot_is_ignored():
+    state = DisruptionState()
+    instant = epoch_minute(JOUR) + 120
+    state.apply_snapshot([_raw(1, 0)], instant, ParseSpy())
+    before = state.summary(JOUR)
+    parse = ParseSpy()
+
+    assert state.apply_snapshot([_raw(2, 0)], instant, parse) == {"ignore": True}
+    assert state.apply_snapshot([_raw(2, 0)], instant - 60, parse) == {"ignore": True}
+    assert parse.calls == 0
+    assert state.summary(JOUR) == before
+
+
+def test_day_states_start_from_latest_previous_day(tmp_path):
+    state = DisruptionState()
+    state.apply_snapshot([_raw(1, 0)], epoch_minute(JOUR), ParseSpy())
+    save_day_state(state, JOUR, tmp_path)
+
+    # Jour sans état : état final du dernier jour antérieur (trou d'un jour compris)
+    later = load_day_state(JOUR + timedelta(days=2), tmp_path)
+    assert len(later) == 1 and later.horloge == state.horloge and later.dernier_instantane == {}
+    # Jour antérieur : aucun état à reprendre
+    assert len(load_day_state(JOUR - timedelta(days=1), tmp_path)) == 0
+
+    # Purge des états trop anciens
+    save_day_state(state, JOUR + timedelta(days=40), tmp_path, keep_days=31)
+    assert not day_state_path(JOUR, tmp_path).exists()
+
+
+def _config(directory, day, rebuild=False):
+    values = {name: getattr(settings, name) for name in dir(settings) if name.isupper()}
+    values.update(API_DATE=day.strftime("%Y-%m-%d"), PERTURBATIONS_RATP_DIR=directory,
+                  PERTURBATIONS_RECONSTRUCTION=rebuild)
+    return SimpleNamespace(**values)
+
+
+def _snapshots(day, hours, indexes_by_hour):
+    return [{"context": {"current_datetime": (day + timedelta(hours=hour)).strftime("%Y%m%dT%H%M%S")},
+             "disruptions": [_raw(index, 0, day) for index in indexes]}
+            for hour, indexes in zip(hours, indexes_by_hour)]
+
+
+def _run(directory, day, snapshots, rebuild=False):
+    results = TrafficProcessor(_config(directory, day, rebuild)).process(snapshots)
+    assert results["success"], results["errors"]
+    return json.dumps(results["indicators"], sort_keys=True, default=str)
+
+
+def test_processor_replay_is_idempotent_and_keyed_by_day(tmp_path):
+    next_day = JOUR + timedelta(days=1)
+    day_snapshots = _snapshots(JOUR, [8, 9], [[1, 2, 3], [1, 3, 4]])
+    next_snapshots = _snapshots(next_day, [8], [[1, 5]])
+
+    first = _run(tmp_path, JOUR, day_snapshots)
+    assert _run(tmp_path, JOUR, day_snapshots) == first  # Même entrée, même résultat
+    assert day_state_path(JOUR, tmp_path).exists()
+
+    following = _run(tmp_path, next_day, next_snapshots)
+    # Rejeu du jour précédent après un jour plus récent : son propre état
+    assert _run(tmp_path, JOUR, day_snapshots) == first
+    # Reconstruction explicite d'une plage de dates, dans l'ordre chronologique
+    assert _run(tmp_path, JOUR, day_snapshots, rebuild=True) == first
+    assert _run(tmp_path, next_day, next_snapshots, rebuild=True) == following
+
+
+def test_processor_hourly_runs_match_full_day(tmp_path):
+    snapshots = _snapshots(JOUR, [6, 7, 8], [[1, 2], [2, 3], [3]])
+    full = _run(tmp_path / "jour", JOUR, snapshots)
+    for snapshot in snapshots:
+        hourly = _run(tmp_path / "horaire", JOUR, [snapshot])
+    assert hourly == full
+
+
+def test_validate_and_clean_does_not_write_state(tmp_path):
+    processor = TrafficProcessor(_config(tmp_path, JOUR))
+    processor.validate_and_clean(_snapshots(JOUR, [8], [[1, 2]]))
+    assert not list(tmp_path.glob("*.npz"))
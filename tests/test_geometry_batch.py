@@ -0,0 +1,29 @@
+"""
+Tests du cache des métriques géométriques (processors.utils.geometry_batch) : entrées
+calculées une fois, fichier écrit une seule fois en fin d'exécution
+"""
+
+from processors.utils import geometry_batch
+from processors.utils.geometry_batch import GeometryCache, compute_geometry_metrics, save_geometry_cache
+
+LIGNE = {"type": "LineString", "coordinates": [[2.35, 48.85], [2.36, 48.85]]}
+CARRE = {"type": "Polygon", "coordinates": [[[2.35, 48.85], [2.351, 48.85], [2.351, 48.851], [2.35, 48.851]]]}
+
+
+def test_cache_marked_dirty_and_written_once_per_run(tmp_path, monkeypatch):
+    path = tmp_path / "geometries.npz"
+    cache = GeometryCache(path)
+    monkeypatch.setattr(geometry_batch, "_default_cache", cache)
+
+    first = compute_geometry_metrics([LIGNE, None, LIGNE])
+    compute_geometry_metrics([CARRE])
+    assert cache.dirty and not path.exists()  # Aucune écriture par appel
+    assert first["longueur_metres"][0] == first["longueur_metres"][2] > 700
+
+    save_geometry_cache()
+    assert path.exists() and not cache.dirty
+    reloaded = GeometryCache(path)
+    again = compute_geometry_metrics([CARRE, LIGNE], cache=reloaded)
+    assert not reloaded.dirty  # Tout venait du cache
+    assert again["longueur_metres"][1] == first["longueur_metres"][0]
+    assert again["surface_m2"][0] > 0
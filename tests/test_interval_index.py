@@ -0,0 +1,102 @@
+"""
+Tests de l'index d'intervalles de dates (processors.utils.interval_index), comparé à
+un parcours exhaustif des intervalles
+"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from processors.utils.calendar_dimension import epoch_day
+from processors.utils.interval_index import DailyActivityMatrix, IntervalIndex
+
+GROUPES = "abc"
+
+
+def _intervals(rng):
+    """Intervalles aléatoires (doublons, intervalles d'un jour et inversés compris)"""
+    n = rng.randint(0, 150)
+    starts = [rng.randint(0, 1000) for _ in range(n)]
+    ends = [start + rng.randint(-5, 300) for start in starts]
+    if n:
+        starts.append(starts[0])
+        ends.append(ends[0])
+    return starts, ends
+
+
+def _brute_active_on(starts, ends, day):
+    return [i for i, (start, end) in enumerate(zip(starts, ends)) if start <= day <= end]
+
+
+def _brute_active_between(starts, ends, first, last):
+    if last < first:
+        return []
+    return [i for i, (start, end) in enumerate(zip(starts, ends))
+            if start <= end and start <= last and end >= first]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_active_on_matches_brute_force(seed):
+    rng = random.Random(seed)
+    starts, ends = _intervals(rng)
+    index = IntervalIndex(starts, ends)
+    days = [rng.randint(-20, 1400) for _ in range(30)] + starts[:5] + ends[:5]
+    for day in days:
+        assert index.active_on(day).tolist() == _brute_active_on(starts, ends, day)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_active_between_matches_brute_force(seed):
+    rng = random.Random(seed)
+    starts, ends = _intervals(rng)
+    index = IntervalIndex(starts, ends)
+    for _ in range(30):
+        first = rng.randint(-20, 1400)
+        last = first + rng.randint(-3, 60)
+        assert index.active_between(first, last).tolist() == _brute_active_between(starts, ends, first, last)
+
+
+def test_queries_accept_dates_for_any_processing_day():
+    debut = date(2025, 11, 1)
+    starts = [epoch_day(debut), epoch_day(debut + timedelta(days=10))]
+    ends = [epoch_day(debut + timedelta(days=5)), epoch_day(debut + timedelta(days=20))]
+    index = IntervalIndex(starts, ends)
+
+    # Rejeu d'historique : résultat identique quel que soit l'ordre des requêtes
+    assert index.active_on("2025-11-12").tolist() == [1]
+    assert index.active_on(date(2025, 11, 3)).tolist() == [0]
+    assert index.active_on("2025-11-08").tolist() == []
+    assert index.active_between("2025-11-04", "2025-11-11").tolist() == [0, 1]
+    assert index.active_on("2025-11-12").tolist() == [1]
+
+
+def test_empty_index():
+    index = IntervalIndex([], [])
+    assert index.active_on(10).tolist() == []
+    assert index.active_between(0, 100).tolist() == []
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_daily_activity_matrix_matches_brute_force(seed):
+    rng = random.Random(seed)
+    starts, ends = _intervals(rng)
+    groups = [rng.choice(GROUPES) for _ in starts]
+    weights = [rng.random() for _ in starts]
+    matrix = DailyActivityMatrix.from_intervals(starts, ends, groups, weights)
+
+    for _ in range(10):
+        day = rng.randint(-20, 1400)
+        by_group = matrix.day(day)
+        for groupe in GROUPES:
+            active = [i for i in _brute_active_on(starts, ends, day) if groups[i] == groupe]
+            got = by_group.get(groupe, {"actifs": 0, "poids": 0.0})
+            assert got["actifs"] == len(active)
+            assert got["poids"] == pytest.approx(sum(weights[i] for i in active), abs=0.011)
+
+        last = day + rng.randint(0, 40)
+        period = matrix.period(day, last)
+        for groupe in GROUPES:
+            expected = sum(1 for d in range(day, last + 1) for i in _brute_active_on(starts, ends, d)
+                           if groups[i] == groupe)
+            assert period.get(groupe, {"jours_actifs": 0})["jours_actifs"] == expected
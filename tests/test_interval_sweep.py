@@ -0,0 +1,111 @@
+"""
+Tests du balayage d'intervalles (processors.utils.interval_sweep), comparé à des
+ensembles de minutes construits un par un
+"""
+
+import random
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from processors.utils.interval_sweep import (
+    MINUTES_PER_DAY, DayIntervalBitmaps, covered_length, merge_intervals, minutes_in_day
+)
+
+CLES = ["1", "4", "14"]
+
+
+def _periods(rng):
+    """Périodes aléatoires : chevauchements, bornes jointives, doublons, veille / lendemain"""
+    starts, ends, keys = [], [], []
+    for _ in range(rng.randint(0, 25)):
+        start = rng.randint(-400, MINUTES_PER_DAY + 100) + rng.choice([0, 0, 0.5])
+        end = start + rng.randint(-30, 500)
+        starts.append(start)
+        ends.append(end)
+        keys.append(rng.choice(CLES + ["inconnue"]))
+    for _ in range(rng.randint(0, 3)):
+        if starts:
+            i = rng.randrange(len(starts))
+            starts.append(ends[i])  # Période jointive
+            ends.append(ends[i] + rng.randint(1, 120))
+            keys.append(keys[i])
+            starts.append(starts[i])  # Doublon
+            ends.append(ends[i])
+            keys.append(keys[i])
+    return keys, starts, ends
+
+
+def _minutes(keys, starts, ends, key):
+    """Minutes [m, m+1) du jour entamées par les périodes d'une clé"""
+    minutes = set()
+    for period_key, start, end in zip(keys, starts, ends):
+        if period_key != key or end <= start:
+            continue
+        first = int(np.floor(min(max(start, 0), MINUTES_PER_DAY)))
+        last = int(np.ceil(min(max(end, 0), MINUTES_PER_DAY)))
+        minutes.update(range(first, last))
+    return minutes
+
+
+def _bitmap_minutes(bitmaps, key):
+    return set(np.flatnonzero(np.unpackbits(bitmaps.bits[bitmaps.index[key]])).tolist())
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_bitmaps_match_minute_sets(seed):
+    rng = random.Random(seed)
+    keys, starts, ends = _periods(rng)
+    bitmaps = DayIntervalBitmaps.from_periods(CLES, keys, starts, ends)
+    for row, key in enumerate(CLES):
+        expected = _minutes(keys, starts, ends, key)
+        assert _bitmap_minutes(bitmaps, key) == expected
+        assert bitmaps.covered_minutes()[row] == len(expected)
+        assert bitmaps.availability()[row] == pytest.approx(100.0 * (1 - len(expected) / MINUTES_PER_DAY))
+
+    other_keys, other_starts, other_ends = _periods(rng)
+    other = DayIntervalBitmaps.from_periods(CLES[::-1], other_keys, other_starts, other_ends)
+    for key in CLES:
+        first = _minutes(keys, starts, ends, key)
+        second = _minutes(other_keys, other_starts, other_ends, key)
+        assert _bitmap_minutes(bitmaps.union(other), key) == first | second
+        assert _bitmap_minutes(bitmaps.intersection(other), key) == first & second
+
+    decoded = DayIntervalBitmaps.decode(CLES, bitmaps.encode())
+    np.testing.assert_array_equal(decoded.bits, bitmaps.bits)
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_merge_and_covered_length_match_brute_force(seed):
+    rng = random.Random(seed)
+    _, starts, ends = _periods(rng)
+    merged_starts, merged_ends = merge_intervals(starts, ends)
+
+    # Intervalles disjoints et non jointifs, union identique minute par minute (bornes entières)
+    assert np.all(merged_starts[1:] > merged_ends[:-1])
+    integer = [(int(s), int(e)) for s, e in zip(starts, ends) if s == int(s)]
+    expected = set()
+    for start, end in integer:
+        expected.update(range(start, end))
+    int_starts, int_ends = merge_intervals([s for s, _ in integer], [e for _, e in integer])
+    assert {m for s, e in zip(int_starts, int_ends) for m in range(int(s), int(e))} == expected
+    assert covered_length([s for s, _ in integer], [e for _, e in integer]) == len(expected)
+
+
+def test_touching_and_cross_midnight_periods():
+    day = datetime(2025, 11, 4)
+    # Veille 22:00 → 01:30, puis 01:30 → 02:00 (jointive), et 23:30 → lendemain 00:45
+    starts = minutes_in_day([datetime(2025, 11, 3, 22), datetime(2025, 11, 4, 1, 30),
+                             datetime(2025, 11, 4, 23, 30), None], day)
+    ends = minutes_in_day([datetime(2025, 11, 4, 1, 30), datetime(2025, 11, 4, 2),
+                           datetime(2025, 11, 5, 0, 45), datetime(2025, 11, 4, 5)], day)
+    assert starts[0] == -120 and np.isnan(starts[3])
+
+    merged_starts, merged_ends = merge_intervals(starts[:3], ends[:3])
+    assert merged_starts.tolist() == [-120, 1410] and merged_ends.tolist() == [120, 1485]
+    assert covered_length(starts[:3], ends[:3]) == 240 + 75
+
+    bitmaps = DayIntervalBitmaps.from_periods(["4"], ["4"] * 4, starts, ends)
+    assert _bitmap_minutes(bitmaps, "4") == set(range(0, 120)) | set(range(1410, MINUTES_PER_DAY))
+    assert bitmaps.to_dict()["4"]["minutes_perturbees"] == 150
@@ -0,0 +1,76 @@
+"""
+Tests de l'arbre k-d (processors.utils.kdtree) et du plus proche tronçon
+(processors.utils.counter_matching.ArcNearestIndex), comparés à un parcours exhaustif
+"""
+
+import numpy as np
+import pytest
+
+from processors.utils.counter_matching import ArcNearestIndex
+from processors.utils.kdtree import KDTree
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_kdtree_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    points = rng.uniform(0, 1000, size=(int(rng.integers(0, 400)), 2))
+    if len(points) > 10:
+        points[5:10] = points[0]  # Doublons
+    tree = KDTree(points, leaf_size=int(rng.integers(1, 20)))
+
+    for x, y in rng.uniform(-100, 1100, size=(25, 2)):
+        d = np.hypot(points[:, 0] - x, points[:, 1] - y)
+        radius = float(rng.uniform(0, 200))
+        assert sorted(tree.query_radius(x, y, radius).tolist()) == np.nonzero(d <= radius)[0].tolist()
+
+        index, distance = tree.nearest(x, y)
+        if len(points):
+            assert distance == pytest.approx(d.min()) and d[index] == pytest.approx(d.min())
+        else:
+            assert (index, distance) == (-1, np.inf)
+        index, distance = tree.nearest(x, y, max_distance=radius)
+        if len(points) and d.min() <= radius:
+            assert distance == pytest.approx(d.min())
+        else:
+            assert (index, distance) == (-1, np.inf)
+
+
+def _random_arcs(rng, n):
+    """Tronçons LineString aléatoires autour de Paris (segments de 5 à 400 m)"""
+    arcs = []
+    for _ in range(n):
+        start = np.array([2.35, 48.85]) + rng.uniform(-0.02, 0.02, size=2)
+        steps = rng.uniform(-0.004, 0.004, size=(int(rng.integers(1, 5)), 2))
+        arcs.append({"type": "LineString", "coordinates": np.vstack([start, start + np.cumsum(steps, axis=0)]).tolist()})
+    return arcs
+
+
+def _brute_distances(index, arcs, lon, lat):
+    """Distance point-segment minimale de chaque tronçon (tous les segments)"""
+    x, y = index._project([lon, lat])[0]
+    distances = []
+    for arc in arcs:
+        points = index._project(arc["coordinates"])
+        a, b = points[:-1], points[1:]
+        direction = b - a
+        norm = np.maximum((direction ** 2).sum(axis=1), 1e-12)
+        t = np.clip(((x - a[:, 0]) * direction[:, 0] + (y - a[:, 1]) * direction[:, 1]) / norm, 0.0, 1.0)
+        distances.append(np.hypot(a[:, 0] + t * direction[:, 0] - x, a[:, 1] + t * direction[:, 1] - y).min())
+    return np.asarray(distances)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_nearest_arc_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    arcs = _random_arcs(rng, int(rng.integers(1, 80)))
+    index = ArcNearestIndex([f"arc{i}" for i in range(len(arcs))], arcs)
+
+    for lon, lat in np.array([2.35, 48.85]) + rng.uniform(-0.025, 0.025, size=(40, 2)):
+        distances = _brute_distances(index, arcs, lon, lat)
+        max_distance = float(rng.choice([30.0, 100.0, 500.0]))
+        arc_index, distance = index.nearest(lon, lat, max_distance)
+        if distances.min() <= max_distance:
+            assert distance == pytest.approx(distances.min(), abs=1e-6)
+            assert distances[arc_index] == pytest.approx(distances.min(), abs=1e-6)
+        else:
+            assert (arc_index, distance) == (-1, np.inf)
@@ -0,0 +1,54 @@
+"""
+Tests de l'extraction des lignes citées dans les messages de perturbation
+(processors.utils.line_extractor)
+"""
+
+import pytest
+
+from processors.utils.line_extractor import LIGNES_METRO, LineExtractor
+
+
+def _labels(extractor, text):
+    return [extractor.labels[code] for code in extractor.extract(text)]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Ligne 4", ["4"]),
+    ("Métro 13 et RER B, bus 72, T3a", ["13", "RER B", "Bus 72", "T3a"]),
+    ("Bus N01 : trafic perturbé", ["Bus N01"]),
+    ("Noctilien N01 dévié", ["Bus N01"]),
+    ("Ligne N01 : arrêt non desservi", ["Bus N01"]),
+    ("Trafic perturbé sur l'ensemble du réseau", []),
+    ("", []),
+    (None, []),
+])
+def test_extracted_lines(text, expected):
+    assert sorted(_labels(LineExtractor(), text)) == sorted(expected)
+
+
+def test_codes_modes_and_counts():
+    extractor = LineExtractor()
+    assert extractor.extract("Ligne 4") == (LIGNES_METRO.index("4"),)
+    codes = extractor.extract("Métro 13 et RER B, bus 72, T3a")
+    assert all(code < len(extractor) for code in codes)
+    night = extractor.extract("Noctilien N01")
+    # Une même ligne, quelle que soit sa formulation, garde son code
+    assert extractor.extract("Bus N01") == extractor.extract("Ligne N01") == night
+
+    counts = extractor.count(list(codes) + list(night) * 2)
+    assert extractor.counts_by_mode(counts) == {"metro": 1, "rer": 1, "tram": 1, "bus": 3}
+    assert extractor.extract_category("METRO 4 et 13") == (3, 12)
+    assert extractor.extract_category("BUS 72") == ()
+
+
+def test_results_are_memoized(monkeypatch):
+    extractor = LineExtractor()
+    scans = []
+    scan = extractor._scan
+    monkeypatch.setattr(extractor, "_scan", lambda text: scans.append(text) or scan(text))
+
+    first = extractor.extract("Ligne 4 et Ligne 8 : trafic interrompu")
+    for _ in range(3):
+        assert extractor.extract("Ligne 4 et Ligne 8 : trafic interrompu") is first
+    extractor.extract("Ligne 1")
+    assert scans == ["Ligne 4 et Ligne 8 : trafic interrompu", "Ligne 1"]
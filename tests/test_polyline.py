@@ -0,0 +1,65 @@
+"""
+Tests de l'encodage polyline et de la simplification (processors.utils.polyline)
+"""
+
+import numpy as np
+import pytest
+
+from processors.utils.polyline import decode_polyline, encode_levels, encode_lines, simplify_lines
+
+# Exemple de référence du format "encoded polyline" (points lat, lon ; précision 5)
+EXEMPLE_POINTS_LAT_LON = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+EXEMPLE_ENCODE = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+
+def _lines(rng, n):
+    """Lot de lignes lon/lat aléatoires (lignes vides et d'un point comprises)"""
+    lengths = rng.integers(0, 30, size=n)
+    steps = rng.normal(0, 0.001, size=(int(lengths.sum()), 2))
+    coords = np.array([2.35, 48.85]) + np.cumsum(steps, axis=0)
+    return coords, np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+
+
+def test_reference_example():
+    coords = np.array([(lon, lat) for lat, lon in EXEMPLE_POINTS_LAT_LON])
+    assert encode_lines(coords, [0, len(coords)]) == [EXEMPLE_ENCODE]
+    decoded = decode_polyline(EXEMPLE_ENCODE)
+    np.testing.assert_allclose(decoded, coords)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_encode_decode_round_trip(seed):
+    rng = np.random.default_rng(seed)
+    coords, offsets = _lines(rng, int(rng.integers(1, 20)))
+    precision = int(rng.choice([5, 6]))
+    encoded = encode_lines(coords, offsets, precision)
+    assert len(encoded) == len(offsets) - 1
+
+    for text, start, end in zip(encoded, offsets[:-1], offsets[1:]):
+        expected = np.round(coords[start:end] * 10 ** precision) / 10 ** precision
+        decoded = np.asarray(decode_polyline(text, precision)).reshape(-1, 2)
+        np.testing.assert_allclose(decoded, expected, atol=10 ** -(precision + 3))
+
+
+def test_negative_and_zero_deltas():
+    coords = np.array([[0.0, 0.0], [-0.00001, 0.0], [-0.00001, 0.00001], [179.99999, -89.99999]])
+    decoded = decode_polyline(encode_lines(coords, [0, 4])[0])
+    np.testing.assert_allclose(decoded, coords, atol=1e-9)
+
+
+def test_simplification_keeps_endpoints_and_levels_are_deduplicated():
+    rng = np.random.default_rng(0)
+    coords, offsets = _lines(rng, 5)
+    simplified, simplified_offsets = simplify_lines(coords, offsets, 50.0)
+    assert len(simplified) <= len(coords)
+    for start, end, new_start, new_end in zip(offsets[:-1], offsets[1:],
+                                              simplified_offsets[:-1], simplified_offsets[1:]):
+        if end > start:
+            np.testing.assert_array_equal(simplified[new_start], coords[start])
+            np.testing.assert_array_equal(simplified[new_end - 1], coords[end - 1])
+
+    # Ligne droite : identique à tous les niveaux, niveau le plus fin seul conservé
+    straight = np.column_stack([np.linspace(2.3, 2.31, 10), np.full(10, 48.85)])
+    levels = encode_levels(straight, [0, 10], {"14": 5.0, "16": 1.0, "12": 20.0})
+    assert list(levels[0]) == ["16"]
+    np.testing.assert_allclose(decode_polyline(levels[0]["16"]), [[2.3, 48.85], [2.31, 48.85]])
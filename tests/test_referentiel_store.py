@@ -0,0 +1,91 @@
+"""
+Tests du référentiel compilé (processors.utils.referentiel_store) : aller-retour
+disque en mmap et recompilation par ReferentielProcessor selon l'empreinte de la source
+"""
+
+import numpy as np
+import pytest
+
+from processors.referentiel_processor import ReferentielProcessor
+from processors.utils import referentiel_store
+from processors.utils.referentiel_store import CompiledReferentiel, source_fingerprint
+
+
+def _records(libelle_suffix=""):
+    """Référentiel brut : deux tronçons avec géométrie, un sans"""
+    return [
+        {"Identifiant arc": "102", "Libelle": f"Rue de Rivoli{libelle_suffix}",
+         "Identifiant noeud amont": "n1", "Identifiant noeud aval": "n2",
+         "geo_shape": {"type": "LineString", "coordinates": [[2.35, 48.856], [2.352, 48.857], [2.354, 48.857]]},
+         "geo_point_2d": "48.8565, 2.352"},
+        {"Identifiant arc": "7", "Libelle": "Boulevard Saint-Michel",
+         "Identifiant noeud amont": "n3", "Identifiant noeud aval": "n4",
+         "geo_shape": {"type": "LineString", "coordinates": [[2.343, 48.85], [2.341, 48.846]]},
+         "geo_point_2d": "48.848, 2.342"},
+        {"Identifiant arc": "55", "Libelle": "Quai d'Orsay é",
+         "Identifiant noeud amont": "n5", "Identifiant noeud aval": "",
+         "geo_shape": "", "geo_point_2d": ""},
+    ]
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    """Répertoire du référentiel compilé isolé, cache de processus réinitialisé"""
+    monkeypatch.setattr(referentiel_store, "REFERENTIEL_STORE_DIR", tmp_path / "referentiel")
+    monkeypatch.setattr(referentiel_store, "_loaded", {})
+    return tmp_path / "referentiel"
+
+
+def _compiled(records):
+    processor = ReferentielProcessor()
+    cleaned = processor.validate_and_clean(records)
+    mapping = processor.aggregate_daily(cleaned)["mapping"]
+    geo_shapes = {r["Identifiant arc"]: r["geo_shape"] for r in cleaned if r.get("geo_shape")}
+    return mapping, CompiledReferentiel.from_mapping(mapping, geo_shapes, source_fingerprint(records))
+
+
+def test_save_load_round_trip(store_dir):
+    mapping, store = _compiled(_records())
+    directory = store.save()
+    assert directory.parent == store_dir
+
+    loaded = CompiledReferentiel.load()
+    assert loaded is not None and loaded.fingerprint == store.fingerprint
+    assert isinstance(loaded.longueur_metres, np.memmap)
+    assert loaded.to_mapping() == store.to_mapping()
+    for arc_id, entry in mapping.items():
+        got = loaded.get(arc_id)
+        assert got["libelle"] == entry["libelle"]
+        assert got["longueur_metres"] == pytest.approx(entry["longueur_metres"])
+        assert (got["center"] is None) == (entry["center"] is None)
+
+    assert loaded.lookup_many(["7", "inconnu", "102"]).tolist() == [loaded.lookup("7"), -1, loaded.lookup("102")]
+    lengths = loaded.lengths(["102", "55", "inconnu"])
+    assert lengths[0] == pytest.approx(mapping["102"]["longueur_metres"])
+    assert np.isnan(lengths[1:]).all()
+    assert [arc_id for arc_id, _ in loaded.arc_geometries()] == ["102", "7"]
+
+
+def test_new_version_replaces_previous(store_dir):
+    _, first = _compiled(_records())
+    first.save()
+    _, second = _compiled(_records(" (modifié)"))
+    second.save()
+
+    assert [p.name for p in store_dir.glob("v*-*")] == [second.directory.name]
+    loaded = CompiledReferentiel.load()
+    assert loaded.fingerprint == second.fingerprint
+    assert loaded.get("102")["libelle"] == "Rue de Rivoli (modifié)"
+
+
+def test_processor_recompiles_only_when_fingerprint_changes(store_dir):
+    processor = ReferentielProcessor()
+    store, recompiled = processor.compile(_records())
+    assert recompiled and store.directory is not None
+
+    same, recompiled = processor.compile(_records())
+    assert not recompiled and same.fingerprint == store.fingerprint
+
+    changed, recompiled = processor.compile(_records(" (modifié)"))
+    assert recompiled and changed.fingerprint != store.fingerprint
+    assert changed.get("102")["libelle"] == "Rue de Rivoli (modifié)"
@@ -0,0 +1,120 @@
+"""
+Tests du graphe routier CSR (processors.utils.road_graph) : adjacence, voisinages à
+k sauts et corridors (union-find), comparés à un parcours naïf des tronçons
+"""
+
+import random
+
+import pytest
+
+from processors.utils.road_graph import DIRECTION_AMONT, DIRECTION_AVAL, DIRECTION_TOUS, RoadGraph
+
+# Petit réseau : chaîne a → b → c → d, bretelle c → e, sens inverse d → c, tronçon isolé x → y
+TRONCONS = {
+    "t1": ("a", "b"), "t2": ("b", "c"), "t3": ("c", "d"), "t4": ("c", "e"),
+    "t5": ("d", "c"), "t6": ("x", "y"), "t7": ("", "a"),
+}
+
+
+def _graph(troncons):
+    arc_ids = list(troncons)
+    return RoadGraph.from_arcs(arc_ids, [troncons[a][0] for a in arc_ids], [troncons[a][1] for a in arc_ids])
+
+
+def _neighbours(troncons, arc_id, direction):
+    """Tronçons adjacents (parcours naïf de tous les tronçons)"""
+    amont, aval = troncons[arc_id]
+    result = set()
+    for other, (other_amont, other_aval) in troncons.items():
+        if direction in (DIRECTION_AVAL, DIRECTION_TOUS) and aval and other_amont == aval:
+            result.add(other)
+        if direction in (DIRECTION_AMONT, DIRECTION_TOUS) and amont and other_aval == amont:
+            result.add(other)
+        if direction == DIRECTION_TOUS and ((amont and other_amont == amont) or (aval and other_aval == aval)):
+            result.add(other)
+    return result
+
+
+def _brute_k_hop(troncons, starts, k, direction):
+    distances = {arc_id: 0 for arc_id in starts if arc_id in troncons}
+    frontier = set(distances)
+    for hop in range(1, k + 1):
+        frontier = {n for arc_id in frontier for n in _neighbours(troncons, arc_id, direction)} - set(distances)
+        distances.update({arc_id: hop for arc_id in frontier})
+    return distances
+
+
+def _brute_groups(troncons, subset):
+    """Composantes connexes par parcours en profondeur (tronçons partageant un nœud)"""
+    subset = list(dict.fromkeys(subset))
+    seen, groups = set(), []
+    for arc_id in subset:
+        if arc_id in seen:
+            continue
+        group, stack = [], [arc_id]
+        seen.add(arc_id)
+        while stack:
+            current = stack.pop()
+            group.append(current)
+            nodes = {n for n in troncons.get(current, ()) if n}
+            for other in subset:
+                if other not in seen and nodes & {n for n in troncons.get(other, ()) if n}:
+                    seen.add(other)
+                    stack.append(other)
+        groups.append(group)
+    return groups
+
+
+def _normalise(groups):
+    return sorted(sorted(group) for group in groups)
+
+
+def test_csr_adjacency():
+    graph = _graph(TRONCONS)
+    assert graph.arc_ids.tolist() == sorted(TRONCONS)
+    assert graph.nodes.tolist() == ["a", "b", "c", "d", "e", "x", "y"]
+    assert graph.arc_amont[graph.positions(["t7"])[0]] == -1
+
+    for index, node in enumerate(graph.nodes.tolist()):
+        sortants = graph.arc_ids[graph.out_arcs[graph.out_offsets[index]:graph.out_offsets[index + 1]]]
+        entrants = graph.arc_ids[graph.in_arcs[graph.in_offsets[index]:graph.in_offsets[index + 1]]]
+        assert sorted(sortants.tolist()) == sorted(a for a, (amont, _) in TRONCONS.items() if amont == node)
+        assert sorted(entrants.tolist()) == sorted(a for a, (_, aval) in TRONCONS.items() if aval == node)
+
+
+def test_k_hop_directions():
+    graph = _graph(TRONCONS)
+    assert graph.k_hop(["t1"], 2, DIRECTION_AVAL) == {"t1": 0, "t2": 1, "t3": 2, "t4": 2}
+    assert graph.k_hop(["t3"], 2, DIRECTION_AMONT) == {"t3": 0, "t2": 1, "t5": 1, "t1": 2}
+    assert graph.k_hop(["t6", "inconnu"], 3) == {"t6": 0}
+
+
+def test_connected_groups_on_small_graph():
+    graph = _graph(TRONCONS)
+    groups = graph.connected_groups(["t1", "t6", "t3", "t5", "t1", "inconnu"])
+    assert _normalise(groups) == [["inconnu"], ["t1"], ["t3", "t5"], ["t6"]]
+    # t2 relie la chaîne : un seul corridor
+    assert _normalise(graph.connected_groups(["t1", "t2", "t4", "t3"])) == [["t1", "t2", "t3", "t4"]]
+
+
+def _random_network(rng):
+    nodes = [f"n{i}" for i in range(rng.randint(1, 25))] + [""]
+    return {f"arc{i}": (rng.choice(nodes), rng.choice(nodes)) for i in range(rng.randint(1, 60))}
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_random_graphs_match_brute_force(seed, tmp_path):
+    rng = random.Random(seed)
+    troncons = _random_network(rng)
+    graph = _graph(troncons)
+    path = tmp_path / "graphe.npz"
+    graph.save(path)
+    graph = RoadGraph.load(path)
+
+    starts = rng.sample(sorted(troncons), rng.randint(1, min(3, len(troncons))))
+    k = rng.randint(0, 4)
+    for direction in (DIRECTION_AVAL, DIRECTION_AMONT, DIRECTION_TOUS):
+        assert graph.k_hop(starts, k, direction) == _brute_k_hop(troncons, starts, k, direction)
+
+    subset = rng.sample(sorted(troncons), rng.randint(0, len(troncons))) + ["inconnu"]
+    assert _normalise(graph.connected_groups(subset)) == _normalise(_brute_groups(troncons, subset))
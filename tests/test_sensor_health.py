@@ -0,0 +1,149 @@
+"""
+Tests du suivi incrémental de santé des capteurs (processors.utils.sensor_health)
+
+Les événements et l'état du tracker, alimenté par micro-lots (avec recouvrements,
+désordre et rechargements de l'état), sont comparés à un modèle de référence qui
+rejoue les relevés un par un.
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from config.settings import CAPTEUR_DEFAILLANT_HEURES, CAPTEUR_VALEUR_CONSTANTE_RELEVES
+from processors.utils.sensor_health import SensorHealthTracker
+
+INACTIF_HEURES = CAPTEUR_DEFAILLANT_HEURES
+CONSTANT_RELEVES = CAPTEUR_VALEUR_CONSTANTE_RELEVES
+HEURE_0 = 480000  # Heure absolue de départ
+
+
+def _reference(batches):
+    """Modèle de référence : relevés traités un par un, dans l'ordre (capteur, heure)"""
+    states = {}
+    clock = -1
+    results = []
+    for batch in batches:
+        events = []
+        firsts = {}
+        for sensor, hour, _ in batch:
+            if sensor and hour >= 0:
+                states.setdefault(sensor, dict(last_hour=-1, last_active=None, last_value=None,
+                                               run=0, inactive=-1, constant=-1))
+                firsts[sensor] = min(firsts.get(sensor, hour), hour)
+        for sensor, first in firsts.items():
+            if states[sensor]["last_active"] is None:
+                states[sensor]["last_active"] = first - 1
+        totals = {}
+        for sensor, hour, value in batch:
+            if sensor and hour >= 0 and hour > states[sensor]["last_hour"]:
+                totals[(sensor, hour)] = totals.get((sensor, hour), 0) + value
+        for sensor, hour in sorted(totals):
+            value, state = totals[(sensor, hour)], states[sensor]
+            if value != 0:
+                if hour - state["last_active"] - 1 >= INACTIF_HEURES or state["inactive"] >= 0:
+                    if state["inactive"] < 0:
+                        events.append((state["last_active"] + INACTIF_HEURES, sensor, "inactif", True))
+                    events.append((hour, sensor, "inactif", False))
+                state["inactive"] = -1
+                state["last_active"] = max(state["last_active"], hour)
+                if state["run"] > 0 and value == state["last_value"]:
+                    state["run"] += 1
+                else:
+                    if state["run"] > CONSTANT_RELEVES:
+                        events.append((hour, sensor, "valeur_constante", False))
+                    state["run"], state["constant"] = 1, -1
+                state["last_value"] = value
+                if state["run"] == CONSTANT_RELEVES + 1:
+                    events.append((hour, sensor, "valeur_constante", True))
+                    state["constant"] = hour
+            state["last_hour"] = max(state["last_hour"], hour)
+            clock = max(clock, hour)
+        for sensor, state in states.items():
+            if clock >= 0 and clock - state["last_active"] >= INACTIF_HEURES and state["inactive"] < 0:
+                state["inactive"] = state["last_active"] + INACTIF_HEURES
+                events.append((state["inactive"], sensor, "inactif", True))
+        results.append(sorted(events, key=lambda e: (e[0], e[1], not e[3])))
+    return results, states
+
+
+def _random_batches(rng):
+    """Relevés horaires aléatoires (zéros, valeurs bloquées, doublons) découpés en lots recouvrants"""
+    sensors = [f"s{i}" for i in range(rng.randint(1, 6))] + [""]
+    records = []
+    for hour in range(HEURE_0, HEURE_0 + rng.randint(1, 80)):
+        for sensor in sensors:
+            if rng.random() < 0.8:
+                mode = rng.random()
+                records.append((sensor, hour, 0 if mode < 0.3 else 5 if mode < 0.75 else rng.randint(0, 3)))
+                if rng.random() < 0.05:
+                    records.append((sensor, hour, 1))
+    cuts = sorted(rng.sample(range(len(records) + 1), min(len(records), rng.randint(0, 5))))
+    bounds = [0] + cuts + [len(records)]
+    batches = []
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        batch = records[max(0, start - rng.randint(0, 10)):stop]
+        rng.shuffle(batch)
+        batches.append(batch)
+    return batches
+
+
+def _events(raw):
+    return [(int(np.datetime64(e["heure"][:13], "h").astype(np.int64)), e["id_capteur"], e["cause"],
+             e["etat"] == "defaillant") for e in raw]
+
+
+@pytest.mark.parametrize("seed", range(60))
+def test_micro_batches_match_reference(seed, tmp_path):
+    rng = random.Random(seed)
+    batches = _random_batches(rng)
+    expected, states = _reference(batches)
+
+    tracker = SensorHealthTracker()
+    path = tmp_path / "sante.npz"
+    for batch, expected_events in zip(batches, expected):
+        if rng.random() < 0.5:
+            tracker.save(path)
+            tracker = SensorHealthTracker.load(path)
+        raw = tracker.consume([r[0] for r in batch], [r[1] for r in batch], [r[2] for r in batch])
+        assert _events(raw) == expected_events
+
+    for sensor, state in states.items():
+        position = tracker.lookup_many([sensor])[0]
+        assert tracker.inactif_depuis[position] == state["inactive"]
+        assert tracker.constant_depuis[position] == state["constant"]
+        assert tracker.serie_constante[position] == state["run"]
+
+
+def test_save_load_round_trip(tmp_path):
+    tracker = SensorHealthTracker()
+    tracker.consume(["a", "b", "a"], [HEURE_0, HEURE_0, HEURE_0 + 3], [4, 0, 4])
+    path = tmp_path / "sante.npz"
+    tracker.save(path)
+
+    loaded = SensorHealthTracker.load(path)
+    assert loaded.horloge == tracker.horloge
+    assert loaded.summary() == tracker.summary()
+    assert [loaded.status(i) for i in range(len(loaded))] == [tracker.status(i) for i in range(len(tracker))]
+
+
+def test_replayed_batch_is_ignored():
+    tracker = SensorHealthTracker()
+    batch = (["a"] * 20, list(range(HEURE_0, HEURE_0 + 20)), [7] * 20)
+    first = tracker.consume(*batch)
+    assert [(e["cause"], e["etat"]) for e in first] == [("valeur_constante", "defaillant")]
+    state = {name: np.copy(value) for name, value in vars(tracker).items() if isinstance(value, np.ndarray)}
+
+    assert tracker.consume(*batch) == []
+    for name, value in state.items():
+        np.testing.assert_array_equal(getattr(tracker, name), value)
+
+
+def test_advance_flags_silent_sensors():
+    tracker = SensorHealthTracker()
+    tracker.consume(["a"], [HEURE_0], [3])
+    assert tracker.advance(HEURE_0 + INACTIF_HEURES - 1) == []
+    events = tracker.advance(HEURE_0 + INACTIF_HEURES)
+    assert [(e["id_capteur"], e["cause"], e["etat"]) for e in events] == [("a", "inactif", "defaillant")]
+    assert tracker.failing_mask(["a", "inconnu"]).tolist() == [True, False]
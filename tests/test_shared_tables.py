@@ -0,0 +1,33 @@
+"""
+Tests du pool de workers à tables partagées (processors.utils.shared_tables) :
+configuration du processeur parent transmise aux workers
+"""
+
+from pathlib import Path
+from types import SimpleNamespace
+
+from processors.utils.shared_tables import (
+    SharedTables, config_snapshot, get_worker_config, shared_worker_pool
+)
+
+
+def _worker_setting(name):
+    config = get_worker_config()
+    return None if config is None else getattr(config, name, None)
+
+
+def test_config_snapshot_keeps_simple_uppercase_settings():
+    config = SimpleNamespace(SEUIL=5.0, CHEMIN=Path("/tmp/etat"), USE_S3=True, LISTE=[1, "a"],
+                             OBJET=object(), minuscule=1)
+    assert config_snapshot(config) == {"SEUIL": 5.0, "CHEMIN": Path("/tmp/etat"), "USE_S3": True,
+                                       "LISTE": [1, "a"]}
+
+
+def test_workers_receive_parent_config():
+    config = SimpleNamespace(TAUX_OCCUPATION_SEUIL_CONGESTION=5.0, USE_S3=True)
+    with SharedTables() as tables:
+        with shared_worker_pool(1, tables, config=config) as executor:
+            assert executor.submit(_worker_setting, "TAUX_OCCUPATION_SEUIL_CONGESTION").result() == 5.0
+            assert executor.submit(_worker_setting, "USE_S3").result() is True
+        with shared_worker_pool(1, tables) as executor:
+            assert executor.submit(_worker_setting, "USE_S3").result() is None
@@ -0,0 +1,63 @@
+"""
+Tests des sketches fusionnables (processors.utils.sketches) : bornes de précision du
+t-digest et de l'HyperLogLog, fusion et sérialisation
+"""
+
+import numpy as np
+import pytest
+
+from processors.utils.sketches import (
+    HyperLogLog, SketchAccumulator, TDigest, merge_sketch_dicts, summarize_sketch
+)
+
+QUANTILES = (0.01, 0.1, 0.5, 0.9, 0.95, 0.99)
+
+
+def _rank_error(values, digest, q):
+    """Écart entre q et le rang empirique du quantile estimé"""
+    return abs(np.searchsorted(np.sort(values), digest.quantile(q)) / len(values) - q)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_tdigest_quantile_rank_error(seed):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(mean=5.0, sigma=1.0, size=40000)
+    digest = TDigest(100).update(values.tolist())
+    for q in QUANTILES:
+        assert _rank_error(values, digest, q) < 0.01, q
+    assert digest.quantile(0.0) == pytest.approx(values.min())
+    assert digest.quantile(1.0) == pytest.approx(values.max())
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_tdigest_merged_chunks_keep_accuracy(seed):
+    rng = np.random.default_rng(seed)
+    chunks = [rng.normal(loc, 10.0, size=4000) for loc in rng.uniform(0, 200, size=10)]
+    serialized = [TDigest(100).update(chunk.tolist()).to_dict() for chunk in chunks]
+    merged = SketchAccumulator().merge_dicts({"debit": serialized[0]})
+    for data in serialized[1:]:
+        merged.merge_dicts({"debit": data})
+    digest = merged.sketches["debit"]
+    values = np.concatenate(chunks)
+    assert digest.total == len(values)
+    for q in QUANTILES:
+        assert _rank_error(values, digest, q) < 0.015, q
+
+
+@pytest.mark.parametrize("p, n", [(12, 50000), (10, 20000), (14, 3000)])
+def test_hyperloglog_relative_error(p, n):
+    hll = HyperLogLog(p).update(f"arc_{i}" for i in range(n))
+    # 4 écarts types de l'erreur théorique 1.04 / sqrt(2^p)
+    assert abs(hll.count() - n) / n < 4 * 1.04 / np.sqrt(1 << p)
+
+
+def test_hyperloglog_small_cardinalities_and_merge():
+    left = HyperLogLog(12).update(f"c{i}" for i in range(150))
+    right = HyperLogLog(12).update(f"c{i}" for i in range(100, 300))
+    assert abs(left.count() - 150) <= 2
+    assert HyperLogLog(12).update(["a", "a", "a"]).count() == 1
+
+    merged = merge_sketch_dicts([left.to_dict(), None, right.to_dict()])
+    assert abs(summarize_sketch(merged)["distincts"] - 300) / 300 < 0.03
+    with pytest.raises(ValueError):
+        HyperLogLog(10).merge(HyperLogLog(12))
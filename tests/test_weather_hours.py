@@ -0,0 +1,95 @@
+"""
+Tests de la météo horaire persistante (processors.utils.weather_hours)
+"""
+
+import numpy as np
+import pytest
+
+from config.settings import METEO_RETENTION_JOURS
+from processors.utils.hourly_matrix import HOURS_PER_DAY, epoch_hours_of_day
+from processors.utils.weather_hours import HourlyWeather, retention_start, weather_conditioned_deltas
+
+JOUR = "2025-11-10"
+
+
+def _hours(day, prevision, temp=10.0, precip=0.0):
+    """24 heures météo d'une journée (température croissante, pluie de 7 h à 9 h)"""
+    return [
+        {"heure_epoch": int(epoch_hour), "temp": temp + hour * 0.5,
+         "precip": 1.2 if 7 <= hour <= 9 else precip, "vent": 10.0, "probabilite_pluie": 50.0,
+         "prevision": prevision, "conditions": "Rain" if 7 <= hour <= 9 else "Clear"}
+        for hour, epoch_hour in enumerate(epoch_hours_of_day(day))
+    ]
+
+
+def test_save_load_round_trip(tmp_path):
+    weather = HourlyWeather()
+    weather.merge(_hours(JOUR, prevision=False) + _hours("2025-11-11", prevision=True))
+    path = tmp_path / "meteo.npz"
+    weather.save(path)
+
+    loaded = HourlyWeather.load(path)
+    assert len(loaded) == 48
+    index = np.concatenate([epoch_hours_of_day(JOUR), epoch_hours_of_day("2025-11-11")])
+    assert loaded.to_dict(index) == weather.to_dict(index)
+    assert loaded.conditions.tolist() == weather.conditions.tolist()
+
+
+def test_incremental_batches_match_single_merge():
+    batches = [_hours(JOUR, prevision=True), _hours(JOUR, prevision=False)[:12],
+               _hours("2025-11-11", prevision=True), _hours(JOUR, prevision=False)[12:]]
+    incremental = HourlyWeather()
+    for batch in batches:
+        incremental.merge(batch)
+
+    expected = HourlyWeather()
+    expected.merge(_hours(JOUR, prevision=False) + _hours("2025-11-11", prevision=True))
+    index = np.concatenate([epoch_hours_of_day(JOUR), epoch_hours_of_day("2025-11-11")])
+    assert incremental.to_dict(index) == expected.to_dict(index)
+    assert np.all(np.diff(incremental.heures) > 0)
+
+
+def test_observation_replaces_forecast_not_the_reverse():
+    weather = HourlyWeather()
+    assert weather.merge(_hours(JOUR, prevision=True)) == {"ajoutees": 24, "remplacees": 0, "ignorees": 0}
+    assert weather.merge(_hours(JOUR, prevision=False, temp=0.0)) == {"ajoutees": 0, "remplacees": 24, "ignorees": 0}
+    stats = weather.merge(_hours(JOUR, prevision=True, temp=30.0))
+    assert stats == {"ajoutees": 0, "remplacees": 0, "ignorees": 24}
+    aligned = weather.align(epoch_hours_of_day(JOUR))
+    assert not aligned["prevision"].any()
+    assert aligned["temp"][0] == pytest.approx(0.0)
+
+
+def test_replay_of_integrated_day_is_idempotent():
+    weather = HourlyWeather()
+    weather.merge(_hours(JOUR, prevision=False))
+    before = weather.to_dict(epoch_hours_of_day(JOUR))
+    stats = weather.merge(_hours(JOUR, prevision=False))
+    assert stats == {"ajoutees": 0, "remplacees": 24, "ignorees": 0}
+    assert weather.to_dict(epoch_hours_of_day(JOUR)) == before
+    assert len(weather) == 24
+
+
+def test_retention_purges_old_hours():
+    weather = HourlyWeather()
+    old_day = str(np.datetime64(JOUR) - METEO_RETENTION_JOURS - 1)
+    weather.merge(_hours(old_day, prevision=False))
+    last_hour = int(epoch_hours_of_day(JOUR)[-1])
+    weather.merge(_hours(JOUR, prevision=False), oldest_kept=retention_start(last_hour))
+    assert len(weather) == HOURS_PER_DAY
+    assert not weather.align(epoch_hours_of_day(old_day))["connue"].any()
+
+
+def test_weather_conditioned_deltas():
+    weather = HourlyWeather()
+    weather.merge(_hours(JOUR, prevision=False))
+    epoch_hours = epoch_hours_of_day(JOUR)
+    attendu = [100.0] * HOURS_PER_DAY
+    observe = [60.0 if 7 <= hour <= 9 else 100.0 for hour in range(HOURS_PER_DAY)]
+    profile = {"heures_epoch": epoch_hours.tolist(), "observe": observe, "attendu": attendu}
+
+    deltas = weather_conditioned_deltas(profile, weather)
+    assert deltas["ecart_par_condition"]["pluie"] == {"heures": 3, "ecart_pourcent": -40.0}
+    assert deltas["ecart_par_condition"]["sec"] == {"heures": 21, "ecart_pourcent": 0.0}
+    assert deltas["effet_pluie_pourcent"] == -40.0
+    assert [h["pluie"] for h in deltas["heures"]][6:11] == [False, True, True, True, False]
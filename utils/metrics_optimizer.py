@@ -3,9 +3,16 @@ Utilitaires pour optimiser les métriques avant stockage
 Permet de créer des versions "summary" pour éviter les limites MongoDB (16 MB)
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 import json
 
+# Profils horaires exportés dans le summary (courbes des tronçons affichés par le dashboard)
+PROFILS_SUMMARY_COUCHES = ("debit", "taux_occupation")
+
+# Pyramide spatiale exportée jusqu'à cette précision geohash (6 ≈ 1,2 km) : le niveau le
+# plus fin (≈ un tronçon par cellule) reste dans le fichier local complet
+PYRAMIDE_SUMMARY_PRECISION_MAX = 6
+
 
 def create_comptages_summary(indicators: Dict[str, Any]) -> Dict[str, Any]:
     """
@@ -31,6 +38,16 @@ def create_comptages_summary(indicators: Dict[str, Any]) -> Dict[str, Any]:
         # Alertes (limitées à 20)
         "alertes_congestion": indicators.get("alertes_congestion", [])[:20],
         
+        # Corridors congestionnés (top 20) et pyramide spatiale (niveaux grossiers)
+        "corridors_congestion": (indicators.get("corridors_congestion") or [])[:20],
+        "pyramide_spatiale": summary_spatial_pyramid(indicators.get("pyramide_spatiale")),
+        
+        # Sketches ville (quelques Ko, fusionnables pour percentiles mensuels)
+        "sketches": {"ville": indicators.get("sketches", {}).get("ville", {})},
+        
+        # Courbes horaires des tronçons du top 10 et des alertes (quelques Ko)
+        "profils_horaires": summary_hourly_profiles(indicators),
+        
         # Métadonnées
         "total_troncons": len(indicators.get("metrics", [])),
         "note": "Liste complète des tronçons disponible dans fichier local uniquement"
@@ -39,6 +56,55 @@ def create_comptages_summary(indicators: Dict[str, Any]) -> Dict[str, Any]:
     return summary
 
 
+def summary_hourly_profiles(indicators: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Profils horaires (débit, taux d'occupation) restreints aux tronçons publiés dans le
+    summary : top 10 tronçons, top 10 zones congestionnées et alertes
+    
+    Args:
+        indicators: Indicateurs complets des comptages (avec "profils_horaires")
+    
+    Returns:
+        Matrices sérialisées (EntityHourMatrix.to_dict) ou None si indisponibles
+    """
+    profils = indicators.get("profils_horaires")
+    if not profils:
+        return None
+    
+    from processors.utils.hourly_matrix import EntityHourMatrix
+    
+    arc_ids: List[str] = [
+        item.get("identifiant_arc")
+        for key, limit in (("top_10_troncons", 10), ("top_10_zones_congestionnees", 10), ("alertes_congestion", 20))
+        for item in indicators.get(key, [])[:limit]
+        if item.get("identifiant_arc")
+    ]
+    return EntityHourMatrix.from_dict(profils).select(arc_ids).to_dict(PROFILS_SUMMARY_COUCHES)
+
+
+def summary_spatial_pyramid(pyramid: Optional[Dict[str, Any]],
+                            max_precision: int = PYRAMIDE_SUMMARY_PRECISION_MAX) -> Optional[Dict[str, Any]]:
+    """
+    Pyramide spatiale restreinte aux niveaux de précision <= max_precision
+    
+    Args:
+        pyramid: Pyramide complète (cf. build_spatial_pyramid)
+        max_precision: Précision geohash maximale conservée
+    
+    Returns:
+        Pyramide allégée ou None si absente
+    """
+    if not pyramid:
+        return None
+    
+    precisions = [p for p in pyramid.get("precisions", []) if p <= max_precision]
+    return dict(
+        pyramid,
+        precisions=precisions,
+        niveaux={str(p): pyramid.get("niveaux", {}).get(str(p), []) for p in precisions}
+    )
+
+
 def estimate_document_size(data: Dict[str, Any]) -> int:
     """
     Estime la taille approximative d'un document en bytes